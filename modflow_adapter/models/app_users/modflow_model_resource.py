@@ -6,6 +6,8 @@
 * Copyright: (c) Aquaveo 2018
 ********************************************************************************
 """
+import json
+from sqlalchemy import Column, Float, Index, String, inspect, text
 from tethysext.atcore.models.app_users import Resource
 
 __all__ = ['ModflowModelResource']
@@ -21,8 +23,173 @@ class ModflowModelResource(Resource):
 
     UPLOAD_STATUS_KEY = 'upload'
     UPLOAD_GS_STATUS_KEY = 'upload_geoserver'
+    PUBLISH_MANIFEST_KEY = 'publish_manifest'
+    DATABASE_ID_KEY = 'database_id'
+    MODEL_EXTENTS_KEY = 'model_extents'
+
+    # Columns added to the shared resources table, see upgrade_schema
+    INDEXED_COLUMNS = ('database_id', 'extent_min_x', 'extent_min_y', 'extent_max_x', 'extent_max_y')
+
+    # Copy of the database_id attribute, indexed to look up resources without parsing their attributes
+    database_id = Column(String, index=True)
+
+    # Copy of the model_extents attribute (minx, miny, maxx, maxy), indexed to select the models in a bounding box
+    extent_min_x = Column(Float)
+    extent_min_y = Column(Float)
+    extent_max_x = Column(Float)
+    extent_max_y = Column(Float)
 
     # Polymorphism
     __mapper_args__ = {
         'polymorphic_identity': TYPE,
     }
+
+    def set_attribute(self, key, value):
+        """
+        Set an attribute of the resource, the database_id and model_extents attributes are also stored in the
+        indexed columns.
+        """
+        super().set_attribute(key, value)
+        if key == self.DATABASE_ID_KEY:
+            self.database_id = value
+        elif key == self.MODEL_EXTENTS_KEY:
+            self.set_extent(value)
+
+    def set_extent(self, model_extents):
+        """
+        Store the extent of the model in the indexed columns.
+
+        Args:
+            model_extents(str|list): minx, miny, maxx, maxy as a list or a JSON string, None to clear the extent.
+        """
+        if isinstance(model_extents, str):
+            model_extents = json.loads(model_extents)
+        if model_extents is None:
+            model_extents = [None] * 4
+        self.extent_min_x, self.extent_min_y, self.extent_max_x, self.extent_max_y = \
+            [None if value is None else float(value) for value in model_extents]
+
+    @classmethod
+    def get_by_database_id(cls, session, database_id):
+        """
+        Get the resource of a model file database with an indexed query.
+
+        Args:
+            session(sqlalchemy.orm.Session): session of the primary database.
+            database_id(str): id of the model file database.
+        Returns:
+            ModflowModelResource: the resource or None if no resource has the database_id.
+        """
+        return session.query(cls).filter(cls.database_id == database_id).first()
+
+    @classmethod
+    def query_by_extent(cls, session, bbox, *entities):
+        """
+        Query the resources with an extent that intersects a bounding box. Resources without extent are excluded.
+
+        Args:
+            session(sqlalchemy.orm.Session): session of the primary database.
+            bbox(list): minx, miny, maxx, maxy in the coordinates of the model extents.
+            entities: columns to query instead of the resources (i.e. ModflowModelResource.database_id).
+        Returns:
+            sqlalchemy.orm.Query: query of the resources ordered by id.
+        """
+        minx, miny, maxx, maxy = [float(value) for value in bbox]
+        return session.query(*(entities or (cls,))) \
+            .filter(cls.extent_min_x <= maxx, cls.extent_max_x >= minx,
+                    cls.extent_min_y <= maxy, cls.extent_max_y >= miny) \
+            .order_by(cls.id)
+
+    @classmethod
+    def upgrade_schema(cls, connection):
+        """
+        Add the indexed columns and their indexes to the resources table of a database created before they existed,
+        then copy the attributes to the columns with index_attributes. Columns and indexes that exist are left as is.
+
+        Args:
+            connection(sqlalchemy.engine.Connection): connection to the primary database, in a transaction
+                (i.e. "with engine.begin() as connection:").
+        Returns:
+            list: names of the columns and indexes added.
+        """
+        table = cls.__table__
+        inspector = inspect(connection)
+        columns = set(column['name'] for column in inspector.get_columns(table.name, schema=table.schema))
+        indexes = set(index['name'] for index in inspector.get_indexes(table.name, schema=table.schema))
+        preparer = connection.dialect.identifier_preparer
+
+        added = []
+        for name in cls.INDEXED_COLUMNS:
+            if name in columns:
+                continue
+            connection.execute(text('ALTER TABLE {} ADD COLUMN {} {}'.format(
+                preparer.format_table(table), preparer.quote(name),
+                table.c[name].type.compile(dialect=connection.dialect)
+            )))
+            added.append(name)
+
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in indexes and any(column.name in cls.INDEXED_COLUMNS for column in index.columns):
+                index.create(bind=connection)
+                added.append(index.name)
+        return added
+
+    @classmethod
+    def index_attributes(cls, session):
+        """
+        Copy the database_id and model_extents attributes to the indexed columns for the resources created before
+        the columns existed, once the columns are added to the table (see upgrade_schema).
+
+        Args:
+            session(sqlalchemy.orm.Session): session of the primary database.
+        Returns:
+            int: number of resources updated, the resources without the attributes of their empty columns are left
+                as is.
+        """
+        count = 0
+        for resource in session.query(cls).filter((cls.database_id.is_(None)) | (cls.extent_min_x.is_(None))):
+            columns = resource.get_indexed_columns()
+            if resource.database_id is None:
+                database_id = resource.get_attribute(cls.DATABASE_ID_KEY)
+                if database_id is not None:
+                    resource.database_id = database_id
+            if resource.extent_min_x is None:
+                model_extents = resource.get_attribute(cls.MODEL_EXTENTS_KEY)
+                if model_extents is not None:
+                    resource.set_extent(model_extents)
+            if resource.get_indexed_columns() != columns:
+                count += 1
+        session.commit()
+        return count
+
+    def get_indexed_columns(self):
+        """
+        Returns:
+            tuple: values of the INDEXED_COLUMNS of the resource.
+        """
+        return tuple(getattr(self, name) for name in self.INDEXED_COLUMNS)
+
+    def get_publish_manifest(self):
+        """
+        Get the manifest of the layers published to GeoServer for this model.
+
+        Returns:
+            dict: manifest to pass to ModflowSpatialManager (see PublishManifest).
+        """
+        return self.get_attribute(self.PUBLISH_MANIFEST_KEY) or {}
+
+    def set_publish_manifest(self, manifest):
+        """
+        Store the manifest of the layers published to GeoServer for this model.
+
+        Args:
+            manifest(dict|PublishManifest): manifest of ModflowSpatialManager.publish_manifest after publishing.
+        """
+        if hasattr(manifest, 'to_dict'):
+            manifest = manifest.to_dict()
+        self.set_attribute(self.PUBLISH_MANIFEST_KEY, manifest)
+
+
+# Composite index of the extent columns (on the shared resources table) for bounding box queries
+Index('ix_modflow_model_resource_extent', ModflowModelResource.extent_min_x, ModflowModelResource.extent_max_x,
+      ModflowModelResource.extent_min_y, ModflowModelResource.extent_max_y)
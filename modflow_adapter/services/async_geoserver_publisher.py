@@ -0,0 +1,329 @@
+"""
+********************************************************************************
+* Name: async_geoserver_publisher
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from contextlib import ExitStack
+
+from modflow_adapter.services.geoserver_publisher import EngineGeoServerPublisher, GeoServerPublishError, \
+    SHAPEFILE_EXTENSIONS
+from modflow_adapter.services.tracing import traced
+
+
+class AsyncGeoServerClient(object):
+    """
+    Asynchronous client of the GeoServer REST API. The requests share one pooled keep-alive HTTP session, at most
+    max_in_flight requests are sent at the same time and the requests failing with a connection error or a server
+    error are retried with exponential backoff.
+    """
+    MAX_IN_FLIGHT = 8
+    MAX_RETRIES = 3
+    RETRY_DELAY = 0.5
+    TIMEOUT = 300
+
+    def __init__(self, endpoint, username, password, max_in_flight=MAX_IN_FLIGHT, max_retries=MAX_RETRIES,
+                 retry_delay=RETRY_DELAY, timeout=TIMEOUT):
+        """
+        Constructor
+
+        Args:
+            endpoint(str): URL of the GeoServer REST API (i.e. http://localhost:8181/geoserver/rest/).
+            username(str): GeoServer user.
+            password(str): password of the user.
+            max_in_flight(int): maximum number of concurrent requests (and pooled connections).
+            max_retries(int): number of times a failed request is sent again.
+            retry_delay(float): seconds to wait before the first retry, doubled after each retry.
+            timeout(float): seconds before a request is abandoned (and retried).
+        """
+        self.endpoint = endpoint.rstrip('/')
+        self.username = username
+        self.password = password
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            auth=aiohttp.BasicAuth(self.username, self.password),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+        self._session = None
+
+    async def request(self, method, path, ok_statuses=(), data_file=None, **kwargs):
+        """
+        Send a request, retried after connection errors and server errors.
+
+        Args:
+            method(str): HTTP method.
+            path(str): path relative to the REST endpoint.
+            ok_statuses(tuple): error statuses accepted as a response (i.e. 404 when deleting).
+            data_file(str): path of a file streamed as the body of the request, opened once the request is sent.
+                Defaults to None.
+            kwargs: arguments of aiohttp.ClientSession.request (i.e. data, json, params, headers).
+        Returns:
+            int: status of the response.
+        """
+        import aiohttp
+        url = '{}/{}'.format(self.endpoint, path)
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(delay)
+                delay *= 2
+            try:
+                async with self._semaphore:
+                    with ExitStack() as stack:
+                        if data_file is not None:
+                            kwargs['data'] = stack.enter_context(open(data_file, 'rb'))
+                        async with self._session.request(method, url, **kwargs) as response:
+                            text = await response.text()
+                            status = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+                continue
+            if status < 400 or status in ok_statuses:
+                return status
+            error = 'HTTP {}: {}'.format(status, text)
+            if status < 500:
+                break
+        raise GeoServerPublishError('{} {} failed: {}'.format(method.upper(), path, error))
+
+    async def upload_store(self, workspace, store, store_type, zip_file):
+        """
+        Upload a zipped GEOTIFF (store_type "coveragestores") or shapefile (store_type "datastores"), replacing
+        the store if it exists. The zip file is streamed from disk.
+        """
+        extension = 'geotiff' if store_type == 'coveragestores' else 'shp'
+        params = {'coverageName': store} if store_type == 'coveragestores' else {}
+        await self.request('put', 'workspaces/{}/{}/{}/file.{}'.format(workspace, store_type, store, extension),
+                           data_file=zip_file, params=params, headers={'Content-Type': 'application/zip'})
+
+    async def update_resource(self, workspace, store, store_type, projection, projection_policy=None):
+        """
+        Declare the projection of the resource of a store and enable it.
+        """
+        resource = {'srs': projection, 'enabled': True}
+        if projection_policy:
+            resource['projectionPolicy'] = projection_policy
+        if store_type == 'coveragestores':
+            path, key = 'workspaces/{0}/coveragestores/{1}/coverages/{1}', 'coverage'
+        else:
+            path, key = 'workspaces/{0}/datastores/{1}/featuretypes/{1}', 'featureType'
+        await self.request('put', path.format(workspace, store), json={key: resource})
+
+    async def update_default_style(self, workspace, layer, style_name):
+        """
+        Set the default style of a layer.
+        """
+        await self.request('put', 'layers/{}:{}'.format(workspace, layer),
+                           json={'layer': {'defaultStyle': {'name': style_name, 'workspace': workspace}}})
+
+    async def create_style(self, workspace, style_name, sld, overwrite=False):
+        """
+        Create a style from an SLD document, replaced if it exists and overwrite is True.
+        """
+        headers = {'Content-Type': 'application/vnd.ogc.sld+xml'}
+        status = await self.request('post', 'workspaces/{}/styles'.format(workspace), ok_statuses=(403, 409),
+                                    data=sld, params={'name': style_name}, headers=headers)
+        if status in (403, 409) and overwrite:
+            await self.request('put', 'workspaces/{}/styles/{}'.format(workspace, style_name),
+                               data=sld, headers=headers)
+
+    async def delete_style(self, workspace, style_name, purge=False):
+        """
+        Delete a style, missing styles are ignored.
+        """
+        await self.request('delete', 'workspaces/{}/styles/{}'.format(workspace, style_name), ok_statuses=(404,),
+                           params={'purge': str(purge).lower()})
+
+    async def delete_store(self, workspace, store):
+        """
+        Delete a coverage store or a data store with its layers, missing stores are ignored.
+        """
+        for store_type in ('coveragestores', 'datastores'):
+            status = await self.request('delete', 'workspaces/{}/{}/{}'.format(workspace, store_type, store),
+                                        ok_statuses=(404,), params={'recurse': 'true'})
+            if status != 404:
+                return
+
+
+class AsyncGeoServerPublisher(EngineGeoServerPublisher):
+    """
+    Stages layers, styles and deletions and submits them concurrently with an AsyncGeoServerClient: the uploads of
+    the layers overlap, and the layer and resource updates of each layer are sent together once it is uploaded. The
+    zip files of the staged layers are kept in the staging directory until they are uploaded, not in memory.
+    """
+    STAGES_LAYERS = True
+
+    def __init__(self, geoserver_engine, workspace, client=None, staging_dir=None, on_published=None,
+                 on_deleted=None, tracer=None, **client_options):
+        """
+        Constructor
+
+        Args:
+            geoserver_engine(tethys_dataset_services.GeoServerEngine): Tethys geoserver engine, its endpoint and
+                credentials are used by the client.
+            workspace(str): workspace of the published layers.
+            client(AsyncGeoServerClient): client of the requests. Defaults to None (new client).
+            staging_dir(str): directory of the staged zip files. Defaults to None (system temporary directory).
+            on_published(callable): function (geoserver_stores) called with the published layers. Defaults to None.
+            on_deleted(callable): function (geoserver_stores) called with the deleted stores. Defaults to None.
+            tracer(Tracer): tracer of the flushes (see tracing). Defaults to None (not traced).
+            client_options: options of the new client (i.e. max_in_flight, max_retries).
+        """
+        super().__init__(geoserver_engine, on_published=on_published, on_deleted=on_deleted, tracer=tracer)
+        self.workspace = workspace
+        self.client = client or AsyncGeoServerClient(geoserver_engine.endpoint, geoserver_engine.username,
+                                                     geoserver_engine.password, **client_options)
+        self.staging_dir = staging_dir
+        self._styles = []
+        self._layers = []
+        self._deleted_stores = []
+        self._deleted_styles = []
+        self._staging_path = None
+        # The client serves one flush at a time, the layers are staged for the next flush meanwhile
+        self._flush_lock = threading.Lock()
+
+    @property
+    def staged_styles(self):
+        """
+        Styles of the layers staged and not published yet.
+        """
+        return set(layer[4] for layer in self._layers)
+
+    def publish_coverage(self, geoserver_store, coverage_file, projection, default_style, projection_policy=None):
+        """
+        Stage a zipped GEOTIFF and its .prj file (copied now, the file can be removed), uploaded by flush.
+        """
+        with self._lock:
+            zip_file = self._get_staged_file(geoserver_store)
+            shutil.copyfile(coverage_file, zip_file)
+            self._stage_layer(geoserver_store, 'coveragestores', zip_file, projection, default_style,
+                              projection_policy)
+
+    def publish_shapefile(self, geoserver_store, projection, default_style, projection_policy=None,
+                          shapefile_zip=None, shapefile_base=None):
+        """
+        Stage a shapefile (copied now, the files can be removed), uploaded by flush.
+        """
+        with self._lock:
+            zip_file = self._get_staged_file(geoserver_store)
+            if shapefile_zip:
+                shutil.copyfile(shapefile_zip, zip_file)
+            else:
+                with zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                    for extension in SHAPEFILE_EXTENSIONS:
+                        if os.path.isfile(shapefile_base + extension):
+                            zipf.write(shapefile_base + extension, os.path.basename(shapefile_base) + extension)
+            self._stage_layer(geoserver_store, 'datastores', zip_file, projection, default_style,
+                              projection_policy)
+
+    def create_style(self, workspace, style_name, sld_template, sld_context, overwrite=False):
+        """
+        Render an SLD template now and stage the style, created by flush before the layers are published.
+        """
+        from jinja2 import Template
+        with open(sld_template, 'r') as f:
+            sld = Template(f.read()).render(sld_context or {})
+        with self._lock:
+            self._styles.append((workspace, style_name, sld, overwrite))
+
+    def delete_style(self, workspace, style_name, purge=False):
+        """
+        Stage the deletion of a style, deleted by flush after the layers.
+        """
+        with self._lock:
+            self._deleted_styles.append((workspace, style_name, purge))
+
+    def delete_resource(self, geoserver_store):
+        """
+        Stage the deletion of a published layer with its store, reported to on_deleted once GeoServer deleted it.
+        """
+        with self._lock:
+            self._deleted_stores.append(geoserver_store)
+
+    @traced('geoserver.async_flush')
+    def flush(self):
+        """
+        Submit the staged requests: create the styles, publish the layers, delete the stores and then the styles.
+        The requests of each step are sent concurrently.
+
+        Returns:
+            list: GeoServer store ids of the published layers.
+        """
+        with self._flush_lock:
+            # The staged requests are swapped under the staging lock, they are submitted without it
+            with self._lock:
+                styles, layers, deleted_stores, deleted_styles, staging_path = \
+                    self._styles, self._layers, self._deleted_stores, self._deleted_styles, self._staging_path
+                self._styles, self._layers, self._deleted_stores, self._deleted_styles, self._staging_path = \
+                    [], [], [], [], None
+            if not (styles or layers or deleted_stores or deleted_styles):
+                return []
+            try:
+                asyncio.run(self._submit(styles, layers, deleted_stores, deleted_styles))
+            finally:
+                if staging_path is not None:
+                    shutil.rmtree(staging_path, ignore_errors=True)
+            return [layer[0] for layer in layers]
+
+    async def _submit(self, styles, layers, deleted_stores, deleted_styles):
+        async with self.client as client:
+            await asyncio.gather(*[client.create_style(*style) for style in styles])
+            # The layers published before a failure are reported, they are not published again on retry
+            results = await asyncio.gather(*[self._publish_layer(client, *layer) for layer in layers],
+                                           return_exceptions=True)
+            self._published([layer[0] for layer, result in zip(layers, results) if result is None])
+            self._raise_first(results)
+            # Only the stores GeoServer deleted are reported, the others stay in the manifest of the publisher
+            results = await asyncio.gather(*[client.delete_store(*store.split(':', 1)) for store in deleted_stores],
+                                           return_exceptions=True)
+            self._deleted([store for store, result in zip(deleted_stores, results) if result is None])
+            self._raise_first(results)
+            await asyncio.gather(*[client.delete_style(*style) for style in deleted_styles])
+
+    @staticmethod
+    def _raise_first(results):
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def _publish_layer(self, client, geoserver_store, store_type, zip_file, projection, default_style,
+                             projection_policy):
+        workspace, store = geoserver_store.split(':', 1)
+        await client.upload_store(workspace, store, store_type, zip_file)
+        updates = [client.update_default_style(workspace, store, default_style)]
+        if projection:
+            updates.append(client.update_resource(workspace, store, store_type, projection, projection_policy))
+        await asyncio.gather(*updates)
+
+    def _get_staged_file(self, geoserver_store):
+        """
+        Path of the staged zip file of a layer, in the staging directory of the next flush.
+        """
+        if self._staging_path is None:
+            self._staging_path = tempfile.mkdtemp(prefix='modflow_async_', dir=self.staging_dir)
+        return os.path.join(self._staging_path, '{}.zip'.format(geoserver_store.split(':')[-1]))
+
+    def _stage_layer(self, geoserver_store, store_type, zip_file, projection, default_style, projection_policy):
+        self._layers.append((geoserver_store, store_type, zip_file, projection, default_style, projection_policy))
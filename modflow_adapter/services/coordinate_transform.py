@@ -0,0 +1,78 @@
+"""
+********************************************************************************
+* Name: coordinate_transform
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+from functools import lru_cache
+import numpy as np
+import pyproj
+
+# Number of (source, destination) transformers kept in memory
+TRANSFORMER_CACHE_SIZE = 64
+
+
+def get_crs(crs):
+    """
+    Get a pyproj CRS from an EPSG code or a proj4 string.
+
+    Args:
+        crs(str|int): EPSG code (i.e. 4326 or "4326") or proj4 string (i.e. "+proj=utm +zone=15 ...").
+    Returns:
+        pyproj.CRS: the coordinate reference system.
+    """
+    crs = str(crs)
+    if "+" in crs:
+        return pyproj.CRS.from_proj4(crs)
+    return pyproj.CRS.from_epsg(int(crs))
+
+
+@lru_cache(maxsize=TRANSFORMER_CACHE_SIZE)
+def get_transformer(in_crs, out_crs):
+    """
+    Get the cached transformer between two coordinate reference systems. Coordinates are in the units of each
+    system and in x, y (longitude, latitude) order.
+
+    Args:
+        in_crs(str): EPSG code or proj4 string of the source coordinates.
+        out_crs(str): EPSG code or proj4 string of the transformed coordinates.
+    Returns:
+        pyproj.Transformer: the transformer.
+    """
+    return pyproj.Transformer.from_crs(get_crs(in_crs), get_crs(out_crs), always_xy=True)
+
+
+def transform(x, y, in_crs, out_crs):
+    """
+    Transform coordinates in a single vectorized call.
+
+    Args:
+        x(float|array-like): x coordinates (scalar or array of any shape).
+        y(float|array-like): y coordinates with the shape of x.
+        in_crs(str|int): EPSG code or proj4 string of the source coordinates.
+        out_crs(str|int): EPSG code or proj4 string of the transformed coordinates.
+    Returns:
+        tuple: transformed x and y, scalars for scalar coordinates and numpy arrays otherwise.
+    """
+    transformer = get_transformer(str(in_crs), str(out_crs))
+    if np.isscalar(x) and np.isscalar(y):
+        return transformer.transform(x, y)
+    return transformer.transform(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+
+
+def transform_points(points, in_crs, out_crs):
+    """
+    Transform an (n, 2) array of x, y points (i.e. grid corners, cell centroids or contour vertices).
+
+    Args:
+        points(array-like): (n, 2) x, y points.
+        in_crs(str|int): EPSG code or proj4 string of the source points.
+        out_crs(str|int): EPSG code or proj4 string of the transformed points.
+    Returns:
+        np.ndarray: (n, 2) transformed points.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    x, y = transform(points[:, 0], points[:, 1], in_crs, out_crs)
+    return np.column_stack((x, y))
@@ -0,0 +1,60 @@
+"""
+********************************************************************************
+* Name: derived_layers
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+from collections import namedtuple
+import numpy as np
+
+# A layer derived from the values of a package attribute:
+#   tag: appended to the attribute name of the layer (i.e. fluxcustomtagpos001001).
+#   index: index of the public name in the list of the attribute in ATTRIBUTE_TRANSLATION_DICT.
+#   minimum, maximum: bounds the values are clipped to, None for no bound.
+#   absolute: use the absolute value of the clipped values.
+#   condition: CQL condition selecting the records of the layer, formatted with the field name.
+DerivedLayer = namedtuple('DerivedLayer', ['tag', 'index', 'minimum', 'maximum', 'absolute', 'condition'])
+
+# Split of an attribute into positive values and absolute negative values (i.e. injection and extraction rates)
+SIGN_SPLIT = (
+    DerivedLayer(tag='customtagpos', index=1, minimum=0, maximum=None, absolute=False, condition='{} > 0'),
+    DerivedLayer(tag='customtagneg', index=0, minimum=None, maximum=0, absolute=True, condition='{} < 0'),
+)
+
+
+def compute_derived_values(values, derived_layers):
+    """
+    Compute the values of the derived layers of an attribute, with one pass over the values for each derived layer.
+
+    Args:
+        values(np.ndarray): values of the attribute.
+        derived_layers(iterable): DerivedLayer definitions.
+    Returns:
+        list: (DerivedLayer, values) for each derived layer.
+    """
+    derived_values = []
+    for derived_layer in derived_layers:
+        # np.clip returns a new array, the absolute value is computed in place on it
+        new_values = np.clip(values, derived_layer.minimum, derived_layer.maximum)
+        if derived_layer.absolute:
+            np.absolute(new_values, out=new_values)
+        derived_values.append((derived_layer, new_values))
+    return derived_values
+
+
+def split_derived_tag(name, derived_layers):
+    """
+    Remove the tag of a derived layer from a layer name.
+
+    Args:
+        name(str): layer name (i.e. fluxcustomtagneg-wel).
+        derived_layers(iterable): DerivedLayer definitions.
+    Returns:
+        tuple: (name without the tag, DerivedLayer or None if the name has no tag).
+    """
+    for derived_layer in derived_layers:
+        if derived_layer.tag in name:
+            return name.replace(derived_layer.tag, ''), derived_layer
+    return name, None
@@ -0,0 +1,385 @@
+"""
+********************************************************************************
+* Name: geoserver_publisher
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from modflow_adapter.services.tracing import traced
+
+# Extensions of the files of a shapefile uploaded with it
+SHAPEFILE_EXTENSIONS = ('.shp', '.shx', '.dbf', '.prj', '.cpg')
+
+
+class GeoServerPublishError(Exception):
+    """
+    Raised when GeoServer did not publish some of the staged layers.
+    """
+    pass
+
+
+def publish_batch(method):
+    """
+    Decorator running a method of a spatial manager in a batch of its publisher: the layers, styles and deletions
+    staged by the method (and the methods it calls) are submitted together when the outermost batch ends.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.publisher.batch():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class EngineGeoServerPublisher(object):
+    """
+    Publishes each layer with the GeoServer engine as soon as it is staged: one upload, one layer update and one
+    resource update per layer. Styles and deletions are also applied immediately.
+    """
+
+    # True if the layers are published by flush rather than when they are staged
+    STAGES_LAYERS = False
+
+    def __init__(self, geoserver_engine, gs_api=None, set_default_style=None, on_published=None, on_deleted=None,
+                 tracer=None):
+        """
+        Constructor
+
+        Args:
+            geoserver_engine(tethys_dataset_services.GeoServerEngine): Tethys geoserver engine.
+            gs_api(GeoServerAPI): atcore GeoServer API used for the styles. Defaults to None (no styles).
+            set_default_style(callable): function (geoserver_store, style_name) setting the default style of a
+                published layer. Defaults to None (update_layer of the engine).
+            on_published(callable): function (geoserver_stores) called by flush with the staged layers GeoServer
+                published, even when some other layers failed. Defaults to None.
+            on_deleted(callable): function (geoserver_stores) called with the stores GeoServer deleted, once they are
+                deleted. Defaults to None.
+            tracer(Tracer): tracer of the GeoServer requests (see tracing). Defaults to None (not traced).
+        """
+        self.gs_engine = geoserver_engine
+        self.tracer = tracer
+        self.gs_api = gs_api
+        self._set_default_style = set_default_style or self._update_default_style
+        self.on_published = on_published
+        self.on_deleted = on_deleted
+        self._batch_depth = 0
+        # Layers may be staged and flushed from several threads (see TaskScheduler)
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def batch(self):
+        """
+        Context in which the staged layers, styles and deletions are submitted with one flush when the outermost
+        batch ends without error. An explicit flush still submits them immediately.
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                outermost = self._batch_depth == 0
+        if outermost:
+            self.flush()
+
+    @traced('geoserver.create_style', 'style_name')
+    def create_style(self, workspace, style_name, sld_template, sld_context, overwrite=False):
+        """
+        Create a style from an SLD template.
+
+        Args:
+            workspace(str): workspace of the style.
+            style_name(str): name of the style.
+            sld_template(str): path of the SLD template.
+            sld_context(dict): context of the template.
+            overwrite(bool): Overwrite style if already exists when True. Defaults to False.
+        """
+        self.gs_api.create_style(
+            workspace=workspace,
+            style_name=style_name,
+            sld_template=sld_template,
+            sld_context=sld_context,
+            overwrite=overwrite
+        )
+
+    @traced('geoserver.delete_style', 'style_name')
+    def delete_style(self, workspace, style_name, purge=False):
+        """
+        Delete a style.
+
+        Args:
+            workspace(str): workspace of the style.
+            style_name(str): name of the style.
+            purge(bool): Force remove all resources associated with style.
+        """
+        self.gs_api.delete_style(
+            workspace=workspace,
+            style_name=style_name,
+            purge=purge
+        )
+
+    @traced('geoserver.delete_resource', 'geoserver_store')
+    def delete_resource(self, geoserver_store):
+        """
+        Delete a published layer and its resource.
+
+        Args:
+            geoserver_store(str): GeoServer store id (i.e. "<workspace>:<store>").
+        """
+        self.gs_engine.delete_resource(geoserver_store)
+        self._deleted([geoserver_store])
+
+    @property
+    def staged_styles(self):
+        """
+        Styles of the layers staged and not published yet, always empty for this publisher.
+        """
+        return set()
+
+    @traced('geoserver.publish_coverage', 'geoserver_store')
+    def publish_coverage(self, geoserver_store, coverage_file, projection, default_style, projection_policy=None):
+        """
+        Publish a zipped GEOTIFF and its .prj file as a coverage layer.
+
+        Args:
+            geoserver_store(str): GeoServer store id (i.e. "<workspace>:<store>").
+            coverage_file(str): path of the zip file.
+            projection(str): declared projection of the layer (i.e. "EPSG:4326").
+            default_style(str): default style of the layer.
+            projection_policy(str): projection policy of the layer (i.e. "FORCE_DECLARED"). Defaults to None.
+        """
+        self.gs_engine.create_coverage_resource(geoserver_store,
+                                                overwrite=True,
+                                                coverage_file=coverage_file,
+                                                coverage_type='geotiff')
+        self._set_default_style(geoserver_store, default_style)
+        self._update_resource(geoserver_store, projection, projection_policy)
+
+    @traced('geoserver.publish_shapefile', 'geoserver_store')
+    def publish_shapefile(self, geoserver_store, projection, default_style, projection_policy=None,
+                          shapefile_zip=None, shapefile_base=None):
+        """
+        Publish a shapefile as a vector layer.
+
+        Args:
+            geoserver_store(str): GeoServer store id (i.e. "<workspace>:<store>").
+            projection(str): declared projection of the layer (i.e. "EPSG:4326"), None to keep the projection read
+                from the .prj file.
+            default_style(str): default style of the layer.
+            projection_policy(str): projection policy of the layer (i.e. "FORCE_DECLARED"). Defaults to None.
+            shapefile_zip(str): path of the zipped shapefile.
+            shapefile_base(str): path of the shapefile without extension, when it is not zipped.
+        """
+        if shapefile_zip:
+            self.gs_engine.create_shapefile_resource(geoserver_store,
+                                                     overwrite=True,
+                                                     shapefile_zip=shapefile_zip)
+        else:
+            self.gs_engine.create_shapefile_resource(geoserver_store,
+                                                     overwrite=True,
+                                                     shapefile_base=shapefile_base)
+        self._set_default_style(geoserver_store, default_style)
+        if projection:
+            self._update_resource(geoserver_store, projection, projection_policy)
+
+    def flush(self):
+        """
+        Publish the staged layers, nothing is staged by this publisher.
+
+        Returns:
+            list: GeoServer store ids of the published layers.
+        """
+        return []
+
+    def _published(self, geoserver_stores):
+        if self.on_published is not None and geoserver_stores:
+            self.on_published(list(geoserver_stores))
+
+    def _deleted(self, geoserver_stores):
+        if self.on_deleted is not None and geoserver_stores:
+            self.on_deleted(list(geoserver_stores))
+
+    def _update_default_style(self, geoserver_store, style_name):
+        self.gs_engine.update_layer(layer_id=geoserver_store,
+                                    default_style=style_name)
+
+    def _update_resource(self, geoserver_store, projection, projection_policy):
+        kwargs = {'projection_policy': projection_policy} if projection_policy else {}
+        self.gs_engine.update_resource(resource_id=geoserver_store,
+                                       projection=projection,
+                                       enabled=True,
+                                       **kwargs)
+
+
+class ImporterGeoServerPublisher(EngineGeoServerPublisher):
+    """
+    Stages the layers of a model in one zip file and publishes them together with the GeoServer Importer extension:
+    one import, one upload, one request per layer to set its projection and style, and one request to run the
+    import, whatever the number of layers.
+    """
+    IMPORTS_PATH = 'imports'
+    STAGES_LAYERS = True
+
+    def __init__(self, geoserver_engine, workspace, session=None, staging_dir=None, gs_api=None, on_published=None,
+                 on_deleted=None, tracer=None):
+        """
+        Constructor
+
+        Args:
+            geoserver_engine(tethys_dataset_services.GeoServerEngine): Tethys geoserver engine, its endpoint and
+                credentials are used for the Importer REST API.
+            workspace(str): workspace of the published layers.
+            session(requests.Session): HTTP session of the requests. Defaults to None (new authenticated session).
+            staging_dir(str): directory of the staged zip file. Defaults to None (system temporary directory).
+            gs_api(GeoServerAPI): atcore GeoServer API used for the styles. Defaults to None (no styles).
+            on_published(callable): function (geoserver_stores) called with the published layers. Defaults to None.
+            on_deleted(callable): function (geoserver_stores) called with the deleted stores. Defaults to None.
+            tracer(Tracer): tracer of the GeoServer requests (see tracing). Defaults to None (not traced).
+        """
+        super().__init__(geoserver_engine, gs_api=gs_api, on_published=on_published, on_deleted=on_deleted,
+                         tracer=tracer)
+        self.workspace = workspace
+        self.endpoint = geoserver_engine.endpoint.rstrip('/')
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.auth = (geoserver_engine.username, geoserver_engine.password)
+        self.session = session
+        self.staging_dir = staging_dir
+        self._staged = OrderedDict()
+        self._zip_path = None
+
+    @property
+    def staged_styles(self):
+        """
+        Styles of the layers staged and not published yet.
+        """
+        return set(layer['style'] for layer in self._staged.values())
+
+    def publish_coverage(self, geoserver_store, coverage_file, projection, default_style, projection_policy=None):
+        """
+        Stage a zipped GEOTIFF and its .prj file, published as a coverage layer by flush.
+
+        Args:
+            geoserver_store(str): GeoServer store id (i.e. "<workspace>:<store>").
+            coverage_file(str): path of the zip file, its content is copied and the file can be removed.
+            projection(str): declared projection of the layer (i.e. "EPSG:4326").
+            default_style(str): default style of the layer.
+            projection_policy(str): projection policy of the layer, ignored (the Importer declares the projection).
+        """
+        with self._lock, zipfile.ZipFile(coverage_file) as src:
+            for name in src.namelist():
+                self._stage_file(geoserver_store, name, src.read(name))
+            self._stage_layer(geoserver_store, projection, default_style)
+
+    def publish_shapefile(self, geoserver_store, projection, default_style, projection_policy=None,
+                          shapefile_zip=None, shapefile_base=None):
+        """
+        Stage a shapefile, published as a vector layer by flush.
+
+        Args:
+            geoserver_store(str): GeoServer store id (i.e. "<workspace>:<store>").
+            projection(str): declared projection of the layer (i.e. "EPSG:4326"), None to keep the projection read
+                from the .prj file.
+            default_style(str): default style of the layer.
+            projection_policy(str): projection policy of the layer, ignored (the Importer declares the projection).
+            shapefile_zip(str): path of the zipped shapefile, its content is copied and the file can be removed.
+            shapefile_base(str): path of the shapefile without extension, when it is not zipped.
+        """
+        with self._lock:
+            if shapefile_zip:
+                with zipfile.ZipFile(shapefile_zip) as src:
+                    for name in src.namelist():
+                        self._stage_file(geoserver_store, name, src.read(name))
+            else:
+                for extension in SHAPEFILE_EXTENSIONS:
+                    if os.path.isfile(shapefile_base + extension):
+                        with open(shapefile_base + extension, 'rb') as f:
+                            self._stage_file(geoserver_store, extension, f.read())
+            self._stage_layer(geoserver_store, projection, default_style)
+
+    @traced('geoserver.import')
+    def flush(self):
+        """
+        Publish the staged layers with one import, existing layers are replaced.
+
+        Returns:
+            list: GeoServer store ids of the published layers.
+        """
+        with self._lock:
+            staged, zip_path = self._staged, self._zip_path
+            self._staged, self._zip_path = OrderedDict(), None
+        if not staged:
+            return []
+
+        try:
+            response = self._request('post', self.IMPORTS_PATH, json={
+                'import': {'targetWorkspace': {'workspace': {'name': self.workspace}}}
+            })
+            import_path = '{}/{}'.format(self.IMPORTS_PATH, response.json()['import']['id'])
+
+            # One task is created for each layer of the zip file
+            with open(zip_path, 'rb') as f:
+                response = self._request('post', import_path + '/tasks',
+                                         files={'filedata': (os.path.basename(zip_path), f, 'application/zip')})
+            tasks = response.json()
+            tasks = tasks.get('tasks', [tasks.get('task')])
+
+            for task in tasks:
+                layer_name = task['layer']['name']
+                layer = staged.get(layer_name)
+                if layer is None:
+                    continue
+                task_layer = {'style': {'name': layer['style']}}
+                if layer['projection']:
+                    task_layer['srs'] = layer['projection']
+                self._request('put', '{}/tasks/{}'.format(import_path, task['id']), json={
+                    'task': {'updateMode': 'REPLACE', 'layer': task_layer}
+                })
+
+            self._request('post', import_path)
+
+            # The import runs synchronously, check that each task completed
+            response = self._request('get', import_path + '/tasks')
+            tasks = response.json().get('tasks', [])
+            failed = [task['layer']['name'] for task in tasks if task.get('state') != 'COMPLETE']
+            missing = set(staged) - set(task['layer']['name'] for task in tasks)
+            self._published([layer['store'] for layer_name, layer in staged.items()
+                             if layer_name not in failed and layer_name not in missing])
+            if failed or missing:
+                raise GeoServerPublishError('Layers not published by import "{}": {}'
+                                            .format(import_path, ', '.join(sorted(set(failed) | missing))))
+        finally:
+            shutil.rmtree(os.path.dirname(zip_path), ignore_errors=True)
+
+        return [layer['store'] for layer in staged.values()]
+
+    def _stage_file(self, geoserver_store, name, data):
+        """
+        Add a file to the staged zip file, renamed after the layer (the Importer names layers after their files).
+        """
+        if self._zip_path is None:
+            self._zip_path = os.path.join(tempfile.mkdtemp(dir=self.staging_dir), 'layers.zip')
+        layer_name = geoserver_store.split(':')[-1]
+        extension = os.path.splitext(name)[1] or name
+        with zipfile.ZipFile(self._zip_path, 'a', zipfile.ZIP_DEFLATED) as dst:
+            dst.writestr(layer_name + extension, data)
+
+    def _stage_layer(self, geoserver_store, projection, default_style):
+        layer_name = geoserver_store.split(':')[-1]
+        self._staged[layer_name] = {'store': geoserver_store, 'projection': projection, 'style': default_style}
+
+    def _request(self, method, path, **kwargs):
+        response = getattr(self.session, method)('{}/{}'.format(self.endpoint, path), **kwargs)
+        response.raise_for_status()
+        return response
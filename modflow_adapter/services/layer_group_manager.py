@@ -0,0 +1,217 @@
+"""
+********************************************************************************
+* Name: layer_group_manager
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+
+class LayerGroupUpdateError(Exception):
+    """
+    Raised when the changes of a layer group are still missing after all the retries.
+    """
+    pass
+
+
+class LayerGroupManager(object):
+    """
+    Batches membership changes of GeoServer layer groups and applies them with one write per group.
+
+    GeoServer has no conditional update of layer groups, the changes are applied with an optimistic retry instead:
+    the group is read, merged with the pending changes, read again right before the write (the merge is redone if
+    the group changed in between) and read after the write to check that the changes were kept. Writers of the same
+    process are serialized with one lock per group.
+    """
+    MAX_RETRIES = 5
+    RETRY_DELAY = 0.2
+
+    # Locks of the groups updated by this process, shared by all the managers
+    _locks = {}
+    _locks_lock = threading.Lock()
+
+    def __init__(self, geoserver_engine, shards=1, bounds=None, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY):
+        """
+        Constructor
+
+        Args:
+            geoserver_engine(tethys_dataset_services.GeoServerEngine): Tethys geoserver engine.
+            shards(int): number of groups a layer group is split into, layers are assigned to a shard with a stable
+                hash of their shard key (i.e. the model database id). Defaults to 1 (no sharding).
+            bounds(list): minx, maxx, miny, maxy and crs of the groups created by the manager. Defaults to None (whole
+                world in EPSG:4326).
+            max_retries(int): number of times the changes of a group are applied again after a concurrent update.
+            retry_delay(float): seconds to wait before the first retry, doubled after each retry.
+        """
+        self.gs_engine = geoserver_engine
+        self.shards = max(int(shards), 1)
+        self.bounds = bounds or ['-180', '180', '-90', '90', '4326']
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._pending = OrderedDict()
+
+    def get_group_name(self, group_name, shard_key=None):
+        """
+        Get the name of the shard of a layer group.
+
+        Args:
+            group_name(str): name of the layer group with workspace (i.e. modflow:model_boundary).
+            shard_key(str): key of the shard (i.e. model database id), ignored without sharding.
+        Returns:
+            str: name of the shard (i.e. modflow:model_boundary_07) or group_name without sharding.
+        """
+        if self.shards == 1 or shard_key is None:
+            return group_name
+        shard = zlib.crc32(str(shard_key).encode('utf-8')) % self.shards
+        return '{}_{:02d}'.format(group_name, shard)
+
+    def get_group_names(self, group_name):
+        """
+        Get the names of all the shards of a layer group.
+
+        Args:
+            group_name(str): name of the layer group with workspace.
+        Returns:
+            list: names of the shards.
+        """
+        if self.shards == 1:
+            return [group_name]
+        return ['{}_{:02d}'.format(group_name, shard) for shard in range(self.shards)]
+
+    def add_layer(self, group_name, layer, style, shard_key=None):
+        """
+        Add a layer to a layer group with the next flush. Layers already in the group keep their position.
+
+        Args:
+            group_name(str): name of the layer group with workspace.
+            layer(str): name of the layer.
+            style(str): style of the layer in the group.
+            shard_key(str): key of the shard of the layer. Defaults to None.
+        """
+        changes = self._pending.setdefault(self.get_group_name(group_name, shard_key), OrderedDict())
+        changes[self._layer_key(layer)] = (layer, style)
+
+    def remove_layer(self, group_name, layer, shard_key=None):
+        """
+        Remove a layer from a layer group with the next flush.
+
+        Args:
+            group_name(str): name of the layer group with workspace.
+            layer(str): name of the layer.
+            shard_key(str): key of the shard of the layer. Defaults to None.
+        """
+        changes = self._pending.setdefault(self.get_group_name(group_name, shard_key), OrderedDict())
+        changes[self._layer_key(layer)] = None
+
+    def flush(self):
+        """
+        Apply the pending changes, with one write per layer group.
+
+        Returns:
+            list: names of the layer groups updated.
+        """
+        updated = []
+        while self._pending:
+            group_name, changes = self._pending.popitem(last=False)
+            with self._get_lock(group_name):
+                if self._apply(group_name, changes):
+                    updated.append(group_name)
+        return updated
+
+    def _apply(self, group_name, changes):
+        """
+        Apply the changes of a layer group with optimistic retry.
+
+        Returns:
+            bool: True if the group was written.
+        """
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(delay)
+                delay *= 2
+
+            members = self._read(group_name)
+            new_members = self._merge(members, changes)
+            if new_members == members:
+                return False
+            if not new_members:
+                # GeoServer rejects empty layer groups, the last layer is removed with the group
+                self.gs_engine.delete_layer_group(layer_group_id=group_name)
+                return True
+
+            # Merge again if another writer changed the group since it was read
+            if self._read(group_name) != members:
+                continue
+
+            layers = tuple(layer for layer, _ in new_members)
+            styles = tuple(style for _, style in new_members)
+            if members is None:
+                self.gs_engine.create_layer_group(layer_group_id=group_name, layers=layers, styles=styles,
+                                                  bounds=self.bounds)
+            else:
+                self.gs_engine.update_layer_group(layer_group_id=group_name, layers=layers, styles=styles)
+
+            # Check that a concurrent writer did not overwrite the changes
+            written = self._read(group_name)
+            if written is not None and self._merge(written, changes) == written:
+                return True
+
+        raise LayerGroupUpdateError('Layer group "{}" could not be updated after {} retries.'
+                                    .format(group_name, self.max_retries))
+
+    def _read(self, group_name):
+        """
+        Read the members of a layer group.
+
+        Returns:
+            list: (layer, style) of the members or None if the group does not exist.
+        """
+        response = self.gs_engine.get_layer_group(group_name)
+        if not response['success']:
+            return None
+        result = response['result']
+        return list(zip(result['layers'], result['styles']))
+
+    def _merge(self, members, changes):
+        """
+        Merge the changes into the members of a layer group. Layers already in the group keep their position and
+        new layers are appended.
+
+        Returns:
+            list: (layer, style) of the new members, None if the group does not exist and nothing is added.
+        """
+        new_members = []
+        merged = set()
+        for layer, style in members or []:
+            key = self._layer_key(layer)
+            if key in changes:
+                if changes[key] is None:
+                    continue
+                merged.add(key)
+                style = changes[key][1]
+            new_members.append((layer, style))
+        new_members.extend(change for key, change in changes.items() if change is not None and key not in merged)
+        if members is None and not new_members:
+            return None
+        return new_members
+
+    @staticmethod
+    def _layer_key(layer):
+        """
+        Key of a layer with or without workspace.
+        """
+        return layer.split(':')[-1]
+
+    @classmethod
+    def _get_lock(cls, group_name):
+        """
+        Get the lock of a layer group in this process.
+        """
+        with cls._locks_lock:
+            return cls._locks.setdefault(group_name, threading.Lock())
@@ -0,0 +1,377 @@
+"""
+********************************************************************************
+* Name: layer_statistics
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Number of bins of the per layer histograms
+HISTOGRAM_BINS = 64
+
+# Methods to compute class breaks from the histograms
+QUANTILE_BREAKS = 'quantile'
+JENKS_BREAKS = 'jenks'
+
+# Statistics returned by get_layer_statistics, one value per layer
+LAYER_STATISTICS = ('minimum', 'maximum', 'nonzero_minimum', 'nonzero_maximum', 'mean', 'count', 'nonzero_count')
+
+# MfList fields that are summed when several records fall in the same cell, the other fields are averaged
+SUMMED_LIST_FIELDS = ('cond', 'flux')
+
+
+def aggregate_list_records(records, shape):
+    """
+    Aggregate the records of a MfList stress period per cell the same way MfList.to_array does, without building the
+    dense arrays.
+
+    Args:
+        records(np.recarray): MfList records of a stress period with k, i and j columns.
+        shape(tuple): (nlay, nrow, ncol) of the model grid.
+    Returns:
+        dict: {"<field name>": (cells, values)} where cells are the flat indices of the cells with records in the
+            (nlay, nrow, ncol) grid and values the aggregated values of the field in those cells.
+    """
+    fields = {}
+    if records is None or len(records) == 0:
+        return fields
+
+    cells = np.ravel_multi_index((records['k'].astype(np.intp),
+                                  records['i'].astype(np.intp),
+                                  records['j'].astype(np.intp)), shape)
+    unique_cells, inverse = np.unique(cells, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(unique_cells))
+
+    for name in records.dtype.names[3:]:
+        if records.dtype.fields[name][0] == object:
+            continue
+        values = np.bincount(inverse, weights=records[name].astype(np.float64), minlength=len(unique_cells))
+        if name not in SUMMED_LIST_FIELDS:
+            values /= counts
+        fields[name] = (unique_cells, values)
+
+    return fields
+
+
+def get_list_layer_statistics(cells, values, ibound):
+    """
+    Get the minimum and maximum of the non zero values of the active cells for each layer, from the aggregated records
+    of a MfList field. Gives the same result as get_layer_statistics and get_nonzero_range on the float32 layers of
+    MfList.to_array.
+
+    Args:
+        cells(np.ndarray): flat indices of the cells in the (nlay, nrow, ncol) grid.
+        values(np.ndarray): values of the cells.
+        ibound(np.ndarray): (nlay, nrow, ncol) ibound array of the model.
+    Returns:
+        list: (minimum, maximum) for each layer, (0, 0) for layers without non zero values.
+    """
+    nlay = ibound.shape[0]
+    layer_size = ibound.shape[1] * ibound.shape[2]
+    values = np.asarray(values).astype(np.float32)
+
+    keep = (ibound.ravel()[cells] != 0) & (values != 0)
+    layers = cells[keep] // layer_size
+    kept_values = values[keep]
+
+    # Group by layer with unbuffered reductions
+    minimums = np.full(nlay, np.inf, dtype=np.float32)
+    maximums = np.full(nlay, -np.inf, dtype=np.float32)
+    np.minimum.at(minimums, layers, kept_values)
+    np.maximum.at(maximums, layers, kept_values)
+    has_values = np.bincount(layers, minlength=nlay) > 0
+
+    return [(minimums[k], maximums[k]) if has_values[k] else (0, 0) for k in range(nlay)]
+
+
+def get_list_layer_array(cells, values, shape, layer):
+    """
+    Build the dense float32 array of one layer from the aggregated records of a MfList field.
+
+    Args:
+        cells(np.ndarray): flat indices of the cells in the (nlay, nrow, ncol) grid.
+        values(np.ndarray): values of the cells.
+        shape(tuple): (nlay, nrow, ncol) of the model grid.
+        layer(int): 0-based layer number.
+    Returns:
+        np.ndarray: (nrow, ncol) array with zeros in the cells without records.
+    """
+    layer_size = shape[1] * shape[2]
+    in_layer = (cells // layer_size) == layer
+    arr = np.zeros(layer_size, dtype=np.float32)
+    arr[cells[in_layer] - layer * layer_size] = values[in_layer]
+    return arr.reshape(shape[1], shape[2])
+
+
+def get_layer_statistics(stack, ibound=None, nodata=None, bins=None, workers=1, window_rows=None):
+    """
+    Compute the statistics of all the layers of a stack in one pass of axis reductions, ignoring the inactive cells,
+    the nodata cells and the non finite values. Minimums and maximums keep the dtype of the stack.
+
+    Args:
+        stack(np.ndarray): (nlay, nrow, ncol) stack of layers or a single (nrow, ncol) layer.
+        ibound(np.ndarray): (nlay, nrow, ncol) or (nrow, ncol) ibound array, a single layer applies to all the layers.
+            Defaults to None (all cells are active).
+        nodata(float): value of the cells without data. Defaults to None.
+        bins(int): number of bins of the histograms of the non zero values (i.e. HISTOGRAM_BINS for class breaks),
+            the stack is read a second time for the histograms. Defaults to None (no histograms).
+        workers(int): number of threads the layers are split across. Defaults to 1.
+        window_rows(int): reduce the layers by windows of rows, the temporary arrays are bounded by the size of a
+            window instead of the size of the stack (i.e. for memory mapped stacks). Defaults to None (whole layers).
+    Returns:
+        dict: {"<statistic>": np.ndarray} with one value per layer for each statistic in LAYER_STATISTICS. With bins,
+            a (nlay, bins) array for the histogram and a (nlay, bins + 1) array for the bin edges.
+    """
+    stack = np.asarray(stack)
+    if stack.ndim == 2:
+        stack = stack[np.newaxis]
+    if ibound is not None:
+        ibound = np.asarray(ibound)
+        if ibound.ndim == 2:
+            ibound = ibound[np.newaxis]
+
+    nlay = stack.shape[0]
+    workers = max(1, min(workers, nlay))
+    if workers == 1:
+        return _get_layer_statistics(stack, ibound, nodata, bins, window_rows)
+
+    # Numpy releases the GIL in the reductions, so chunks of layers are computed concurrently
+    bounds = np.linspace(0, nlay, workers + 1).astype(int)
+    chunks = [(stack[start:end], ibound if ibound is None or ibound.shape[0] == 1 else ibound[start:end])
+              for start, end in zip(bounds[:-1], bounds[1:])]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            lambda chunk: _get_layer_statistics(chunk[0], chunk[1], nodata, bins, window_rows), chunks
+        ))
+    return {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+
+
+def _get_layer_statistics(stack, ibound, nodata, bins, window_rows=None):
+    """
+    Compute the statistics of a chunk of layers, see get_layer_statistics.
+    """
+    nrow = stack.shape[1]
+    windows = [(row, row + window_rows) for row in range(0, nrow, window_rows)] if window_rows else [(0, nrow)]
+
+    reductions = None
+    for start, end in windows:
+        window_reductions = _reduce_window(*_get_window(stack, ibound, nodata, start, end))
+        reductions = window_reductions if reductions is None else _merge_reductions(reductions, window_reductions)
+    count, nonzero_count, minimum, maximum, nonzero_minimum, nonzero_maximum, total = reductions
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, total / count, np.nan)
+    statistics = {
+        'minimum': minimum,
+        'maximum': maximum,
+        'nonzero_minimum': nonzero_minimum,
+        'nonzero_maximum': nonzero_maximum,
+        'mean': mean,
+        'count': count,
+        'nonzero_count': nonzero_count,
+    }
+    if not bins:
+        return statistics
+
+    # Histogram of the non zero values of every layer, each layer has its own range
+    lower = nonzero_minimum.astype(np.float64)
+    width = nonzero_maximum.astype(np.float64) - lower
+    width[(nonzero_count == 0) | (width <= 0)] = 1.0
+    histogram = np.zeros((stack.shape[0], bins), dtype=np.intp)
+    for start, end in windows:
+        window, _, nonzero = _get_window(stack, ibound, nodata, start, end)
+        histogram += _get_window_histogram(window, nonzero, lower, width, bins)
+    statistics['histogram'] = histogram
+    statistics['bin_edges'] = lower[:, np.newaxis] + width[:, np.newaxis] * np.linspace(0, 1, bins + 1)[np.newaxis, :]
+    return statistics
+
+
+def _get_window(stack, ibound, nodata, start, end):
+    """
+    Rows start:end of the layers of a stack, with the masks of their active and non zero cells.
+    """
+    window = stack[:, start:end]
+    active = np.ones(window.shape, dtype=bool) if ibound is None else \
+        np.broadcast_to(ibound[:, start:end] != 0, window.shape)
+    if nodata is not None:
+        active = active & (window != nodata)
+    if np.issubdtype(window.dtype, np.floating):
+        active = active & np.isfinite(window)
+    return window, active, active & (window != 0)
+
+
+def _reduce_window(window, active, nonzero):
+    """
+    Axis reductions of a window of the layers: (count, nonzero_count, minimum, maximum, nonzero_minimum,
+    nonzero_maximum, total) with one value per layer.
+    """
+    axes = (1, 2)
+    if np.issubdtype(window.dtype, np.floating):
+        highest, lowest = np.finfo(window.dtype).max, np.finfo(window.dtype).min
+    else:
+        highest, lowest = np.iinfo(window.dtype).max, np.iinfo(window.dtype).min
+
+    return (
+        np.count_nonzero(active, axis=axes),
+        np.count_nonzero(nonzero, axis=axes),
+        np.min(window, axis=axes, where=active, initial=highest),
+        np.max(window, axis=axes, where=active, initial=lowest),
+        np.min(window, axis=axes, where=nonzero, initial=highest),
+        np.max(window, axis=axes, where=nonzero, initial=lowest),
+        np.sum(window, axis=axes, where=active, dtype=np.float64),
+    )
+
+
+def _merge_reductions(first, second):
+    """
+    Reductions of two windows of the same layers.
+    """
+    return (
+        first[0] + second[0],
+        first[1] + second[1],
+        np.minimum(first[2], second[2]),
+        np.maximum(first[3], second[3]),
+        np.minimum(first[4], second[4]),
+        np.maximum(first[5], second[5]),
+        first[6] + second[6],
+    )
+
+
+def _get_window_histogram(window, nonzero, lower, width, bins):
+    """
+    Histograms of the non zero values of a window of the layers with a single bincount, the bins of each layer span
+    lower to lower + width.
+    """
+    nlay = window.shape[0]
+    scale = bins / width
+    with np.errstate(invalid='ignore', over='ignore'):
+        # Cells outside of the non zero values (i.e. nodata, nan) are cast to any bin and ignored by the mask
+        bin_index = ((window - lower[:, np.newaxis, np.newaxis]) * scale[:, np.newaxis, np.newaxis]).astype(np.intp)
+    np.clip(bin_index, 0, bins - 1, out=bin_index)
+    bin_index += (np.arange(nlay) * bins)[:, np.newaxis, np.newaxis]
+    return np.bincount(bin_index[nonzero], minlength=nlay * bins).reshape(nlay, bins)
+
+
+def get_nonzero_range(statistics, layer):
+    """
+    Get the minimum and maximum of the non zero values of a layer.
+
+    Args:
+        statistics(dict): statistics returned by get_layer_statistics.
+        layer(int): 0-based layer number in the stack.
+    Returns:
+        tuple: (minimum, maximum), (0, 0) if the layer has no active non zero value.
+    """
+    if statistics['nonzero_count'][layer] == 0:
+        return 0, 0
+    return statistics['nonzero_minimum'][layer], statistics['nonzero_maximum'][layer]
+
+
+def get_list_layer_histograms(cells, values, ibound, bins=HISTOGRAM_BINS):
+    """
+    Compute the histograms of the non zero values of the active cells of each layer, from the aggregated records of a
+    MfList field. Each layer has its own range, from the minimum to the maximum of its non zero values.
+
+    Args:
+        cells(np.ndarray): flat indices of the cells in the (nlay, nrow, ncol) grid.
+        values(np.ndarray): values of the cells.
+        ibound(np.ndarray): (nlay, nrow, ncol) ibound array of the model.
+        bins(int): number of bins of the histograms. Defaults to HISTOGRAM_BINS.
+    Returns:
+        tuple: (nlay, bins) histograms and (nlay, bins + 1) bin edges.
+    """
+    nlay = ibound.shape[0]
+    layer_size = ibound.shape[1] * ibound.shape[2]
+    values = np.asarray(values).astype(np.float32)
+
+    keep = (ibound.ravel()[cells] != 0) & (values != 0)
+    layers = cells[keep] // layer_size
+    kept_values = values[keep].astype(np.float64)
+
+    lower = np.full(nlay, np.inf)
+    upper = np.full(nlay, -np.inf)
+    np.minimum.at(lower, layers, kept_values)
+    np.maximum.at(upper, layers, kept_values)
+    empty = ~np.isfinite(lower)
+    lower[empty] = 0.0
+    width = upper - lower
+    width[empty | (width <= 0)] = 1.0
+
+    bin_index = ((kept_values - lower[layers]) * (bins / width[layers])).astype(np.intp)
+    np.clip(bin_index, 0, bins - 1, out=bin_index)
+    histogram = np.bincount(layers * bins + bin_index, minlength=nlay * bins).reshape(nlay, bins)
+    bin_edges = lower[:, np.newaxis] + width[:, np.newaxis] * np.linspace(0, 1, bins + 1)[np.newaxis, :]
+    return histogram, bin_edges
+
+
+def get_class_breaks(histogram, bin_edges, classes, method=QUANTILE_BREAKS):
+    """
+    Compute the class breaks of a layer from its histogram, without going back to the values of the layer.
+
+    Args:
+        histogram(np.ndarray): counts of the bins of the layer.
+        bin_edges(np.ndarray): edges of the bins of the layer (one more than the counts).
+        classes(int): number of breaks, including the minimum and the maximum.
+        method(str): QUANTILE_BREAKS or JENKS_BREAKS (natural breaks). Defaults to QUANTILE_BREAKS.
+    Returns:
+        list: increasing break values, empty if the histogram is empty.
+    """
+    histogram = np.asarray(histogram, dtype=np.float64)
+    bin_edges = np.asarray(bin_edges, dtype=np.float64)
+    total = histogram.sum()
+    if total == 0:
+        return []
+
+    if method == JENKS_BREAKS:
+        breaks = _get_jenks_breaks(histogram, bin_edges, classes - 1)
+    elif method == QUANTILE_BREAKS:
+        cumulative = np.concatenate(([0.0], np.cumsum(histogram))) / total
+        breaks = np.interp(np.linspace(0, 1, classes), cumulative, bin_edges)
+    else:
+        raise ValueError('Unknown class breaks method "{}"'.format(method))
+
+    return [float(value) for value in np.unique(breaks)]
+
+
+def _get_jenks_breaks(histogram, bin_edges, classes):
+    """
+    Fisher-Jenks natural breaks of the centers of the non empty bins weighted by their counts.
+    """
+    occupied = np.flatnonzero(histogram)
+    weights = histogram[occupied]
+    centers = (bin_edges[occupied] + bin_edges[occupied + 1]) / 2
+    n = len(occupied)
+    classes = max(1, min(classes, n))
+
+    # Weighted sum of squared deviations of the bins i..j from prefix sums
+    w = np.concatenate(([0.0], np.cumsum(weights)))
+    s1 = np.concatenate(([0.0], np.cumsum(weights * centers)))
+    s2 = np.concatenate(([0.0], np.cumsum(weights * centers ** 2)))
+
+    def ssd(i, j):
+        count = w[j + 1] - w[i]
+        total = s1[j + 1] - s1[i]
+        return s2[j + 1] - s2[i] - total * total / count
+
+    cost = np.full((classes + 1, n), np.inf)
+    first = np.zeros((classes + 1, n), dtype=np.intp)
+    for j in range(n):
+        cost[1, j] = ssd(0, j)
+    for m in range(2, classes + 1):
+        for j in range(m - 1, n):
+            for i in range(m - 1, j + 1):
+                candidate = cost[m - 1, i - 1] + ssd(i, j)
+                if candidate < cost[m, j]:
+                    cost[m, j] = candidate
+                    first[m, j] = i
+
+    # Walk back the first bin of each class, the break is the upper edge of the last bin of the class
+    upper_bins = []
+    j = n - 1
+    for m in range(classes, 0, -1):
+        upper_bins.append(j)
+        j = first[m, j] - 1
+    upper_edges = bin_edges[occupied[sorted(upper_bins)] + 1]
+    return np.concatenate(([bin_edges[occupied[0]]], upper_edges))
@@ -0,0 +1,422 @@
+"""
+********************************************************************************
+* Name: metrics
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the buckets of the duration histograms
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, _escape(value)) for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(object):
+    """
+    Base class of the metrics: values by label values.
+    """
+    TYPE = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Constructor
+
+        Args:
+            name(str): name of the metric (i.e. "modflow_layers_total").
+            documentation(str): help of the metric.
+            labelnames(iterable): names of the labels of the metric.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError('Metric "{}" has labels {}, got {}.'.format(self.name, list(self.labelnames),
+                                                                         sorted(labels)))
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, **extra):
+        return tuple(zip(self.labelnames, key)) + tuple(extra.items())
+
+
+class Counter(Metric):
+    """
+    A value that only goes up (i.e. number of published layers).
+    """
+    TYPE = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """
+        Increment the counter.
+
+        Args:
+            amount(float): increment, not negative.
+            labels: values of the labels of the metric.
+        """
+        if amount < 0:
+            raise ValueError('Counter "{}" can only be incremented.'.format(self.name))
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        """
+        Returns:
+            float: value of the counter for the label values.
+        """
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def get_samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, self._labels(key), value) for key, value in values]
+
+    def get_state(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge_state(self, state):
+        with self._lock:
+            for key, value in state:
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0) + value
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values (i.e. durations of the GeoServer requests) in cumulative buckets.
+    """
+    TYPE = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Constructor
+
+        Args:
+            name(str): name of the metric (i.e. "modflow_geoserver_request_seconds").
+            documentation(str): help of the metric.
+            labelnames(iterable): names of the labels of the metric.
+            buckets(iterable): upper bounds of the buckets, +Inf is added.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """
+        Observe a value.
+
+        Args:
+            value(float): the value (i.e. seconds).
+            labels: values of the labels of the metric.
+        """
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Context observing its duration in seconds.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def get_count(self, **labels):
+        """
+        Returns:
+            int: number of observed values for the label values.
+        """
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return sum(counts)
+
+    def get_sum(self, **labels):
+        """
+        Returns:
+            float: sum of the observed values for the label values.
+        """
+        with self._lock:
+            return self._values.get(self._key(labels), ([0], 0.0))[1]
+
+    def get_samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        samples = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append(('{}_bucket'.format(self.name), self._labels(key, le=_format_value(float(bound))),
+                                cumulative))
+            samples.append(('{}_sum'.format(self.name), self._labels(key), total))
+            samples.append(('{}_count'.format(self.name), self._labels(key), cumulative))
+        return samples
+
+    def get_state(self):
+        with self._lock:
+            return [[list(key), [list(counts), total]] for key, (counts, total) in self._values.items()]
+
+    def merge_state(self, state):
+        with self._lock:
+            for key, (counts, total) in state:
+                key = tuple(key)
+                current, current_total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+                self._values[key] = ([a + b for a, b in zip(current, counts)], current_total + total)
+
+
+class MetricsRegistry(object):
+    """
+    In-process registry of metrics, exported in the Prometheus text format to a file (i.e. for the textfile collector
+    of the node exporter) or by a local HTTP server.
+    """
+    METRIC_TYPES = {Counter.TYPE: Counter, Histogram.TYPE: Histogram}
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        """
+        Get or create a counter.
+
+        Args:
+            name(str): name of the metric.
+            documentation(str): help of the metric.
+            labelnames(iterable): names of the labels of the metric.
+        Returns:
+            Counter: the counter.
+        """
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Get or create a histogram.
+
+        Args:
+            name(str): name of the metric.
+            documentation(str): help of the metric.
+            labelnames(iterable): names of the labels of the metric.
+            buckets(iterable): upper bounds of the buckets.
+        Returns:
+            Histogram: the histogram.
+        """
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name):
+        """
+        Args:
+            name(str): name of the metric.
+        Returns:
+            Metric: the metric, None if it does not exist.
+        """
+        with self._lock:
+            return self._metrics.get(name)
+
+    def to_prometheus(self):
+        """
+        Returns:
+            str: the metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.documentation.replace('\n', ' ')))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.TYPE))
+            for name, labels, value in metric.get_samples():
+                lines.append('{}{} {}'.format(name, _format_labels(labels), _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """
+        Write the metrics to a file, replaced atomically so that readers never see a partial file.
+
+        Args:
+            path(str): path of the file (i.e. "<textfile collector directory>/modflow_publish.prom").
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def serve(self, port=9464, host='127.0.0.1'):
+        """
+        Serve the metrics on http://<host>:<port>/metrics from a daemon thread.
+
+        Args:
+            port(int): port of the server, 0 for any free port.
+            host(str): address of the server. Defaults to the local host.
+        Returns:
+            ThreadingHTTPServer: the running server, stopped with shutdown().
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def get_state(self):
+        """
+        Returns:
+            dict: picklable values of the metrics, to merge them into the registry of another process.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: {'type': metric.TYPE, 'documentation': metric.documentation,
+                              'labelnames': list(metric.labelnames), 'buckets': list(getattr(metric, 'buckets', ())),
+                              'values': metric.get_state()}
+                for metric in metrics}
+
+    def merge_state(self, state):
+        """
+        Add the values of the registry of another process (see get_state), i.e. the metrics of a model published in
+        a batch process.
+
+        Args:
+            state(dict): state of the other registry.
+        """
+        for name, metric_state in state.items():
+            kwargs = {'buckets': metric_state['buckets']} if metric_state['type'] == Histogram.TYPE else {}
+            metric = self._get_or_create(self.METRIC_TYPES[metric_state['type']], name,
+                                         metric_state['documentation'], metric_state['labelnames'], **kwargs)
+            metric.merge_state(metric_state['values'])
+
+    def _get_or_create(self, metric_class, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, metric_class) or metric.labelnames != tuple(labelnames):
+                raise ValueError('Metric "{}" already exists with another type or labels.'.format(name))
+            return metric
+
+
+# Registry of the process, used by the spatial managers without a registry
+REGISTRY = MetricsRegistry()
+
+
+class PublishMetrics(object):
+    """
+    Metrics of the publishes of the spatial managers: layers by result, bytes written and uploaded, arrays loaded in
+    memory and the durations of the GeoServer requests, model loads and publishes. The durations are observed from
+    the spans of the tracer of the manager (see observe_span).
+    """
+    # Results of the layers
+    PUBLISHED = 'published'
+    SKIPPED = 'skipped'
+    RESTYLED = 'restyled'
+    FAILED = 'failed'
+
+    # Spans of the GeoServer requests that publish a layer
+    PUBLISH_SPANS = ('geoserver.publish_coverage', 'geoserver.publish_shapefile')
+
+    def __init__(self, registry=None):
+        """
+        Constructor
+
+        Args:
+            registry(MetricsRegistry): registry of the metrics. Defaults to None (REGISTRY).
+        """
+        self.registry = registry or REGISTRY
+        self.layers = self.registry.counter('modflow_layers_total', 'Layers by publish result.', ['result'])
+        self.bytes_written = self.registry.counter('modflow_bytes_written_total',
+                                                   'Bytes of the temporary files written.')
+        self.bytes_uploaded = self.registry.counter('modflow_bytes_uploaded_total',
+                                                    'Bytes of the files uploaded to GeoServer.')
+        self.arrays = self.registry.counter('modflow_arrays_materialized_total', 'Model arrays loaded in memory.')
+        self.array_bytes = self.registry.counter('modflow_array_bytes_materialized_total',
+                                                 'Bytes of the model arrays loaded in memory.')
+        self.geoserver_seconds = self.registry.histogram('modflow_geoserver_request_seconds',
+                                                         'Duration of the GeoServer REST calls.',
+                                                         ['operation', 'status'])
+        self.model_load_seconds = self.registry.histogram('modflow_model_load_seconds', 'Duration of the model loads.')
+        self.publish_seconds = self.registry.histogram('modflow_publish_seconds', 'Duration of create_all.',
+                                                       ['status'])
+
+    def count_array(self, arr):
+        """
+        Count an array loaded in memory.
+
+        Args:
+            arr(np.ndarray): the array.
+        """
+        self.arrays.inc()
+        self.array_bytes.inc(arr.nbytes)
+
+    def observe_span(self, span):
+        """
+        Listener of the tracer of a manager: observes the durations of the GeoServer requests, model loads and
+        publishes, and counts the layers the GeoServer engine failed to publish.
+
+        Args:
+            span(Span): completed span.
+        """
+        status = 'error' if span.error else 'ok'
+        if span.name.startswith('geoserver.'):
+            self.geoserver_seconds.observe(span.duration, operation=span.name[len('geoserver.'):], status=status)
+            if span.error and span.name in self.PUBLISH_SPANS:
+                self.layers.inc(result=self.FAILED)
+        elif span.name == 'load_model':
+            self.model_load_seconds.observe(span.duration)
+        elif span.name == 'create_all':
+            self.publish_seconds.observe(span.duration, status=status)
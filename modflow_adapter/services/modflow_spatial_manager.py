@@ -6,18 +6,24 @@
 * Copyright: (c) Aquaveo 2018
 ********************************************************************************
 """
+import glob
 import os
+import re
 import flopy
 import zipfile
 import fiona
 import geopandas
 import pandas
 import rasterio
+from rasterio.features import geometry_mask, geometry_window
 from rasterio.mask import mask
+from rasterio.windows import Window
 from rasterio.warp import calculate_default_transform, reproject, Resampling
 import numpy as np
-import pyproj
 import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from flopy.utils.reference import SpatialReference
 import flopy.utils.binaryfile as bf
 from flopy.utils.util_array import Util2d, Util3d, Transient2d
@@ -25,6 +31,23 @@ from flopy.utils.util_list import MfList
 from flopy.export.shapefile_utils import shape_attr_name
 from shapely.geometry import mapping
 from modflow_adapter.models.app_users.modflow_model_resource import ModflowModelResource
+from modflow_adapter.services import coordinate_transform
+from modflow_adapter.services.async_geoserver_publisher import AsyncGeoServerPublisher
+from modflow_adapter.services.geoserver_publisher import EngineGeoServerPublisher, ImporterGeoServerPublisher, \
+    publish_batch
+from modflow_adapter.services.layer_group_manager import LayerGroupManager
+from modflow_adapter.services.derived_layers import SIGN_SPLIT, compute_derived_values, split_derived_tag
+from modflow_adapter.services.layer_statistics import HISTOGRAM_BINS, aggregate_list_records, get_class_breaks, \
+    get_layer_statistics, get_list_layer_array, get_list_layer_histograms, get_list_layer_statistics, \
+    get_nonzero_range
+from modflow_adapter.services.metrics import PublishMetrics
+from modflow_adapter.services.out_of_core import MemoryBudget, read_head_file, stack_layers
+from modflow_adapter.services.publish_manifest import PublishManifest
+from modflow_adapter.services.raster_encoding import encode_array, write_geotiff, write_geotiff_windows
+from modflow_adapter.services.scratch_space import ScratchSpace
+from modflow_adapter.services.shared_arrays import FILES, SharedArrayRegistry, call_with_arrays
+from modflow_adapter.services.task_scheduler import PROCESS_POOL, TaskResult, TaskScheduler
+from modflow_adapter.services.tracing import Tracer, traced
 
 from tethysext.atcore.services.model_file_db_spatial_manager import ModelFileDBSpatialManager
 from tethysext.atcore.services.base_spatial_manager import reload_config
@@ -45,6 +68,11 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
     VL_MODEL_BOUNDARY = 'model_boundary'
     VL_MODEL_GRID = 'model_grid'
     VL_PACKAGE = 'package'
+    VL_LIST_PACKAGE = 'list_package'
+
+    # Geometry of the features of list package vector layers
+    LIST_PACKAGE_POINTS = 'point'
+    LIST_PACKAGE_CELLS = 'polygon'
 
     # Raster Layer Types
     RL_HEAD = 'head_raster'
@@ -52,6 +80,38 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
     RL = 'raster'
     RL1 = 'raster_one_value'
     RLLB = 'raster_reverse'
+    RL_CLASSES = 'raster_classes'
+
+    # Number of class breaks (including the minimum and the maximum) of the per layer raster styles
+    CLASS_BREAKS = 10
+    # Colors of the class breaks from low to high values, reversed for LOW_BLUE_STYLE_PACKAGE
+    CLASS_COLORS = ['#FF0000', '#FF3000', '#FF7000', '#FFA200', '#FFD000',
+                    '#FFFF00', '#A2D05C', '#45A2B9', '#0080FF', '#003ea3']
+
+    # Store name patterns (without the model prefix) used to find published stores
+    PACKAGE_STORE_PATTERN = r'[A-Z0-9]+-'
+    HEAD_RASTER_STORE_PATTERN = RL_HEAD + r'_\d{3}$'
+    HEAD_CONTOUR_STORE_PATTERN = VL_HEAD_CONTOUR + r'_\d{3}$'
+
+    # Number of threads the layers of large arrays are split across to compute their statistics
+    STATISTICS_WORKERS = 1
+
+    # Number of concurrent GeoServer style uploads
+    STYLE_WORKERS = 8
+
+    # Bytes of the temporary arrays per cell of the windows of the out-of-core mode (masks, bin indices, encoded values)
+    WINDOW_CELL_BYTES = 24
+
+    # Key of the styles of create_all_styles in the publish cache
+    SHARED_STYLES = 'all_styles'
+
+    # Number of threads and processes running the tasks of create_all
+    TASK_THREAD_WORKERS = 4
+    TASK_PROCESS_WORKERS = 2
+
+    # Declared precision of raster values, allows a scaled int16 encoding (i.e. {'DIS-thickn': 0.01}). The keys are
+    # matched against the start of "<package>-<attribute>".
+    RASTER_PRECISION = {}
 
     # Number of first stress periods to import
     MAX_STRESS_PERIOD = 5
@@ -74,6 +134,11 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         'RIV': 'RIVER (RIV)',
     }
 
+    # Derived layers of the attributes mapped to a list in ATTRIBUTE_TRANSLATION_DICT (i.e. flux-wel)
+    DERIVED_LAYERS = SIGN_SPLIT
+    # Derived layers of specific attributes (i.e. {'stage-riv': (DerivedLayer(...), ...)}), overrides DERIVED_LAYERS
+    DERIVED_LAYER_ATTRIBUTES = {}
+
     # LOW IS BLUE RASTER TYPE
     LOW_BLUE_STYLE_PACKAGE = ['WEL', 'EVT']
 
@@ -183,7 +248,11 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         'cell-riv': '',
     }
 
-    def __init__(self, geoserver_engine, model_file_db_connection, modflow_version):
+    def __init__(self, geoserver_engine, model_file_db_connection, modflow_version, multi_band=False,
+                 publish_manifest=None, list_package_geometry=None, class_breaks=None, layer_group_shards=1,
+                 bulk_publish=False, async_publish=False, checkpoint=None, scratch_dir=None, scratch_budget=None,
+                 publish_cache=None, tracer=None, trace_file=None, metrics=None, out_of_core=False,
+                 memory_budget=None):
         """
         Constructor
 
@@ -191,36 +260,120 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
             geoserver_engine(tethys_dataset_services.GeoServerEngine): Tethys geoserver engine.
             model_file_db_connection(ModelFileDatabaseConnection): Model File Database object
             modflow_version(Str): Version of Modflow executable (i.e. mf2005, mfnwt, etc
+            multi_band(bool): Publish each Util3d attribute as one multi-band GEOTIFF (one band per layer) instead of
+                one GEOTIFF per layer. Defaults to False.
+            publish_manifest(dict|PublishManifest): Manifest of the last publish stored with the model resource. Only
+                the layers that changed since that publish are uploaded again.
+            list_package_geometry(str): Publish the MfList packages (i.e. WEL, CHD, RIV, GHB) as one vector layer per
+                package with cell centroid points (LIST_PACKAGE_POINTS) or cell polygons (LIST_PACKAGE_CELLS) instead
+                of one raster per layer and stress period. Defaults to None (rasters).
+            class_breaks(str): Style each raster layer with its own color map from class breaks computed with
+                QUANTILE_BREAKS or JENKS_BREAKS (see layer_statistics), and add the legends to the layer tree. Defaults
+                to None (shared styles scaled by the client).
+            layer_group_shards(int): Split the model boundary layer group into this number of groups, the models are
+                assigned to a group with a hash of their database id. The layer tree gives the group of the model and
+                get_boundary_layer_groups the names of all the groups. Defaults to 1 (one group).
+            bulk_publish(bool): Stage the layers and publish them with one GeoServer Importer import per publishing
+                step instead of three requests per layer (requires the Importer extension). Defaults to False.
+            async_publish(bool): Stage the layers, styles and deletions and submit them concurrently with a pooled
+                asynchronous client (see AsyncGeoServerPublisher). Defaults to False.
+            checkpoint(callable): function ({geoserver_store: manifest_entry}) called with the layers GeoServer
+                published as soon as they are published, to resume a failed publish from them (see
+                PublishManifest). Defaults to None.
+            scratch_dir(str): parent directory of the scratch directories of the temporary files, each operation
+                writes its files into its own directory (see ScratchSpace). Defaults to None (tmpfs if available).
+            scratch_budget(int): maximum number of bytes of temporary files written by the manager at the same time,
+                the operations reserve their bytes before writing them. Defaults to None (no limit).
+            publish_cache(PublishCache): styles and projections shared with the managers of the other models of a
+                batch, the shared styles are uploaded once per batch. Defaults to None (not shared).
+            tracer(Tracer): tracer of the stages of the publish (see tracing), i.e. with profiling enabled. Defaults to
+                None (new tracer recording the spans).
+            trace_file(str): path of the JSON trace file written by create_all. Defaults to None (not written).
+            metrics(MetricsRegistry): registry of the publish metrics (see PublishMetrics), observed from the spans of
+                the tracer. Defaults to None (registry of the process).
+            out_of_core(bool): Bounded memory mode for grids larger than the memory: the heads are memory mapped from
+                the head file, the layers of the Util3d attributes are read one at a time (stacked in memory mapped
+                scratch files for multi-band GEOTIFFs), and the statistics and GEOTIFFs are computed and written by
+                windows of rows sized from the memory budget. Defaults to False.
+            memory_budget(int): maximum bytes of resident memory of the publish (see MemoryBudget), a
+                MemoryBudgetError is raised when the publish goes over it. Defaults to None (no limit).
         """
         super().__init__(geoserver_engine)
         self.model_file_db = model_file_db_connection
         self.modflow_version = modflow_version
+        self.multi_band = multi_band
+        self.list_package_geometry = list_package_geometry
+        self.class_breaks = class_breaks
         self.flopy_model = None
         self.proj_file = None
         self.map_extents = None
         self.model_selection_bounds = None
         self._boundary = None
+        self._boundary_cells = None
+        self.publish_cache = publish_cache
+        # The band styles published by the other models of the batch are not uploaded again
+        self._band_styles = publish_cache.get_style_names() if publish_cache is not None else set()
+        self._class_styles = {}
+        self._deferred_default_styles = []
+        self.publish_manifest = PublishManifest.from_dict(publish_manifest)
+        self.checkpoint = checkpoint
+        self.out_of_core = out_of_core
+        self.memory_budget = MemoryBudget(memory_budget)
+        self.metrics = PublishMetrics(metrics)
+        # The memory mapped files of the out-of-core mode are written to disk, tmpfs pages are resident memory
+        self.scratch = ScratchSpace(root=scratch_dir, budget=scratch_budget, tmpfs=not out_of_core,
+                                    on_release=self.metrics.bytes_written.inc)
+        # Number of layers and bytes uploaded
+        self.publish_stats = {'layers': 0, 'bytes': 0}
+        self.tracer = tracer or Tracer()
+        self.tracer.add_listener(self.metrics.observe_span)
+        self.trace_file = trace_file
+        self._spatial_reference_key = None
+        self._publish_lock = threading.RLock()
+        self._head_data = None
+        self._head_statistics = None
+        self._ibound = None
+        self.shared_arrays = None
+        self.task_scheduler = None
+        self.layer_groups = LayerGroupManager(self.gs_engine, shards=layer_group_shards)
+        if async_publish:
+            self.publisher = AsyncGeoServerPublisher(self.gs_engine, self.WORKSPACE, staging_dir=self.scratch.root,
+                                                     on_published=self.confirm_published_layers,
+                                                     on_deleted=self.confirm_deleted_stores, tracer=self.tracer)
+        elif bulk_publish:
+            self.publisher = ImporterGeoServerPublisher(self.gs_engine, self.WORKSPACE, gs_api=self.gs_api,
+                                                        staging_dir=self.scratch.root,
+                                                        on_published=self.confirm_published_layers,
+                                                        on_deleted=self.confirm_deleted_stores, tracer=self.tracer)
+        else:
+            self.publisher = EngineGeoServerPublisher(self.gs_engine, gs_api=self.gs_api,
+                                                      set_default_style=self.set_default_style,
+                                                      on_deleted=self.confirm_deleted_stores, tracer=self.tracer)
 
     def load_boundary(self):
+        """
+        Load the union of the active cells of the model and the active cells of its grid, once per manager.
+        """
         if not self._boundary:
             if not self.flopy_model:
                 self.load_model()
 
-            tmp_grid_name = 'temp_grid_file'
-            tmp_grid_shapefile = "{}.shp".format(tmp_grid_name)
-
-            # Open the gridded shapefile, select the values with Ibound not 0, and make a union from them
-            gdf_boundary = []
-            for layer in range(self.flopy_model.dis.nlay):
-                print("number of layer is:" + str(self.flopy_model.dis.nlay))
-                self.flopy_model.bas6.ibound[layer].export(tmp_grid_shapefile)
-                gdf = geopandas.read_file(tmp_grid_shapefile)
-                ibound_col = 'ibound__' + str(layer)
-                if layer > 0:
-                    gdf_boundary.append(gdf[gdf[ibound_col] != 0], sort=False)
-                else:
-                    gdf_boundary = gdf[gdf[ibound_col] != 0]
-            self._boundary = gdf_boundary.geometry.unary_union
+            with self.tracer.span('boundary_union', layers=self.flopy_model.dis.nlay):
+                with self.scratch.directory('boundary') as tmp_dir:
+                    tmp_grid_shapefile = os.path.join(tmp_dir, 'temp_grid_file.shp')
+
+                    # Open the gridded shapefile, select the values with Ibound not 0, and make a union from them
+                    gdf_boundary = []
+                    for layer in range(self.flopy_model.dis.nlay):
+                        self.flopy_model.bas6.ibound[layer].export(tmp_grid_shapefile)
+                        gdf = geopandas.read_file(tmp_grid_shapefile)
+                        ibound_col = 'ibound__' + str(layer)
+                        if layer > 0:
+                            gdf_boundary.append(gdf[gdf[ibound_col] != 0], sort=False)
+                        else:
+                            gdf_boundary = gdf[gdf[ibound_col] != 0]
+                self._boundary_cells = gdf_boundary
+                self._boundary = gdf_boundary.geometry.unary_union
 
     @reload_config()
     def create_workspace(self, reload_config=True):
@@ -255,15 +408,18 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
             raise OSError("{} does not exist".format(model_exe))
 
         # Load flopy_model from the model file database
-        flopy_model = flopy.modflow.Modflow.load(
-            file,
-            model_ws=self.model_file_db.db_dir,
-            verbose=False,
-            check=True,
-            exe_name=model_exe)
+        with self.tracer.span('load_model', nam_file=file) as span:
+            flopy_model = flopy.modflow.Modflow.load(
+                file,
+                model_ws=self.model_file_db.db_dir,
+                verbose=False,
+                check=True,
+                exe_name=model_exe)
+            span.set(packages=len(flopy_model.get_package_list()))
 
         # Change property from False to the model when loaded
         self.flopy_model = flopy_model
+        self.memory_budget.check('load_model')
 
     def get_unique_item_name(self, item_name, variable='', suffix='', scenario_id=None, model_file_db=None,
                              with_workspace=False):
@@ -340,8 +496,11 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         )
         boundary_layer = "{}:{}-{}".format(self.WORKSPACE, self.WORKSPACE, boundary_layer)
 
+        # The layer group of the boundary and the grid is one of the shards of model_boundary with layer_group_shards
+        layer_group = self.layer_groups.get_group_name(self.get_boundary_layer_group_name(),
+                                                       shard_key=self.model_file_db.get_id())
         boundary_group[boundary_layer] = {'active': True, 'public_name': 'Boundary',
-                                          'minimum': None, 'maximum': None}
+                                          'minimum': None, 'maximum': None, 'layer_group': layer_group}
 
         model_grid_layer = self.get_unique_item_name(
             item_name=self.VL_MODEL_GRID,
@@ -351,7 +510,7 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         model_grid_layer = "{}:{}-{}".format(self.WORKSPACE, self.WORKSPACE, model_grid_layer)
 
         grid_group[model_grid_layer] = {'active': True, 'public_name': 'Model Grid',
-                                        'minimum': None, 'maximum': None}
+                                        'minimum': None, 'maximum': None, 'layer_group': layer_group}
 
         geoserver_layer['Grid'] = grid_group
         geoserver_layer['Boundary'] = boundary_group
@@ -373,12 +532,21 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
                 minimum = head_info[layer_number]['minimum']
                 head_group[geoserver_name] = {'active': True, 'public_name': public_layer_name,
                                               'minimum': str(minimum), 'maximum': str(maximum)}
+                if 'legend' in head_info[layer_number]:
+                    head_group[geoserver_name].update({
+                        'style': "{}:{}".format(self.WORKSPACE, self.get_unique_item_name(
+                            item_name=self.RL_HEAD, suffix=str(layer_number).zfill(3) + '_' + self.RL_CLASSES,
+                            model_file_db=self.model_file_db,
+                        )),
+                        'legend': head_info[layer_number]['legend'],
+                    })
             geoserver_layer['Head'] = head_group
             geoserver_group['Head'] = {'active': True, 'public_name': self.LAYER_GROUP_TRANSLATION_DICT['Head']}
 
-        # Compose modflow package layers and create layers group for each modflow package
+        # Compose modflow package layers and create layers group for each modflow package, from the statistics of all
+        # the packages computed in one pass
+        package_layer_info = self.get_package_layer_attribute_info()
         for package in self.flopy_model.get_package_list():
-            package_layer_info = self.get_package_layer_attribute_info()
             # Check package for data
             if package_layer_info[package]:
                 package_group[package] = {}
@@ -424,6 +592,45 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
                                                                   'public_name': public_layer_name,
                                                                   'minimum': str(minimum),
                                                                   'maximum': str(maximum)}
+                        # Rasters styled with their own class breaks carry the legend of the style
+                        legend = package_layer_info[package][layer_attribute].get('legend')
+                        if legend:
+                            package_group[package][geoserver_name].update({
+                                'style': "{}:{}".format(self.WORKSPACE, self.get_unique_item_name(
+                                    item_name="{}-{}".format(package, attribute), suffix=self.RL_CLASSES,
+                                    model_file_db=self.model_file_db,
+                                )),
+                                'legend': legend,
+                            })
+                        # Records of list packages share one vector layer per package and are selected by CQL
+                        cql_filter = package_layer_info[package][layer_attribute].get('cql_filter')
+                        if self.list_package_geometry and cql_filter:
+                            list_layer_name = self.get_unique_item_name(
+                                item_name="{}-{}".format(package, self.VL_LIST_PACKAGE),
+                                model_file_db=self.model_file_db,
+                            )
+                            package_group[package][geoserver_name].update({
+                                'geoserver_layer': "modflow:modflow-{}".format(list_layer_name),
+                                'cql_filter': cql_filter,
+                            })
+                        # Bands of a multi-band GEOTIFF share one geoserver layer and are selected by style
+                        band = package_layer_info[package][layer_attribute].get('band')
+                        if self.multi_band and band:
+                            band_layer_name = self.get_unique_item_name(
+                                item_name="{}-{}".format(
+                                    package, package_layer_info[package][layer_attribute]['band_attribute']
+                                ),
+                                model_file_db=self.model_file_db,
+                            )
+                            package_group[package][geoserver_name].update({
+                                'geoserver_layer': "modflow:modflow-{}".format(band_layer_name),
+                                'band': band,
+                                'style': "{}:{}".format(self.WORKSPACE, self.get_raster_style_name(
+                                    package, minimum != maximum, band=band
+                                )),
+                            })
+                            # The band style is rendered, not the class breaks
+                            package_group[package][geoserver_name].pop('legend', None)
                         number_layer_attribute += 1
             if number_layer_attribute > 0:
                 if package in self.LAYER_GROUP_TRANSLATION_DICT:
@@ -458,10 +665,7 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
             native_name = attribute_name[:-6].lower()
             layer_name, layer_unit = self.translate_layer_name(native_name + "-" + str(package).lower(), length_unit,
                                                                time_unit)
-        if 'customtagpos' in native_name:
-            native_name = native_name.replace('customtagpos', '')
-        if 'customtagneg' in native_name:
-            native_name = native_name.replace('customtagneg', '')
+        native_name, _ = split_derived_tag(native_name, self.get_all_derived_layers())
         native_name = native_name.upper()
         return layer_name, native_name, layer_unit, layer_number, stress_period
 
@@ -474,14 +678,9 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
     def translate_layer_name(self, layer_name, length_unit, time_unit):
         org_layer_name = layer_name
         layer_unit = ''
-        if 'customtagpos' in layer_name:
-            layer_name = layer_name.replace('customtagpos', '')
-            if layer_name in self.ATTRIBUTE_TRANSLATION_DICT:
-                layer_name = self.ATTRIBUTE_TRANSLATION_DICT[layer_name][1]
-        if 'customtagneg' in layer_name:
-            layer_name = layer_name.replace('customtagneg', '')
-            if layer_name in self.ATTRIBUTE_TRANSLATION_DICT:
-                layer_name = self.ATTRIBUTE_TRANSLATION_DICT[layer_name][0]
+        layer_name, derived_layer = split_derived_tag(layer_name, self.get_all_derived_layers())
+        if derived_layer and isinstance(self.ATTRIBUTE_TRANSLATION_DICT.get(layer_name), list):
+            layer_name = self.ATTRIBUTE_TRANSLATION_DICT[layer_name][derived_layer.index]
         if layer_name in self.ATTRIBUTE_TRANSLATION_DICT:
             layer_name = self.ATTRIBUTE_TRANSLATION_DICT[layer_name]
         else:
@@ -502,17 +701,17 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
 
     @staticmethod
     def transform(x, y, inprj, outprj):
-        if "+" in inprj:
-            inprj = pyproj.Proj(str(inprj), preserve_units=True)
-        else:
-            inprj = pyproj.Proj(init='epsg:' + str(inprj), preserve_units=True)
-
-        if "+" in outprj:
-            outprj = pyproj.Proj(str(outprj), preserve_units=True)
-        else:
-            outprj = pyproj.Proj(init='epsg:' + str(outprj), preserve_units=True)
-        x, y = pyproj.transform(inprj, outprj, x, y)
-        return x, y
+        """
+        Transform coordinates with a cached transformer, see coordinate_transform.transform.
+        Args:
+            x(float|array-like): x coordinates.
+            y(float|array-like): y coordinates.
+            inprj(str): EPSG code or proj4 string of the source coordinates.
+            outprj(str): EPSG code or proj4 string of the transformed coordinates.
+        Returns:
+            tuple: transformed x and y.
+        """
+        return coordinate_transform.transform(x, y, inprj, outprj)
 
     def create_extent_for_project(self, xll, yll, rotation, model_epsg):
         """
@@ -534,12 +733,13 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
                                                         xll=float(xll), yll=float(yll), rotation=float(rotation),
                                                         proj4_str=prj)
             self.flopy_model.sr = sr
+            self._spatial_reference_key = None
 
             model_xmin, model_xmax, model_ymin, model_ymax = self.flopy_model.sr.get_extent()
 
-            geo_xmin, geo_ymin = self.transform(model_xmin, model_ymin, str(model_epsg), geo_prj)
-            geo_xmax, geo_ymax = self.transform(model_xmax, model_ymax, str(model_epsg), geo_prj)
-            self.map_extents = [geo_xmin, geo_ymin, geo_xmax, geo_ymax]
+            # Transform both corners in one call
+            geo_x, geo_y = self.transform([model_xmin, model_xmax], [model_ymin, model_ymax], str(model_epsg), geo_prj)
+            self.map_extents = [float(geo_x[0]), float(geo_y[0]), float(geo_x[1]), float(geo_y[1])]
 
         return self.map_extents
 
@@ -554,15 +754,14 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
             Session = model_db._app.get_persistent_store_database('primary_db', as_sessionmaker=True)
             session = Session()
 
-            # Get resource_id and name by querying the resource with database_id
-            resources = session.query(ModflowModelResource).all()
+            # Get the resource with the indexed database_id
             model_extents = [-180, -90, 180, 90]
-            for resource in resources:
-                attributes = json.loads(resource._attributes)
-                if attributes['database_id'] == db_id:
-                    if 'model_extents' in attributes:
-                        model_extents = json.loads(attributes['model_extents'])
-                    break
+            try:
+                resource = ModflowModelResource.get_by_database_id(session, db_id)
+                if resource is not None and resource.get_attribute('model_extents'):
+                    model_extents = json.loads(resource.get_attribute('model_extents'))
+            finally:
+                session.close()
             self.map_extents = model_extents
 
         return self.map_extents
@@ -587,6 +786,123 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
 
         return self.flopy_model.sr.units
 
+    def get_prj(self, epsg):
+        """
+        Get the content of the .prj files of the layers, from the publish cache if the manager has one.
+        Args:
+            epsg(int): EPSG code of the model.
+        Returns:
+            str: the projection in the ESRI .prj format.
+        """
+        if self.publish_cache is not None:
+            return self.publish_cache.get_projection(epsg)
+        return flopy.utils.reference.getprj(epsg)
+
+    def get_spatial_reference_key(self):
+        """
+        Returns:
+            str: key identifying the spatial reference and the active cells (cropping boundary) of published layers.
+        """
+        if not self.flopy_model:
+            self.load_model()
+
+        if not self._spatial_reference_key:
+            digest = PublishManifest.hash_arrays(*(self.get_grid_geometry() + (self.get_ibound(),)))
+            self._spatial_reference_key = '{}:{}'.format(self.flopy_model.sr.epsg, digest)
+
+        return self._spatial_reference_key
+
+    def get_publish_action(self, geoserver_store, digest, style_name):
+        """
+        Get the action needed to bring a published layer up to date with the model.
+        Args:
+            geoserver_store(str): GeoServer store id (i.e. "<workspace>:<store>").
+            digest(str): hash of the data of the layer.
+            style_name(str): default style of the layer.
+        Returns:
+            str: one of PublishManifest.SKIP, PublishManifest.RESTYLE or PublishManifest.UPLOAD.
+        """
+        action = self.publish_manifest.get_action(geoserver_store, digest, style_name,
+                                                  self.get_spatial_reference_key())
+
+        if action == PublishManifest.RESTYLE:
+            self.set_default_style(geoserver_store, style_name)
+            self.metrics.layers.inc(result=PublishMetrics.RESTYLED)
+        elif action == PublishManifest.SKIP:
+            self.metrics.layers.inc(result=PublishMetrics.SKIPPED)
+
+        if action != PublishManifest.UPLOAD:
+            self.publish_manifest.record(geoserver_store, digest, style_name, self.get_spatial_reference_key())
+
+        return action
+
+    def record_published_layer(self, geoserver_store, digest, style_name):
+        """
+        Record an uploaded layer in the publish manifest. The layers staged by the publisher are recorded once it
+        published them (see confirm_published_layers).
+        Args:
+            geoserver_store(str): GeoServer store id (i.e. "<workspace>:<store>").
+            digest(str): hash of the data of the layer.
+            style_name(str): default style of the layer.
+        """
+        if self.publisher.STAGES_LAYERS:
+            self.publish_manifest.stage(geoserver_store, digest, style_name, self.get_spatial_reference_key())
+            return
+        self.publish_manifest.record(geoserver_store, digest, style_name, self.get_spatial_reference_key())
+        self.metrics.layers.inc(result=PublishMetrics.PUBLISHED)
+        if self.checkpoint is not None:
+            self.checkpoint({geoserver_store: self.publish_manifest.layers[geoserver_store]})
+
+    def count_upload(self, upload_file):
+        """
+        Add an uploaded layer and the size of its file to publish_stats and to the uploaded bytes metric.
+        Args:
+            upload_file(str): path of the uploaded file, or of the shapefile without extension.
+        """
+        if os.path.isfile(upload_file):
+            nbytes = os.path.getsize(upload_file)
+        else:
+            nbytes = sum(os.path.getsize(path) for path in glob.glob('{}.*'.format(upload_file)))
+        with self._publish_lock:
+            self.publish_stats['layers'] += 1
+            self.publish_stats['bytes'] += nbytes
+        self.metrics.bytes_uploaded.inc(nbytes)
+
+    def zip_files(self, zip_file, files):
+        """
+        Zip files under their base names, the missing files (i.e. optional shapefile extensions) are skipped.
+        Args:
+            zip_file(str): path of the zip file.
+            files(list): paths of the files.
+        """
+        with self.tracer.span('zip', zip_file=os.path.basename(zip_file)) as span:
+            with zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                for file_path in files:
+                    if os.path.isfile(file_path):
+                        zipf.write(file_path, os.path.basename(file_path))
+            span.set(bytes=os.path.getsize(zip_file))
+
+    def confirm_published_layers(self, geoserver_stores):
+        """
+        Record the staged layers published by the publisher in the publish manifest and checkpoint them.
+        Args:
+            geoserver_stores(list): GeoServer store ids of the published layers.
+        """
+        layers = self.publish_manifest.confirm(geoserver_stores)
+        self.metrics.layers.inc(len(layers), result=PublishMetrics.PUBLISHED)
+        if self.checkpoint is not None and layers:
+            self.checkpoint(layers)
+
+    def confirm_deleted_stores(self, geoserver_stores):
+        """
+        Remove the stores deleted by the publisher from the publish manifest.
+        Args:
+            geoserver_stores(list): GeoServer store ids of the deleted stores.
+        """
+        with self._publish_lock:
+            for geoserver_store in geoserver_stores:
+                self.publish_manifest.remove(geoserver_store)
+
     def modify_spatial_reference(self,
                                  delr=None,
                                  delc=None,
@@ -643,6 +959,7 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         if not lenuni:
             lenuni = self.flopy_model.sr.lenuni
 
+        self._spatial_reference_key = None
         self.flopy_model.sr = SpatialReference(delr=delr,
                                                delc=delc,
                                                xll=xll,
@@ -655,28 +972,43 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
                                                )
         return self.flopy_model.sr
 
+    def get_head_file(self):
+        """
+        Gets the path of the head file of the model file database
+        Returns:
+            str: path of the .hds (or .hed) file, None if the model has no head file.
+        """
+        hds_file = None
+
+        # loop through model file database for a .hds file
+        for file in self.model_file_db.list():
+            if file.split(".")[-1] in ['hds', 'hed']:
+                hds_file = os.path.join(self.model_file_db.db_dir, file)
+        return hds_file
+
     def get_head_data(self):
         """
         Gets the head data from the hds file if it exists
         Returns:
             bf.HeadFile(hds).get_data()
         """
+        # Heads loaded by the head_data task of create_all
+        if self._head_data is not None:
+            return self._head_data
+
         # Load flopy model if not already loaded
         if not self.flopy_model:
             self.load_model()
 
-        model_file_list = self.model_file_db.list()
-        hds_file = None
-
-        # loop through model file database for a .hds file
-        for file in model_file_list:
-            if file.split(".")[-1] in ['hds', 'hed']:
-                hds_file = os.path.join(self.model_file_db.db_dir, file)
+        hds_file = self.get_head_file()
 
         # If .hds file exists, get heads data
-        if hds_file:
+        if hds_file and self.out_of_core:
+            return read_head_file(hds_file)
+        elif hds_file:
             hdsobj = bf.HeadFile(hds_file)
             hds = hdsobj.get_data()
+            self.metrics.count_array(hds)
             return hds
         else:
             return None
@@ -702,23 +1034,20 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
                 attrs.remove('sr')
             if 'start_datetime' in attrs:
                 attrs.remove('start_datetime')
+            ibound = self.get_ibound()
             # Create arrays for the attributes in packages and save the min and max to a dict
             for attr in attrs:
                 a = pak.__getattribute__(attr)
                 if isinstance(a, Util2d) and a.shape == (self.flopy_model.nrow, self.flopy_model.ncol):
                     name = a.name.lower()
-                    arr = a.array
-                    arr = self.compress_array(arr, self.flopy_model.bas6.ibound[0].array)
-                    minval, maxval = self.get_min_max_non_zeros(arr)
-                    layer_dict[package_extension][name] = {'minimum': minval, 'maximum': maxval}
+                    layer_dict[package_extension][name] = self.get_layer_info(package_extension, a.array, ibound[0])[0]
                 elif isinstance(a, Util3d):
+                    layer_info = self.get_util3d_layer_info(package_extension, a, ibound)
                     for i, u2d in enumerate(a):
-                        name = shape_attr_name(u2d.name)
-                        name += '_{:03d}'.format(i + 1)
-                        arr = u2d.array
-                        arr = self.compress_array(arr, self.flopy_model.bas6.ibound[i].array)
-                        minval, maxval = self.get_min_max_non_zeros(arr)
-                        layer_dict[package_extension][name] = {'minimum': minval, 'maximum': maxval}
+                        band_attribute = shape_attr_name(u2d.name)
+                        name = '{}_{:03d}'.format(band_attribute, i + 1)
+                        layer_dict[package_extension][name] = dict(layer_info[i], band=i + 1,
+                                                                   band_attribute=band_attribute)
                 elif isinstance(a, Transient2d):
                     kpers = list(a.transient_2ds.keys())
                     kpers.sort()
@@ -727,60 +1056,85 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
                             u2d = a.transient_2ds[kper]
                             name = shape_attr_name(u2d.name)
                             name = "{}_{:03d}".format(name, kper + 1)
-                            arr = u2d.array
-                            arr = self.compress_array(arr, self.flopy_model.bas6.ibound[0].array)
-                            minval, maxval = self.get_min_max_non_zeros(arr)
-                            layer_dict[package_extension][name] = {'minimum': minval, 'maximum': maxval}
+                            layer_dict[package_extension][name] = \
+                                self.get_layer_info(package_extension, u2d.array, ibound[0])[0]
                 elif isinstance(a, MfList):
                     kpers = a.data.keys()
                     for kper in kpers:
                         if kper in self.STRESS_PERIOD_IMPORT:
-                            arrays = a.to_array(kper)
-                            for name, array in arrays.items():
-                                flopy_package_name = "{}-{}".format(name, package_extension.lower())
-                                if flopy_package_name in self.ATTRIBUTE_TRANSLATION_DICT \
-                                        and isinstance(self.ATTRIBUTE_TRANSLATION_DICT[flopy_package_name], list):
-                                    positive_array = np.copy(array)
-                                    negative_array = np.copy(array)
-
-                                    # Positive Array
-                                    positive_array[positive_array < 0] = 0
-                                    # Negative Array
-                                    negative_array[negative_array > 0] = 0
-                                    negative_array = np.absolute(negative_array)
-
-                                    list_loop = {'customtagpos': positive_array, 'customtagneg': negative_array}
-                                    for key, new_array in list_loop.items():
-                                        name = shape_attr_name(name, length=4) + key
-                                        for k in range(new_array.shape[0]):
-                                            aname = "{}{:03d}{:03d}".format(name, k + 1, kper + 1)
-                                            arr = new_array[k].astype(np.float32)
-                                            arr = self.compress_array(arr, self.flopy_model.bas6.ibound[k].array)
-                                            minval, maxval = self.get_min_max_non_zeros(arr)
-                                            layer_dict[package_extension][aname] = {'minimum': minval,
-                                                                                    'maximum': maxval}
-                                else:
-                                    for k in range(array.shape[0]):
-                                        name = shape_attr_name(name, length=4)
-                                        aname = "{}{:03d}{:03d}".format(name, k + 1,
-                                                                        kper + 1)
-                                        arr = array[k].astype(np.float32)
-                                        arr = self.compress_array(arr, self.flopy_model.bas6.ibound[k].array)
-                                        minval, maxval = self.get_min_max_non_zeros(arr)
-                                        layer_dict[package_extension][aname] = {'minimum': minval, 'maximum': maxval}
+                            for name, condition, cells, values in \
+                                    self.get_list_package_fields(a, kper, package_extension):
+                                layer_info = self.get_list_layer_info(package_extension, cells, values, ibound)
+                                for k, info in enumerate(layer_info):
+                                    aname = "{}{:03d}{:03d}".format(name, k + 1, kper + 1)
+                                    # Filter of the records of the layer in the list package vector layer
+                                    cql_filter = "k = {} AND kper = {}".format(k, kper)
+                                    if condition:
+                                        cql_filter = "{} AND {}".format(cql_filter, condition)
+                                    layer_dict[package_extension][aname] = dict(info, cql_filter=cql_filter)
                 elif isinstance(a, list):
                     for v in a:
                         if isinstance(v, Util3d):
+                            layer_info = self.get_util3d_layer_info(package_extension, v, ibound)
                             for i, u2d in enumerate(v):
-                                name = shape_attr_name(u2d.name)
-                                name += '_{:03d}'.format(i + 1)
-                                arr = u2d.array
-                                arr = self.compress_array(arr, self.flopy_model.bas6.ibound[i].array)
-                                minval, maxval = self.get_min_max_non_zeros(arr)
-                                layer_dict[package_extension][name] = {'minimum': minval, 'maximum': maxval}
+                                band_attribute = shape_attr_name(u2d.name)
+                                name = '{}_{:03d}'.format(band_attribute, i + 1)
+                                layer_dict[package_extension][name] = dict(layer_info[i], band=i + 1,
+                                                                           band_attribute=band_attribute)
 
         return layer_dict
 
+    def get_derived_layers(self, flopy_package_name):
+        """
+        Get the derived layers of a package attribute.
+        Args:
+            flopy_package_name(str): attribute and package name (i.e. flux-wel).
+        Returns:
+            tuple: DerivedLayer definitions, empty if the attribute is published as is.
+        """
+        if flopy_package_name in self.DERIVED_LAYER_ATTRIBUTES:
+            return self.DERIVED_LAYER_ATTRIBUTES[flopy_package_name]
+        if isinstance(self.ATTRIBUTE_TRANSLATION_DICT.get(flopy_package_name), list):
+            return self.DERIVED_LAYERS
+        return ()
+
+    def get_all_derived_layers(self):
+        """
+        Returns:
+            list: all the configured DerivedLayer definitions.
+        """
+        all_derived_layers = list(self.DERIVED_LAYERS)
+        for derived_layers in self.DERIVED_LAYER_ATTRIBUTES.values():
+            all_derived_layers.extend(derived_layers)
+        return all_derived_layers
+
+    def get_list_package_fields(self, mflist, kper, package_extension):
+        """
+        Get the records of a MfList stress period aggregated per cell, without building dense arrays. Attributes
+        with derived layers (i.e. flux-wel split into positive and negative values) are computed once per stress
+        period and reused for all the layers.
+        Args:
+            mflist(MfList): flopy MfList of the package (i.e. stress_period_data of the WEL package)
+            kper(int): 0-based stress period.
+            package_extension(str): modflow package name (i.e WEL, RIV, etc)
+        Returns:
+            list: (attribute name, CQL condition, cells, values) where cells are flat indices in the (nlay, nrow, ncol)
+                grid and the CQL condition selects the records of split attributes in the list package vector layer.
+        """
+        shape = (self.flopy_model.nlay, self.flopy_model.nrow, self.flopy_model.ncol)
+        fields = []
+        for name, (cells, values) in aggregate_list_records(mflist[kper], shape).items():
+            derived_layers = self.get_derived_layers("{}-{}".format(name, package_extension.lower()))
+            if derived_layers:
+                field_name = shape_attr_name(name, length=10)
+                for derived_layer, new_values in compute_derived_values(values, derived_layers):
+                    fields.append((shape_attr_name(name, length=4) + derived_layer.tag,
+                                   derived_layer.condition.format(field_name), cells, new_values))
+            else:
+                fields.append((shape_attr_name(name, length=4), None, cells, values))
+
+        return fields
+
     def get_head_info(self):
         """
         gets the max and min values for the head layers
@@ -793,81 +1147,277 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
 
         hds = self.get_head_data()
         if hds is not None:
-            head_info = {}
-            if hds is None:
-                return None
-            else:
-                # Get min and max values for each layer of heads in the model
-                for i, hdslayer in enumerate(hds):
-                    hdslayer[hdslayer == self.flopy_model.bas6.hnoflo] = np.nan
-                    head_info[str(i + 1)] = {'minimum': np.nanmin(hdslayer), 'maximum': np.nanmax(hdslayer)}
+            return self.get_head_layer_info(hds)
 
-                return head_info
+    def get_head_layer_info(self, hds, statistics=None):
+        """
+        gets the max and min values (and legends when using class breaks) of the head layers, ignoring the no flow cells
+        Args:
+            hds(np.ndarray): (nlay, nrow, ncol) heads.
+            statistics(dict): statistics of the heads already computed with get_layer_statistics. Defaults to None.
+        Returns:
+            layer_dict(dict): {"layer":{maximum:..., minimum:...}}
+        """
+        head_info = {}
+        if statistics is None:
+            with self.tracer.span('statistics', package=self.RL_HEAD, cells=hds.size):
+                statistics = get_layer_statistics(hds, nodata=self.flopy_model.bas6.hnoflo,
+                                                  bins=self.get_histogram_bins(), workers=self.STATISTICS_WORKERS,
+                                                  window_rows=self.get_window_rows(hds))
+        for i in range(len(hds)):
+            if statistics['count'][i] == 0:
+                head_info[str(i + 1)] = {'minimum': np.nan, 'maximum': np.nan}
+                continue
+            head_info[str(i + 1)] = {'minimum': statistics['minimum'][i], 'maximum': statistics['maximum'][i]}
+            if self.class_breaks and statistics['minimum'][i] != statistics['maximum'][i]:
+                head_info[str(i + 1)]['legend'] = self.get_legend(
+                    self.RL_HEAD, statistics['histogram'][i], statistics['bin_edges'][i]
+                )
+
+        return head_info
 
-    def upload_tif(self, package, attribute, arr, multiple_values=True):
+    def get_raster_style_type(self, package, multiple_values=True):
         """
-        Create a GEOTIFF for the package attribute and uploads the tif to geoserver
+        Get the raster style type used for a package attribute.
         Args:
             package (str): modflow package name (i.e DIS, BAS6, etc)
-            attribute (str): attribute name within the package (i.e model_top for the DIS package)
-            arr (str): numpy array for the given package attribute
             multiple_values (bool): True if have more than one value, False if only has one value.
+        Returns:
+            str: raster style type (i.e. RL, RL1 or RL_LOWBLUE).
         """
-
         if multiple_values:
             if package in self.LOW_BLUE_STYLE_PACKAGE:
-                style_name_ext = self.RL_LOWBLUE
+                return self.RL_LOWBLUE
+            return self.RL
+        return self.RL1
+
+    def get_raster_style_name(self, package, multiple_values=True, band=None):
+        """
+        Get the name of the raster style used for a package attribute.
+        Args:
+            package (str): modflow package name (i.e DIS, BAS6, etc)
+            multiple_values (bool): True if have more than one value, False if only has one value.
+            band (int): 1-based band number of a multi-band GEOTIFF. Defaults to None for single band GEOTIFFs.
+        Returns:
+            str: name of the style.
+        """
+        style_name_ext = self.get_raster_style_type(package, multiple_values)
+        if band is None:
+            return "{}_{}".format(self.WORKSPACE, style_name_ext)
+        return "{}_{}_band_{:03d}".format(self.WORKSPACE, style_name_ext, band)
+
+    def upload_multi_band_tif(self, package, u3d):
+        """
+        Create one multi-band GEOTIFF for a Util3d package attribute (one band per layer) and upload it to geoserver.
+        Args:
+            package (str): modflow package name (i.e DIS, BAS6, etc)
+            u3d (Util3d): flopy Util3d of the package attribute (i.e botm for the DIS package)
+        """
+        attribute = shape_attr_name(u3d[0].name)
+        if self.out_of_core:
+            # The layers are stacked one at a time in a memory mapped file instead of in memory
+            nbytes = int(np.prod(u3d.shape)) * np.dtype(u3d.dtype).itemsize
+            with self.scratch.directory('multi_band', nbytes=nbytes) as tmp_dir:
+                arr = stack_layers(os.path.join(tmp_dir, '{}.dat'.format(attribute)), (u2d.array for u2d in u3d),
+                                   u3d.shape, u3d.dtype)
+                self._upload_multi_band_tif(package, attribute, arr)
+                del arr
+            return
+
+        arr = u3d.array
+        self.metrics.count_array(arr)
+        self._upload_multi_band_tif(package, attribute, arr)
+
+    def _upload_multi_band_tif(self, package, attribute, arr):
+        """
+        Upload the (nlay, nrow, ncol) array of a Util3d package attribute as a multi-band GEOTIFF.
+        """
+        multiple_values = [info['minimum'] != info['maximum'] for info in
+                           self.get_layer_info(package, arr, self.get_ibound())]
+
+        self.upload_tif(package, attribute, arr, multiple_values)
+
+    def upload_layer_tifs(self, package, u3d):
+        """
+        Create one GEOTIFF per layer for a Util3d package attribute and upload them to geoserver.
+        Args:
+            package (str): modflow package name (i.e DIS, BAS6, etc)
+            u3d (Util3d): flopy Util3d of the package attribute (i.e botm for the DIS package)
+        """
+        ibound = self.get_ibound()
+        if self.out_of_core:
+            # One layer in memory at a time
+            layers = (u2d.array for u2d in u3d)
+        else:
+            arr = u3d.array
+            self.metrics.count_array(arr)
+            layer_info = self.get_layer_info(package, arr, ibound)
+            layers = iter(arr)
+
+        for i, (u2d, layer) in enumerate(zip(u3d, layers)):
+            name = shape_attr_name(u2d.name)
+            name += '_{:03d}'.format(i + 1)
+            if self.out_of_core:
+                self.metrics.count_array(layer)
+                info = self.get_layer_info(package, layer, ibound[i])[0]
             else:
-                style_name_ext = self.RL
+                info = layer_info[i]
+            self.upload_tif(package, name, layer, info['minimum'] != info['maximum'], legend=info.get('legend'))
+
+    def upload_tif(self, package, attribute, arr, multiple_values=True, legend=None):
+        """
+        Create a GEOTIFF for the package attribute and uploads the tif to geoserver
+        Args:
+            package (str): modflow package name (i.e DIS, BAS6, etc)
+            attribute (str): attribute name within the package (i.e model_top for the DIS package)
+            arr (str): numpy array for the given package attribute, a 3D array is written as a multi-band GEOTIFF.
+            multiple_values (bool|list): True if have more than one value, False if only has one value. A list with
+                one value per band for 3D arrays.
+            legend (list): legend of the class breaks of a 2D array, the layer gets its own style when given.
+        """
+        if arr.ndim == 3:
+            # Create the band styles that don't exist yet, band 1 is the default style of the layer
+            for band, band_multiple_values in enumerate(multiple_values, start=1):
+                band_style_name = self.get_raster_style_name(package, band_multiple_values, band=band)
+                if band_style_name not in self._band_styles:
+                    self.create_band_raster_style(self.get_raster_style_type(package, band_multiple_values), band,
+                                                  reload_config=False)
+            style_name = self.get_raster_style_name(package, multiple_values[0], band=1)
+        elif legend:
+            style_name = self.get_unique_item_name("{}-{}".format(package, attribute), suffix=self.RL_CLASSES,
+                                                   model_file_db=self.model_file_db)
+            self._class_styles[style_name] = legend
         else:
-            style_name_ext = self.RL1
+            style_name = self.get_raster_style_name(package, multiple_values)
 
         # Get unique name for the package attribute
         geoserver_file_name = self.get_unique_item_name("{}-{}".format(package, attribute),
                                                         model_file_db=self.model_file_db)
-        tmp_raster = "{}.tif".format(geoserver_file_name)
-        tmp_raster2 = "{}_temp.tif".format(geoserver_file_name)
-        tmp_prj = '{}.prj'.format(geoserver_file_name)
-        tmp_zip = '{}.zip'.format(geoserver_file_name)
-
-        # Create GEOTIFF and .prj file from flopy
-        self.flopy_model.sr.export_array(tmp_raster2, arr)
-
-        # Crop the raster using boundary layer
-        # self.crop_reproject_raster(dst_src, tmp_raster2, tmp_raster)
-        self.crop_raster(tmp_raster2, tmp_raster)
-        proj = flopy.utils.reference.getprj(self.flopy_model.sr.epsg)
-        with open(tmp_prj, 'w') as f:
-            f.write(proj)
-
-        # Zip the GEOTIFF and .prj file together
-        zipf = zipfile.ZipFile(tmp_zip, 'w', zipfile.ZIP_DEFLATED)
-        zipf.write(tmp_raster)
-        zipf.write(tmp_prj)
-        zipf.close()
-
-        # Upload the zipped folder to geoserver
         geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_file_name)
-        self.gs_engine.create_coverage_resource(geoserver_store,
-                                                overwrite=True,
-                                                coverage_file=tmp_zip,
-                                                coverage_type='geotiff')
-
-        # Update the geoserer resource with the correct style, crs, enable, and projection_policy
-        style_name = "{}_{}".format(self.WORKSPACE, style_name_ext)
-        self.gs_engine.update_layer(layer_id=geoserver_store,
-                                    default_style=style_name)
-        self.gs_engine.update_resource(resource_id=geoserver_store,
-                                       projection="EPSG:{}".format(self.flopy_model.sr.epsg),
-                                       enabled=True)
-
-        # Delete temporary files
-        os.remove(tmp_raster)
-        os.remove(tmp_raster2)
-        os.remove(tmp_prj)
-        os.remove(tmp_zip)
+
+        # Skip the upload if the layer and its encoding didn't change since the last publish
+        precision = self.get_raster_precision(package, attribute)
+        digest = PublishManifest.hash_array(arr)
+        if precision:
+            digest = PublishManifest.hash_arrays(arr, np.array([precision]))
+        if self.get_publish_action(geoserver_store, digest, style_name) != PublishManifest.UPLOAD:
+            return
+
+        # The GEOTIFF is written twice (encoded, then cropped) and zipped
+        with self.scratch.directory('raster', nbytes=3 * arr.nbytes) as tmp_dir:
+            tmp_raster = os.path.join(tmp_dir, "{}.tif".format(geoserver_file_name))
+            tmp_raster2 = os.path.join(tmp_dir, "{}_temp.tif".format(geoserver_file_name))
+            tmp_prj = os.path.join(tmp_dir, '{}.prj'.format(geoserver_file_name))
+            tmp_zip = os.path.join(tmp_dir, '{}.zip'.format(geoserver_file_name))
+
+            # Create GEOTIFF with the narrowest dtype for the values and .prj file
+            window_rows = self.get_window_rows(arr)
+            with self.tracer.span('encode', package=package, attribute=attribute, cells=arr.size, bytes=arr.nbytes):
+                if window_rows:
+                    write_geotiff_windows(tmp_raster2, arr, self.flopy_model.sr, precision=precision,
+                                          window_rows=window_rows)
+                else:
+                    write_geotiff(tmp_raster2, encode_array(arr, precision=precision), self.flopy_model.sr)
+
+            # Crop the raster using boundary layer
+            # self.crop_reproject_raster(dst_src, tmp_raster2, tmp_raster)
+            self.crop_raster(tmp_raster2, tmp_raster, window_rows=window_rows)
+            self.memory_budget.check('upload_tif')
+            proj = self.get_prj(self.flopy_model.sr.epsg)
+            with open(tmp_prj, 'w') as f:
+                f.write(proj)
+
+            # Zip the GEOTIFF and .prj file together
+            self.zip_files(tmp_zip, [tmp_raster, tmp_prj])
+
+            # Upload the zipped folder to geoserver with the correct style, crs and enable
+            self.publisher.publish_coverage(geoserver_store, tmp_zip, "EPSG:{}".format(self.flopy_model.sr.epsg),
+                                            style_name)
+            self.count_upload(tmp_zip)
+            self.record_published_layer(geoserver_store, digest, style_name)
+
+    def create_list_package_vector_layer(self, package, mflist):
+        """
+        Create one shapefile with the records of the imported stress periods of a list package (i.e. WEL, CHD, RIV,
+        GHB) and upload it to geoserver. Each record is written as the centroid point or the polygon of its cell, with
+        the fields of the records and a 0-based stress period (kper) column to filter the layer with CQL.
+        Args:
+            package (str): modflow package name (i.e WEL, RIV, etc)
+            mflist (MfList): flopy MfList of the package (i.e. stress_period_data of the WEL package)
+        """
+        style_name = "{}_{}".format(self.VL_LIST_PACKAGE, self.list_package_geometry)
+        geoserver_file_name = self.get_unique_item_name("{}-{}".format(package, self.VL_LIST_PACKAGE),
+                                                        model_file_db=self.model_file_db)
+        geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_file_name)
+
+        kpers = [kper for kper in sorted(mflist.data.keys()) if kper in self.STRESS_PERIOD_IMPORT]
+        period_records = [(kper, mflist[kper]) for kper in kpers]
+
+        # Skip the upload if the records and geometry didn't change since the last publish
+        digest = PublishManifest.hash_arrays(
+            np.frombuffer(self.list_package_geometry.encode('utf-8'), dtype=np.uint8),
+            np.array(kpers),
+            *[np.asarray(records) for _, records in period_records]
+        )
+        if self.get_publish_action(geoserver_store, digest, style_name) != PublishManifest.UPLOAD:
+            return
+
+        # All the fields of the records become attributes of the features
+        fields = [name for name in mflist.dtype.names if mflist.dtype.fields[name][0] != object]
+        properties = OrderedDict([('kper', 'int')])
+        for name in fields:
+            field_type = 'int' if np.issubdtype(mflist.dtype.fields[name][0], np.integer) else 'float'
+            properties[shape_attr_name(name, length=10)] = field_type
+
+        if self.list_package_geometry == self.LIST_PACKAGE_POINTS:
+            schema = {'geometry': 'Point', 'properties': properties}
+        else:
+            schema = {'geometry': 'Polygon', 'properties': properties}
+
+        with self.scratch.directory('list_package') as tmp_dir:
+            tmp_base = os.path.join(tmp_dir, geoserver_file_name)
+            tmp_shapefile = "{}.shp".format(tmp_base)
+            tmp_prj = '{}.prj'.format(tmp_base)
+            tmp_zip = '{}.zip'.format(tmp_base)
+            tmp_files = [tmp_shapefile, "{}.shx".format(tmp_base), "{}.dbf".format(tmp_base), "{}.cpg".format(tmp_base),
+                         tmp_prj]
+
+            sr = self.flopy_model.sr
+            with fiona.open(tmp_shapefile, 'w', 'ESRI Shapefile', schema) as c:
+                for kper, records in period_records:
+                    if records is None or len(records) == 0:
+                        continue
+                    rows = records['i'].astype(int)
+                    cols = records['j'].astype(int)
+                    if self.list_package_geometry == self.LIST_PACKAGE_POINTS:
+                        geometries = [{'type': 'Point', 'coordinates': (x, y)}
+                                      for x, y in zip(sr.xcentergrid[rows, cols], sr.ycentergrid[rows, cols])]
+                    else:
+                        geometries = [{'type': 'Polygon', 'coordinates': [vertices]}
+                                      for vertices in sr.get_vertices(rows, cols)]
+                    columns = [records[name].tolist() for name in fields]
+                    c.writerecords(
+                        {'geometry': geometry,
+                         'properties': OrderedDict(zip(properties, [kper] + [column[n] for column in columns]))}
+                        for n, geometry in enumerate(geometries)
+                    )
+
+            # Create a .prj file
+            proj = self.get_prj(sr.epsg)
+            with open(tmp_prj, 'w') as f:
+                f.write(proj)
+
+            # Zip the shapefile
+            self.zip_files(tmp_zip, tmp_files)
+
+            # Create geoserver resource with the zip file and correct parameters
+            self.publisher.publish_shapefile(geoserver_store, "EPSG:{}".format(sr.epsg), style_name,
+                                             projection_policy="FORCE_DECLARED", shapefile_zip=tmp_zip)
+            self.count_upload(tmp_zip)
+            self.record_published_layer(geoserver_store, digest, style_name)
 
     @reload_config()
+    @publish_batch
     def create_model_boundary_style(self, overwrite=True, reload_config=True):
         """
         Create style for models boundary layers.
@@ -877,7 +1427,7 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         """
         # Create Base Style
         context = {}
-        self.gs_api.create_style(
+        self.publisher.create_style(
             workspace=self.WORKSPACE,
             style_name=self.VL_MODEL_BOUNDARY,
             sld_template=os.path.join(self.SLD_PATH, self.VL_MODEL_BOUNDARY + '.sld'),
@@ -886,6 +1436,7 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         )
 
     @reload_config()
+    @publish_batch
     def create_model_grid_style(self, overwrite=True, reload_config=True):
         """
         Create style for models boundary layers.
@@ -895,7 +1446,7 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         """
         # Create Base Style
         context = {}
-        self.gs_api.create_style(
+        self.publisher.create_style(
             workspace=self.WORKSPACE,
             style_name=self.VL_MODEL_GRID,
             sld_template=os.path.join(self.SLD_PATH, self.VL_MODEL_GRID + '.sld'),
@@ -904,6 +1455,42 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         )
 
     @reload_config()
+    @publish_batch
+    def create_list_package_style(self, overwrite=True, reload_config=True):
+        """
+        Create the point and cell styles for list package vector layers.
+        Args:
+            overwrite(bool): Overwrite style if already exists when True. Defaults to False.
+            reload_config(bool): Reload the GeoServer node configuration and catalog before returning if True.
+        """
+        for geometry in (self.LIST_PACKAGE_POINTS, self.LIST_PACKAGE_CELLS):
+            context = {'geometry': geometry}
+            self.publisher.create_style(
+                workspace=self.WORKSPACE,
+                style_name="{}_{}".format(self.VL_LIST_PACKAGE, geometry),
+                sld_template=os.path.join(self.SLD_PATH, self.VL_LIST_PACKAGE + '.sld'),
+                sld_context=context,
+                overwrite=overwrite
+            )
+
+    @reload_config()
+    @publish_batch
+    def delete_list_package_style(self, purge=True, reload_config=True):
+        """
+        Delete the styles of list package vector layers.
+        Args:
+            purge(bool): Force remove all resources associated with style.
+            reload_config(bool): Reload the GeoServer node configuration and catalog before returning if True.
+        """
+        for geometry in (self.LIST_PACKAGE_POINTS, self.LIST_PACKAGE_CELLS):
+            self.publisher.delete_style(
+                workspace=self.WORKSPACE,
+                style_name="{}_{}".format(self.VL_LIST_PACKAGE, geometry),
+                purge=purge
+            )
+
+    @reload_config()
+    @publish_batch
     def delete_model_grid_style(self, purge=True, reload_config=True):
         """
         Delete model boundary style.
@@ -912,13 +1499,14 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
             reload_config(bool): Reload the GeoServer node configuration and catalog before returning if True.
         """
         # Delete Base Style
-        self.gs_api.delete_style(
+        self.publisher.delete_style(
             workspace=self.WORKSPACE,
             style_name=self.VL_MODEL_GRID,
             purge=purge
         )
 
     @reload_config()
+    @publish_batch
     def delete_model_boundary_style(self, purge=True, reload_config=True):
         """
         Delete model boundary style.
@@ -927,7 +1515,7 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
             reload_config(bool): Reload the GeoServer node configuration and catalog before returning if True.
         """
         # Delete Base Style
-        self.gs_api.delete_style(
+        self.publisher.delete_style(
             workspace=self.WORKSPACE,
             style_name=self.VL_MODEL_BOUNDARY,
             purge=purge
@@ -939,113 +1527,68 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         Create and Upload a model boundary shapefile to geoserver. Creates store (if it doesn't
         exist), feature type resource, and a layer.
         """
-        # Load flopy model if not already loaded
-        if not self.flopy_model:
-            self.load_model()
-
-        tmp_grid_name = 'temp_grid'
-        tmp_grid_shapefile = "{}.shp".format(tmp_grid_name)
-
-        # Open the gridded shapefile, select the values with Ibound not 0, and make a union from them
-        gdf_boundary = []
-        for layer in range(self.flopy_model.dis.nlay):
-            print("number of layer is:" + str(self.flopy_model.dis.nlay))
-            self.flopy_model.bas6.ibound[layer].export(tmp_grid_shapefile)
-            gdf = geopandas.read_file(tmp_grid_shapefile)
-            ibound_col = 'ibound__' + str(layer)
-            if layer > 0:
-                gdf_boundary.append(gdf[gdf[ibound_col] != 0], sort=False)
-            else:
-                gdf_boundary = gdf[gdf[ibound_col] != 0]
-        self._boundary = gdf_boundary.geometry.unary_union
+        # The union of the active cells is computed once, i.e. by the boundary_mask task of create_all
+        self.load_boundary()
+        gdf_boundary = self._boundary_cells.copy()
 
         # Get names of geoserver files
+        boundary_group_name = self.get_boundary_layer_group_name()
         geoserver_boundary_file_name = self.get_unique_item_name(self.VL_MODEL_BOUNDARY,
                                                                  model_file_db=self.model_file_db)
-        tmp_boundary_shapefile = "{}.shp".format(geoserver_boundary_file_name)
-        tmp_dbf = "{}.dbf".format(geoserver_boundary_file_name)
-        tmp_shx = "{}.shx".format(geoserver_boundary_file_name)
-        tmp_prj = '{}.prj'.format(geoserver_boundary_file_name)
-        tmp_zip = '{}.zip'.format(geoserver_boundary_file_name)
-
-        # Create a single polygon shapefile from the unioned gridded shapefile
-        schema = {
-            'geometry': 'Polygon',
-            'properties': {'id': 'str'},
-        }
+        geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_boundary_file_name)
 
-        with fiona.open(tmp_boundary_shapefile, 'w', 'ESRI Shapefile', schema) as c:
-            c.write({
-                'geometry': mapping(self._boundary),
-                'properties': {'id': 'boundary'},
-            })
+        # Skip the boundary if the active cells didn't change since the last publish
+        ibound_digest = PublishManifest.hash_array(self.get_ibound())
+        if self.get_publish_action(geoserver_store, ibound_digest, self.VL_MODEL_BOUNDARY) == PublishManifest.UPLOAD:
+            with self.scratch.directory('model_boundary') as tmp_dir:
+                tmp_base = os.path.join(tmp_dir, geoserver_boundary_file_name)
+                tmp_boundary_shapefile = "{}.shp".format(tmp_base)
+                tmp_dbf = "{}.dbf".format(tmp_base)
+                tmp_shx = "{}.shx".format(tmp_base)
+                tmp_prj = '{}.prj'.format(tmp_base)
+                tmp_zip = '{}.zip'.format(tmp_base)
+
+                # Create a single polygon shapefile from the unioned gridded shapefile
+                schema = {
+                    'geometry': 'Polygon',
+                    'properties': {'id': 'str'},
+                }
+
+                with fiona.open(tmp_boundary_shapefile, 'w', 'ESRI Shapefile', schema) as c:
+                    c.write({
+                        'geometry': mapping(self._boundary),
+                        'properties': {'id': 'boundary'},
+                    })
+
+                # Create a .prj file
+                proj = self.get_prj(self.flopy_model.sr.epsg)
+                with open(tmp_prj, 'w') as f:
+                    f.write(proj)
 
-        # Create a .prj file
-        proj = flopy.utils.reference.getprj(self.flopy_model.sr.epsg)
-        with open(tmp_prj, 'w') as f:
-            f.write(proj)
-
-        # Zip the .prj file with the single polygon shapefile and necessary extensions
-        zipf = zipfile.ZipFile(tmp_zip, 'w', zipfile.ZIP_DEFLATED)
-        zipf.write(tmp_boundary_shapefile)
-        zipf.write(tmp_dbf)
-        zipf.write(tmp_shx)
-        zipf.write(tmp_prj)
-        zipf.close()
-
-        # Create geoserver resource with the zip file
-        geoserver_engine = self.gs_engine
-        geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_boundary_file_name)
-        geoserver_engine.create_shapefile_resource(geoserver_store,
-                                                   overwrite=True,
-                                                   shapefile_zip=tmp_zip)
-
-        # Update geoserver resource with correct parameters
-        style_name = self.VL_MODEL_BOUNDARY
-        self.gs_engine.update_layer(layer_id=geoserver_store,
-                                    default_style=style_name)
-        self.gs_engine.update_resource(resource_id=geoserver_store,
-                                       projection="EPSG:{}".format(self.flopy_model.sr.epsg),
-                                       projection_policy="FORCE_DECLARED",
-                                       enabled=True)
-
-        # Get model boundary layer group from geoserver
-        boundary_group_name = "{}:{}".format(self.WORKSPACE, self.VL_MODEL_BOUNDARY)
-        style_name = self.VL_MODEL_BOUNDARY
-        response = self.gs_engine.get_layer_group(boundary_group_name)
-
-        # If layer group exists, get existing layers/styles and update with new layer/style
-        if response['success']:
-            layers = response['result']['layers']
-            styles = response['result']['styles']
-            layers.append(geoserver_boundary_file_name)
-            styles.append(style_name)
-            self.gs_engine.update_layer_group(layer_group_id=boundary_group_name,
-                                              layers=layers,
-                                              styles=styles
-                                              )
-        # Create new layer group if model boundary layer group doesn't exist
-        else:
-            if not self.model_selection_bounds:
-                self.model_selection_bounds = ['-180', '180', '-90', '90']
-            self.model_selection_bounds.append('4326')
-            self.gs_engine.create_layer_group(layer_group_id=boundary_group_name,
-                                              layers=(geoserver_boundary_file_name,),
-                                              styles=(style_name,),
-                                              bounds=self.model_selection_bounds
-                                              )
-
-        # Clean up shapefiles that aren't needed anymore
-        os.remove(tmp_grid_shapefile)
-        os.remove("{}.shx".format(tmp_grid_name))
-        os.remove("{}.dbf".format(tmp_grid_name))
-
-        os.remove(tmp_boundary_shapefile)
-        os.remove("{}.shx".format(geoserver_boundary_file_name))
-        os.remove("{}.dbf".format(geoserver_boundary_file_name))
-        os.remove("{}.prj".format(geoserver_boundary_file_name))
-        os.remove("{}.cpg".format(geoserver_boundary_file_name))
-        os.remove("{}.zip".format(geoserver_boundary_file_name))
+                # Zip the .prj file with the single polygon shapefile and necessary extensions
+                self.zip_files(tmp_zip, [tmp_boundary_shapefile, tmp_dbf, tmp_shx, tmp_prj])
+
+                # Create geoserver resource with the zip file and correct parameters
+                self.publisher.publish_shapefile(geoserver_store, "EPSG:{}".format(self.flopy_model.sr.epsg),
+                                                 self.VL_MODEL_BOUNDARY, projection_policy="FORCE_DECLARED",
+                                                 shapefile_zip=tmp_zip)
+                self.count_upload(tmp_zip)
+
+            # Add the boundary to the model boundary layer group with the next flush
+            self.layer_groups.add_layer(boundary_group_name, geoserver_boundary_file_name, self.VL_MODEL_BOUNDARY,
+                                        shard_key=self.model_file_db.get_id())
+
+            self.record_published_layer(geoserver_store, ibound_digest, self.VL_MODEL_BOUNDARY)
+
+        # Skip the grid if the active cells and thickness didn't change since the last publish
+        geoserver_grid_file_name = self.get_unique_item_name(self.VL_MODEL_GRID, model_file_db=self.model_file_db)
+        geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_grid_file_name)
+        grid_digest = PublishManifest.hash_arrays(self.get_ibound(),
+                                                  self.flopy_model.dis.top.array,
+                                                  self.flopy_model.dis.botm[self.flopy_model.dis.nlay - 1].array)
+        if self.get_publish_action(geoserver_store, grid_digest, self.VL_MODEL_GRID) != PublishManifest.UPLOAD:
+            self.flush_layer_groups()
+            return
 
         # Create Model Grid
         # Get bottom elevation and append to gdf_boundary (model grid)
@@ -1071,76 +1614,57 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         # Merge bottom dataframe dataset using IJ data
         gdf_boundary = gdf_boundary.merge(thickness_df, on='IJ')
 
-        geoserver_grid_file_name = self.get_unique_item_name(self.VL_MODEL_GRID, model_file_db=self.model_file_db)
-
-        # Create shapefile
-        tmp_grid_shapefile = "{}.shp".format(geoserver_grid_file_name)
-        tmp_grid_dbf = "{}.dbf".format(geoserver_grid_file_name)
-        tmp_grid_shx = "{}.shx".format(geoserver_grid_file_name)
-        tmp_grid_cpg = '{}.cpg'.format(geoserver_grid_file_name)
-        tmp_grid_zip = '{}.zip'.format(geoserver_grid_file_name)
-        gdf_boundary.to_file(tmp_grid_shapefile)
-
-        # Zip the shapefile
-        zipf = zipfile.ZipFile(tmp_grid_zip, 'w', zipfile.ZIP_DEFLATED)
-        zipf.write(tmp_grid_shapefile)
-        zipf.write(tmp_grid_dbf)
-        zipf.write(tmp_grid_shx)
-        zipf.write(tmp_grid_cpg)
-        zipf.close()
-
-        # Create geoserver resource with the zip file
-        geoserver_engine = self.gs_engine
-        geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_grid_file_name)
-        geoserver_engine.create_shapefile_resource(geoserver_store,
-                                                   overwrite=True,
-                                                   shapefile_zip=tmp_grid_zip)
-
-        # Update geoserver resource with correct parameters
-        style_name = self.VL_MODEL_GRID
-        self.gs_engine.update_layer(layer_id=geoserver_store,
-                                    default_style=style_name)
-        self.gs_engine.update_resource(resource_id=geoserver_store,
-                                       projection="EPSG:{}".format(self.flopy_model.sr.epsg),
-                                       projection_policy="FORCE_DECLARED",
-                                       enabled=True)
-
-        # Get model boundary layer group from geoserver
-        style_name = self.VL_MODEL_GRID
-        response = self.gs_engine.get_layer_group(boundary_group_name)
-
-        # If layer group exists, get existing layers/styles and update with new layer/style
-        if response['success']:
-            layers = response['result']['layers']
-            styles = response['result']['styles']
-            layers.append(geoserver_grid_file_name)
-            styles.append(style_name)
-            self.gs_engine.update_layer_group(layer_group_id=boundary_group_name,
-                                              layers=layers,
-                                              styles=styles
-                                              )
-
-        # Clean up shapefiles that aren't needed anymore
-        # os.remove(tmp_grid_shapefile)
-        # os.remove(tmp_grid_dbf)
-        # os.remove(tmp_grid_shx)
-        # os.remove(tmp_grid_cpg)
-        # os.remove("{}.zip".format(geoserver_grid_file_name))
+        # The grid shapefile and its zip are removed with the scratch directory
+        with self.scratch.directory('model_grid') as tmp_dir:
+            # Create shapefile
+            tmp_base = os.path.join(tmp_dir, geoserver_grid_file_name)
+            tmp_grid_shapefile = "{}.shp".format(tmp_base)
+            tmp_grid_dbf = "{}.dbf".format(tmp_base)
+            tmp_grid_shx = "{}.shx".format(tmp_base)
+            tmp_grid_cpg = '{}.cpg'.format(tmp_base)
+            tmp_grid_zip = '{}.zip'.format(tmp_base)
+            gdf_boundary.to_file(tmp_grid_shapefile)
+
+            # Zip the shapefile
+            self.zip_files(tmp_grid_zip, [tmp_grid_shapefile, tmp_grid_dbf, tmp_grid_shx, tmp_grid_cpg])
+
+            # Create geoserver resource with the zip file and correct parameters
+            self.publisher.publish_shapefile(geoserver_store, "EPSG:{}".format(self.flopy_model.sr.epsg),
+                                             self.VL_MODEL_GRID, projection_policy="FORCE_DECLARED",
+                                             shapefile_zip=tmp_grid_zip)
+            self.count_upload(tmp_grid_zip)
+
+        # Add the grid to the model boundary layer group with the boundary, in one update
+        self.layer_groups.add_layer(boundary_group_name, geoserver_grid_file_name, self.VL_MODEL_GRID,
+                                    shard_key=self.model_file_db.get_id())
+        self.flush_layer_groups()
+
+        self.record_published_layer(geoserver_store, grid_digest, self.VL_MODEL_GRID)
 
     @reload_config()
     def delete_model_boundary_layer(self, reload_config=True):
         """
-        Deletes geoserver resources for the model boundary
+        Deletes geoserver resources for the model boundary and the model grid
         """
-        # Load flopy model if not already loaded
-        if not self.flopy_model:
-            self.load_model()
+        boundary_group_name = self.get_boundary_layer_group_name()
+        geoserver_stores = []
+        for item_name in (self.VL_MODEL_BOUNDARY, self.VL_MODEL_GRID):
+            geoserver_file_name = self.get_unique_item_name(item_name, model_file_db=self.model_file_db)
+            geoserver_stores.append("{}:{}".format(self.WORKSPACE, geoserver_file_name))
+            self.layer_groups.remove_layer(boundary_group_name, geoserver_file_name,
+                                           shard_key=self.model_file_db.get_id())
+        self.flush_layer_groups()
+        self.delete_stores(geoserver_stores)
 
-        # Delete model boundary layer
-        geoserver_engine = self.gs_engine
-        geoserver_file_name = self.get_unique_item_name(self.VL_MODEL_BOUNDARY, model_file_db=self.model_file_db)
-        geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_file_name)
-        geoserver_engine.delete_resource(geoserver_store)
+    def flush_layer_groups(self):
+        """
+        Apply the pending changes of the layer groups (see LayerGroupManager), with one update per layer group. The
+        layers staged by the bulk publisher are published first, layer groups only accept existing layers.
+        """
+        self.flush_default_styles()
+        bounds = list(self.model_selection_bounds or ['-180', '180', '-90', '90'])
+        self.layer_groups.bounds = bounds + ['4326']
+        self.layer_groups.flush()
 
     @reload_config()
     def create_package_shapefile_layers(self, reload_config=True):
@@ -1154,181 +1678,137 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
 
         # Loop through all the flopy packages in the model
         for package_extension in self.flopy_model.get_package_list():
-            pak = self.flopy_model.get_package(package_extension)
-            attrs = dir(pak)
-            if 'sr' in attrs:
-                attrs.remove('sr')
-            if 'start_datetime' in attrs:
-                attrs.remove('start_datetime')
-            # Create arrays for the attributes in packages and upload them to geoserver with upload_tif method
-            for attr in attrs:
-                a = pak.__getattribute__(attr)
-                if isinstance(a, Util2d) and a.shape == (self.flopy_model.nrow, self.flopy_model.ncol):
-                    name = a.name.lower()
-                    arr = a.array
-                    compress_arr = self.compress_array(arr, self.flopy_model.bas6.ibound[0].array)
-                    multiple_values = True
-                    minval, maxval = self.get_min_max_non_zeros(compress_arr)
-                    if minval == maxval:
-                        multiple_values = False
-                    self.upload_tif(package_extension, name, arr, multiple_values)
-                elif isinstance(a, Util3d):
-                    for i, u2d in enumerate(a):
+            self.create_package_layers(package_extension)
+
+        # Upload the per layer styles and set them as default style of their layers
+        self.flush_default_styles()
+
+    @traced('package', 'package_extension')
+    def create_package_layers(self, package_extension):
+        """
+        Create and Upload the layers of the attributes of a package of the modflow model. The per layer styles are
+        uploaded by flush_default_styles.
+        Args:
+            package_extension(str): modflow package name (i.e DIS, BAS6, etc)
+        """
+        pak = self.flopy_model.get_package(package_extension)
+        attrs = dir(pak)
+        if 'sr' in attrs:
+            attrs.remove('sr')
+        if 'start_datetime' in attrs:
+            attrs.remove('start_datetime')
+        ibound = self.get_ibound()
+        # Create arrays for the attributes in packages and upload them to geoserver with upload_tif method
+        for attr in attrs:
+            a = pak.__getattribute__(attr)
+            if isinstance(a, Util2d) and a.shape == (self.flopy_model.nrow, self.flopy_model.ncol):
+                name = a.name.lower()
+                arr = a.array
+                self.metrics.count_array(arr)
+                info = self.get_layer_info(package_extension, arr, ibound[0])[0]
+                self.upload_tif(package_extension, name, arr, info['minimum'] != info['maximum'],
+                                legend=info.get('legend'))
+            elif isinstance(a, Util3d) and self.multi_band:
+                self.upload_multi_band_tif(package_extension, a)
+            elif isinstance(a, Util3d):
+                self.upload_layer_tifs(package_extension, a)
+            elif isinstance(a, Transient2d):
+                kpers = list(a.transient_2ds.keys())
+                kpers.sort()
+                for kper in kpers:
+                    if kper in self.STRESS_PERIOD_IMPORT:
+                        u2d = a.transient_2ds[kper]
                         name = shape_attr_name(u2d.name)
-                        name += '_{:03d}'.format(i + 1)
+                        name = "{}_{:03d}".format(name, kper + 1)
                         arr = u2d.array
-                        compress_arr = self.compress_array(arr, self.flopy_model.bas6.ibound[i].array)
-                        multiple_values = True
-                        minval, maxval = self.get_min_max_non_zeros(compress_arr)
-                        if minval == maxval:
-                            multiple_values = False
-                        self.upload_tif(package_extension, name, arr, multiple_values)
-                elif isinstance(a, Transient2d):
-                    kpers = list(a.transient_2ds.keys())
-                    kpers.sort()
-                    for kper in kpers:
-                        if kper in self.STRESS_PERIOD_IMPORT:
-                            u2d = a.transient_2ds[kper]
-                            name = shape_attr_name(u2d.name)
-                            name = "{}_{:03d}".format(name, kper + 1)
-                            arr = u2d.array
-                            compress_arr = self.compress_array(arr, self.flopy_model.bas6.ibound[0].array)
-                            multiple_values = True
-                            minval, maxval = self.get_min_max_non_zeros(compress_arr)
-                            if minval == maxval:
-                                multiple_values = False
-                            self.upload_tif(package_extension, name, arr, multiple_values)
-                elif isinstance(a, MfList):
-                    kpers = a.data.keys()
-                    for kper in kpers:
-                        if kper in self.STRESS_PERIOD_IMPORT:
-                            arrays = a.to_array(kper)
-                            for name, array in arrays.items():
-                                flopy_package_name = "{}-{}".format(name, package_extension.lower())
-                                for k in range(array.shape[0]):
-                                    if flopy_package_name in self.ATTRIBUTE_TRANSLATION_DICT \
-                                            and isinstance(self.ATTRIBUTE_TRANSLATION_DICT[flopy_package_name], list):
-                                        # Positive Array
-                                        positive_array = np.copy(array)
-                                        positive_array[positive_array < 0] = 0
-
-                                        # Negative Array
-                                        negative_array = np.copy(array)
-                                        negative_array[negative_array > 0] = 0
-                                        negative_array = np.absolute(negative_array)
-
-                                        list_loop = {'customtagpos': positive_array, 'customtagneg': negative_array}
-                                        for key, new_array in list_loop.items():
-                                            name = shape_attr_name(name, length=4) + key
-                                            aname = "{}{:03d}{:03d}".format(name, k + 1,
-                                                                            kper + 1)
-                                            arr = new_array[k].astype(np.float32)
-                                            compress_arr = self.compress_array(arr,
-                                                                               self.flopy_model.bas6.ibound[k].array)
-                                            minval, maxval = self.get_min_max_non_zeros(compress_arr)
-                                            if minval == maxval:
-                                                multiple_values = False
-                                            self.upload_tif(package_extension, aname, arr, multiple_values)
-                                    else:
-                                        name = shape_attr_name(name, length=4)
-                                        aname = "{}{:03d}{:03d}".format(name, k + 1,
-                                                                        kper + 1)
-                                        arr = array[k].astype(np.float32)
-                                        compress_arr = self.compress_array(arr, self.flopy_model.bas6.ibound[k].array)
-                                        multiple_values = True
-                                        minval, maxval = self.get_min_max_non_zeros(compress_arr)
-                                        if minval == maxval:
-                                            multiple_values = False
-                                        self.upload_tif(package_extension, aname, arr, multiple_values)
-                elif isinstance(a, list):
-                    for v in a:
-                        if isinstance(v, Util3d):
-                            for i, u2d in enumerate(v):
-                                name = shape_attr_name(u2d.name)
-                                name += '_{:03d}'.format(i + 1)
-                                arr = u2d.array
-                                compress_arr = self.compress_array(arr, self.flopy_model.bas6.ibound[i].array)
-                                multiple_values = True
-                                minval, maxval = self.get_min_max_non_zeros(compress_arr)
-                                if minval == maxval:
-                                    multiple_values = False
-                                self.upload_tif(package_extension, name, arr, multiple_values)
+                        self.metrics.count_array(arr)
+                        info = self.get_layer_info(package_extension, arr, ibound[0])[0]
+                        self.upload_tif(package_extension, name, arr, info['minimum'] != info['maximum'],
+                                        legend=info.get('legend'))
+            elif isinstance(a, MfList) and self.list_package_geometry:
+                self.create_list_package_vector_layer(package_extension, a)
+            elif isinstance(a, MfList):
+                kpers = a.data.keys()
+                for kper in kpers:
+                    if kper in self.STRESS_PERIOD_IMPORT:
+                        for name, _, cells, values in self.get_list_package_fields(a, kper, package_extension):
+                            layer_info = self.get_list_layer_info(package_extension, cells, values, ibound)
+                            for k, info in enumerate(layer_info):
+                                # Layers without values are not part of the layer tree
+                                if info['minimum'] == 0 and info['maximum'] == 0:
+                                    continue
+                                aname = "{}{:03d}{:03d}".format(name, k + 1, kper + 1)
+                                arr = get_list_layer_array(cells, values, ibound.shape, k)
+                                self.upload_tif(package_extension, aname, arr, info['minimum'] != info['maximum'],
+                                                legend=info.get('legend'))
+            elif isinstance(a, list):
+                for v in a:
+                    if isinstance(v, Util3d) and self.multi_band:
+                        self.upload_multi_band_tif(package_extension, v)
+                    elif isinstance(v, Util3d):
+                        self.upload_layer_tifs(package_extension, v)
 
     @reload_config()
     def delete_package_shapefile_layers(self, reload_config=True):
         """
         Deletes geoserver resources for all packages in the modflow model
         """
-        # Loop through all the flopy packages in the model
-        if not self.flopy_model:
-            self.load_model()
+        self.delete_stores(self.get_published_stores(self.PACKAGE_STORE_PATTERN))
 
-        geoserver_engine = self.gs_engine
+    def list_published_stores(self):
+        """
+        List the geoserver stores published for the modflow model, without loading the model. The stores are taken
+        from the publish manifest or, when the manifest is empty, from the workspace stores starting with the model id.
+        Returns:
+            list: geoserver store ids (i.e. "<workspace>:<store>").
+        """
+        geoserver_stores = self.publish_manifest.get_stores()
 
-        # Loop through all the pac
-        for package_extension in self.flopy_model.get_package_list():
-            pak = self.flopy_model.get_package(package_extension)
-            attrs = dir(pak)
-            if 'sr' in attrs:
-                attrs.remove('sr')
-            if 'start_datetime' in attrs:
-                attrs.remove('start_datetime')
-            # Get names of each package attribute and delete from geoserver
-            for attr in attrs:
-                a = pak.__getattribute__(attr)
-                if isinstance(a, Util2d) and a.shape == (self.flopy_model.nrow, self.flopy_model.ncol):
-                    name = a.name.lower()
-                    geoserver_file_name = self.get_unique_item_name("{}-{}".format(package_extension, name),
-                                                                    model_file_db=self.model_file_db)
-                    geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_file_name)
-                    geoserver_engine.delete_resource(geoserver_store)
-                elif isinstance(a, Util3d):
-                    for i, u2d in enumerate(a):
-                        name = shape_attr_name(u2d.name)
-                        name += '_{:03d}'.format(i + 1)
-                        geoserver_file_name = self.get_unique_item_name("{}-{}".format(package_extension, name),
-                                                                        model_file_db=self.model_file_db)
-                        geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_file_name)
-                        geoserver_engine.delete_resource(geoserver_store)
-                elif isinstance(a, Transient2d):
-                    kpers = list(a.transient_2ds.keys())
-                    kpers.sort()
-                    for kper in kpers:
-                        u2d = a.transient_2ds[kper]
-                        name = shape_attr_name(u2d.name)
-                        name = "{}_{:03d}".format(name, kper + 1)
-                        geoserver_file_name = self.get_unique_item_name("{}-{}".format(package_extension, name),
-                                                                        model_file_db=self.model_file_db)
-                        geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_file_name)
-                        geoserver_engine.delete_resource(geoserver_store)
-                elif isinstance(a, MfList):
-                    kpers = a.data.keys()
-                    for kper in kpers:
-                        arrays = a.to_array(kper)
-                        for name, array in arrays.items():
-                            for k in range(array.shape[0]):
-                                name = shape_attr_name(name, length=4)
-                                aname = "{}{:03d}{:03d}".format(name, k + 1,
-                                                                kper + 1)
-                                geoserver_file_name = self.get_unique_item_name("{}-{}".format(
-                                                                                    package_extension,
-                                                                                    aname
-                                                                                ),
-                                                                                model_file_db=self.model_file_db)
-                                geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_file_name)
-                                geoserver_engine.delete_resource(geoserver_store)
-                elif isinstance(a, list):
-                    for v in a:
-                        if isinstance(v, Util3d):
-                            for i, u2d in enumerate(v):
-                                name = shape_attr_name(u2d.name)
-                                name += '_{:03d}'.format(i + 1)
-                                geoserver_file_name = self.get_unique_item_name("{}-{}".format(package_extension, name),
-                                                                                model_file_db=self.model_file_db)
-                                geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_file_name)
-                                geoserver_engine.delete_resource(geoserver_store)
+        if not geoserver_stores:
+            with self.tracer.span('geoserver.list_stores'):
+                response = self.gs_engine.list_stores(workspace=self.WORKSPACE)
+            if response['success']:
+                geoserver_stores = ["{}:{}".format(self.WORKSPACE, store) for store in response['result']]
+
+        model_prefix = self.get_unique_item_name('', model_file_db=self.model_file_db)
+        return [store for store in geoserver_stores if store.split(':', 1)[-1].startswith(model_prefix)]
+
+    def get_published_stores(self, pattern):
+        """
+        Get the geoserver stores published for the modflow model that match a pattern.
+        Args:
+            pattern(str): regular expression matched against the store name without the model prefix.
+        Returns:
+            list: geoserver store ids (i.e. "<workspace>:<store>").
+        """
+        model_prefix = self.get_unique_item_name('', model_file_db=self.model_file_db)
+        return [store for store in self.list_published_stores()
+                if re.match(pattern, store.split(':', 1)[-1][len(model_prefix):])]
+
+    @publish_batch
+    def delete_stores(self, geoserver_stores):
+        """
+        Delete geoserver resources and then their per layer styles, they are removed from the publish manifest once
+        GeoServer deleted them (see confirm_deleted_stores). The engine publisher deletes them one at a time with the
+        shared GeoServer clients, the async publisher stages them and deletes them concurrently on flush.
+        Args:
+            geoserver_stores(list): geoserver store ids (i.e. "<workspace>:<store>").
+        """
+        if not geoserver_stores:
+            return
+
+        # Per layer styles of the stores are deleted with them
+        class_styles = [self.publish_manifest.layers[store]['style'] for store in geoserver_stores
+                        if str(self.publish_manifest.layers.get(store, {}).get('style')).endswith(self.RL_CLASSES)]
+
+        for geoserver_store in geoserver_stores:
+            self.publisher.delete_resource(geoserver_store)
+        # The styles are deleted once the layers that reference them are gone
+        for style_name in class_styles:
+            self.publisher.delete_style(workspace=self.WORKSPACE, style_name=style_name, purge=True)
 
     @reload_config()
+    @publish_batch
     def create_raster_style(self, overwrite=True, reload_config=True):
         """
         Create styles for head raster layers.
@@ -1338,7 +1818,7 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         """
         # Create Base Style
         context = {}
-        self.gs_api.create_style(
+        self.publisher.create_style(
             workspace=self.WORKSPACE,
             style_name="{}_{}".format(self.WORKSPACE, self.RL),
             sld_template=os.path.join(self.SLD_PATH, self.RL + '.sld'),
@@ -1346,7 +1826,7 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
             overwrite=overwrite
         )
 
-        self.gs_api.create_style(
+        self.publisher.create_style(
             workspace=self.WORKSPACE,
             style_name="{}_{}".format(self.WORKSPACE, self.RL1),
             sld_template=os.path.join(self.SLD_PATH, self.RL1 + '.sld'),
@@ -1354,7 +1834,7 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
             overwrite=overwrite
         )
 
-        self.gs_api.create_style(
+        self.publisher.create_style(
             workspace=self.WORKSPACE,
             style_name="{}_{}".format(self.WORKSPACE, self.RL_LOWBLUE),
             sld_template=os.path.join(self.SLD_PATH, self.RLLB + '.sld'),
@@ -1363,6 +1843,103 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         )
 
     @reload_config()
+    @publish_batch
+    def create_band_raster_style(self, style_name_ext, band, overwrite=True, reload_config=True):
+        """
+        Create a raster style that renders a single band of a multi-band GEOTIFF.
+        Args:
+            style_name_ext(str): raster style type (i.e. RL, RL1 or RL_LOWBLUE).
+            band(int): 1-based band number rendered by the style.
+            overwrite(bool): Overwrite style if already exists when True. Defaults to False.
+            reload_config(bool): Reload the GeoServer node configuration and catalog before returning if True.
+        """
+        sld_templates = {
+            self.RL: self.RL,
+            self.RL1: self.RL1,
+            self.RL_LOWBLUE: self.RLLB,
+        }
+        style_name = "{}_{}_band_{:03d}".format(self.WORKSPACE, style_name_ext, band)
+        context = {'band': band}
+        self.publisher.create_style(
+            workspace=self.WORKSPACE,
+            style_name=style_name,
+            sld_template=os.path.join(self.SLD_PATH, sld_templates[style_name_ext] + '.sld'),
+            sld_context=context,
+            overwrite=overwrite
+        )
+        self._band_styles.add(style_name)
+
+    @reload_config()
+    @publish_batch
+    def create_class_raster_styles(self, styles, overwrite=True, reload_config=True):
+        """
+        Create per layer raster styles from the legends of their class breaks. The styles are uploaded concurrently
+        and the GeoServer configuration is reloaded once for all of them.
+        Args:
+            styles(dict): {"<style name>": legend} with the legends returned by get_legend.
+            overwrite(bool): Overwrite style if already exists when True. Defaults to False.
+            reload_config(bool): Reload the GeoServer node configuration and catalog before returning if True.
+        """
+        def create_style(style):
+            style_name, legend = style
+            context = {'legend': legend, 'transparent_zero': legend[0]['quantity'] > 0}
+            self.publisher.create_style(
+                workspace=self.WORKSPACE,
+                style_name=style_name,
+                sld_template=os.path.join(self.SLD_PATH, self.RL_CLASSES + '.sld'),
+                sld_context=context,
+                overwrite=overwrite
+            )
+
+        with ThreadPoolExecutor(max_workers=self.STYLE_WORKERS) as executor:
+            list(executor.map(create_style, sorted(styles.items())))
+
+    def set_default_style(self, geoserver_store, style_name):
+        """
+        Set the default style of a layer. Per layer class break styles are not uploaded yet, so their layers are
+        updated by flush_default_styles once the styles are uploaded in bulk.
+        Args:
+            geoserver_store(str): GeoServer store id (i.e. "<workspace>:<store>").
+            style_name(str): default style of the layer.
+        """
+        if style_name in self._class_styles:
+            self._deferred_default_styles.append((geoserver_store, style_name))
+        else:
+            with self.tracer.span('geoserver.update_layer', geoserver_store=geoserver_store):
+                self.gs_engine.update_layer(layer_id=geoserver_store,
+                                            default_style=style_name)
+
+    def flush_default_styles(self):
+        """
+        Upload the per layer styles of the deferred and staged layers in bulk, publish the layers staged by the bulk
+        publisher and set the per layer styles as default style of the deferred layers.
+        """
+        # Tasks of create_all running in other threads may publish layers meanwhile
+        with self._publish_lock:
+            deferred, self._deferred_default_styles = self._deferred_default_styles, []
+            style_names = set(style_name for _, style_name in deferred)
+            style_names.update(self.publisher.staged_styles.intersection(self._class_styles))
+            if style_names:
+                styles = {style_name: self._class_styles[style_name] for style_name in style_names}
+                self.create_class_raster_styles(styles, reload_config=False)
+
+            # The styles of the staged layers must exist before they are published
+            try:
+                self.publisher.flush()
+            except Exception:
+                # The layers the publisher failed to publish are still staged
+                self.metrics.layers.inc(len(self.publish_manifest.pending), result=PublishMetrics.FAILED)
+                raise
+
+            for geoserver_store, style_name in deferred:
+                with self.tracer.span('geoserver.update_layer', geoserver_store=geoserver_store):
+                    self.gs_engine.update_layer(layer_id=geoserver_store,
+                                                default_style=style_name)
+            for style_name in style_names:
+                self._class_styles.pop(style_name, None)
+
+    @reload_config()
+    @publish_batch
     def delete_raster_style(self, purge=True, reload_config=True):
         """
         Delete styles for head raster layers.
@@ -1371,18 +1948,44 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
             reload_config(bool): Reload the GeoServer node configuration and catalog before returning if True.
         """
         # Delete Base Style
-        self.gs_api.delete_style(
+        self.publisher.delete_style(
             workspace=self.WORKSPACE,
             style_name="{}_{}".format(self.WORKSPACE, self.RL),
             purge=purge
         )
 
-        self.gs_api.delete_style(
+        self.publisher.delete_style(
             workspace=self.WORKSPACE,
             style_name="{}_{}".format(self.WORKSPACE, self.RL1),
             purge=purge
         )
 
+        # Band Styles
+        if self.multi_band:
+            for style_name in self.list_band_styles():
+                self.publisher.delete_style(
+                    workspace=self.WORKSPACE,
+                    style_name=style_name,
+                    purge=purge
+                )
+            self._band_styles.clear()
+
+    def list_band_styles(self):
+        """
+        List the band styles of the multi-band GEOTIFFs, without loading the model: the band styles created by the
+        manager (or by the other models of the publish cache) and the band styles of the workspace.
+        Returns:
+            list: names of the band styles.
+        """
+        style_names = set(self._band_styles)
+        with self.tracer.span('geoserver.list_styles'):
+            response = self.gs_engine.list_styles(workspace=self.WORKSPACE)
+        if response['success']:
+            style_names.update(style_name.split(':', 1)[-1] for style_name in response['result'] or [])
+
+        pattern = r'^{}_({}|{}|{})_band_\d{{3}}$'.format(self.WORKSPACE, self.RL, self.RL1, self.RL_LOWBLUE)
+        return sorted(style_name for style_name in style_names if re.match(pattern, style_name))
+
     @reload_config()
     def create_head_raster_layer(self, reload_config=True):
         """
@@ -1395,63 +1998,64 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         hds = self.get_head_data()
 
         if hds is not None:
-            geoserver_engine = self.gs_engine
+            head_info = self.get_head_layer_info(hds, self._head_statistics) if self.class_breaks else {}
             # Loop through the head layers
             for i, hdslayer in enumerate(hds):
                 # Get names for the head raster for the specific layer
                 raster_name = self.get_unique_item_name(self.RL_HEAD, model_file_db=self.model_file_db)
                 geoserver_raster_file_name = '{}_{}'.format(raster_name, str(i + 1).zfill(3))
-                tmp_raster = '{}.tif'.format(geoserver_raster_file_name)
-                tmp_prj = '{}.prj'.format(geoserver_raster_file_name)
-                tmp_zip = '{}.zip'.format(geoserver_raster_file_name)
-                nodatavalue = float(self.flopy_model.bas6.hnoflo)
-                # Create GEOTIFF for the specific layer for the head raster
-                self.flopy_model.sr.export_array(tmp_raster, hdslayer, nodata=nodatavalue)
-
-                # Create .prj file and zip with GEOTIFF
-                proj = flopy.utils.reference.getprj(self.flopy_model.sr.epsg)
-                with open(tmp_prj, 'w') as f:
-                    f.write(proj)
-                zipf = zipfile.ZipFile(tmp_zip, 'w', zipfile.ZIP_DEFLATED)
-                zipf.write(tmp_raster)
-                zipf.write(tmp_prj)
-                zipf.close()
-
-                # Upload GEOTIFF to the geoserver
                 geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_raster_file_name)
-                geoserver_engine.create_coverage_resource(geoserver_store,
-                                                          overwrite=True,
-                                                          coverage_file=tmp_zip,
-                                                          coverage_type='geotiff')
-
-                # Update the resource with correct parameters
                 style_name = "{}_{}".format(self.WORKSPACE, self.RL)
-                self.gs_engine.update_layer(layer_id=geoserver_store,
-                                            default_style=style_name)
-                self.gs_engine.update_resource(resource_id=geoserver_store,
-                                               projection="EPSG:{}".format(self.flopy_model.sr.epsg),
-                                               projection_policy="FORCE_DECLARED",
-                                               enabled=True,)
-
-                # Clean up unnecessary files
-                os.remove(tmp_raster)
-                os.remove(tmp_zip)
-                os.remove(tmp_prj)
+                legend = head_info.get(str(i + 1), {}).get('legend')
+                if legend:
+                    style_name = '{}_{}'.format(geoserver_raster_file_name, self.RL_CLASSES)
+                    self._class_styles[style_name] = legend
+
+                # Skip the layer if it didn't change since the last publish
+                digest = PublishManifest.hash_array(hdslayer)
+                if self.get_publish_action(geoserver_store, digest, style_name) != PublishManifest.UPLOAD:
+                    continue
+
+                with self.scratch.directory('head_raster', nbytes=2 * hdslayer.nbytes) as tmp_dir:
+                    tmp_raster = os.path.join(tmp_dir, '{}.tif'.format(geoserver_raster_file_name))
+                    tmp_prj = os.path.join(tmp_dir, '{}.prj'.format(geoserver_raster_file_name))
+                    tmp_zip = os.path.join(tmp_dir, '{}.zip'.format(geoserver_raster_file_name))
+                    nodatavalue = float(self.flopy_model.bas6.hnoflo)
+                    # Create GEOTIFF for the specific layer for the head raster
+                    precision = self.get_raster_precision(self.RL_HEAD, '')
+                    window_rows = self.get_window_rows(hdslayer)
+                    with self.tracer.span('encode', package=self.RL_HEAD, layer=i + 1, cells=hdslayer.size,
+                                          bytes=hdslayer.nbytes):
+                        if window_rows:
+                            write_geotiff_windows(tmp_raster, hdslayer, self.flopy_model.sr, nodata=nodatavalue,
+                                                  precision=precision, window_rows=window_rows)
+                        else:
+                            write_geotiff(tmp_raster, encode_array(hdslayer, nodata=nodatavalue, precision=precision),
+                                          self.flopy_model.sr)
+                    self.memory_budget.check('create_head_raster_layer')
+
+                    # Create .prj file and zip with GEOTIFF
+                    proj = self.get_prj(self.flopy_model.sr.epsg)
+                    with open(tmp_prj, 'w') as f:
+                        f.write(proj)
+                    self.zip_files(tmp_zip, [tmp_raster, tmp_prj])
+
+                    # Upload GEOTIFF to the geoserver with correct parameters
+                    self.publisher.publish_coverage(geoserver_store, tmp_zip,
+                                                    "EPSG:{}".format(self.flopy_model.sr.epsg), style_name,
+                                                    projection_policy="FORCE_DECLARED")
+                    self.count_upload(tmp_zip)
+                    self.record_published_layer(geoserver_store, digest, style_name)
+
+            # Upload the per layer styles and set them as default style of their layers
+            self.flush_default_styles()
 
     @reload_config()
     def delete_head_raster_layer(self, reload_config=True):
         """
         Deletes the head raster resource.
         """
-        hds = self.get_head_data()
-
-        if hds is not None:
-            geoserver_engine = self.gs_engine
-            for i, hdslayer in enumerate(hds):
-                raster_name = self.get_unique_item_name(self.RL_HEAD, model_file_db=self.model_file_db)
-                geoserver_raster_file_name = '{}_{}'.format(raster_name, str(i + 1).zfill(3))
-                geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_raster_file_name)
-                geoserver_engine.delete_resource(geoserver_store)
+        self.delete_stores(self.get_published_stores(self.HEAD_RASTER_STORE_PATTERN))
 
     # TODO: Fix this with writing prj file and zipping
     @reload_config()
@@ -1465,35 +2069,36 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         hds = self.get_head_data()
 
         if hds is not None:
-            geoserver_engine = self.gs_engine
             for i, hdslayer in enumerate(hds):
                 contour_name = self.get_unique_item_name(self.VL_HEAD_CONTOUR, model_file_db=self.model_file_db)
                 geoserver_contour_file_name = '{}_{}'.format(contour_name, str(i + 1).zfill(3))
-                tmp_contour = '{}.shp'.format(geoserver_contour_file_name)
-
-                self.flopy_model.sr.export_array_contours(tmp_contour, hdslayer)
+                geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_contour_file_name)
+                default_style = self.get_unique_item_name(self.VL_HEAD_CONTOUR)
 
-                proj = flopy.utils.reference.getprj(self.flopy_model.sr.epsg)
+                # Skip the layer if it didn't change since the last publish
+                digest = PublishManifest.hash_array(hdslayer)
+                if self.get_publish_action(geoserver_store, digest, default_style) != PublishManifest.UPLOAD:
+                    continue
 
-                with open('{}.prj'.format(geoserver_contour_file_name), 'w') as f:
-                    f.write(proj)
+                with self.scratch.directory('head_contour') as tmp_dir:
+                    tmp_base = os.path.join(tmp_dir, geoserver_contour_file_name)
+                    tmp_contour = '{}.shp'.format(tmp_base)
 
-                geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_contour_file_name)
+                    with self.tracer.span('contour', layer=i + 1, cells=hdslayer.size):
+                        self.flopy_model.sr.export_array_contours(tmp_contour, hdslayer)
 
-                geoserver_engine.create_shapefile_resource(geoserver_store,
-                                                           overwrite=True,
-                                                           shapefile_base=geoserver_contour_file_name)
+                    proj = self.get_prj(self.flopy_model.sr.epsg)
 
-                default_style = self.get_unique_item_name(self.VL_HEAD_CONTOUR)
+                    with open('{}.prj'.format(tmp_base), 'w') as f:
+                        f.write(proj)
 
-                self.gs_engine.update_layer(layer_id=geoserver_store,
-                                            default_style=default_style)
+                    self.publisher.publish_shapefile(geoserver_store, None, default_style,
+                                                     shapefile_base=tmp_base)
+                    self.count_upload(tmp_base)
+                    self.record_published_layer(geoserver_store, digest, default_style)
 
-                os.remove(tmp_contour)
-                # Deletes the shx and dbf files
-                os.remove("{}.shx".format(geoserver_contour_file_name))
-                os.remove("{}.dbf".format(geoserver_contour_file_name))
-                os.remove("{}.prj".format(geoserver_contour_file_name))
+            # Publish the layers staged by the bulk publisher
+            self.flush_default_styles()
 
     @reload_config()
     def delete_head_contour_layer(self, reload_config=True):
@@ -1503,15 +2108,7 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         Args:
             reload_config(bool): Reload the GeoServer node configuration and catalog before returning if True
         """
-        hds = self.get_head_data()
-
-        if hds is not None:
-            geoserver_engine = self.gs_engine
-            for i, hdslayer in enumerate(hds):
-                contour_name = self.get_unique_item_name(self.VL_HEAD_CONTOUR, model_file_db=self.model_file_db)
-                geoserver_contour_file_name = '{}_{}'.format(contour_name, str(i + 1).zfill(3))
-                geoserver_store = "{}:{}".format(self.WORKSPACE, geoserver_contour_file_name)
-                geoserver_engine.delete_resource(geoserver_store)
+        self.delete_stores(self.get_published_stores(self.HEAD_CONTOUR_STORE_PATTERN))
 
     @reload_config()
     def create_all_vector_layers(self, reload_config=True):
@@ -1541,6 +2138,11 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
             reload_config=False
         )
 
+        # Head Contours
+        self.delete_head_contour_layer(
+            reload_config=False
+        )
+
     @reload_config()
     def create_all_raster_layers(self, reload_config=True):
         """
@@ -1585,7 +2187,8 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         Args:
             reload_config(bool): Reload the GeoServer node configuration and catalog before returning if True.
         """
-        print("Printing All Layers")
+        self.publish_manifest.begin()
+
         # Vector
         self.create_all_vector_layers(
             reload_config=False
@@ -1596,7 +2199,23 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
             reload_config=False
         )
 
+        # Layers that are not part of the model anymore
+        self.delete_stale_layers(
+            reload_config=False
+        )
+
+    @reload_config()
+    def delete_stale_layers(self, reload_config=True):
+        """
+        Delete the layers of the publish manifest that were not published since the publish began.
+
+        Args:
+            reload_config(bool): Reload the GeoServer node configuration and catalog before returning if True.
+        """
+        self.delete_stores(self.publish_manifest.get_stale_stores())
+
     @reload_config()
+    @publish_batch
     def delete_all_layers(self, reload_config=True):
         """
         High level function to delete all GeoServer layers for the modflow project.
@@ -1614,6 +2233,7 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         )
 
     @reload_config()
+    @publish_batch
     def create_all_styles(self, overwrite=True, reload_config=True):
         """
         High level function to create all GeoServer styles for the modflow project.
@@ -1641,7 +2261,14 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
             reload_config=False
         )
 
+        # List Packages
+        self.create_list_package_style(
+            overwrite=overwrite,
+            reload_config=False
+        )
+
     @reload_config()
+    @publish_batch
     def delete_all_styles(self, purge=True, reload_config=True):
         """
         High level function to delete all GeoServer styles for the modflow project.
@@ -1663,23 +2290,181 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
             reload_config=False
         )
 
+        # List Packages
+        self.delete_list_package_style(
+            purge=purge,
+            reload_config=False
+        )
+
     @reload_config()
-    def create_all(self, reload_config=True):
+    @publish_batch
+    def create_all(self, reload_config=True, progress=None):
         """
-        High level function to create all layers and styles for the modflow project.
+        High level function to create all layers and styles for the modflow project. The steps run as a DAG of tasks
+        (see TaskScheduler): only the boundary layer and the package rasters (cropped with the boundary) wait for the
+        boundary, the styles, heads and contours run alongside them. The timings and critical path of the run are
+        kept in task_scheduler.
 
         Args:
             reload_config(bool): Reload the GeoServer node configuration and catalog before returning if True.
+            progress(callable): function (task_name, completed, total) called after each task completes.
+                Defaults to None.
+        """
+        if not self.flopy_model:
+            self.load_model()
+        self.publish_manifest.begin()
+
+        scheduler = TaskScheduler(thread_workers=self.TASK_THREAD_WORKERS, process_workers=self.TASK_PROCESS_WORKERS)
+        styles = scheduler.add_task('styles', self.create_shared_styles)
+        boundary_mask = scheduler.add_task('boundary_mask', self.load_boundary)
+        head_data = scheduler.add_task('head_data', self.get_head_data)
+        # The ibound and grid geometry used by all the publish tasks are placed once in the shared arrays
+        shared_arrays = scheduler.add_task('shared_arrays', self.share_model_arrays)
+
+        # The statistics of the class breaks are CPU bound, they are computed in another process. The heads are given
+        # to the process by handle instead of being pickled: they are placed once in shared memory, or shared from
+        # their memory mapped file and reduced by windows in out-of-core mode.
+        head_statistics = None
+        if self.class_breaks and self.get_head_file():
+            statistics_options = {}
+            if self.out_of_core:
+                nlay, nrow, ncol = self.flopy_model.nlay, self.flopy_model.nrow, self.flopy_model.ncol
+                statistics_options = {'window_rows': self.memory_budget.get_window_rows(
+                    nrow, nlay * ncol * (np.dtype(np.float64).itemsize + self.WINDOW_CELL_BYTES))}
+            shared_heads = scheduler.add_task('shared_heads', self.share_array, 'heads', TaskResult(head_data))
+            head_statistics = TaskResult(scheduler.add_task(
+                'head_statistics', call_with_arrays, get_layer_statistics, TaskResult(shared_heads),
+                nodata=self.flopy_model.bas6.hnoflo, bins=HISTOGRAM_BINS, workers=self.STATISTICS_WORKERS,
+                pool=PROCESS_POOL,
+                **statistics_options
+            ))
+
+        publish_tasks = [
+            scheduler.add_task('boundary_grid', self.create_model_boundary_layer, reload_config=False,
+                               dependencies=[styles, boundary_mask, shared_arrays]),
+            scheduler.add_task('head_rasters', self._run_head_task, self.create_head_raster_layer,
+                               TaskResult(head_data), head_statistics, dependencies=[styles, shared_arrays]),
+            scheduler.add_task('head_contours', self._run_head_task, self.create_head_contour_layer,
+                               TaskResult(head_data), dependencies=[styles, shared_arrays]),
+        ]
+        for package_extension in self.flopy_model.get_package_list():
+            publish_tasks.append(scheduler.add_task('package_{}'.format(package_extension),
+                                                    self.create_package_layers, package_extension,
+                                                    dependencies=[styles, boundary_mask, shared_arrays]))
+
+        # Upload the per layer styles of the packages, then remove the layers that are not part of the model anymore
+        flush = scheduler.add_task('flush', self.flush_default_styles, dependencies=publish_tasks)
+        scheduler.add_task('stale_layers', self.delete_stale_layers, reload_config=False, dependencies=[flush])
+
+        self.task_scheduler = scheduler
+        # The shared arrays of the out-of-core mode are memory mapped files in the scratch directory, on disk
+        self.shared_arrays = SharedArrayRegistry(backend=FILES if self.out_of_core else None,
+                                                 directory=self.scratch.root)
+        try:
+            with self.tracer.span('create_all', model=self.model_file_db.get_id()) as span:
+                started = self.tracer.now()
+                try:
+                    scheduler.run(progress=progress)
+                finally:
+                    self._head_data = None
+                    self._head_statistics = None
+                    self._ibound = None
+                    self.shared_arrays.close()
+                    # The tasks as spans on their own track, the stages they ran are in the tracks of the threads
+                    for name, timing in scheduler.timings.items():
+                        self.tracer.add_span('task.{}'.format(name), started + timing.start, started + timing.end,
+                                             lane='tasks')
+                    path, total = scheduler.get_critical_path()
+                    span.set(critical_path=path, critical_path_seconds=total, **self.publish_stats)
+        finally:
+            if self.trace_file:
+                self.tracer.write(self.trace_file)
+
+        # The styles are published once create_all flushed them, the other models of the batch can use them
+        if self.publish_cache is not None:
+            self.publish_cache.add_styles([self.SHARED_STYLES] + sorted(self._band_styles))
+
+    def create_shared_styles(self):
+        """
+        Create the styles shared by all the models (see create_all_styles), skipped if another model of the batch of
+        the publish cache published them.
+        """
+        if self.publish_cache is not None and self.publish_cache.has_style(self.SHARED_STYLES):
+            return
+        self.create_all_styles(reload_config=False)
+
+    def share_model_arrays(self):
+        """
+        Place the ibound, stacked one layer at a time, and the grid geometry of the model in the shared arrays of
+        create_all. The tasks then use the shared ibound (see get_ibound).
+
+        Returns:
+            SharedArray: handle of the ibound.
+        """
+        ibound = self.flopy_model.bas6.ibound
+        stack = self.shared_arrays.create('ibound', ibound.shape, ibound.dtype)
+        for k, u2d in enumerate(ibound):
+            stack[k] = u2d.array
+        del stack
+        for name, arr in zip(('grid_origin', 'delr', 'delc'), self.get_grid_geometry()):
+            self.shared_arrays.put(name, arr)
+        self._ibound = self.shared_arrays.get('ibound')
+        return self.shared_arrays.handles['ibound']
+
+    def share_array(self, name, arr):
+        """
+        Place an array in the shared arrays of create_all, to give it to the PROCESS_POOL tasks by handle.
+
+        Args:
+            name(str): name of the array (i.e. "heads").
+            arr(np.ndarray): array to share.
+        Returns:
+            SharedArray: handle of the array, None without array.
+        """
+        if arr is None:
+            return None
+        return self.shared_arrays.put(name, arr)
+
+    def _run_head_task(self, method, hds, statistics=None):
+        """
+        Run a head layer method of create_all with the heads (and their statistics) loaded by other tasks.
+        """
+        if hds is None:
+            return
+        with self._publish_lock:
+            self._head_data = hds
+            if statistics is not None:
+                self._head_statistics = statistics
+        method(reload_config=False)
+
+    def get_boundary_layer_group_name(self):
+        """
+        Returns:
+            str: name of the model boundary layer group with workspace (i.e. modflow:model_boundary).
+        """
+        return "{}:{}".format(self.WORKSPACE, self.VL_MODEL_BOUNDARY)
+
+    def get_boundary_layer_groups(self):
+        """
+        Get the names of the layer groups of the boundary layers of all the models: the shards of the model boundary
+        layer group when it is split with layer_group_shards (i.e. modflow:model_boundary_07).
+        Returns:
+            list: names of the layer groups with workspace.
         """
-        self.create_all_layers(reload_config=False)
+        return self.layer_groups.get_group_names(self.get_boundary_layer_group_name())
 
     @reload_config()
-    def get_all_boundary_layers(self, app, reload_config=True):
+    def get_all_boundary_layers(self, app, reload_config=True, bbox=None, page_size=None, page=0):
         """
-        Get all the layers in the model_boundary layer group on geoserver.
+        Get all the layers in the model_boundary layer group on geoserver, or in its shards (see
+        get_boundary_layer_groups).
 
         Args:
             reload_config(bool): Reload the GeoServer node configuration and catalog before returning if True.
+            bbox(list): minx, miny, maxx, maxy of the viewport, only the models with an extent that intersects it are
+                returned if given. Defaults to None.
+            page_size(int): maximum number of layers returned, all the layers if None. Defaults to None.
+            page(int): index of the page of layers returned when page_size is given. Defaults to 0.
         Returns:
             layers (list): List of layer in the model boundary layer group
             bounds (list): minx, miny, maxx, maxy
@@ -1688,11 +2473,21 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
         Session = app.get_persistent_store_database('primary_db', as_sessionmaker=True)
         session = Session()
 
-        # Get resource_id and name by querying the resource with database_id
-        resources = session.query(ModflowModelResource).all()
-        for resource in resources:
-            attributes = json.loads(resource._attributes)
-            db_id = attributes['database_id'].replace("_", "-")
+        # Get the database_id of the models with the indexed columns
+        try:
+            if bbox is not None:
+                query = ModflowModelResource.query_by_extent(session, bbox, ModflowModelResource.database_id)
+            else:
+                query = session.query(ModflowModelResource.database_id).order_by(ModflowModelResource.id)
+            query = query.filter(ModflowModelResource.database_id.isnot(None))
+            if page_size is not None:
+                query = query.limit(page_size).offset(page * page_size)
+            database_ids = [database_id for database_id, in query]
+        finally:
+            session.close()
+
+        for database_id in database_ids:
+            db_id = database_id.replace("_", "-")
             boundary_layers.append("{}:{}-{}_{}".format(self.WORKSPACE, self.WORKSPACE, db_id, self.VL_MODEL_BOUNDARY))
 
         minx = app.get_custom_setting('minx_extent')
@@ -1703,14 +2498,8 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
 
         return boundary_layers, bounds
 
-    @staticmethod
-    def compress_array(array, ibound_layer):
-        mask_array = np.ma.masked_where(ibound_layer == 0, array)
-        compress_mask_array = np.ma.compressed(mask_array)
-        return compress_mask_array
-
     def crop_reproject_raster(self, new_projection, in_raster_file, out_raster_file):
-        tmp_raster2 = 'raster_temp2.tif'
+        tmp_raster2 = os.path.join(os.path.dirname(os.path.abspath(out_raster_file)), 'raster_temp2.tif')
         if not self._boundary:
             self.load_boundary()
         data = rasterio.open(in_raster_file)
@@ -1748,26 +2537,199 @@ class ModflowSpatialManager(ModelFileDBSpatialManager):
                     )
                 dst.write(out_img)
 
-    def crop_raster(self, in_raster_file, out_raster_file):
+    @traced('crop', 'out_raster_file')
+    def crop_raster(self, in_raster_file, out_raster_file, window_rows=None):
+        """
+        Crop a GEOTIFF with the model boundary, the cells outside of the boundary have no data.
+        Args:
+            in_raster_file(str): path of the GEOTIFF to crop.
+            out_raster_file(str): path of the cropped GEOTIFF.
+            window_rows(int): read, mask and write the GEOTIFF by windows of rows. Defaults to None (whole GEOTIFF).
+        """
         if not self._boundary:
             self.load_boundary()
-        data = rasterio.open(in_raster_file)
-        out_img, out_transform = mask(dataset=data, shapes=[mapping(self._boundary)], crop=True)
-        out_meta = data.meta.copy()
-        out_meta.update({"height": out_img.shape[1],
-                         "width": out_img.shape[2],
-                         "transform": out_transform,
-                         "crs": data.meta['crs']})
+        if window_rows:
+            return self._crop_raster_windows(in_raster_file, out_raster_file, window_rows)
+
+        with rasterio.open(in_raster_file) as data:
+            out_img, out_transform = mask(dataset=data, shapes=[mapping(self._boundary)], crop=True)
+            # Keep the dtype, nodata, compression and scaling of the encoded raster
+            out_meta = data.profile.copy()
+            out_meta.update({"height": out_img.shape[1],
+                             "width": out_img.shape[2],
+                             "transform": out_transform,
+                             "crs": data.meta['crs']})
+            scales, offsets = data.scales, data.offsets
 
         with rasterio.open(out_raster_file, 'w', **out_meta) as src:
             src.write(out_img)
+            if any(scale != 1.0 for scale in scales) or any(offset != 0.0 for offset in offsets):
+                src.scales = scales
+                src.offsets = offsets
+
+    def _crop_raster_windows(self, in_raster_file, out_raster_file, window_rows):
+        """
+        Crop a GEOTIFF with the model boundary by windows of rows, the same cells as rasterio.mask.mask.
+        """
+        shapes = [mapping(self._boundary)]
+        with rasterio.open(in_raster_file) as data:
+            crop = geometry_window(data, shapes)
+            height, width = int(crop.height), int(crop.width)
+            nodata = data.nodata if data.nodata is not None else 0
+            out_meta = data.profile.copy()
+            out_meta.update({"height": height,
+                             "width": width,
+                             "transform": data.window_transform(crop),
+                             "crs": data.meta['crs']})
+
+            with rasterio.open(out_raster_file, 'w', **out_meta) as src:
+                for row in range(0, height, window_rows):
+                    rows = min(window_rows, height - row)
+                    window = Window(crop.col_off, crop.row_off + row, width, rows)
+                    block = data.read(window=window)
+                    outside = geometry_mask(shapes, out_shape=(rows, width), transform=data.window_transform(window))
+                    block[:, outside] = nodata
+                    src.write(block, window=Window(0, row, width, rows))
+                if any(scale != 1.0 for scale in data.scales) or any(offset != 0.0 for offset in data.offsets):
+                    src.scales = data.scales
+                    src.offsets = data.offsets
+
+    def get_raster_precision(self, package, attribute):
+        """
+        Get the declared precision of the values of a raster layer.
+        Args:
+            package(str): modflow package name (i.e DIS, BAS6, etc) or RL_HEAD for head layers.
+            attribute(str): attribute name within the package (i.e thickn_001 for the DIS package)
+        Returns:
+            float: precision from RASTER_PRECISION or None to keep the values exactly.
+        """
+        layer_name = "{}-{}".format(package, attribute)
+        for key, precision in self.RASTER_PRECISION.items():
+            if layer_name.startswith(key):
+                return precision
+        return None
 
-    @staticmethod
-    def get_min_max_non_zeros(arr):
-        if arr.min() == 0 and arr.max() == 0:
-            minval = 0
-            maxval = 0
-        else:
-            minval = np.min(arr[np.nonzero(arr)])
-            maxval = np.max(arr[np.nonzero(arr)])
-        return minval, maxval
+    def get_layer_info(self, package, arr, ibound):
+        """
+        Get the minimum and maximum of the non zero values of the active cells of each layer of an array, and the
+        legend of the layers with more than one value when using class breaks.
+        Args:
+            package(str): modflow package name (i.e DIS, BAS6, etc)
+            arr(np.ndarray): (nlay, nrow, ncol) or (nrow, ncol) array.
+            ibound(np.ndarray): ibound of the layers of the array, a (nrow, ncol) ibound applies to all the layers.
+        Returns:
+            list: {"minimum": ..., "maximum": ...[, "legend": ...]} for each layer, minimum and maximum are 0 for
+                layers without active non zero values.
+        """
+        if arr.ndim == 3 and ibound.ndim == 3:
+            ibound = ibound[:arr.shape[0]]
+        with self.tracer.span('statistics', package=package, cells=arr.size):
+            statistics = get_layer_statistics(arr, ibound, bins=self.get_histogram_bins(),
+                                              workers=self.STATISTICS_WORKERS,
+                                              window_rows=self.get_window_rows(arr))
+        self.memory_budget.check('statistics')
+        layer_info = []
+        for k in range(len(statistics['count'])):
+            minval, maxval = get_nonzero_range(statistics, k)
+            info = {'minimum': minval, 'maximum': maxval}
+            if self.class_breaks and minval != maxval:
+                info['legend'] = self.get_legend(package, statistics['histogram'][k], statistics['bin_edges'][k])
+            layer_info.append(info)
+        return layer_info
+
+    def get_histogram_bins(self):
+        """
+        Get the number of bins of the histograms of the layer statistics, only computed for the class breaks.
+        Returns:
+            int: HISTOGRAM_BINS when using class breaks, None otherwise.
+        """
+        return HISTOGRAM_BINS if self.class_breaks else None
+
+    def get_ibound(self):
+        """
+        Get the ibound array of the model, the shared stack of the ibound while create_all runs.
+        Returns:
+            np.ndarray: (nlay, nrow, ncol) ibound array.
+        """
+        if self._ibound is not None:
+            return self._ibound
+        return self.flopy_model.bas6.ibound.array
+
+    def get_grid_geometry(self):
+        """
+        Get the geometry of the grid of the model.
+        Returns:
+            tuple: (xul, yul, rotation), delr and delc float64 arrays.
+        """
+        sr = self.flopy_model.sr
+        return (np.array([sr.xul, sr.yul, sr.rotation], dtype=np.float64),
+                np.asarray(sr.delr, dtype=np.float64),
+                np.asarray(sr.delc, dtype=np.float64))
+
+    def get_util3d_layer_info(self, package, u3d, ibound):
+        """
+        Get the layer info of the layers of a Util3d package attribute, see get_layer_info. The layers are read one at
+        a time in out-of-core mode instead of being stacked in memory.
+        Args:
+            package(str): modflow package name (i.e DIS, BAS6, etc)
+            u3d(Util3d): flopy Util3d of the package attribute (i.e botm for the DIS package)
+            ibound(np.ndarray): (nlay, nrow, ncol) ibound array of the model.
+        Returns:
+            list: {"minimum": ..., "maximum": ...[, "legend": ...]} for each layer.
+        """
+        if not self.out_of_core:
+            return self.get_layer_info(package, u3d.array, ibound)
+        return [self.get_layer_info(package, u2d.array, ibound[k])[0] for k, u2d in enumerate(u3d)]
+
+    def get_window_rows(self, arr):
+        """
+        Get the number of rows of the windows an array is processed by in out-of-core mode, from the memory left in
+        the memory budget.
+        Args:
+            arr(np.ndarray): (nlay, nrow, ncol) or (nrow, ncol) array.
+        Returns:
+            int: number of rows of the windows, None when not in out-of-core mode (whole arrays).
+        """
+        if not self.out_of_core:
+            return None
+        cells_per_row = arr.size // arr.shape[-2] if arr.shape[-2] else 0
+        return self.memory_budget.get_window_rows(arr.shape[-2],
+                                                  cells_per_row * (arr.dtype.itemsize + self.WINDOW_CELL_BYTES))
+
+    def get_list_layer_info(self, package, cells, values, ibound):
+        """
+        Get the minimum, maximum and legend of each layer from the aggregated records of a MfList field, see
+        get_layer_info.
+        Args:
+            package(str): modflow package name (i.e WEL, RIV, etc)
+            cells(np.ndarray): flat indices of the cells in the (nlay, nrow, ncol) grid.
+            values(np.ndarray): values of the cells.
+            ibound(np.ndarray): (nlay, nrow, ncol) ibound array of the model.
+        Returns:
+            list: {"minimum": ..., "maximum": ...[, "legend": ...]} for each layer.
+        """
+        with self.tracer.span('statistics', package=package, cells=len(values)):
+            layer_info = [{'minimum': minval, 'maximum': maxval}
+                          for minval, maxval in get_list_layer_statistics(cells, values, ibound)]
+            if self.class_breaks:
+                histograms, bin_edges = get_list_layer_histograms(cells, values, ibound)
+                for k, info in enumerate(layer_info):
+                    if info['minimum'] != info['maximum']:
+                        info['legend'] = self.get_legend(package, histograms[k], bin_edges[k])
+        return layer_info
+
+    def get_legend(self, package, histogram, bin_edges):
+        """
+        Get the legend of a raster layer from the class breaks of its histogram.
+        Args:
+            package(str): modflow package name (i.e DIS, BAS6, etc) or RL_HEAD for head layers.
+            histogram(np.ndarray): histogram of the non zero values of the layer.
+            bin_edges(np.ndarray): edges of the bins of the histogram.
+        Returns:
+            list: {"quantity": ..., "color": ..., "label": ...} for each class break, from low to high values.
+        """
+        breaks = get_class_breaks(histogram, bin_edges, self.CLASS_BREAKS, method=self.class_breaks)
+        colors = self.CLASS_COLORS[::-1] if package in self.LOW_BLUE_STYLE_PACKAGE else self.CLASS_COLORS
+        color_index = np.linspace(0, len(colors) - 1, len(breaks)).round().astype(int)
+        return [{'quantity': quantity, 'color': colors[index], 'label': '{:.4g}'.format(quantity)}
+                for quantity, index in zip(breaks, color_index)]
@@ -0,0 +1,195 @@
+"""
+********************************************************************************
+* Name: out_of_core
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import sys
+import numpy as np
+
+# Bytes of the temporary arrays of one window of the windowed processing when the budget leaves room for them
+WINDOW_BYTES = 64 * 1024 * 1024
+
+# Share of the memory left in the budget the temporary arrays of a window can use
+WINDOW_BUDGET_FRACTION = 0.25
+
+# Headers of the records of the binary head files, single and double precision (without Fortran record markers)
+HEAD_HEADERS = (
+    np.dtype([('kstp', '<i4'), ('kper', '<i4'), ('pertim', '<f4'), ('totim', '<f4'), ('text', 'S16'),
+              ('ncol', '<i4'), ('nrow', '<i4'), ('ilay', '<i4')]),
+    np.dtype([('kstp', '<i4'), ('kper', '<i4'), ('pertim', '<f8'), ('totim', '<f8'), ('text', 'S16'),
+              ('ncol', '<i4'), ('nrow', '<i4'), ('ilay', '<i4')]),
+)
+
+
+class MemoryBudgetError(MemoryError):
+    """
+    Raised when the resident memory of the process goes over its MemoryBudget.
+    """
+
+
+def get_rss():
+    """
+    Get the resident memory of the process that can't be reclaimed by the system: anonymous and shared memory pages.
+    The pages of memory mapped files are reclaimed under memory pressure and are not counted.
+
+    Returns:
+        int: bytes of resident memory, the whole resident set size when the details are not available.
+    """
+    try:
+        rss = 0
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(('RssAnon:', 'RssShmem:')):
+                    rss += int(line.split()[1]) * 1024
+        if rss:
+            return rss
+    except (IOError, OSError, ValueError):
+        pass
+
+    try:
+        import resource
+        # Peak resident set size, in kilobytes on Linux and bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+    except (ImportError, AttributeError):
+        return 0
+
+
+class MemoryBudget(object):
+    """
+    Peak resident memory allowed to a publish. The windows of the out-of-core processing are sized from the memory
+    left in the budget, and check raises MemoryBudgetError as soon as the process goes over it.
+    """
+
+    def __init__(self, max_rss=None, window_bytes=WINDOW_BYTES):
+        """
+        Constructor
+
+        Args:
+            max_rss(int): maximum bytes of resident memory (see get_rss). Defaults to None (no limit).
+            window_bytes(int): bytes of the temporary arrays of one window when the budget leaves room for them.
+                Defaults to WINDOW_BYTES.
+        """
+        self.max_rss = max_rss
+        self.window_bytes = window_bytes
+        self.peak = 0
+
+    def get_available(self):
+        """
+        Returns:
+            int: bytes of memory left in the budget, None without limit.
+        """
+        rss = get_rss()
+        self.peak = max(self.peak, rss)
+        if self.max_rss is None:
+            return None
+        return max(self.max_rss - rss, 0)
+
+    def check(self, label=None):
+        """
+        Check that the process is within the budget.
+
+        Args:
+            label(str): name of the step that is checked, for the error message. Defaults to None.
+        Raises:
+            MemoryBudgetError: the resident memory is over the budget.
+        """
+        available = self.get_available()
+        if available is not None and available == 0:
+            raise MemoryBudgetError('Resident memory of {} bytes is over the budget of {} bytes{}.'.format(
+                self.peak, self.max_rss, ' in {}'.format(label) if label else ''))
+
+    def get_window_rows(self, nrow, row_bytes):
+        """
+        Get the number of rows of the windows of an array, so that the temporary arrays of a window fit in the memory
+        left in the budget.
+
+        Args:
+            nrow(int): number of rows of the array.
+            row_bytes(int): bytes of the temporary arrays of one row (i.e. ncol * bytes per cell for all the layers).
+        Returns:
+            int: number of rows of the windows, between 1 and nrow.
+        """
+        window_bytes = self.window_bytes
+        available = self.get_available()
+        if available is not None:
+            window_bytes = min(window_bytes, int(available * WINDOW_BUDGET_FRACTION))
+        return int(max(1, min(nrow, window_bytes // max(row_bytes, 1))))
+
+
+def read_head_file(filename):
+    """
+    Map the heads of the last time step of a binary head file, the same heads as HeadFile.get_data without reading
+    them in memory.
+
+    Args:
+        filename(str): path of the .hds (or .hed) file.
+    Returns:
+        np.ndarray: (nlay, nrow, ncol) read-only view of the memory mapped records of the heads, or an array filled
+            with nan for the layers missing from the last time step when they are not all saved.
+    Raises:
+        ValueError: the file is not a single or double precision binary head file.
+    """
+    size = os.path.getsize(filename)
+    for header, realtype in zip(HEAD_HEADERS, (np.float32, np.float64)):
+        if size < header.itemsize:
+            continue
+        first = np.fromfile(filename, dtype=header, count=1)[0]
+        nrow, ncol = int(first['nrow']), int(first['ncol'])
+        record_size = header.itemsize + nrow * ncol * np.dtype(realtype).itemsize
+        if not _is_text(first['text']) or nrow <= 0 or ncol <= 0 or record_size > size or size % record_size != 0:
+            continue
+        record = np.dtype([('header', header), ('data', realtype, (nrow, ncol))])
+
+        records = np.memmap(filename, dtype=record, mode='r')
+        totims = records['header']['totim']
+        indices = np.flatnonzero(totims == totims[-1])
+        ilays = records['header']['ilay'][indices]
+        nlay = int(records['header']['ilay'].max())
+
+        # All the layers saved in order: the heads are a strided view of the records
+        if len(indices) == nlay and np.array_equal(indices, np.arange(indices[0], indices[0] + nlay)) and \
+                np.array_equal(ilays, np.arange(1, nlay + 1)):
+            return records['data'][indices[0]:indices[0] + nlay]
+
+        data = np.full((nlay, nrow, ncol), np.nan, dtype=realtype)
+        for index, ilay in zip(indices, ilays):
+            data[ilay - 1] = records['data'][index]
+        return data
+
+    raise ValueError('{} is not a binary head file.'.format(filename))
+
+
+def _is_text(text):
+    """
+    Check that the text of a record header is printable ascii (i.e. "            HEAD").
+    """
+    try:
+        text = text.decode('ascii')
+    except UnicodeDecodeError:
+        return False
+    return text.strip() != '' and all(32 <= ord(c) < 127 for c in text)
+
+
+def stack_layers(filename, layers, shape, dtype):
+    """
+    Write 2D layers one at a time into a memory mapped file, to get a 3D array without holding all its layers in
+    memory (i.e. the layers of a Util3d).
+
+    Args:
+        filename(str): path of the backing file, created or overwritten.
+        layers(iterable): (nrow, ncol) arrays.
+        shape(tuple): (nlay, nrow, ncol) of the stack.
+        dtype(np.dtype): dtype of the stack.
+    Returns:
+        np.memmap: (nlay, nrow, ncol) stack backed by the file.
+    """
+    stack = np.memmap(filename, dtype=dtype, mode='w+', shape=tuple(shape))
+    for k, layer in enumerate(layers):
+        stack[k] = layer
+    stack.flush()
+    return stack
@@ -0,0 +1,94 @@
+"""
+********************************************************************************
+* Name: publish_cache
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import threading
+
+import flopy
+
+
+class PublishCache(object):
+    """
+    Styles and projections shared by the spatial managers publishing a batch of models: the styles shared by all the
+    models are uploaded once per batch and the .prj of each EPSG code is fetched once. The mappings can be proxies of
+    a multiprocessing.Manager to share them across the processes of a batch (see from_sync_manager).
+    """
+
+    def __init__(self, styles=None, projections=None):
+        """
+        Constructor
+
+        Args:
+            styles(dict): {style_name: True} of the styles published by the batch. Defaults to None (new dict).
+            projections(dict): {epsg: prj} of the fetched projections. Defaults to None (new dict).
+        """
+        self.styles = styles if styles is not None else {}
+        self.projections = projections if projections is not None else {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_sync_manager(cls, sync_manager):
+        """
+        Create a cache shared by processes.
+
+        Args:
+            sync_manager(multiprocessing.managers.SyncManager): started manager holding the shared mappings.
+        Returns:
+            PublishCache: the cache, picklable to be passed to the processes.
+        """
+        return cls(styles=sync_manager.dict(), projections=sync_manager.dict())
+
+    def __getstate__(self):
+        return {'styles': self.styles, 'projections': self.projections}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def has_style(self, style_name):
+        """
+        Args:
+            style_name(str): name of the style.
+        Returns:
+            bool: True if the style was published by the batch.
+        """
+        return style_name in self.styles
+
+    def get_style_names(self):
+        """
+        Returns:
+            set: names of the styles published by the batch.
+        """
+        return set(self.styles.keys())
+
+    def add_styles(self, style_names):
+        """
+        Record published styles.
+
+        Args:
+            style_names(iterable): names of the styles.
+        """
+        self.styles.update({style_name: True for style_name in style_names})
+
+    def get_projection(self, epsg):
+        """
+        Get the .prj content of an EPSG code, fetched by the first manager that needs it.
+
+        Args:
+            epsg(int): EPSG code.
+        Returns:
+            str: the projection in the ESRI .prj format.
+        """
+        key = str(epsg)
+        prj = self.projections.get(key)
+        if prj is None:
+            # Concurrent processes may fetch it more than once, the result is the same
+            with self._lock:
+                prj = self.projections.get(key)
+                if prj is None:
+                    prj = flopy.utils.reference.getprj(epsg)
+                    self.projections[key] = prj
+        return prj
@@ -0,0 +1,188 @@
+"""
+********************************************************************************
+* Name: publish_manifest
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import hashlib
+import numpy as np
+import xxhash
+
+
+class PublishManifest(object):
+    """
+    Record of the GeoServer stores published for a Modflow model, used to republish only what changed.
+    """
+    # Publish Actions
+    SKIP = 'skip'
+    RESTYLE = 'restyle'
+    UPLOAD = 'upload'
+
+    def __init__(self, layers=None):
+        """
+        Constructor
+
+        Args:
+            layers(dict): {"<workspace>:<store>": {"hash": ..., "style": ..., "spatial_reference": ...}}
+        """
+        self.layers = dict(layers or {})
+        self.pending = {}
+        self._seen = set()
+
+    @classmethod
+    def from_dict(cls, manifest):
+        """
+        Create a manifest from the dictionary stored with the model resource.
+
+        Args:
+            manifest(dict|PublishManifest): stored manifest, PublishManifest instance or None.
+        Returns:
+            PublishManifest: the manifest.
+        """
+        if isinstance(manifest, cls):
+            return manifest
+        if not manifest:
+            return cls()
+        return cls(layers=manifest.get('layers'))
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: JSON serializable representation of the manifest to store with the model resource.
+        """
+        return {'layers': self.layers}
+
+    @staticmethod
+    def hash_array(arr):
+        """
+        Hash the content, dtype and shape of a numpy array (including record arrays).
+
+        Args:
+            arr(np.ndarray): array to hash.
+        Returns:
+            str: hex digest of the array.
+        """
+        arr = np.asarray(arr)
+        if arr.ndim < 2:
+            arr = np.ascontiguousarray(arr)
+        # xxhash is a dependency of the package: all the nodes hash the arrays with the same algorithm
+        hasher = xxhash.xxh64()
+        hasher.update('{}{}'.format(arr.dtype.str, arr.shape).encode('utf-8'))
+        # Strided arrays (i.e. memory mapped head records) are hashed one slice at a time instead of being copied
+        slices = [arr] if arr.flags.c_contiguous else arr
+        for part in slices:
+            hasher.update(memoryview(np.ascontiguousarray(part).reshape(-1).view(np.uint8)))
+        return hasher.hexdigest()
+
+    @classmethod
+    def hash_arrays(cls, *arrays):
+        """
+        Hash several numpy arrays together.
+
+        Returns:
+            str: hex digest of the arrays.
+        """
+        return hashlib.blake2b(''.join(cls.hash_array(arr) for arr in arrays).encode('utf-8'),
+                               digest_size=16).hexdigest()
+
+    def begin(self):
+        """
+        Start a new publish, every store not recorded before end of the publish is considered stale.
+        """
+        self._seen = set()
+
+    def get_action(self, store, digest, style, spatial_reference):
+        """
+        Get the action needed to bring a published store up to date.
+
+        Args:
+            store(str): GeoServer store id (i.e. "<workspace>:<store>").
+            digest(str): hash of the published data.
+            style(str): default style of the layer.
+            spatial_reference(str): key of the spatial reference of the published data.
+        Returns:
+            str: one of SKIP, RESTYLE or UPLOAD.
+        """
+        layer = self.layers.get(store)
+        if layer is None or layer['hash'] != digest or layer['spatial_reference'] != spatial_reference:
+            return self.UPLOAD
+        if layer['style'] != style:
+            return self.RESTYLE
+        return self.SKIP
+
+    def record(self, store, digest, style, spatial_reference):
+        """
+        Record a published store.
+
+        Args:
+            store(str): GeoServer store id (i.e. "<workspace>:<store>").
+            digest(str): hash of the published data.
+            style(str): default style of the layer.
+            spatial_reference(str): key of the spatial reference of the published data.
+        """
+        self.layers[store] = {'hash': digest, 'style': style, 'spatial_reference': spatial_reference}
+        self._seen.add(store)
+
+    def stage(self, store, digest, style, spatial_reference):
+        """
+        Record a store staged for publishing, moved to the published stores by confirm once GeoServer published it.
+
+        Args:
+            store(str): GeoServer store id (i.e. "<workspace>:<store>").
+            digest(str): hash of the published data.
+            style(str): default style of the layer.
+            spatial_reference(str): key of the spatial reference of the published data.
+        """
+        self.pending[store] = {'hash': digest, 'style': style, 'spatial_reference': spatial_reference}
+        self._seen.add(store)
+
+    def confirm(self, stores):
+        """
+        Record the staged stores that GeoServer published.
+
+        Args:
+            stores(list): GeoServer store ids of the published stores.
+        Returns:
+            dict: {store: layer} entries of the confirmed stores.
+        """
+        confirmed = {}
+        for store in stores:
+            layer = self.pending.pop(store, None)
+            if layer is not None:
+                self.layers[store] = confirmed[store] = layer
+        return confirmed
+
+    def remove(self, store):
+        """
+        Remove a store from the manifest.
+
+        Args:
+            store(str): GeoServer store id (i.e. "<workspace>:<store>").
+        """
+        self.layers.pop(store, None)
+        self.pending.pop(store, None)
+        self._seen.discard(store)
+
+    def clear(self):
+        """
+        Remove all the stores from the manifest.
+        """
+        self.layers.clear()
+        self.pending.clear()
+        self._seen.clear()
+
+    def get_stores(self):
+        """
+        Returns:
+            list: ids of all the stores in the manifest.
+        """
+        return sorted(self.layers)
+
+    def get_stale_stores(self):
+        """
+        Returns:
+            list: ids of the stores in the manifest that were not recorded since begin() was called.
+        """
+        return sorted(set(self.layers) - self._seen)
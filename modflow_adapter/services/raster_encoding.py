@@ -0,0 +1,258 @@
+"""
+********************************************************************************
+* Name: raster_encoding
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+from collections import namedtuple
+import numpy as np
+
+# Nodata value of continuous rasters, same as flopy SpatialReference.export_array
+FLOAT_NODATA = -9999
+
+# Integer dtypes tried from the narrowest, the minimum of each dtype is reserved for nodata
+INTEGER_DTYPES = (np.int8, np.int16, np.int32)
+
+# Scaled int16 values, the minimum of int16 is reserved for nodata
+SCALED_MIN = -32767
+SCALED_MAX = 32767
+
+# Compression of the written GEOTIFFs
+GEOTIFF_COMPRESSION = 'deflate'
+
+# An array encoded for a GEOTIFF: the values are array * scale + offset, cells equal to nodata have no data
+EncodedArray = namedtuple('EncodedArray', ['array', 'nodata', 'scale', 'offset'])
+
+
+# Encoding of the values of an array, see get_encoding
+RasterEncoding = namedtuple('RasterEncoding', ['dtype', 'nodata', 'scale', 'offset'])
+
+
+def encode_array(arr, nodata=None, precision=None):
+    """
+    Encode an array with the narrowest dtype that keeps its values: int8, int16 or int32 for integer values, scaled
+    int16 when a precision is declared and the range of the values allows it, float32 otherwise (float64 only for
+    values out of the float32 range). Non finite values and nodata values are written as the nodata of the encoding.
+
+    Args:
+        arr(np.ndarray): 2D array or 3D array (one band per layer).
+        nodata(float): value of the cells without data in the array (i.e. hnoflo of the heads). Defaults to None.
+        precision(float): declared precision of the values, allows a lossy scaled int16 encoding. Defaults to None.
+    Returns:
+        EncodedArray: encoded array, nodata, scale and offset.
+    """
+    arr = np.asarray(arr)
+    valid = _get_valid(arr, nodata)
+    values = arr[valid]
+    encoding = _get_encoding(arr.dtype, _summarize(values, nodata), nodata, precision)
+    return EncodedArray(_encode(arr.shape, valid, values, encoding), encoding.nodata, encoding.scale,
+                        encoding.offset)
+
+
+def get_encoding(arr, nodata=None, precision=None, window_rows=None):
+    """
+    Get the encoding encode_array chooses for an array, reading the array by windows of rows so that the temporary
+    arrays are bounded by the size of a window (i.e. for memory mapped arrays).
+
+    Args:
+        arr(np.ndarray): 2D array or 3D array (one band per layer).
+        nodata(float): value of the cells without data in the array. Defaults to None.
+        precision(float): declared precision of the values. Defaults to None.
+        window_rows(int): number of rows of the windows. Defaults to None (the whole array).
+    Returns:
+        RasterEncoding: dtype, nodata, scale and offset of the encoded values.
+    """
+    summary = None
+    for window in _iter_windows(arr, window_rows):
+        window = np.asarray(window)
+        window_summary = _summarize(window[_get_valid(window, nodata)], nodata)
+        summary = window_summary if summary is None else _merge_summaries(summary, window_summary)
+    return _get_encoding(arr.dtype, summary, nodata, precision)
+
+
+def encode_window(arr, encoding, nodata=None):
+    """
+    Encode a window of an array with the encoding of the whole array.
+
+    Args:
+        arr(np.ndarray): window of the array (i.e. rows of a 2D array).
+        encoding(RasterEncoding): encoding returned by get_encoding.
+        nodata(float): value of the cells without data in the array. Defaults to None.
+    Returns:
+        np.ndarray: encoded values of the window.
+    """
+    arr = np.asarray(arr)
+    valid = _get_valid(arr, nodata)
+    return _encode(arr.shape, valid, arr[valid], encoding)
+
+
+def _get_valid(arr, nodata):
+    """
+    Mask of the finite cells that are not nodata.
+    """
+    valid = np.ones(arr.shape, dtype=bool)
+    if np.issubdtype(arr.dtype, np.floating):
+        valid &= np.isfinite(arr)
+    if nodata is not None:
+        valid &= arr != nodata
+    return valid
+
+
+def _summarize(values, nodata):
+    """
+    Summary of the valid values of an array (or of a window) the encoding is chosen from: (count, minimum, maximum,
+    all values are integers, the float nodata is one of the values).
+    """
+    if len(values) == 0:
+        return 0, None, None, True, False
+    return (len(values), values.min(), values.max(), bool(np.array_equal(values, np.round(values))),
+            bool(np.any(values == (FLOAT_NODATA if nodata is None else nodata))))
+
+
+def _merge_summaries(first, second):
+    """
+    Summary of the values of two windows.
+    """
+    if first[0] == 0:
+        return second
+    if second[0] == 0:
+        return first
+    return (first[0] + second[0], min(first[1], second[1]), max(first[2], second[2]), first[3] and second[3],
+            first[4] or second[4])
+
+
+def _get_encoding(dtype, summary, nodata, precision):
+    """
+    Choose the encoding of the values of an array from their summary, see encode_array.
+    """
+    count, vmin, vmax, integers, has_float_nodata = summary
+    if count == 0:
+        return RasterEncoding(np.int8, int(np.iinfo(np.int8).min), 1.0, 0.0)
+
+    # Integer values (i.e. ibound, iseg, ievt), whatever the dtype of the array
+    if np.issubdtype(dtype, np.integer) or integers:
+        for integer_dtype in INTEGER_DTYPES:
+            info = np.iinfo(integer_dtype)
+            if info.min < vmin and vmax <= info.max:
+                return RasterEncoding(integer_dtype, int(info.min), 1.0, 0.0)
+
+    # Scaled int16 with the declared precision
+    if precision and (float(vmax) - float(vmin)) / precision <= SCALED_MAX - SCALED_MIN:
+        return RasterEncoding(np.int16, SCALED_MIN - 1, float(precision), float(vmin) - SCALED_MIN * precision)
+
+    # Continuous values
+    float_dtype = np.float32
+    if max(abs(float(vmin)), abs(float(vmax))) > np.finfo(np.float32).max:
+        float_dtype = np.float64
+    encoded_nodata = np.nan if has_float_nodata else float(FLOAT_NODATA if nodata is None else nodata)
+    return RasterEncoding(float_dtype, encoded_nodata, 1.0, 0.0)
+
+
+def _encode(shape, valid, values, encoding):
+    """
+    Encoded array of the valid values of an array, the other cells are the nodata of the encoding.
+    """
+    encoded = np.full(shape, encoding.nodata, dtype=encoding.dtype)
+    if encoding.scale != 1.0 or encoding.offset != 0.0:
+        values = np.clip(np.round((values - encoding.offset) / encoding.scale), SCALED_MIN, SCALED_MAX)
+    encoded[valid] = values
+    return encoded
+
+
+def _iter_windows(arr, window_rows):
+    """
+    Windows of rows of a 2D array or of each band of a 3D array.
+    """
+    bands = [arr] if arr.ndim == 2 else arr
+    nrow = arr.shape[-2]
+    window_rows = window_rows or nrow
+    for band in bands:
+        for row in range(0, nrow, window_rows):
+            yield band[row:row + window_rows]
+
+
+def write_geotiff(filename, encoded, sr):
+    """
+    Write an encoded array as a compressed GEOTIFF georeferenced the same way as flopy SpatialReference.export_array.
+
+    Args:
+        filename(str): path of the GEOTIFF.
+        encoded(EncodedArray): array returned by encode_array.
+        sr(SpatialReference): flopy spatial reference of the model (uniform grid).
+    """
+    import rasterio
+
+    arr = encoded.array
+    if arr.ndim == 2:
+        arr = arr[np.newaxis]
+
+    meta = _get_geotiff_meta(sr, arr.shape, arr.dtype, encoded.nodata)
+    with rasterio.open(filename, 'w', **meta) as dst:
+        dst.write(arr)
+        if encoded.scale != 1.0 or encoded.offset != 0.0:
+            dst.scales = [encoded.scale] * arr.shape[0]
+            dst.offsets = [encoded.offset] * arr.shape[0]
+
+
+def write_geotiff_windows(filename, arr, sr, nodata=None, precision=None, window_rows=None):
+    """
+    Encode an array and write it as a GEOTIFF window by window (see write_geotiff), the array is read twice: once to
+    choose the encoding and once to write the encoded windows. Gives the same GEOTIFF as encode_array and
+    write_geotiff, with temporary arrays bounded by the size of a window.
+
+    Args:
+        filename(str): path of the GEOTIFF.
+        arr(np.ndarray): 2D array or 3D array (one band per layer), i.e. memory mapped.
+        sr(SpatialReference): flopy spatial reference of the model (uniform grid).
+        nodata(float): value of the cells without data in the array. Defaults to None.
+        precision(float): declared precision of the values. Defaults to None.
+        window_rows(int): number of rows of the windows. Defaults to None (the whole bands).
+    Returns:
+        RasterEncoding: encoding of the GEOTIFF.
+    """
+    import rasterio
+    from rasterio.windows import Window
+
+    encoding = get_encoding(arr, nodata=nodata, precision=precision, window_rows=window_rows)
+    nrow, ncol = arr.shape[-2:]
+    count = 1 if arr.ndim == 2 else arr.shape[0]
+    window_rows = window_rows or nrow
+
+    meta = _get_geotiff_meta(sr, (count, nrow, ncol), np.dtype(encoding.dtype), encoding.nodata)
+    with rasterio.open(filename, 'w', **meta) as dst:
+        for band in range(count):
+            for row in range(0, nrow, window_rows):
+                window = arr[row:row + window_rows] if arr.ndim == 2 else arr[band, row:row + window_rows]
+                dst.write(encode_window(window, encoding, nodata), band + 1,
+                          window=Window(0, row, ncol, window.shape[0]))
+        if encoding.scale != 1.0 or encoding.offset != 0.0:
+            dst.scales = [encoding.scale] * count
+            dst.offsets = [encoding.offset] * count
+    return encoding
+
+
+def _get_geotiff_meta(sr, shape, dtype, nodata):
+    """
+    Creation options of a GEOTIFF of (count, height, width) cells of the model grid.
+    """
+    from rasterio import Affine
+
+    if len(np.unique(sr.delr)) != 1 or len(np.unique(sr.delc)) != 1 or sr.delr[0] != sr.delc[0]:
+        raise ValueError('GeoTIFF export require a uniform grid.')
+
+    dxdy = sr.delc[0] * sr.length_multiplier
+    transform = Affine.translation(sr.xul, sr.yul) * Affine.rotation(sr.rotation) * Affine.scale(dxdy, -dxdy)
+
+    return {
+        'count': shape[0],
+        'width': shape[2],
+        'height': shape[1],
+        'nodata': nodata,
+        'dtype': dtype.name,
+        'driver': 'GTiff',
+        'crs': sr.proj4_str,
+        'transform': transform,
+        'compress': GEOTIFF_COMPRESSION,
+    }
@@ -0,0 +1,141 @@
+"""
+********************************************************************************
+* Name: scratch_space
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Memory backed file systems used for the scratch directories when they have enough free space
+TMPFS_ROOTS = ('/dev/shm',)
+
+# Free bytes a memory backed file system must have without budget (i.e. /dev/shm is 64 MB in a stock container)
+TMPFS_MIN_FREE = 1024 ** 3
+
+
+class ScratchBudgetError(OSError):
+    """
+    Raised when the files of a scratch space would exceed its disk budget.
+    """
+    pass
+
+
+class ScratchSpace(object):
+    """
+    Private directories for the temporary files of a spatial manager: each operation writes its files into its own
+    directory, removed with its content when the operation ends (even when it fails), so that several managers (i.e.
+    concurrent publish jobs) can run on one node without overwriting each other's files.
+    """
+    PREFIX = 'modflow_'
+
+    def __init__(self, root=None, budget=None, tmpfs=True, on_release=None):
+        """
+        Constructor
+
+        Args:
+            root(str): parent directory of the scratch directories. Defaults to None (a tmpfs root with enough free
+                space if tmpfs is True, else the system temporary directory, see get_default_root).
+            budget(int): maximum number of bytes of the files of all the directories of this space. Defaults to None
+                (no limit).
+            tmpfs(bool): use a memory backed file system when root is not given. Defaults to True.
+            on_release(callable): function (nbytes) called with the number of bytes of the files of each directory
+                when it is removed (i.e. to count the bytes written). Defaults to None.
+        """
+        self.budget = budget
+        self.on_release = on_release
+        self.root = root or self.get_default_root(budget, tmpfs=tmpfs)
+        # Bytes reserved by each open directory
+        self._directories = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_default_root(budget=None, tmpfs=True):
+        """
+        Get the tmpfs root with the most free space, if it can hold the budget, or the system temporary directory.
+
+        Args:
+            budget(int): number of bytes the root must be able to hold. Defaults to None (TMPFS_MIN_FREE).
+            tmpfs(bool): consider the memory backed file systems. Defaults to True.
+        Returns:
+            str: path of the root.
+        """
+        candidates = []
+        for root in TMPFS_ROOTS if tmpfs else ():
+            if os.path.isdir(root) and os.access(root, os.W_OK):
+                free = shutil.disk_usage(root).free
+                if free >= (TMPFS_MIN_FREE if budget is None else budget):
+                    candidates.append((free, root))
+        if candidates:
+            return max(candidates)[1]
+        return tempfile.gettempdir()
+
+    @contextmanager
+    def directory(self, name='operation', nbytes=0):
+        """
+        Context of an operation with its own scratch directory, removed on exit.
+
+        Args:
+            name(str): name of the operation, used as prefix of the directory.
+            nbytes(int): number of bytes the operation is about to write, reserved in the budget until the directory
+                is removed. Defaults to 0.
+        Returns:
+            str: path of the directory.
+        Raises:
+            ScratchBudgetError: if the reservation would exceed the budget.
+        """
+        # The budget is checked and the bytes reserved at once, concurrent operations can't both pass the check
+        with self._lock:
+            if self.budget is not None:
+                usage = self._get_usage()
+                if usage + nbytes > self.budget:
+                    raise ScratchBudgetError('Scratch space budget of {} bytes exceeded in "{}": {} bytes used, {} '
+                                             'bytes requested.'.format(self.budget, self.root, usage, nbytes))
+            path = tempfile.mkdtemp(prefix='{}{}_'.format(self.PREFIX, name), dir=self.root)
+            self._directories[path] = nbytes
+        try:
+            yield path
+        finally:
+            if self.on_release is not None:
+                self.on_release(self._get_size(path))
+            shutil.rmtree(path, ignore_errors=True)
+            with self._lock:
+                self._directories.pop(path, None)
+
+    def get_usage(self):
+        """
+        Returns:
+            int: number of bytes used by the open directories of this space, the bytes reserved by a directory or
+                the bytes of its files if they are more.
+        """
+        with self._lock:
+            return self._get_usage()
+
+    def cleanup(self):
+        """
+        Remove the directories of the operations still running (i.e. when the manager is discarded).
+        """
+        with self._lock:
+            directories, self._directories = self._directories, {}
+        for directory in directories:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _get_usage(self):
+        return sum(max(nbytes, self._get_size(directory)) for directory, nbytes in self._directories.items())
+
+    @staticmethod
+    def _get_size(directory):
+        size = 0
+        for path, _, file_names in os.walk(directory):
+            for file_name in file_names:
+                try:
+                    size += os.path.getsize(os.path.join(path, file_name))
+                except OSError:
+                    # Removed by its operation meanwhile
+                    pass
+        return size
@@ -0,0 +1,270 @@
+"""
+********************************************************************************
+* Name: shared_arrays
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import namedtuple
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+# Backends of the arrays placed in a SharedArrayRegistry
+SHARED_MEMORY = 'shared_memory'
+FILES = 'files'
+
+# Picklable handle of a shared array: the array is the (shape, dtype, strides) view at offset bytes of a shared memory
+# block (shm_name) or of a file (filename)
+SharedArray = namedtuple('SharedArray', ['name', 'shape', 'dtype', 'strides', 'offset', 'shm_name', 'filename'])
+
+# Shared memory blocks attached by this process, kept open while the process runs
+_attached = {}
+_attached_lock = threading.Lock()
+
+
+class SharedArrayRegistry(object):
+    """
+    Arrays shared with the worker processes of a node without serializing them: each array is placed once in shared
+    memory (or in a memory mapped file) and the workers get a read-only zero-copy view of it from its handle. Memory
+    mapped arrays (i.e. the heads of the out-of-core mode) are shared from their files without being copied.
+    """
+    PREFIX = 'modflow_'
+
+    def __init__(self, backend=None, directory=None):
+        """
+        Constructor
+
+        Args:
+            backend(str): SHARED_MEMORY or FILES. Defaults to None (SHARED_MEMORY if available).
+            directory(str): parent directory of the files of the FILES backend. Defaults to None (system temporary
+                directory).
+        """
+        if backend is None:
+            backend = SHARED_MEMORY if shared_memory is not None else FILES
+        if backend not in (SHARED_MEMORY, FILES):
+            raise ValueError('Unknown backend "{}".'.format(backend))
+        if backend == SHARED_MEMORY and shared_memory is None:
+            raise ValueError('Shared memory is not available in this version of Python.')
+        self.backend = backend
+        self.directory = directory
+        self.handles = {}
+        self.nbytes = 0
+        self._blocks = []
+        self._files_dir = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def create(self, name, shape, dtype):
+        """
+        Create an array in the registry, to fill it without holding a copy of it (i.e. one layer at a time).
+
+        Args:
+            name(str): name of the array (i.e. "ibound").
+            shape(tuple): shape of the array.
+            dtype(np.dtype): dtype of the array.
+        Returns:
+            np.ndarray: writable array, its handle is in handles.
+        """
+        shape, dtype = tuple(shape), np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if self.backend == SHARED_MEMORY:
+            block = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+            arr = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            handle = SharedArray(name, shape, dtype.str, arr.strides, 0, block.name, None)
+        else:
+            block = None
+            filename = os.path.join(self._get_files_dir(), '{}.dat'.format(uuid.uuid4().hex))
+            if nbytes:
+                arr = np.memmap(filename, dtype=dtype, mode='w+', shape=shape)
+            else:
+                open(filename, 'wb').close()
+                arr = np.zeros(shape, dtype=dtype)
+            handle = SharedArray(name, shape, dtype.str, arr.strides, 0, None, filename)
+
+        with self._lock:
+            if name in self.handles:
+                self._release(block)
+                raise ValueError('Duplicate shared array "{}".'.format(name))
+            if block is not None:
+                self._blocks.append(block)
+                with _attached_lock:
+                    _attached[block.name] = block
+            self.nbytes += nbytes
+            self.handles[name] = handle
+        return arr
+
+    def put(self, name, arr):
+        """
+        Place an array in the registry, once: the handle of an array already placed under the name is returned.
+
+        Args:
+            name(str): name of the array (i.e. "heads").
+            arr(np.ndarray): array to share, memory mapped arrays are shared from their files without being copied.
+        Returns:
+            SharedArray: handle of the array, to give to the workers.
+        """
+        with self._lock:
+            if name in self.handles:
+                return self.handles[name]
+
+        handle = get_memmap_handle(name, arr)
+        if handle is not None:
+            with self._lock:
+                return self.handles.setdefault(name, handle)
+
+        try:
+            shared = self.create(name, np.shape(arr), np.asarray(arr).dtype)
+        except ValueError:
+            # Placed by another thread in the meantime
+            return self.handles[name]
+        shared[...] = arr
+        if isinstance(shared, np.memmap):
+            shared.flush()
+        return self.handles[name]
+
+    def get(self, name):
+        """
+        Get a view of an array of the registry.
+
+        Args:
+            name(str): name of the array.
+        Returns:
+            np.ndarray: read-only view of the array.
+        """
+        return attach(self.handles[name])
+
+    def close(self):
+        """
+        Free the shared memory blocks and files of the registry, the workers must not use the handles anymore.
+        """
+        with self._lock:
+            blocks, self._blocks = self._blocks, []
+            files_dir, self._files_dir = self._files_dir, None
+            self.handles = {}
+            self.nbytes = 0
+        for block in blocks:
+            self._release(block)
+        if files_dir is not None:
+            shutil.rmtree(files_dir, ignore_errors=True)
+
+    def _get_files_dir(self):
+        with self._lock:
+            if self._files_dir is None:
+                self._files_dir = tempfile.mkdtemp(prefix='{}shared_'.format(self.PREFIX), dir=self.directory)
+            return self._files_dir
+
+    @staticmethod
+    def _release(block):
+        if shared_memory is not None and isinstance(block, shared_memory.SharedMemory):
+            with _attached_lock:
+                _attached.pop(block.name, None)
+            try:
+                block.close()
+            except BufferError:
+                # Views of the block are still used, the memory is freed with them
+                pass
+            block.unlink()
+
+
+def get_memmap_handle(name, arr):
+    """
+    Get the handle of a view of a memory mapped file, to share it from the file.
+
+    Args:
+        name(str): name of the array.
+        arr(np.ndarray): array, i.e. a np.memmap or a view of one.
+    Returns:
+        SharedArray: handle of the array in its file, None if the array is not a view of a memory mapped file.
+    """
+    root = arr
+    while isinstance(root, np.ndarray) and isinstance(root.base, np.ndarray):
+        root = root.base
+    # The changes to copy-on-write maps are private to the process
+    if not isinstance(root, np.memmap) or not isinstance(root.base, mmap.mmap) or root.filename is None or \
+            root.mode == 'c':
+        return None
+    if any(stride < 0 for stride in arr.strides):
+        return None
+    offset = root.offset + (arr.__array_interface__['data'][0] - root.__array_interface__['data'][0])
+    return SharedArray(name, arr.shape, arr.dtype.str, arr.strides, offset, None, root.filename)
+
+
+def attach(handle):
+    """
+    Get the array of a handle, in any process of the node.
+
+    Args:
+        handle(SharedArray): handle returned by SharedArrayRegistry.put.
+    Returns:
+        np.ndarray: read-only view of the array.
+    """
+    extent = _get_extent(handle)
+    if handle.shm_name is not None:
+        buffer = _attach_block(handle.shm_name).buf
+    elif extent == 0:
+        buffer = b''
+        handle = handle._replace(offset=0)
+    else:
+        buffer = np.memmap(handle.filename, dtype=np.uint8, mode='r', offset=handle.offset, shape=(extent,))
+        handle = handle._replace(offset=0)
+    arr = np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=buffer, offset=handle.offset,
+                     strides=handle.strides)
+    arr.flags.writeable = False
+    return arr
+
+
+def call_with_arrays(function, *args, **kwargs):
+    """
+    Call a function with the arrays of the handles in its arguments, i.e. as the function of a PROCESS_POOL task of
+    the TaskScheduler: only the handles are pickled to the worker.
+
+    Args:
+        function(callable): function to call.
+        args: arguments of the function, SharedArray arguments are replaced by their arrays.
+        kwargs: keyword arguments of the function, SharedArray values are replaced by their arrays.
+    Returns:
+        object: result of the function.
+    """
+    args = [attach(arg) if isinstance(arg, SharedArray) else arg for arg in args]
+    kwargs = {key: attach(value) if isinstance(value, SharedArray) else value for key, value in kwargs.items()}
+    return function(*args, **kwargs)
+
+
+def _attach_block(shm_name):
+    """
+    Shared memory block of a name, attached once per process.
+    """
+    with _attached_lock:
+        if shm_name not in _attached:
+            try:
+                # The registry that created the block unlinks it, not the processes using it
+                _attached[shm_name] = shared_memory.SharedMemory(name=shm_name, track=False)
+            except TypeError:  # Python < 3.13
+                _attached[shm_name] = shared_memory.SharedMemory(name=shm_name)
+        return _attached[shm_name]
+
+
+def _get_extent(handle):
+    """
+    Bytes spanned by the array of a handle from its first element.
+    """
+    if 0 in handle.shape:
+        return 0
+    return sum((size - 1) * stride for size, stride in zip(handle.shape, handle.strides)) + \
+        np.dtype(handle.dtype).itemsize
@@ -0,0 +1,202 @@
+"""
+********************************************************************************
+* Name: task_scheduler
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+# Pools the tasks run on: threads for tasks sharing the state of the caller (i.e. the loaded model, GeoServer
+# connections), processes for CPU bound tasks with picklable functions and arguments
+THREAD_POOL = 'thread'
+PROCESS_POOL = 'process'
+
+# Placeholder of an argument replaced by the result of a dependency when the task runs
+TaskResult = namedtuple('TaskResult', ['name'])
+
+# Start and end (seconds since the start of the run) of a completed task
+TaskTiming = namedtuple('TaskTiming', ['start', 'end'])
+
+
+class Task(object):
+    """
+    A function of the scheduler with the tasks it depends on.
+    """
+
+    def __init__(self, name, function, args=(), kwargs=None, dependencies=(), pool=THREAD_POOL):
+        self.name = name
+        self.function = function
+        self.args = tuple(args)
+        self.kwargs = kwargs or {}
+        self.pool = pool
+        # The tasks whose results are arguments are dependencies too
+        arg_dependencies = [arg.name for arg in self.args + tuple(self.kwargs.values()) if isinstance(arg, TaskResult)]
+        self.dependencies = tuple(OrderedDict.fromkeys(tuple(dependencies) + tuple(arg_dependencies)))
+
+
+class TaskScheduler(object):
+    """
+    Runs a DAG of tasks on a thread pool and a process pool: each task is submitted as soon as all its dependencies
+    completed, so independent chains of tasks overlap. The timings of the tasks give the critical path of the run,
+    the chain of dependent tasks that bounds its duration.
+    """
+    THREAD_WORKERS = 4
+    PROCESS_WORKERS = 2
+
+    def __init__(self, thread_workers=THREAD_WORKERS, process_workers=PROCESS_WORKERS):
+        """
+        Constructor
+
+        Args:
+            thread_workers(int): number of threads running THREAD_POOL tasks.
+            process_workers(int): number of processes running PROCESS_POOL tasks.
+        """
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.tasks = OrderedDict()
+        self.results = {}
+        self.timings = OrderedDict()
+
+    def add_task(self, name, function, *args, dependencies=(), pool=THREAD_POOL, **kwargs):
+        """
+        Add a task to the DAG.
+
+        Args:
+            name(str): unique name of the task.
+            function(callable): function of the task, picklable for PROCESS_POOL tasks.
+            args: arguments of the function, TaskResult(name) arguments are replaced by the result of the task.
+            dependencies(iterable): names of the tasks that must complete before this one.
+            pool(str): THREAD_POOL or PROCESS_POOL.
+            kwargs: keyword arguments of the function.
+        Returns:
+            str: name of the task.
+        """
+        if name in self.tasks:
+            raise ValueError('Duplicate task "{}".'.format(name))
+        if pool not in (THREAD_POOL, PROCESS_POOL):
+            raise ValueError('Unknown pool "{}".'.format(pool))
+        self.tasks[name] = Task(name, function, args, kwargs, dependencies, pool)
+        return name
+
+    def get_order(self):
+        """
+        Get the tasks in an order compatible with their dependencies.
+
+        Returns:
+            list: names of the tasks.
+        """
+        for task in self.tasks.values():
+            for dependency in task.dependencies:
+                if dependency not in self.tasks:
+                    raise ValueError('Task "{}" depends on unknown task "{}".'.format(task.name, dependency))
+
+        order = []
+        remaining = OrderedDict((name, set(task.dependencies)) for name, task in self.tasks.items())
+        while remaining:
+            ready = [name for name, dependencies in remaining.items() if not dependencies - set(order)]
+            if not ready:
+                raise ValueError('Cyclic dependencies between tasks: {}.'.format(', '.join(remaining)))
+            for name in ready:
+                order.append(name)
+                remaining.pop(name)
+        return order
+
+    def run(self, progress=None):
+        """
+        Run all the tasks. When a task fails, no task is started anymore and its exception is raised once the
+        running tasks complete.
+
+        Args:
+            progress(callable): function (name, completed, total) called in the calling thread after each task
+                completes. Defaults to None.
+        Returns:
+            dict: {name: result} of the tasks.
+        """
+        order = self.get_order()
+        self.results = {}
+        self.timings = OrderedDict()
+        started = time.perf_counter()
+        starts = {}
+        pending = list(order)
+        running = {}
+        error = None
+
+        thread_pool = ThreadPoolExecutor(max_workers=self.thread_workers)
+        process_pool = None
+        if any(self.tasks[name].pool == PROCESS_POOL for name in order):
+            process_pool = ProcessPoolExecutor(max_workers=self.process_workers)
+
+        try:
+            while pending or running:
+                if error is None:
+                    for name in [name for name in pending
+                                 if all(dependency in self.results for dependency in self.tasks[name].dependencies)]:
+                        task = self.tasks[name]
+                        args = [self._resolve(arg) for arg in task.args]
+                        kwargs = {key: self._resolve(value) for key, value in task.kwargs.items()}
+                        pool = process_pool if task.pool == PROCESS_POOL else thread_pool
+                        starts[name] = time.perf_counter() - started
+                        running[pool.submit(task.function, *args, **kwargs)] = name
+                        pending.remove(name)
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    self.timings[name] = TaskTiming(starts[name], time.perf_counter() - started)
+                    if progress is not None:
+                        progress(name, len(self.results), len(order))
+        finally:
+            thread_pool.shutdown()
+            if process_pool is not None:
+                process_pool.shutdown()
+
+        if error is not None:
+            raise error
+        return self.results
+
+    def get_critical_path(self):
+        """
+        Get the chain of dependent tasks with the longest total duration in the last run.
+
+        Returns:
+            tuple: (names of the tasks of the chain, total duration in seconds).
+        """
+        longest = {}
+        for name in self.get_order():
+            if name not in self.timings:
+                continue
+            duration = self.timings[name].end - self.timings[name].start
+            previous = [longest[dependency] for dependency in self.tasks[name].dependencies if dependency in longest]
+            path, total = max(previous, key=lambda chain: chain[1]) if previous else ([], 0.0)
+            longest[name] = (path + [name], total + duration)
+        if not longest:
+            return [], 0.0
+        return max(longest.values(), key=lambda chain: chain[1])
+
+    def get_report(self):
+        """
+        Get a report of the last run: the duration of each task, the wall time and the critical path.
+
+        Returns:
+            str: report.
+        """
+        lines = ['{:<40} {:>9.3f}s'.format(name, timing.end - timing.start) for name, timing in self.timings.items()]
+        wall_time = max([timing.end for timing in self.timings.values()] or [0.0])
+        path, total = self.get_critical_path()
+        lines.append('Wall time: {:.3f}s'.format(wall_time))
+        lines.append('Critical path ({:.3f}s): {}'.format(total, ' -> '.join(path)))
+        return '\n'.join(lines)
+
+    def _resolve(self, arg):
+        return self.results[arg.name] if isinstance(arg, TaskResult) else arg
@@ -0,0 +1,319 @@
+"""
+********************************************************************************
+* Name: tracing
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import cProfile
+import fnmatch
+import functools
+import inspect
+import itertools
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Number of functions of the cProfile summary of a profiled span
+PROFILE_TOP_FUNCTIONS = 10
+
+
+class Span(object):
+    """
+    A named and timed stage of a publish, with its attributes (i.e. package, layer, bytes, cells).
+    """
+
+    def __init__(self, span_id, name, start, attributes=None, parent=None, thread=None):
+        self.id = span_id
+        self.name = name
+        self.start = start
+        self.end = None
+        self.attributes = dict(attributes or {})
+        self.parent = parent
+        self.thread = thread
+        self.error = None
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else self.start) - self.start
+
+    def set(self, **attributes):
+        """
+        Add attributes to the span (i.e. the bytes of a file once it is written).
+        """
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: the span, times in seconds since the tracer was created.
+        """
+        return {'id': self.id, 'name': self.name, 'start': self.start, 'duration': self.duration,
+                'parent': self.parent, 'thread': self.thread, 'error': self.error, 'attributes': self.attributes}
+
+
+class _NullSpan(object):
+    """
+    Span of a disabled tracer, ignores its attributes.
+    """
+
+    def set(self, **attributes):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer(object):
+    """
+    Records the spans of the stages of a publish, written as a JSON trace file in the Chrome trace event format
+    (viewable in chrome://tracing or Perfetto). The spans of each thread are nested, the spans of the tasks running
+    in other threads are roots of their thread. Spans can be profiled with cProfile and tracemalloc, opt-in.
+    """
+
+    def __init__(self, enabled=True, profile=None, profile_dir=None, trace_memory=False):
+        """
+        Constructor
+
+        Args:
+            enabled(bool): record the spans. Defaults to True.
+            profile(bool|iterable): names or fnmatch patterns (i.e. "geoserver.*") of the spans profiled with
+                cProfile, True for all the spans. One span is profiled at a time, the spans starting while another
+                one is profiled are not profiled. Defaults to None (no profiling).
+            profile_dir(str): directory of the .prof files of the profiled spans (see pstats). Defaults to None (only
+                the top functions are added to the attributes of the spans).
+            trace_memory(bool): add the bytes allocated during each span and the peak traced memory to its
+                attributes with tracemalloc, which slows the allocations down. The memory is traced for the whole
+                process, concurrent spans see the allocations of each other. Defaults to False.
+        """
+        self.enabled = enabled
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory and enabled
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+        self._listeners = []
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def now(self):
+        """
+        Returns:
+            float: seconds since the tracer was created.
+        """
+        return time.perf_counter() - self._origin
+
+    def add_listener(self, listener):
+        """
+        Add a function called with each completed span (i.e. to observe the durations of the spans as metrics).
+
+        Args:
+            listener(callable): function (span), its errors are not caught. Added once.
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def is_profiled(self, name):
+        """
+        Args:
+            name(str): name of a span.
+        Returns:
+            bool: True if the spans with this name are profiled.
+        """
+        if not self.profile:
+            return False
+        if self.profile is True:
+            return True
+        return any(fnmatch.fnmatchcase(name, pattern) for pattern in self.profile)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Context of a span, the errors raised in it are recorded in the span.
+
+        Args:
+            name(str): name of the span (i.e. "encode", "geoserver.publish_coverage").
+            attributes: attributes of the span.
+        Returns:
+            Span: the span, to add attributes known once the stage ran.
+        """
+        if not self.enabled:
+            yield NULL_SPAN
+            return
+
+        stack = self._get_stack()
+        span = Span(next(self._ids), name, self.now(), attributes, parent=stack[-1].id if stack else None,
+                    thread=threading.get_ident())
+        profiler = None
+        if self.is_profiled(name) and self._profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+        memory = tracemalloc.get_traced_memory()[0] if self.trace_memory else None
+
+        stack.append(span)
+        try:
+            if profiler is not None:
+                profiler.enable()
+            yield span
+        except BaseException as e:
+            span.error = '{}: {}'.format(type(e).__name__, e)
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._profile_lock.release()
+                self._add_profile(span, profiler)
+            if memory is not None:
+                current, peak = tracemalloc.get_traced_memory()
+                span.set(memory_allocated=current - memory, memory_peak=peak)
+            span.end = self.now()
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+            for listener in self._listeners:
+                listener(span)
+
+    def add_span(self, name, start, end, lane=None, **attributes):
+        """
+        Add a span timed by another component (i.e. the tasks of a TaskScheduler).
+
+        Args:
+            name(str): name of the span.
+            start(float): start in seconds since the tracer was created (see now).
+            end(float): end in seconds since the tracer was created.
+            lane(str): name of the track of the span in the trace, for spans overlapping the spans of the calling
+                thread. Defaults to None (calling thread).
+            attributes: attributes of the span.
+        """
+        if not self.enabled:
+            return
+        span = Span(next(self._ids), name, start, attributes, thread=lane or threading.get_ident())
+        span.end = end
+        with self._lock:
+            self.spans.append(span)
+
+    def get_spans(self, name=None):
+        """
+        Args:
+            name(str): name or fnmatch pattern of the spans. Defaults to None (all the spans).
+        Returns:
+            list: the completed spans ordered by start.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        if name is not None:
+            spans = [span for span in spans if fnmatch.fnmatchcase(span.name, name)]
+        return sorted(spans, key=lambda span: span.start)
+
+    def get_summary(self):
+        """
+        Returns:
+            dict: {name: {'count', 'total', 'max', 'errors'}} of the spans, times in seconds.
+        """
+        summary = {}
+        for span in self.get_spans():
+            stats = summary.setdefault(span.name, {'count': 0, 'total': 0.0, 'max': 0.0, 'errors': 0})
+            stats['count'] += 1
+            stats['total'] += span.duration
+            stats['max'] = max(stats['max'], span.duration)
+            stats['errors'] += 1 if span.error else 0
+        return summary
+
+    def to_chrome_trace(self):
+        """
+        Returns:
+            dict: the spans as complete events ("X") of the Chrome trace event format, with the summary.
+        """
+        pid = os.getpid()
+        events = []
+        lanes = {}
+        for span in self.get_spans():
+            tid = span.thread
+            if isinstance(tid, str):
+                # Named lanes get their own track
+                if tid not in lanes:
+                    lanes[tid] = len(lanes) + 1
+                    events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': lanes[tid],
+                                   'args': {'name': tid}})
+                tid = lanes[tid]
+            args = dict(span.attributes, id=span.id, parent=span.parent)
+            if span.error:
+                args['error'] = span.error
+            events.append({'name': span.name, 'cat': span.name.split('.')[0], 'ph': 'X', 'pid': pid,
+                           'tid': tid, 'ts': span.start * 1e6, 'dur': span.duration * 1e6, 'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'summary': self.get_summary()}}
+
+    def write(self, path):
+        """
+        Write the JSON trace file.
+
+        Args:
+            path(str): path of the file.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+
+    def clear(self):
+        """
+        Remove the recorded spans.
+        """
+        with self._lock:
+            self.spans = []
+
+    def close(self):
+        """
+        Stop tracemalloc if the tracer started it.
+        """
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _get_stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _add_profile(self, span, profiler):
+        stats = pstats.Stats(profiler)
+        if self.profile_dir:
+            path = os.path.join(self.profile_dir, '{:06d}_{}.prof'.format(span.id, span.name))
+            stats.dump_stats(path)
+            span.set(profile=path)
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP_FUNCTIONS]
+        span.set(profile_top=[{'function': '{}:{}({})'.format(*function), 'calls': calls, 'cumtime': cumtime}
+                              for function, (_, calls, _, cumtime, _) in top])
+
+
+def traced(name, *arg_names):
+    """
+    Decorator recording the calls of a method as spans of the tracer of its object (self.tracer).
+
+    Args:
+        name(str): name of the spans.
+        arg_names: names of the arguments of the method added to the attributes of the spans.
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            tracer = getattr(self, 'tracer', None)
+            if tracer is None or not tracer.enabled:
+                return method(self, *args, **kwargs)
+            arguments = signature.bind(self, *args, **kwargs).arguments
+            attributes = {arg_name: arguments[arg_name] for arg_name in arg_names if arg_name in arguments}
+            with tracer.span(name, **attributes):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
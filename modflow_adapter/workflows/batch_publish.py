@@ -0,0 +1,369 @@
+"""
+********************************************************************************
+* Name: batch_publish
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tethys_dataset_services.engines import GeoServerSpatialDatasetEngine
+from tethysext.atcore.services.model_file_db_connection import ModelFileDBConnection
+
+from modflow_adapter.services.metrics import REGISTRY, MetricsRegistry
+from modflow_adapter.services.modflow_spatial_manager import ModflowSpatialManager
+from modflow_adapter.services.publish_cache import PublishCache
+from modflow_adapter.services.tracing import Tracer
+
+__all__ = ['BatchPublishReport', 'BatchPublisher', 'create_manager', 'get_manifest_file', 'load_publish_manifest',
+           'main', 'save_publish_manifest']
+
+# Publish cache of the current batch process, set by the initializer of the process pool
+_publish_cache = None
+
+# Suffix of the publish manifest file of a model file database
+MANIFEST_SUFFIX = '.publish_manifest.json'
+
+
+class BatchPublishReport(object):
+    """
+    Throughput of a batch publish, to size the publishing nodes: models per hour, layers per second, bytes uploaded and
+    failed models.
+    """
+
+    def __init__(self, results, elapsed, processes):
+        """
+        Constructor
+
+        Args:
+            results(list): results of the models (see BatchPublisher.publish_model).
+            elapsed(float): wall clock seconds of the batch.
+            processes(int): number of models published at the same time.
+        """
+        self.results = results
+        self.elapsed = elapsed
+        self.processes = processes
+
+    @property
+    def models(self):
+        return len(self.results)
+
+    @property
+    def failures(self):
+        return [result for result in self.results if result['error']]
+
+    @property
+    def layers(self):
+        return sum(result['layers'] for result in self.results)
+
+    @property
+    def bytes(self):
+        return sum(result['bytes'] for result in self.results)
+
+    @property
+    def models_per_hour(self):
+        published = self.models - len(self.failures)
+        return published * 3600.0 / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def layers_per_second(self):
+        return self.layers / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: the throughput and the results of the models.
+        """
+        return {
+            'models': self.models,
+            'failures': len(self.failures),
+            'processes': self.processes,
+            'elapsed': self.elapsed,
+            'layers': self.layers,
+            'bytes': self.bytes,
+            'models_per_hour': self.models_per_hour,
+            'layers_per_second': self.layers_per_second,
+            'results': self.results,
+        }
+
+    def __str__(self):
+        lines = [
+            'Batch publish report',
+            '  models:            {} ({} failed) in {:.1f} s with {} processes'.format(
+                self.models, len(self.failures), self.elapsed, self.processes),
+            '  models/hour:       {:.1f}'.format(self.models_per_hour),
+            '  layers:            {} ({:.2f} layers/s)'.format(self.layers, self.layers_per_second),
+            '  bytes uploaded:    {} ({:.1f} MB)'.format(self.bytes, self.bytes / 1e6),
+        ]
+        for result in self.failures:
+            lines.append('  failed: {} ({})'.format(result['model'], result['error']))
+        return '\n'.join(lines)
+
+
+class BatchPublisher(object):
+    """
+    Publishes a list of model file databases across a pool of processes, each model with its own
+    ModflowSpatialManager.create_all. The styles and projections are shared by all the managers of the batch (see
+    PublishCache). The metrics of each model are merged into the registry of the batch as soon as it is published.
+    The publish manifest of each model is saved next to its model file database (see get_manifest_file), the next
+    batch republishes only the layers that changed.
+    """
+
+    def __init__(self, manager_factory, processes=2, metrics=None):
+        """
+        Constructor
+
+        Args:
+            manager_factory(callable): module level (picklable) function (model_db_path, publish_cache=None,
+                metrics=None) returning the ModflowSpatialManager of a model file database (see create_manager).
+            processes(int): number of models published at the same time on this node.
+            metrics(MetricsRegistry): registry of the metrics of the batch. Defaults to None (registry of the
+                process).
+        """
+        self.manager_factory = manager_factory
+        self.processes = processes
+        self.metrics = metrics or REGISTRY
+        self.models = self.metrics.counter('modflow_models_total', 'Models published by the batches by result.',
+                                           ['result'])
+
+    def run(self, model_db_paths, progress=None):
+        """
+        Publish the models.
+
+        Args:
+            model_db_paths(list): paths of the model file databases.
+            progress(callable): function (result, completed, total) called after each model. Defaults to None.
+        Returns:
+            BatchPublishReport: the throughput report of the batch.
+        """
+        started = time.monotonic()
+        results = []
+        with multiprocessing.Manager() as sync_manager:
+            publish_cache = PublishCache.from_sync_manager(sync_manager)
+            with ProcessPoolExecutor(max_workers=self.processes, initializer=_init_process,
+                                     initargs=(publish_cache,)) as executor:
+                futures = [executor.submit(self.publish_model, self.manager_factory, model_db_path)
+                           for model_db_path in model_db_paths]
+                for future in as_completed(futures):
+                    result = future.result()
+                    self.metrics.merge_state(result.pop('metrics', {}))
+                    self.models.inc(result='failed' if result['error'] else 'published')
+                    results.append(result)
+                    if progress is not None:
+                        progress(results[-1], len(results), len(futures))
+        return BatchPublishReport(results, time.monotonic() - started, self.processes)
+
+    @staticmethod
+    def publish_model(manager_factory, model_db_path, publish_cache=None):
+        """
+        Publish a model and save its publish manifest, also when the publish failed (the layers published before the
+        failure are in it). The errors are returned in the result instead of failing the batch.
+
+        Args:
+            manager_factory(callable): manager factory (see BatchPublisher).
+            model_db_path(str): path of the model file database.
+            publish_cache(PublishCache): cache shared by the managers. Defaults to None (cache of the process).
+        Returns:
+            dict: the model, its uploaded layers and bytes, duration in seconds, error message (None on success) and
+                metrics (see MetricsRegistry.get_state).
+        """
+        started = time.monotonic()
+        result = {'model': model_db_path, 'layers': 0, 'bytes': 0, 'seconds': 0.0, 'error': None}
+        metrics = MetricsRegistry()
+        try:
+            manager = manager_factory(model_db_path, publish_cache=publish_cache or _publish_cache, metrics=metrics)
+            try:
+                manager.create_all()
+            finally:
+                result.update(manager.publish_stats)
+                save_publish_manifest(model_db_path, manager.publish_manifest)
+        except Exception as e:
+            result['error'] = '{}: {}'.format(type(e).__name__, e)
+        result['seconds'] = time.monotonic() - started
+        result['metrics'] = metrics.get_state()
+        return result
+
+
+def _init_process(publish_cache):
+    """
+    Initializer of the processes of a batch.
+    """
+    global _publish_cache
+    _publish_cache = publish_cache
+
+
+def get_manifest_file(model_db_path):
+    """
+    Get the path of the publish manifest of a model file database. It is a JSON file next to the directory of the
+    database rather than in it, the files of the database are the files of the model.
+
+    Args:
+        model_db_path(str): path of the model file database.
+    Returns:
+        str: path of the manifest file (i.e. "<model_db_path>.publish_manifest.json").
+    """
+    return '{}{}'.format(os.path.abspath(model_db_path), MANIFEST_SUFFIX)
+
+
+def load_publish_manifest(model_db_path):
+    """
+    Load the publish manifest saved by the previous batch of a model file database.
+
+    Args:
+        model_db_path(str): path of the model file database.
+    Returns:
+        dict: manifest to pass to ModflowSpatialManager (see PublishManifest), None if the model was never published.
+    """
+    manifest_file = get_manifest_file(model_db_path)
+    if not os.path.isfile(manifest_file):
+        return None
+    with open(manifest_file) as f:
+        return json.load(f)
+
+
+def save_publish_manifest(model_db_path, manifest):
+    """
+    Save the publish manifest of a model file database. The file is replaced at once, a batch stopped while saving
+    leaves the previous manifest.
+
+    Args:
+        model_db_path(str): path of the model file database.
+        manifest(dict|PublishManifest): manifest of ModflowSpatialManager.publish_manifest after publishing.
+    """
+    if hasattr(manifest, 'to_dict'):
+        manifest = manifest.to_dict()
+    manifest_file = get_manifest_file(model_db_path)
+    tmp_file = '{}.{}.tmp'.format(manifest_file, os.getpid())
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_file, manifest_file)
+
+
+def create_manager(model_db_path, publish_cache=None, metrics=None, geoserver_endpoint=None, geoserver_username=None,
+                   geoserver_password=None, modflow_version='mf2005', trace_dir=None, profile=None, profile_dir=None,
+                   trace_memory=False, **manager_options):
+    """
+    Manager factory of the batch publish command: connects to GeoServer and to the model file database, and loads the
+    publish manifest of the previous batch of the model (see load_publish_manifest).
+
+    Args:
+        model_db_path(str): path of the model file database, its directory name is the database id.
+        publish_cache(PublishCache): cache shared by the managers of the batch. Defaults to None.
+        metrics(MetricsRegistry): registry of the metrics of the model. Defaults to None.
+        geoserver_endpoint(str): GeoServer REST endpoint (i.e. "http://localhost:8181/geoserver/rest/").
+        geoserver_username(str): GeoServer user.
+        geoserver_password(str): GeoServer password.
+        modflow_version(str): version of the Modflow executable (i.e. mf2005, mfnwt).
+        trace_dir(str): directory of the JSON trace files, one per model named after its database id. Defaults to
+            None (no trace file).
+        profile(list): names or patterns of the spans profiled with cProfile (see Tracer). Defaults to None.
+        profile_dir(str): directory of the .prof files of the profiled spans. Defaults to None.
+        trace_memory(bool): trace the memory allocated by each span with tracemalloc. Defaults to False.
+        manager_options: options of the ModflowSpatialManager (i.e. multi_band, bulk_publish, publish_manifest).
+    Returns:
+        ModflowSpatialManager: the manager of the model.
+    """
+    model_db_path = os.path.abspath(model_db_path)
+    geoserver_engine = GeoServerSpatialDatasetEngine(endpoint=geoserver_endpoint, username=geoserver_username,
+                                                     password=geoserver_password)
+    model_file_db = ModelFileDBConnection(os.path.dirname(model_db_path), db_id=os.path.basename(model_db_path))
+    tracer = Tracer(profile=profile, profile_dir=profile_dir, trace_memory=trace_memory)
+    trace_file = os.path.join(trace_dir, '{}.json'.format(os.path.basename(model_db_path))) if trace_dir else None
+    manager_options.setdefault('publish_manifest', load_publish_manifest(model_db_path))
+    return ModflowSpatialManager(geoserver_engine, model_file_db, modflow_version, publish_cache=publish_cache,
+                                 tracer=tracer, trace_file=trace_file, metrics=metrics, **manager_options)
+
+
+def main(argv=None):
+    """
+    Entry point of the modflow-publish command.
+
+    Args:
+        argv(list): command line arguments. Defaults to None (sys.argv).
+    Returns:
+        int: exit code, 1 if a model failed.
+    """
+    parser = argparse.ArgumentParser(prog='modflow-publish',
+                                     description='Publish the layers of Modflow model file databases to GeoServer.')
+    parser.add_argument('model_dbs', nargs='*', help='paths of the model file databases')
+    parser.add_argument('-f', '--from-file', help='file with one model file database path per line')
+    parser.add_argument('-p', '--processes', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='number of models published at the same time on this node')
+    parser.add_argument('--geoserver', default=os.environ.get('GEOSERVER_ENDPOINT'),
+                        help='GeoServer REST endpoint (default: $GEOSERVER_ENDPOINT)')
+    parser.add_argument('--username', default=os.environ.get('GEOSERVER_USERNAME', 'admin'),
+                        help='GeoServer user (default: $GEOSERVER_USERNAME)')
+    parser.add_argument('--password', default=os.environ.get('GEOSERVER_PASSWORD'),
+                        help='GeoServer password (default: $GEOSERVER_PASSWORD)')
+    parser.add_argument('--modflow-version', default='mf2005', help='version of the Modflow executable')
+    parser.add_argument('--multi-band', action='store_true', help='publish Util3d attributes as multi-band GEOTIFFs')
+    parser.add_argument('--bulk-publish', action='store_true', help='publish with the GeoServer Importer')
+    parser.add_argument('--async-publish', action='store_true', help='publish with the asynchronous client')
+    parser.add_argument('--scratch-dir', help='parent directory of the temporary files')
+    parser.add_argument('--scratch-budget', type=int, help='maximum bytes of temporary files per model')
+    parser.add_argument('--out-of-core', action='store_true',
+                        help='bounded memory mode for grids larger than the memory (memory mapped heads, windowed '
+                             'statistics and GEOTIFFs)')
+    parser.add_argument('--memory-budget', type=int, help='maximum bytes of resident memory per model')
+    parser.add_argument('--json', dest='json_report', help='also write the report to this JSON file')
+    parser.add_argument('--trace-dir', help='write a JSON trace file of the stages of each model to this directory')
+    parser.add_argument('--profile', action='append',
+                        help='profile the stages with this name or pattern (i.e. "encode", "geoserver.*")')
+    parser.add_argument('--profile-dir', help='write the cProfile stats of the profiled stages to this directory')
+    parser.add_argument('--trace-memory', action='store_true', help='trace the memory allocated by each stage')
+    parser.add_argument('--metrics-file',
+                        help='write the metrics in the Prometheus text format to this file after each model')
+    parser.add_argument('--metrics-port', type=int,
+                        help='serve the metrics on http://127.0.0.1:<port>/metrics while the batch runs')
+    args = parser.parse_args(argv)
+
+    model_db_paths = list(args.model_dbs)
+    if args.from_file:
+        with open(args.from_file) as f:
+            model_db_paths.extend(line.strip() for line in f if line.strip())
+    if not model_db_paths:
+        parser.error('no model file database given')
+    if not args.geoserver:
+        parser.error('--geoserver or $GEOSERVER_ENDPOINT is required')
+
+    manager_factory = functools.partial(
+        create_manager, geoserver_endpoint=args.geoserver, geoserver_username=args.username,
+        geoserver_password=args.password, modflow_version=args.modflow_version, multi_band=args.multi_band,
+        bulk_publish=args.bulk_publish, async_publish=args.async_publish, scratch_dir=args.scratch_dir,
+        scratch_budget=args.scratch_budget, out_of_core=args.out_of_core, memory_budget=args.memory_budget,
+        trace_dir=args.trace_dir, profile=args.profile,
+        profile_dir=args.profile_dir, trace_memory=args.trace_memory,
+    )
+
+    metrics = MetricsRegistry()
+    server = metrics.serve(args.metrics_port) if args.metrics_port is not None else None
+
+    def progress(result, completed, total):
+        status = 'failed: {}'.format(result['error']) if result['error'] else '{} layers'.format(result['layers'])
+        print('[{}/{}] {} in {:.1f} s, {}'.format(completed, total, result['model'], result['seconds'], status))
+        if args.metrics_file:
+            metrics.write(args.metrics_file)
+
+    try:
+        report = BatchPublisher(manager_factory, processes=args.processes, metrics=metrics).run(model_db_paths,
+                                                                                                progress=progress)
+    finally:
+        if server is not None:
+            server.shutdown()
+    print(report)
+    if args.json_report:
+        with open(args.json_report, 'w') as f:
+            json.dump(report.to_dict(), f, indent=2)
+    return 1 if report.failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
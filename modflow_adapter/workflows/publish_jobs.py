@@ -0,0 +1,277 @@
+"""
+********************************************************************************
+* Name: publish_jobs
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import datetime
+import json
+import os
+import socket
+
+from sqlalchemy import Column, DateTime, Float, Integer, String, Text, and_, create_engine, or_
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import aliased, sessionmaker
+
+__all__ = ['PublishJob', 'PublishJobQueue', 'PublishJobsBase']
+
+PublishJobsBase = declarative_base()
+
+
+class PublishJob(PublishJobsBase):
+    """
+    A request to publish the layers of a Modflow model resource to GeoServer, run by a PublishWorker.
+    """
+    __tablename__ = 'modflow_publish_jobs'
+
+    # Job Statuses
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+    id = Column(Integer, primary_key=True)
+    resource_id = Column(String, nullable=False, index=True)
+    status = Column(String, nullable=False, default=QUEUED, index=True)
+    stage = Column(String)
+    progress = Column(Float, nullable=False, default=0.0)
+    options = Column(Text, nullable=False, default='{}')
+    worker = Column(String)
+    attempts = Column(Integer, nullable=False, default=0)
+    message = Column(Text)
+    # Manifest entries of the layers published by the previous attempts, to resume from them
+    checkpoint = Column(Text, nullable=False, default='{}')
+    date_created = Column(DateTime, default=datetime.datetime.utcnow)
+    date_started = Column(DateTime)
+    date_updated = Column(DateTime)
+    date_finished = Column(DateTime)
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: the columns of the job, with the options and the checkpoint decoded.
+        """
+        job = {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        job['options'] = json.loads(self.options or '{}')
+        job['checkpoint'] = json.loads(self.checkpoint or '{}')
+        return job
+
+
+class PublishJobQueue(object):
+    """
+    Queue of publish jobs stored in a SQL database, a local SQLite file by default so that no broker is needed. The
+    web tier submits jobs and returns, worker processes claim them one at a time.
+    """
+    DEFAULT_URL = 'sqlite:///modflow_publish_jobs.sqlite'
+    # Seconds a SQLite connection waits for the lock of another process
+    SQLITE_TIMEOUT = 30
+
+    def __init__(self, url=DEFAULT_URL):
+        """
+        Constructor
+
+        Args:
+            url(str): SQLAlchemy URL of the queue database. Defaults to DEFAULT_URL.
+        """
+        self.url = url
+        kwargs = {'connect_args': {'timeout': self.SQLITE_TIMEOUT}} if url.startswith('sqlite') else {}
+        self.engine = create_engine(url, **kwargs)
+        PublishJobsBase.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def enqueue(self, resource_id, **options):
+        """
+        Queue a publish job for a resource. A resource has at most one job waiting: the id of the queued job is
+        returned if there is one. A job queued while another job of the resource is running is claimed once the
+        running job finished (see claim).
+
+        Args:
+            resource_id(str): id of the ModflowModelResource.
+            options: JSON serializable options of the job, passed to the manager factory of the workers.
+        Returns:
+            int: id of the job.
+        """
+        session = self.Session()
+        try:
+            job = session.query(PublishJob) \
+                .filter(PublishJob.resource_id == str(resource_id), PublishJob.status == PublishJob.QUEUED) \
+                .first()
+            if job is None:
+                job = PublishJob(resource_id=str(resource_id), status=PublishJob.QUEUED, progress=0.0,
+                                 options=json.dumps(options), attempts=0)
+                session.add(job)
+                session.commit()
+            return job.id
+        finally:
+            session.close()
+
+    def submit(self, session, resource, **options):
+        """
+        Mark the upload statuses of a resource as pending and queue its publish job, returns immediately.
+
+        Args:
+            session(sqlalchemy.orm.Session): session of the primary database the resource belongs to.
+            resource(ModflowModelResource): resource to publish.
+            options: JSON serializable options of the job.
+        Returns:
+            int: id of the job.
+        """
+        job_id = self.enqueue(resource.id, **options)
+        for key in (resource.UPLOAD_STATUS_KEY, resource.UPLOAD_GS_STATUS_KEY):
+            resource.set_status(key, resource.STATUS_PENDING)
+            resource.set_attribute(key, {'status': resource.STATUS_PENDING, 'job_id': job_id, 'stage': None,
+                                         'progress': 0.0, 'stages': {}})
+        session.commit()
+        return job_id
+
+    def claim(self, worker=None, stale_after=None):
+        """
+        Claim the oldest queued job of a resource without running job, the jobs of a resource run one at a time. The
+        job is claimed with a conditional update, so that only one of the workers racing for it gets it.
+
+        Args:
+            worker(str): name of the worker. Defaults to None ("<host>:<pid>").
+            stale_after(float): also claim the running jobs not updated for this number of seconds, left by workers
+                that stopped. Defaults to None (only queued jobs).
+        Returns:
+            dict: the claimed job (see PublishJob.to_dict), None if no job is queued.
+        """
+        worker = worker or '{}:{}'.format(socket.gethostname(), os.getpid())
+        session = self.Session()
+        try:
+            while True:
+                claimable = PublishJob.status == PublishJob.QUEUED
+                # A resubmitted resource waits for its running job, two jobs would publish the same stores
+                running = aliased(PublishJob)
+                busy = session.query(running.id) \
+                    .filter(running.resource_id == PublishJob.resource_id, running.id != PublishJob.id,
+                            running.status == PublishJob.RUNNING)
+                if stale_after is not None:
+                    stale = datetime.datetime.utcnow() - datetime.timedelta(seconds=stale_after)
+                    claimable = or_(claimable, and_(PublishJob.status == PublishJob.RUNNING,
+                                                    PublishJob.date_updated < stale))
+                    busy = busy.filter(running.date_updated >= stale)
+                idle = ~busy.exists()
+                job = session.query(PublishJob) \
+                    .filter(claimable, idle) \
+                    .order_by(PublishJob.id) \
+                    .first()
+                if job is None:
+                    return None
+                # The job must not have changed since it was read, nor a job of its resource started
+                now = datetime.datetime.utcnow()
+                claimed = session.query(PublishJob) \
+                    .filter(PublishJob.id == job.id, PublishJob.status == job.status,
+                            PublishJob.attempts == job.attempts, idle) \
+                    .update({'status': PublishJob.RUNNING, 'worker': worker, 'attempts': PublishJob.attempts + 1,
+                             'date_started': now, 'date_updated': now, 'message': None},
+                            synchronize_session=False)
+                session.commit()
+                if claimed:
+                    session.refresh(job)
+                    return job.to_dict()
+        finally:
+            session.close()
+
+    def update(self, job_id, **values):
+        """
+        Update the columns of a job (i.e. stage, progress).
+
+        Args:
+            job_id(int): id of the job.
+            values: new values of the columns.
+        """
+        values.setdefault('date_updated', datetime.datetime.utcnow())
+        session = self.Session()
+        try:
+            session.query(PublishJob).filter(PublishJob.id == job_id).update(values, synchronize_session=False)
+            session.commit()
+        finally:
+            session.close()
+
+    def save_checkpoint(self, job_id, layers):
+        """
+        Add published layers to the checkpoint of a job.
+
+        Args:
+            job_id(int): id of the job.
+            layers(dict): {geoserver_store: manifest_entry} of the published layers (see PublishManifest).
+        """
+        session = self.Session()
+        try:
+            job = session.query(PublishJob).get(job_id)
+            checkpoint = json.loads(job.checkpoint or '{}')
+            checkpoint.update(layers)
+            job.checkpoint = json.dumps(checkpoint)
+            job.date_updated = datetime.datetime.utcnow()
+            session.commit()
+        finally:
+            session.close()
+
+    def complete(self, job_id):
+        """
+        Mark a job as completed.
+
+        Args:
+            job_id(int): id of the job.
+        """
+        self.update(job_id, status=PublishJob.COMPLETED, progress=1.0, date_finished=datetime.datetime.utcnow())
+
+    def fail(self, job_id, message, retry=False):
+        """
+        Mark a job as failed.
+
+        Args:
+            job_id(int): id of the job.
+            message(str): error of the job.
+            retry(bool): queue the job again, to resume from its checkpoint. Defaults to False.
+        """
+        if retry:
+            self.update(job_id, status=PublishJob.QUEUED, message=message)
+        else:
+            self.update(job_id, status=PublishJob.FAILED, message=message, date_finished=datetime.datetime.utcnow())
+
+    def retry(self, job_id):
+        """
+        Queue a failed job again, it resumes from its checkpoint.
+
+        Args:
+            job_id(int): id of the job.
+        """
+        self.update(job_id, status=PublishJob.QUEUED, date_finished=None)
+
+    def get(self, job_id):
+        """
+        Get a job.
+
+        Args:
+            job_id(int): id of the job.
+        Returns:
+            dict: the job (see PublishJob.to_dict), None if it does not exist.
+        """
+        session = self.Session()
+        try:
+            job = session.query(PublishJob).get(job_id)
+            return job.to_dict() if job is not None else None
+        finally:
+            session.close()
+
+    def count(self, status=None):
+        """
+        Count the jobs.
+
+        Args:
+            status(str): count only the jobs with this status. Defaults to None (all jobs).
+        Returns:
+            int: number of jobs.
+        """
+        session = self.Session()
+        try:
+            query = session.query(PublishJob)
+            if status is not None:
+                query = query.filter(PublishJob.status == status)
+            return query.count()
+        finally:
+            session.close()
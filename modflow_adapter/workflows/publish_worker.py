@@ -0,0 +1,329 @@
+"""
+********************************************************************************
+* Name: publish_worker
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import multiprocessing
+import os
+import socket
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from modflow_adapter.models.app_users.modflow_model_resource import ModflowModelResource
+from modflow_adapter.services.publish_manifest import PublishManifest
+from modflow_adapter.workflows.publish_jobs import PublishJobQueue
+
+__all__ = ['PublishCheckpointWriter', 'PublishStatusWriter', 'PublishWorker', 'run_workers']
+
+
+class PublishStatusWriter(object):
+    """
+    Keeps the status of a publish job and writes it to the upload status keys of its resource and to the job record.
+    The status of each stage changes often (one task of create_all after the other), the writes are batched: at most
+    one write every interval seconds, plus one when the job finishes.
+    """
+    STAGE_KEYS = (ModflowModelResource.UPLOAD_STATUS_KEY, ModflowModelResource.UPLOAD_GS_STATUS_KEY)
+
+    def __init__(self, session, resource, queue, job_id, interval=2.0):
+        """
+        Constructor
+
+        Args:
+            session(sqlalchemy.orm.Session): session of the primary database the resource belongs to.
+            resource(ModflowModelResource): resource of the job.
+            queue(PublishJobQueue): queue of the job.
+            job_id(int): id of the job.
+            interval(float): minimum number of seconds between two writes.
+        """
+        self.session = session
+        self.resource = resource
+        self.queue = queue
+        self.job_id = job_id
+        self.interval = interval
+        self.statuses = {key: {'status': resource.STATUS_PENDING, 'job_id': job_id, 'stage': None, 'progress': 0.0,
+                               'stages': {}} for key in self.STAGE_KEYS}
+        self.writes = 0
+        self._dirty = False
+        self._last_write = None
+
+    def update(self, key, stage, stage_status, progress=None, status=None):
+        """
+        Update the status of a stage, written if the last write is older than interval.
+
+        Args:
+            key(str): UPLOAD_STATUS_KEY or UPLOAD_GS_STATUS_KEY.
+            stage(str): name of the stage (i.e. a task of create_all).
+            stage_status(str): status of the stage (i.e. STATUS_WORKING, STATUS_SUCCESS).
+            progress(float): completed fraction of the key, between 0 and 1. Defaults to None (unchanged).
+            status(str): status of the key. Defaults to None (STATUS_WORKING).
+        """
+        key_status = self.statuses[key]
+        key_status['stage'] = stage
+        key_status['stages'][stage] = stage_status
+        key_status['status'] = status or self.resource.STATUS_WORKING
+        if progress is not None:
+            key_status['progress'] = progress
+        self._dirty = True
+        if self._last_write is None or time.monotonic() - self._last_write >= self.interval:
+            self.flush()
+
+    def finish(self, status, message=None):
+        """
+        Set the final status of the keys that did not succeed yet and write all the statuses.
+
+        Args:
+            status(str): final status (i.e. STATUS_SUCCESS, STATUS_FAILED).
+            message(str): error message. Defaults to None.
+        """
+        for key_status in self.statuses.values():
+            if key_status['status'] == self.resource.STATUS_SUCCESS:
+                continue
+            key_status['status'] = status
+            if status == self.resource.STATUS_SUCCESS:
+                key_status['progress'] = 1.0
+            if message:
+                key_status['message'] = message
+        self._dirty = True
+        self.flush()
+
+    def flush(self):
+        """
+        Write the statuses that changed since the last write, in one transaction.
+        """
+        if not self._dirty:
+            return
+        for key, key_status in self.statuses.items():
+            self.resource.set_status(key, key_status['status'])
+            self.resource.set_attribute(key, dict(key_status, stages=dict(key_status['stages'])))
+        self.session.commit()
+
+        gs_status = self.statuses[ModflowModelResource.UPLOAD_GS_STATUS_KEY]
+        self.queue.update(self.job_id, stage=gs_status['stage'], progress=gs_status['progress'])
+        self.writes += 1
+        self._dirty = False
+        self._last_write = time.monotonic()
+
+
+class PublishCheckpointWriter(object):
+    """
+    Checkpoint of the layers published by a job (see ModflowSpatialManager checkpoint): the manifest entries of the
+    published layers are saved in the job record, batched in one write every interval seconds.
+    """
+
+    def __init__(self, queue, job_id, interval=2.0):
+        """
+        Constructor
+
+        Args:
+            queue(PublishJobQueue): queue of the job.
+            job_id(int): id of the job.
+            interval(float): minimum number of seconds between two writes.
+        """
+        self.queue = queue
+        self.job_id = job_id
+        self.interval = interval
+        self.pending = {}
+        self._last_write = time.monotonic()
+        # Layers are published by several tasks of create_all at the same time
+        self._lock = threading.Lock()
+
+    def __call__(self, layers):
+        """
+        Checkpoint published layers.
+
+        Args:
+            layers(dict): {geoserver_store: manifest_entry} of the published layers.
+        """
+        with self._lock:
+            self.pending.update(layers)
+            if time.monotonic() - self._last_write >= self.interval:
+                self._write()
+
+    def flush(self):
+        """
+        Write the layers not written yet.
+        """
+        with self._lock:
+            self._write()
+
+    def _write(self):
+        if self.pending:
+            self.queue.save_checkpoint(self.job_id, self.pending)
+            self.pending = {}
+        self._last_write = time.monotonic()
+
+
+class PublishWorker(object):
+    """
+    Claims publish jobs from a PublishJobQueue and runs them: loads the model of the resource and publishes all its
+    layers and styles with ModflowSpatialManager.create_all, reporting the progress of each task.
+    """
+    POLL_INTERVAL = 1.0
+    STATUS_INTERVAL = 2.0
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, queue, resource_sessionmaker, manager_factory, name=None, poll_interval=POLL_INTERVAL,
+                 status_interval=STATUS_INTERVAL, max_attempts=MAX_ATTEMPTS, stale_after=None):
+        """
+        Constructor
+
+        Args:
+            queue(PublishJobQueue): queue of the jobs.
+            resource_sessionmaker(sessionmaker): session maker of the primary database of the resources.
+            manager_factory(callable): function (resource, **options) returning the ModflowSpatialManager of a
+                resource, called with the options of the job. It should pass the publish manifest of the resource to
+                the manager (see ModflowModelResource.get_publish_manifest).
+            name(str): name of the worker. Defaults to None ("<host>:<pid>").
+            poll_interval(float): seconds to wait for a job when the queue is empty.
+            status_interval(float): minimum number of seconds between two writes of the status (and checkpoint)
+                of a job.
+            max_attempts(int): number of times a job is run before it fails, each attempt resumes from the layers
+                published by the previous ones.
+            stale_after(float): seconds after which the running job of a worker that stopped updating it is claimed
+                again. Must be longer than the longest task of create_all. Defaults to None (never).
+        """
+        self.queue = queue
+        self.resource_sessionmaker = resource_sessionmaker
+        self.manager_factory = manager_factory
+        self.name = name or '{}:{}'.format(socket.gethostname(), os.getpid())
+        self.poll_interval = poll_interval
+        self.status_interval = status_interval
+        self.max_attempts = max_attempts
+        self.stale_after = stale_after
+
+    def run(self, max_jobs=None, stop_when_empty=False):
+        """
+        Run the queued jobs one after the other.
+
+        Args:
+            max_jobs(int): stop after this number of jobs. Defaults to None (no limit).
+            stop_when_empty(bool): stop when no job is queued instead of waiting for one. Defaults to False.
+        Returns:
+            int: number of jobs run.
+        """
+        count = 0
+        while max_jobs is None or count < max_jobs:
+            if not self.run_once():
+                if stop_when_empty:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            count += 1
+        return count
+
+    def run_once(self):
+        """
+        Claim and run one job.
+
+        Returns:
+            dict: the job that was run (as claimed), None if no job is queued.
+        """
+        job = self.queue.claim(self.name, stale_after=self.stale_after)
+        if job is not None:
+            self.process(job)
+        return job
+
+    def process(self, job):
+        """
+        Run a claimed job. Errors are recorded in the job and in the statuses of the resource, not raised. The layers
+        in the checkpoint of the job are added to the publish manifest, so that the layers published by the previous
+        attempts are skipped, and the failed job is queued again until max_attempts. The layers published by a failed
+        job are added to the publish manifest of the resource.
+
+        Args:
+            job(dict): the claimed job (see PublishJob.to_dict).
+        Returns:
+            bool: True if the job completed.
+        """
+        session = self.resource_sessionmaker()
+        upload_key = ModflowModelResource.UPLOAD_STATUS_KEY
+        gs_key = ModflowModelResource.UPLOAD_GS_STATUS_KEY
+        status = None
+        checkpoint = PublishCheckpointWriter(self.queue, job['id'], interval=self.status_interval)
+        try:
+            resource = session.query(ModflowModelResource) \
+                .filter(ModflowModelResource.id == job['resource_id']) \
+                .one()
+            status = PublishStatusWriter(session, resource, self.queue, job['id'], interval=self.status_interval)
+
+            status.update(upload_key, 'load_model', resource.STATUS_WORKING, progress=0.0)
+            manager = self.manager_factory(resource, **job['options'])
+            manager.publish_manifest.layers.update(job['checkpoint'])
+            manager.checkpoint = checkpoint
+            manager.load_model()
+            status.update(upload_key, 'load_model', resource.STATUS_SUCCESS, progress=1.0,
+                          status=resource.STATUS_SUCCESS)
+
+            def progress(task_name, completed, total):
+                status.update(gs_key, task_name, resource.STATUS_SUCCESS, progress=completed / total)
+
+            manager.create_all(progress=progress)
+            checkpoint.flush()
+            resource.set_publish_manifest(manager.publish_manifest)
+            status.finish(resource.STATUS_SUCCESS)
+        except Exception as e:
+            message = '{}: {}'.format(type(e).__name__, e)
+            retry = job['attempts'] < self.max_attempts
+            checkpoint.flush()
+            if status is not None:
+                session.rollback()
+                # The stores published before the failure are in the resource manifest, i.e. to be deleted with it
+                manifest = PublishManifest.from_dict(status.resource.get_publish_manifest())
+                manifest.layers.update(self.queue.get(job['id'])['checkpoint'])
+                status.resource.set_publish_manifest(manifest)
+                status.finish(status.resource.STATUS_PENDING if retry else status.resource.STATUS_FAILED,
+                              message=message)
+            self.queue.fail(job['id'], message, retry=retry)
+            return False
+        finally:
+            session.close()
+
+        self.queue.complete(job['id'])
+        return True
+
+
+def _run_worker(queue_url, resource_db_url, manager_factory, max_jobs, stop_when_empty, worker_options):
+    """
+    Entry point of a worker process, the database connections are created in the process.
+    """
+    queue = PublishJobQueue(queue_url)
+    resource_sessionmaker = sessionmaker(bind=create_engine(resource_db_url))
+    worker = PublishWorker(queue, resource_sessionmaker, manager_factory, **worker_options)
+    worker.run(max_jobs=max_jobs, stop_when_empty=stop_when_empty)
+
+
+def run_workers(queue_url, resource_db_url, manager_factory, processes=2, max_jobs=None, stop_when_empty=False,
+                **worker_options):
+    """
+    Run publish workers in separate processes and wait for them. Workers on other hosts can share a queue database
+    that supports concurrent writers.
+
+    Args:
+        queue_url(str): SQLAlchemy URL of the queue database (see PublishJobQueue).
+        resource_db_url(str): SQLAlchemy URL of the primary database of the resources.
+        manager_factory(callable): module level (picklable) manager factory (see PublishWorker).
+        processes(int): number of worker processes.
+        max_jobs(int): number of jobs after which each worker stops. Defaults to None (no limit).
+        stop_when_empty(bool): stop the workers when no job is queued. Defaults to False.
+        worker_options: options of the workers (i.e. poll_interval, status_interval).
+    Returns:
+        list: exit codes of the worker processes.
+    """
+    # Create the tables before the workers race for it
+    PublishJobQueue(queue_url).engine.dispose()
+
+    workers = [multiprocessing.Process(target=_run_worker,
+                                       args=(queue_url, resource_db_url, manager_factory, max_jobs, stop_when_empty,
+                                             worker_options))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return [worker.exitcode for worker in workers]
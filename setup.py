@@ -5,12 +5,17 @@ import os
 dependencies = [
     'flopy==3.2.10',
     'sqlalchemy',
-    'numpy',
+    'numpy>=1.17',
     'tethysext-atcore',
     'fiona',
     'geopandas',
     'pyshp==1.2.12',
-    'rasterio'
+    'rasterio',
+    'pyproj>=2.1',
+    'requests',
+    'aiohttp',
+    'jinja2',
+    'xxhash'
 ]
 
 test_dependencies = [
@@ -44,6 +49,9 @@ setup(
     include_package_data=True,
     zip_safe=False,
     install_requires=dependencies,
+    entry_points={
+        'console_scripts': ['modflow-publish=modflow_adapter.workflows.batch_publish:main'],
+    },
     tests_require=test_dependencies,
     test_suite='tests',
 )
@@ -0,0 +1,8 @@
+"""
+********************************************************************************
+* Name: __init__.py
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
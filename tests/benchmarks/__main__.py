@@ -0,0 +1,13 @@
+"""
+********************************************************************************
+* Name: __main__.py
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import sys
+
+from tests.benchmarks.benchmark import main
+
+sys.exit(main())
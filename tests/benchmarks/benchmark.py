@@ -0,0 +1,363 @@
+"""
+********************************************************************************
+* Name: benchmark
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import mock
+
+from modflow_adapter.services.metrics import MetricsRegistry
+from modflow_adapter.services.modflow_spatial_manager import ModflowSpatialManager
+from modflow_adapter.services.publish_cache import PublishCache
+from modflow_adapter.services.tracing import Tracer
+from tests.benchmarks.fake_geoserver import InProcessGeoServer
+from tests.benchmarks.synthetic_model import DEFAULT_PACKAGES, EPSG, PRJ, SyntheticModel
+
+# Public stages of the spatial manager: (name, method, arguments), each runs with a new manager and GeoServer
+STAGES = (
+    ('load_model', 'load_model', {}),
+    ('get_package_layer_attribute_info', 'get_package_layer_attribute_info', {}),
+    ('get_head_info', 'get_head_info', {}),
+    ('create_all_styles', 'create_all_styles', {'reload_config': False}),
+    ('create_model_boundary_layer', 'create_model_boundary_layer', {'reload_config': False}),
+    ('create_package_shapefile_layers', 'create_package_shapefile_layers', {'reload_config': False}),
+    ('create_head_raster_layer', 'create_head_raster_layer', {'reload_config': False}),
+    ('create_head_contour_layer', 'create_head_contour_layer', {'reload_config': False}),
+    ('create_all', 'create_all', {'reload_config': False}),
+    # Publish again with the manifest of create_all, nothing changed
+    ('create_all_unchanged', 'create_all', {'reload_config': False}),
+)
+
+DEFAULT_SIZES = ('50x50x2x2', '200x200x3x13')
+DEFAULT_HISTORY = 'benchmark_history.json'
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ModelDirectory(object):
+    """
+    Model file database of a directory of model files, with the interface used by the spatial manager.
+    """
+
+    def __init__(self, db_dir, db_id):
+        self.db_dir = db_dir
+        self.db_id = db_id
+
+    def get_id(self):
+        return self.db_id
+
+    def list(self):
+        return sorted(os.listdir(self.db_dir))
+
+
+class Benchmark(object):
+    """
+    Runs the stages of the spatial manager on synthetic models against an in-process GeoServer, measuring the wall
+    clock and CPU seconds, the GeoServer requests and uploaded bytes, and the time in each traced stage.
+    """
+
+    def __init__(self, stages=None, repeat=1, trace_memory=False, manager_options=None):
+        """
+        Constructor
+
+        Args:
+            stages(list): names of the stages of STAGES to run. Defaults to None (all the stages).
+            repeat(int): number of runs of each stage, the fastest run is kept.
+            trace_memory(bool): record the peak memory traced by tracemalloc during each stage, which slows the
+                stages down. Defaults to False.
+            manager_options(dict): options of the ModflowSpatialManager (i.e. multi_band). Defaults to None.
+        """
+        names = [name for name, _, _ in STAGES]
+        unknown = set(stages or ()) - set(names)
+        if unknown:
+            raise ValueError('Unknown stages: {}.'.format(', '.join(sorted(unknown))))
+        self.stages = [stage for stage in STAGES if not stages or stage[0] in stages]
+        self.repeat = max(1, repeat)
+        self.trace_memory = trace_memory
+        self.manager_options = dict(manager_options or {})
+
+    def run(self, models, work_dir=None, progress=None):
+        """
+        Generate the models and run the stages.
+
+        Args:
+            models(list): the SyntheticModel to benchmark.
+            work_dir(str): directory of the model files. Defaults to None (temporary directory, removed afterwards).
+            progress(callable): function (model_key, stage, result) called after each stage. Defaults to None.
+        Returns:
+            dict: the run, to add to a BenchmarkHistory.
+        """
+        run = {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0).isoformat(),
+            'commit': get_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': self.repeat,
+            'options': self.manager_options,
+            'cases': {},
+        }
+        tmp_dir = None if work_dir else tempfile.mkdtemp(prefix='modflow_benchmark_')
+        started_tracemalloc = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start()
+        try:
+            for model in models:
+                model_dir = os.path.join(work_dir or tmp_dir, model.key)
+                started = time.perf_counter()
+                model.write(model_dir)
+                case = run['cases'][model.key] = {
+                    'model': model.to_dict(),
+                    'generate_seconds': time.perf_counter() - started,
+                    'stages': {},
+                }
+                manifest = None
+                for name, method, kwargs in self.stages:
+                    if name == 'create_all_unchanged' and manifest is None:
+                        # Needs the manifest of the create_all stage
+                        continue
+                    results = [self.run_stage(model_dir, model.name, method, kwargs,
+                                              manifest if name == 'create_all_unchanged' else None)
+                               for _ in range(self.repeat)]
+                    manifests = [result.pop('publish_manifest') for result in results]
+                    if name == 'create_all':
+                        manifest = manifests[-1]
+                    result = case['stages'][name] = min(results, key=lambda result: result['seconds'])
+                    if progress is not None:
+                        progress(model.key, name, result)
+        finally:
+            if started_tracemalloc:
+                tracemalloc.stop()
+            if tmp_dir:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        return run
+
+    def run_stage(self, model_dir, db_id, method, kwargs, publish_manifest=None):
+        """
+        Run a stage with a new manager, the model is loaded beforehand except for the load_model stage.
+
+        Args:
+            model_dir(str): directory of the model files.
+            db_id(str): id of the model file database.
+            method(str): method of the manager.
+            kwargs(dict): arguments of the method.
+            publish_manifest(dict): manifest of a previous publish. Defaults to None.
+        Returns:
+            dict: the measures of the stage, and the publish manifest of the manager.
+        """
+        geoserver = InProcessGeoServer()
+        tracer = Tracer()
+        with mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI', return_value=geoserver):
+            manager = ModflowSpatialManager(geoserver, ModelDirectory(model_dir, db_id), 'mf2005',
+                                            publish_manifest=publish_manifest,
+                                            publish_cache=PublishCache(projections={str(EPSG): PRJ}),
+                                            tracer=tracer, metrics=MetricsRegistry(), **self.manager_options)
+        result = {'seconds': None, 'cpu_seconds': None, 'error': None}
+        try:
+            if method != 'load_model':
+                load_model(manager)
+            geoserver.reset_counts()
+            tracer.clear()
+            if self.trace_memory:
+                tracemalloc.reset_peak()
+            started, cpu_started = time.perf_counter(), time.process_time()
+            try:
+                getattr(manager, method)(**kwargs)
+            except Exception as e:
+                result['error'] = '{}: {}'.format(type(e).__name__, e)
+            result['seconds'] = time.perf_counter() - started
+            result['cpu_seconds'] = time.process_time() - cpu_started
+            if self.trace_memory:
+                result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            manager.scratch.cleanup()
+        result.update(geoserver.get_counts())
+        result['layers'] = manager.publish_stats['layers']
+        result['spans'] = {span_name: {'count': stats['count'], 'seconds': stats['total']}
+                           for span_name, stats in tracer.get_summary().items()}
+        result['publish_manifest'] = manager.publish_manifest.to_dict()
+        return result
+
+
+def load_model(manager):
+    """
+    Load the model of a manager and resolve the EPSG code of its spatial reference offline: flopy sets the code of an
+    "EPSG:<code>" proj4 string when the string is read, setting the code itself fetches the projection online.
+    """
+    manager.load_model()
+    manager.flopy_model.sr.proj4_str
+    if manager.flopy_model.sr.epsg != EPSG:
+        raise ValueError('Spatial reference of the synthetic model not loaded: {}'.format(manager.flopy_model.sr))
+
+
+def get_commit():
+    """
+    Returns:
+        str: the git commit of the repository, None if it is not a git checkout.
+    """
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.decode('utf-8').strip()
+
+
+class BenchmarkHistory(object):
+    """
+    JSON file of the benchmark runs, to compare a run with the previous runs of the same models.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.runs = []
+        if os.path.isfile(path):
+            with open(path) as f:
+                self.runs = json.load(f)['runs']
+
+    def add(self, run):
+        self.runs.append(run)
+
+    def save(self):
+        tmp_path = '{}.tmp'.format(self.path)
+        with open(tmp_path, 'w') as f:
+            json.dump({'runs': self.runs}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def get_baseline(self, case_key, before=None):
+        """
+        Args:
+            case_key(str): key of the model (see SyntheticModel.key).
+            before(dict): run, the baseline is a run older than it. Defaults to None (any run).
+        Returns:
+            dict: the stages of the case in the latest run with the case, None if no run has it.
+        """
+        runs = self.runs[:self.runs.index(before)] if before in self.runs else self.runs
+        for run in reversed(runs):
+            if case_key in run['cases']:
+                return run['cases'][case_key]['stages']
+        return None
+
+
+def compare(history, run, threshold=1.25):
+    """
+    Compare the stages of a run with the latest previous run of each model.
+
+    Args:
+        history(BenchmarkHistory): the history.
+        run(dict): the run.
+        threshold(float): ratio of the seconds of a stage to the baseline above which the stage regressed.
+    Returns:
+        list: {'case', 'stage', 'baseline', 'seconds', 'ratio', 'requests', 'baseline_requests', 'regression'} of
+            each stage of the run.
+    """
+    rows = []
+    for case_key, case in sorted(run['cases'].items()):
+        baseline = history.get_baseline(case_key, before=run) or {}
+        for stage, result in case['stages'].items():
+            before = baseline.get(stage) or {}
+            ratio = None
+            if before.get('seconds') and result['seconds'] is not None:
+                ratio = result['seconds'] / before['seconds']
+            rows.append({
+                'case': case_key,
+                'stage': stage,
+                'baseline': before.get('seconds'),
+                'seconds': result['seconds'],
+                'ratio': ratio,
+                'requests': result['request_count'],
+                'baseline_requests': before.get('request_count'),
+                'regression': bool(result['error']) or (ratio is not None and ratio > threshold),
+            })
+    return rows
+
+
+def format_rows(rows):
+    """
+    Returns:
+        str: the comparison as a text table.
+    """
+    def seconds(value):
+        return '{:9.3f}'.format(value) if value is not None else '{:>9}'.format('-')
+
+    lines = ['{:<32} {:<34} {:>9} {:>9} {:>7} {:>9}'.format('case', 'stage', 'baseline', 'seconds', 'ratio',
+                                                            'requests')]
+    for row in rows:
+        ratio = '{:6.2f}x'.format(row['ratio']) if row['ratio'] is not None else '{:>7}'.format('-')
+        lines.append('{:<32} {:<34} {} {} {} {:>9}{}'.format(row['case'], row['stage'], seconds(row['baseline']),
+                                                             seconds(row['seconds']), ratio, row['requests'],
+                                                             '  REGRESSION' if row['regression'] else ''))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """
+    Entry point of the benchmarks: python -m tests.benchmarks --help
+
+    Args:
+        argv(list): command line arguments. Defaults to None (sys.argv).
+    Returns:
+        int: exit code, 1 if a stage failed or regressed with --fail-on-regression.
+    """
+    parser = argparse.ArgumentParser(prog='python -m tests.benchmarks',
+                                     description='Benchmark the publish stages on synthetic MODFLOW models.')
+    parser.add_argument('-s', '--size', action='append',
+                        help='model size <nrow>x<ncol>x<nlay>x<nper>, repeatable (default: {})'.format(
+                            ', '.join(DEFAULT_SIZES)))
+    parser.add_argument('--packages', default=','.join(DEFAULT_PACKAGES),
+                        help='comma separated packages among lpf, rch, wel, riv, ghb, chd (default: %(default)s)')
+    parser.add_argument('--no-outputs', action='store_true', help='do not write the head and budget files')
+    parser.add_argument('--stage', action='append', help='run only this stage, repeatable')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='runs of each stage, the fastest is kept')
+    parser.add_argument('--multi-band', action='store_true', help='publish Util3d attributes as multi-band GEOTIFFs')
+    parser.add_argument('--out-of-core', action='store_true', help='publish in the bounded memory mode')
+    parser.add_argument('--memory', action='store_true', help='record the peak traced memory of each stage')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON history file (default: %(default)s)')
+    parser.add_argument('--no-save', action='store_true', help='compare with the history without adding the run')
+    parser.add_argument('--label', help='label of the run in the history (i.e. the name of the change)')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio of a stage reported as a regression (default: %(default)s)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with 1 if a stage regressed')
+    parser.add_argument('--work-dir', help='keep the generated models in this directory')
+    args = parser.parse_args(argv)
+
+    packages = [package.strip().lower() for package in args.packages.split(',') if package.strip()]
+    models = [SyntheticModel.from_size(size, packages=packages, outputs=not args.no_outputs)
+              for size in args.size or DEFAULT_SIZES]
+    manager_options = {name: True for name in ('multi_band', 'out_of_core') if getattr(args, name)}
+    benchmark = Benchmark(stages=args.stage, repeat=args.repeat, trace_memory=args.memory,
+                          manager_options=manager_options)
+
+    def progress(case_key, stage, result):
+        status = 'failed: {}'.format(result['error']) if result['error'] else '{} requests, {} bytes'.format(
+            result['request_count'], result['bytes'])
+        print('{} {}: {:.3f} s, {}'.format(case_key, stage, result['seconds'], status))
+
+    run = benchmark.run(models, work_dir=args.work_dir, progress=progress)
+    run['label'] = args.label
+    history = BenchmarkHistory(args.history)
+    history.add(run)
+    rows = compare(history, run, threshold=args.threshold)
+    print(format_rows(rows))
+    if not args.no_save:
+        history.save()
+    failed = any(result['error'] for case in run['cases'].values() for result in case['stages'].values())
+    regressed = args.fail_on_regression and any(row['regression'] for row in rows)
+    return 1 if failed or regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+********************************************************************************
+* Name: fake_geoserver
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import glob
+import os
+import threading
+from collections import Counter
+
+
+class InProcessGeoServer(object):
+    """
+    Stand-in for the GeoServer engine and the GeoServer API of the spatial managers, keeping the stores, layers, layer
+    groups and styles in memory. Each call is counted as one request with the bytes of its uploaded files, the calls
+    the stand-in does not implement succeed without effect.
+    """
+    endpoint = 'http://127.0.0.1:8181/geoserver/rest/'
+    public_endpoint = endpoint
+    username = 'admin'
+    password = 'geoserver'
+
+    def __init__(self, workspace='modflow'):
+        """
+        Constructor
+
+        Args:
+            workspace(str): workspace of the stores returned by list_stores.
+        """
+        self.workspace = workspace
+        self.requests = Counter()
+        self.bytes = 0
+        self.stores = {}
+        self.layers = {}
+        self.layer_groups = {}
+        self.styles = set()
+        self._lock = threading.Lock()
+
+    def reset_counts(self):
+        """
+        Reset the request counts and bytes, keeping the published stores, layers and styles.
+        """
+        with self._lock:
+            self.requests = Counter()
+            self.bytes = 0
+
+    def get_counts(self):
+        """
+        Returns:
+            dict: the number of requests of each call, their total and the bytes uploaded.
+        """
+        with self._lock:
+            return {'requests': dict(self.requests), 'request_count': sum(self.requests.values()),
+                    'bytes': self.bytes}
+
+    # GeoServer engine
+    def create_workspace(self, workspace_id, uri, **kwargs):
+        return self._record('create_workspace')
+
+    def list_stores(self, workspace=None, **kwargs):
+        with self._lock:
+            stores = [store_id.split(':', 1)[1] for store_id in self.stores]
+        return self._record('list_stores', result=stores)
+
+    def create_coverage_resource(self, store_id, coverage_file=None, coverage_type=None, overwrite=False, **kwargs):
+        return self._create_store('create_coverage_resource', store_id, [coverage_file])
+
+    def create_shapefile_resource(self, store_id, shapefile_base=None, shapefile_zip=None, overwrite=False,
+                                  **kwargs):
+        files = [shapefile_zip] if shapefile_zip else glob.glob('{}.*'.format(shapefile_base))
+        return self._create_store('create_shapefile_resource', store_id, files)
+
+    def update_resource(self, resource_id, store=None, **kwargs):
+        return self._record('update_resource')
+
+    def update_layer(self, layer_id, default_style=None, **kwargs):
+        with self._lock:
+            if layer_id in self.layers:
+                self.layers[layer_id] = default_style
+        return self._record('update_layer')
+
+    def delete_resource(self, resource_id, store_id=None, **kwargs):
+        with self._lock:
+            self.stores.pop(resource_id, None)
+            self.layers.pop(resource_id, None)
+        return self._record('delete_resource')
+
+    def get_layer_group(self, layer_group_id, **kwargs):
+        with self._lock:
+            group = self.layer_groups.get(layer_group_id)
+            result = {'layers': list(group['layers']), 'styles': list(group['styles'])} if group else None
+        self._record('get_layer_group')
+        return {'success': result is not None, 'result': result}
+
+    def create_layer_group(self, layer_group_id, layers, styles, **kwargs):
+        with self._lock:
+            self.layer_groups[layer_group_id] = {'layers': list(layers), 'styles': list(styles)}
+        return self._record('create_layer_group')
+
+    def update_layer_group(self, layer_group_id, layers=None, styles=None, **kwargs):
+        with self._lock:
+            self.layer_groups[layer_group_id] = {'layers': list(layers or []), 'styles': list(styles or [])}
+        return self._record('update_layer_group')
+
+    def delete_layer_group(self, layer_group_id, **kwargs):
+        with self._lock:
+            self.layer_groups.pop(layer_group_id, None)
+        return self._record('delete_layer_group')
+
+    # GeoServer API
+    def create_style(self, workspace, style_name, sld_template, sld_context, overwrite=False, **kwargs):
+        with self._lock:
+            self.styles.add('{}:{}'.format(workspace, style_name))
+        return self._record('create_style')
+
+    def delete_style(self, workspace, style_name, purge=False, **kwargs):
+        with self._lock:
+            self.styles.discard('{}:{}'.format(workspace, style_name))
+        return self._record('delete_style')
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self._record(name)
+        return call
+
+    def _create_store(self, name, store_id, files):
+        nbytes = sum(os.path.getsize(path) for path in files if path and os.path.isfile(path))
+        with self._lock:
+            self.stores[store_id] = nbytes
+            self.layers[store_id] = None
+            self.bytes += nbytes
+        return self._record(name)
+
+    def _record(self, name, result=None):
+        with self._lock:
+            self.requests[name] += 1
+        return {'success': True, 'result': result}
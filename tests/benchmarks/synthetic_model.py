@@ -0,0 +1,237 @@
+"""
+********************************************************************************
+* Name: synthetic_model
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+
+import flopy
+import numpy as np
+
+# Packages of the synthetic models besides DIS, BAS6, OC and PCG
+PACKAGES = ('lpf', 'rch', 'wel', 'riv', 'ghb', 'chd')
+DEFAULT_PACKAGES = ('lpf', 'rch', 'wel', 'riv')
+
+# NAD83 / UTM zone 12N, its .prj text is given to the managers so that no projection is fetched from the internet
+EPSG = 26912
+PRJ = 'PROJCS["NAD_1983_UTM_Zone_12N",GEOGCS["GCS_North_American_1983",DATUM["D_North_American_1983",' \
+      'SPHEROID["GRS_1980",6378137.0,298.257222101]],PRIMEM["Greenwich",0.0],UNIT["Degree",0.0174532925199433]],' \
+      'PROJECTION["Transverse_Mercator"],PARAMETER["False_Easting",500000.0],PARAMETER["False_Northing",0.0],' \
+      'PARAMETER["Central_Meridian",-111.0],PARAMETER["Scale_Factor",0.9996],PARAMETER["Latitude_Of_Origin",0.0],' \
+      'UNIT["Meter",1.0]]'
+
+# Head of the inactive cells
+HNOFLO = -999.99
+
+# Binary records of the head and budget files (single precision, without Fortran record markers)
+HEAD_HEADER = np.dtype([('kstp', '<i4'), ('kper', '<i4'), ('pertim', '<f4'), ('totim', '<f4'), ('text', 'S16'),
+                        ('ncol', '<i4'), ('nrow', '<i4'), ('ilay', '<i4')])
+BUDGET_HEADER = np.dtype([('kstp', '<i4'), ('kper', '<i4'), ('text', 'S16'), ('ncol', '<i4'), ('nrow', '<i4'),
+                          ('nlay', '<i4')])
+BUDGET_TERMS = ('CONSTANT HEAD', 'FLOW RIGHT FACE', 'FLOW FRONT FACE', 'FLOW LOWER FACE', 'RECHARGE', 'WELLS')
+
+
+class SyntheticModel(object):
+    """
+    Generates a MODFLOW-2005 model of any size, with an irregular active area, transient packages and head and budget
+    output files written without running MODFLOW. The arrays are reproducible for a seed.
+    """
+
+    def __init__(self, nrow=100, ncol=100, nlay=3, nper=2, packages=DEFAULT_PACKAGES, outputs=True, cell_size=100.0,
+                 seed=0, name='synthetic'):
+        """
+        Constructor
+
+        Args:
+            nrow(int): number of rows.
+            ncol(int): number of columns.
+            nlay(int): number of layers.
+            nper(int): number of stress periods, only the periods of ModflowSpatialManager.STRESS_PERIOD_IMPORT are
+                published (i.e. 13 periods publish periods 1, 7, 8, 9 and 13).
+            packages(iterable): packages of PACKAGES in the model.
+            outputs(bool): write the head (.hds) and budget (.cbc) files. Defaults to True.
+            cell_size(float): width of the cells in meters.
+            seed(int): seed of the random values.
+            name(str): name of the model files.
+        """
+        unknown = set(packages) - set(PACKAGES)
+        if unknown:
+            raise ValueError('Unknown packages: {}.'.format(', '.join(sorted(unknown))))
+        self.nrow = nrow
+        self.ncol = ncol
+        self.nlay = nlay
+        self.nper = nper
+        self.packages = tuple(packages)
+        self.outputs = outputs
+        self.cell_size = cell_size
+        self.seed = seed
+        self.name = name
+
+    @classmethod
+    def from_size(cls, size, **kwargs):
+        """
+        Create a model from its size.
+
+        Args:
+            size(str): "<nrow>x<ncol>x<nlay>x<nper>" (i.e. "200x200x3x13").
+            kwargs: other arguments of the constructor.
+        Returns:
+            SyntheticModel: the model.
+        """
+        try:
+            nrow, ncol, nlay, nper = (int(value) for value in size.lower().split('x'))
+        except ValueError:
+            raise ValueError('Invalid model size "{}", expected <nrow>x<ncol>x<nlay>x<nper>.'.format(size))
+        return cls(nrow, ncol, nlay, nper, **kwargs)
+
+    @property
+    def key(self):
+        """
+        Identifier of the model in the benchmark history (i.e. "200x200x3x13-lpf+rch+wel+riv").
+        """
+        return '{}x{}x{}x{}-{}'.format(self.nrow, self.ncol, self.nlay, self.nper, '+'.join(self.packages) or 'none')
+
+    @property
+    def cells(self):
+        return self.nrow * self.ncol * self.nlay
+
+    def to_dict(self):
+        return {'nrow': self.nrow, 'ncol': self.ncol, 'nlay': self.nlay, 'nper': self.nper,
+                'packages': list(self.packages), 'outputs': self.outputs, 'cell_size': self.cell_size,
+                'seed': self.seed}
+
+    def get_ibound(self):
+        """
+        Returns:
+            np.ndarray: (nlay, nrow, ncol) ibound, active in an ellipse with a wavy edge and a constant head column.
+        """
+        rows, cols = np.mgrid[0:self.nrow, 0:self.ncol]
+        y = (rows + 0.5) / self.nrow * 2.0 - 1.0
+        x = (cols + 0.5) / self.ncol * 2.0 - 1.0
+        angle = np.arctan2(y, x)
+        active = x ** 2 + y ** 2 <= (0.9 + 0.08 * np.sin(5.0 * angle)) ** 2
+        ibound = np.repeat(active[np.newaxis].astype(np.int32), self.nlay, axis=0)
+        if 'chd' not in self.packages:
+            # Constant heads on the west edge of the active area
+            west = np.argmax(active, axis=1)
+            has_active = active.any(axis=1)
+            ibound[:, np.nonzero(has_active)[0], west[has_active]] = -1
+        return ibound
+
+    def get_top(self):
+        rows, cols = np.mgrid[0:self.nrow, 0:self.ncol]
+        return (100.0 + 20.0 * np.sin(rows / max(self.nrow, 1) * np.pi) + 10.0 * cols / max(self.ncol, 1)) \
+            .astype(np.float32)
+
+    def get_botm(self, top):
+        thickness = 100.0 / self.nlay
+        return np.stack([top - 20.0 - thickness * (k + 1) for k in range(self.nlay)]).astype(np.float32)
+
+    def get_heads(self, top, ibound, kper):
+        """
+        Returns:
+            np.ndarray: (nlay, nrow, ncol) heads of a stress period, HNOFLO in the inactive cells.
+        """
+        rows, cols = np.mgrid[0:self.nrow, 0:self.ncol]
+        heads = []
+        for k in range(self.nlay):
+            layer = top - 5.0 - 2.0 * k - 8.0 * cols / max(self.ncol, 1) - 0.5 * kper * np.cos(rows / 7.0)
+            heads.append(np.where(ibound[k] != 0, layer, HNOFLO))
+        return np.stack(heads).astype(np.float32)
+
+    def write(self, model_ws):
+        """
+        Write the model files.
+
+        Args:
+            model_ws(str): directory of the model files, created if it does not exist.
+        Returns:
+            list: names of the files in the directory.
+        """
+        if not os.path.isdir(model_ws):
+            os.makedirs(model_ws)
+        rng = np.random.RandomState(self.seed)
+        ibound = self.get_ibound()
+        top = self.get_top()
+        botm = self.get_botm(top)
+        cells = np.argwhere(ibound[0] > 0)
+
+        model = flopy.modflow.Modflow(self.name, model_ws=model_ws, version='mf2005')
+        flopy.modflow.ModflowDis(model, nlay=self.nlay, nrow=self.nrow, ncol=self.ncol, nper=self.nper,
+                                 delr=self.cell_size, delc=self.cell_size, top=top, botm=botm,
+                                 perlen=[30.0] * self.nper, nstp=1, steady=[True] + [False] * (self.nper - 1),
+                                 xul=400000.0, yul=4500000.0 + self.nrow * self.cell_size,
+                                 proj4_str='EPSG:{}'.format(EPSG))
+        flopy.modflow.ModflowBas(model, ibound=ibound, strt=top[np.newaxis].repeat(self.nlay, axis=0) - 5.0,
+                                 hnoflo=HNOFLO)
+        if 'lpf' in self.packages:
+            hk = np.exp(rng.normal(1.0, 0.5, (self.nlay, self.nrow, self.ncol))).astype(np.float32)
+            flopy.modflow.ModflowLpf(model, ipakcb=53, laytyp=[1] + [0] * (self.nlay - 1), hk=hk, vka=hk / 10.0,
+                                     sy=0.2, ss=1e-5)
+        if 'rch' in self.packages:
+            rech = {kper: (1e-4 * (1.0 + 0.5 * np.sin(kper)) * rng.uniform(0.5, 1.5, (self.nrow, self.ncol)))
+                    .astype(np.float32) for kper in range(self.nper)}
+            flopy.modflow.ModflowRch(model, ipakcb=53, rech=rech)
+        if 'wel' in self.packages:
+            wells = cells[rng.choice(len(cells), size=min(len(cells), max(1, len(cells) // 400)), replace=False)]
+            flopy.modflow.ModflowWel(model, ipakcb=53, stress_period_data={
+                kper: [[int(rng.randint(self.nlay)), int(i), int(j), float(-rng.uniform(100.0, 1000.0))]
+                       for i, j in wells] for kper in range(self.nper)})
+        if 'riv' in self.packages:
+            river = self._get_line(cells, 0.5)
+            flopy.modflow.ModflowRiv(model, ipakcb=53, stress_period_data={
+                kper: [[0, int(i), int(j), float(top[i, j] - 2.0 - 0.1 * kper), 50.0, float(top[i, j] - 6.0)]
+                       for i, j in river] for kper in range(self.nper)})
+        if 'ghb' in self.packages:
+            flopy.modflow.ModflowGhb(model, ipakcb=53, stress_period_data={
+                kper: [[self.nlay - 1, int(i), int(j), float(top[i, j] - 15.0), 10.0]
+                       for i, j in self._get_line(cells, 0.8)] for kper in range(self.nper)})
+        if 'chd' in self.packages:
+            flopy.modflow.ModflowChd(model, stress_period_data={
+                kper: [[k, int(i), int(j), float(top[i, j] - 5.0), float(top[i, j] - 5.0)]
+                       for k in range(self.nlay) for i, j in self._get_line(cells, 0.2)] for kper in range(self.nper)})
+        flopy.modflow.ModflowOc(model, compact=False, stress_period_data={
+            (kper, 0): ['save head', 'save budget'] for kper in range(self.nper)})
+        flopy.modflow.ModflowPcg(model)
+        model.write_input()
+
+        if self.outputs:
+            self.write_heads(os.path.join(model_ws, '{}.hds'.format(self.name)), top, ibound)
+            self.write_budget(os.path.join(model_ws, '{}.cbc'.format(self.name)), rng)
+        return sorted(os.listdir(model_ws))
+
+    def write_heads(self, path, top, ibound):
+        """
+        Write the binary head file, one record per layer and stress period.
+        """
+        with open(path, 'wb') as f:
+            for kper in range(self.nper):
+                heads = self.get_heads(top, ibound, kper)
+                for k in range(self.nlay):
+                    header = np.array([(1, kper + 1, 30.0, 30.0 * (kper + 1), '{:>16}'.format('HEAD'), self.ncol,
+                                        self.nrow, k + 1)], dtype=HEAD_HEADER)
+                    f.write(header.tobytes())
+                    f.write(heads[k].tobytes())
+
+    def write_budget(self, path, rng):
+        """
+        Write the binary cell by cell budget file (full 3D arrays), one record per budget term and stress period.
+        """
+        shape = (self.nlay, self.nrow, self.ncol)
+        with open(path, 'wb') as f:
+            for kper in range(self.nper):
+                for term in BUDGET_TERMS:
+                    header = np.array([(1, kper + 1, '{:>16}'.format(term), self.ncol, self.nrow, self.nlay)],
+                                      dtype=BUDGET_HEADER)
+                    f.write(header.tobytes())
+                    f.write(rng.normal(0.0, 10.0, shape).astype(np.float32).tobytes())
+
+    def _get_line(self, cells, fraction):
+        """
+        Active cells of the first layer in the column at a fraction of the width of the grid.
+        """
+        column = int(self.ncol * fraction)
+        return [(i, j) for i, j in cells if j == column]
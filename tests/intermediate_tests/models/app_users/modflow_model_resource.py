@@ -8,6 +8,7 @@
 """
 import datetime
 import unittest
+from sqlalchemy import text
 from sqlalchemy.engine import create_engine
 from sqlalchemy.orm.session import Session
 
@@ -76,3 +77,106 @@ class ModflowModelResourceTests(unittest.TestCase):
             self.assertEqual(resource.type, ModflowModelResource.TYPE)
             self.assertEqual(resource.DISPLAY_TYPE_SINGULAR, ModflowModelResource.DISPLAY_TYPE_SINGULAR)
             self.assertEqual(resource.DISPLAY_TYPE_PLURAL, ModflowModelResource.DISPLAY_TYPE_PLURAL)
+
+    def test_publish_manifest(self):
+        resource = ModflowModelResource(
+            name=self.name,
+            description=self.description,
+            created_by=self.created_by,
+            date_created=self.creation_date,
+        )
+        self.assertEqual({}, resource.get_publish_manifest())
+
+        manifest = {'layers': {'modflow:foo': {'hash': 'abc', 'style': 'bar', 'spatial_reference': '2901:def'}}}
+        resource.set_publish_manifest(manifest)
+        self.session.add(resource)
+        self.session.commit()
+
+        resource = self.session.query(ModflowModelResource).one()
+        self.assertEqual(manifest, resource.get_publish_manifest())
+
+    def test_get_by_database_id(self):
+        resource = ModflowModelResource(
+            name=self.name,
+            description=self.description,
+            created_by=self.created_by,
+            date_created=self.creation_date,
+        )
+        resource.set_attribute('database_id', 'abc_123')
+        self.assertEqual('abc_123', resource.database_id)
+        self.session.add(resource)
+        self.session.commit()
+
+        ret = ModflowModelResource.get_by_database_id(self.session, 'abc_123')
+        self.assertEqual(resource.id, ret.id)
+        self.assertIsNone(ModflowModelResource.get_by_database_id(self.session, 'foo'))
+
+    def test_index_attributes(self):
+        resource = ModflowModelResource(
+            name=self.name,
+            description=self.description,
+            created_by=self.created_by,
+            date_created=self.creation_date,
+        )
+        resource.set_attribute('database_id', 'abc_123')
+        resource.set_attribute('model_extents', '[0, 0, 1, 1]')
+        resource.database_id = None
+        resource.set_extent(None)
+        self.session.add(resource)
+        self.session.commit()
+
+        self.assertEqual(1, ModflowModelResource.index_attributes(self.session))
+        self.assertEqual(resource.id, ModflowModelResource.get_by_database_id(self.session, 'abc_123').id)
+        self.assertEqual(1.0, resource.extent_max_y)
+
+    def test_index_attributes_without_extent(self):
+        resource = ModflowModelResource(
+            name=self.name,
+            description=self.description,
+            created_by=self.created_by,
+            date_created=self.creation_date,
+        )
+        resource.set_attribute('database_id', 'abc_123')
+        resource.database_id = None
+        self.session.add(resource)
+        self.session.commit()
+
+        # Only the database_id is copied, the resource without extent is not updated again
+        self.assertEqual(1, ModflowModelResource.index_attributes(self.session))
+        self.assertEqual('abc_123', resource.database_id)
+        self.assertIsNone(resource.extent_min_x)
+        self.assertEqual(0, ModflowModelResource.index_attributes(self.session))
+
+    def test_upgrade_schema(self):
+        self.assertEqual([], ModflowModelResource.upgrade_schema(connection))
+
+        # Resources table of a database created before the indexed columns existed
+        table_name = ModflowModelResource.__table__.name
+        connection.execute(text('ALTER TABLE {} DROP COLUMN database_id'.format(table_name)))
+        self.assertEqual(['database_id', 'ix_{}_database_id'.format(table_name)],
+                         ModflowModelResource.upgrade_schema(connection))
+        self.assertIsNone(ModflowModelResource.get_by_database_id(self.session, 'abc_123'))
+
+    def test_query_by_extent(self):
+        extents = {'west': [-10, 0, -5, 5], 'east': [5, 0, 10, 5], 'none': None}
+        for database_id, model_extents in extents.items():
+            resource = ModflowModelResource(
+                name=database_id,
+                description=self.description,
+                created_by=self.created_by,
+                date_created=self.creation_date,
+            )
+            resource.set_attribute('database_id', database_id)
+            if model_extents is not None:
+                resource.set_attribute('model_extents', model_extents)
+            self.session.add(resource)
+        self.session.commit()
+
+        ret = ModflowModelResource.query_by_extent(self.session, [-6, 1, 0, 2], ModflowModelResource.database_id)
+        self.assertEqual([('west',)], ret.all())
+
+        ret = ModflowModelResource.query_by_extent(self.session, [-20, -20, 20, 20]).all()
+        self.assertEqual(['east', 'west'], sorted(resource.database_id for resource in ret))
+
+        ret = ModflowModelResource.query_by_extent(self.session, [20, 20, 30, 30]).all()
+        self.assertEqual([], ret)
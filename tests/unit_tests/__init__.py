@@ -7,3 +7,20 @@
 ********************************************************************************
 """
 from tests.unit_tests.services.modflow_spatial_manager import ModflowSpatialManagerTests  # noqa: F401
+from tests.unit_tests.services.publish_manifest import PublishManifestTests  # noqa: F401
+from tests.unit_tests.services.layer_statistics import LayerStatisticsTests  # noqa: F401
+from tests.unit_tests.services.derived_layers import DerivedLayersTests  # noqa: F401
+from tests.unit_tests.services.raster_encoding import RasterEncodingTests  # noqa: F401
+from tests.unit_tests.services.coordinate_transform import CoordinateTransformTests  # noqa: F401
+from tests.unit_tests.services.layer_group_manager import LayerGroupManagerTests  # noqa: F401
+from tests.unit_tests.services.geoserver_publisher import GeoServerPublisherTests  # noqa: F401
+from tests.unit_tests.services.async_geoserver_publisher import AsyncGeoServerPublisherTests  # noqa: F401
+from tests.unit_tests.services.task_scheduler import TaskSchedulerTests  # noqa: F401
+from tests.unit_tests.services.scratch_space import ScratchSpaceTests  # noqa: F401
+from tests.unit_tests.services.tracing import TracingTests  # noqa: F401
+from tests.unit_tests.services.metrics import MetricsTests  # noqa: F401
+from tests.unit_tests.services.out_of_core import OutOfCoreTests  # noqa: F401
+from tests.unit_tests.services.shared_arrays import SharedArraysTests  # noqa: F401
+from tests.unit_tests.workflows.publish_jobs import PublishJobQueueTests  # noqa: F401
+from tests.unit_tests.workflows.publish_worker import PublishWorkerTests  # noqa: F401
+from tests.unit_tests.workflows.batch_publish import BatchPublishTests  # noqa: F401
@@ -0,0 +1,165 @@
+"""
+********************************************************************************
+* Name: async_geoserver_publisher
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import mock
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile
+
+from modflow_adapter.services.async_geoserver_publisher import AsyncGeoServerPublisher
+from modflow_adapter.services.geoserver_publisher import GeoServerPublishError
+from tests.unit_tests.utilities import FakeGeoServer
+
+
+class AsyncGeoServerPublisherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.server = FakeGeoServer().start()
+        self.gs_engine = mock.MagicMock(endpoint=self.server.endpoint, username='admin', password='geoserver')
+        self.staging_dir = os.path.join(self.tmp_dir, 'staging')
+        os.mkdir(self.staging_dir)
+        self.publisher = AsyncGeoServerPublisher(self.gs_engine, 'modflow', staging_dir=self.staging_dir,
+                                                 max_in_flight=4, retry_delay=0.01)
+        self.sld_template = os.path.join(self.tmp_dir, 'style.sld')
+        with open(self.sld_template, 'w') as f:
+            f.write('<Band>{{ band }}</Band>')
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def _zip(self, name):
+        zip_path = os.path.join(self.tmp_dir, '{}.zip'.format(name))
+        with zipfile.ZipFile(zip_path, 'w') as zipf:
+            zipf.writestr(name + '.tif', 'data')
+        return zip_path
+
+    def test_flush_layers_and_styles(self):
+        self.server.delay = 0.05
+        self.publisher.create_style('modflow', 'modflow_raster_band_001', self.sld_template, {'band': 1})
+        for n in range(8):
+            self.publisher.publish_coverage('modflow:layer_{}'.format(n), self._zip('layer_{}'.format(n)),
+                                            'EPSG:2901', 'modflow_raster_band_001',
+                                            projection_policy='FORCE_DECLARED')
+        self.assertEqual({'modflow_raster_band_001'}, self.publisher.staged_styles)
+
+        ret = self.publisher.flush()
+
+        self.assertEqual(['modflow:layer_{}'.format(n) for n in range(8)], ret)
+        self.assertEqual('<Band>1</Band>', self.server.styles['modflow_raster_band_001'])
+        self.assertEqual(8, len(self.server.stores))
+        self.assertEqual({'modflow_raster_band_001'}, set(self.server.layers.values()))
+        self.assertEqual({'coverage': {'srs': 'EPSG:2901', 'enabled': True, 'projectionPolicy': 'FORCE_DECLARED'}},
+                         self.server.resources['layer_0'])
+
+        # The requests overlap without exceeding the limit of the client
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLessEqual(self.server.max_in_flight, 4)
+
+        # Nothing is left to submit
+        self.assertEqual([], self.publisher.flush())
+
+    def test_flush_staged_files(self):
+        zip_path = self._zip('layer')
+        with open(zip_path, 'rb') as f:
+            zip_data = f.read()
+        self.publisher.publish_coverage('modflow:layer', zip_path, 'EPSG:2901', 'modflow_raster')
+        os.remove(zip_path)
+
+        # The layer is staged as a file of the staging directory until it is uploaded
+        staged = [os.path.join(root, name) for root, _, names in os.walk(self.staging_dir) for name in names]
+        self.assertEqual(1, len(staged))
+        self.assertEqual(staged[0], self.publisher._layers[0][2])
+
+        self.publisher.flush()
+        self.assertEqual(zip_data, self.server.stores[('coveragestores', 'layer')])
+        self.assertEqual([], os.listdir(self.staging_dir))
+
+    def test_flush_stage_concurrently(self):
+        self.server.delay = 0.2
+        self.publisher.publish_coverage('modflow:layer_1', self._zip('layer_1'), 'EPSG:2901', 'modflow_raster')
+        flush = threading.Thread(target=self.publisher.flush)
+        flush.start()
+        while self.publisher._layers:
+            flush.join(0.01)
+
+        # A layer is staged while the flush is submitting, for the next flush
+        self.publisher.publish_coverage('modflow:layer_2', self._zip('layer_2'), 'EPSG:2901', 'modflow_raster')
+        self.assertTrue(flush.is_alive())
+        flush.join()
+        self.assertEqual([('coveragestores', 'layer_1')], list(self.server.stores))
+        self.assertEqual(['modflow:layer_2'], self.publisher.flush())
+
+    def test_flush_overwrite_style(self):
+        self.server.styles['modflow_raster_band_001'] = 'old'
+        self.publisher.create_style('modflow', 'modflow_raster_band_001', self.sld_template, {'band': 2},
+                                    overwrite=True)
+        self.publisher.flush()
+        self.assertEqual('<Band>2</Band>', self.server.styles['modflow_raster_band_001'])
+
+    def test_flush_deletions(self):
+        self.server.stores[('datastores', 'contour')] = b''
+        self.server.stores[('coveragestores', 'raster')] = b''
+        self.server.styles['raster_classes'] = 'sld'
+        with self.publisher.batch():
+            self.publisher.delete_resource('modflow:contour')
+            self.publisher.delete_resource('modflow:raster')
+            self.publisher.delete_resource('modflow:missing')
+            self.publisher.delete_style('modflow', 'raster_classes', purge=True)
+            self.assertEqual([], self.server.requests)
+        self.assertEqual({}, self.server.stores)
+        self.assertEqual({}, self.server.styles)
+
+    def test_flush_deletions_failure(self):
+        on_deleted = mock.MagicMock()
+        self.publisher.on_deleted = on_deleted
+        self.server.stores[('datastores', 'contour')] = b''
+        self.server.fail_statuses = [400]
+        self.publisher.delete_resource('modflow:contour')
+        self.assertRaises(GeoServerPublishError, self.publisher.flush)
+
+        # The store was not deleted, it is not reported
+        on_deleted.assert_not_called()
+        self.assertIn(('datastores', 'contour'), self.server.stores)
+
+        self.publisher.delete_resource('modflow:contour')
+        self.publisher.flush()
+        on_deleted.assert_called_once_with(['modflow:contour'])
+
+    def test_flush_retry(self):
+        self.server.fail_statuses = [503, 502]
+        self.publisher.publish_coverage('modflow:layer', self._zip('layer'), 'EPSG:2901', 'modflow_raster')
+        self.publisher.flush()
+        self.assertIn(('coveragestores', 'layer'), self.server.stores)
+        uploads = [method for method, path, _ in self.server.requests if path.endswith('file.geotiff')]
+        self.assertEqual(['put', 'put', 'put'], uploads)
+
+    def test_flush_client_error(self):
+        self.server.fail_statuses = [400]
+        self.publisher.publish_coverage('modflow:layer', self._zip('layer'), 'EPSG:2901', 'modflow_raster')
+        self.assertRaises(GeoServerPublishError, self.publisher.flush)
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_flush_partial_failure(self):
+        on_published = mock.MagicMock()
+        self.publisher.on_published = on_published
+        self.server.fail_statuses = [400]
+        self.publisher.publish_coverage('modflow:layer_0', self._zip('layer_0'), 'EPSG:2901', 'modflow_raster')
+        self.publisher.publish_coverage('modflow:layer_1', self._zip('layer_1'), 'EPSG:2901', 'modflow_raster')
+
+        self.assertRaises(GeoServerPublishError, self.publisher.flush)
+
+        # One of the uploads fails, the other layer is published and reported
+        on_published.assert_called_once()
+        published = on_published.call_args[0][0]
+        self.assertEqual(1, len(published))
+        self.assertEqual([('coveragestores', published[0].split(':')[1])], list(self.server.stores))
@@ -0,0 +1,49 @@
+"""
+********************************************************************************
+* Name: coordinate_transform
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import unittest
+import numpy as np
+
+from modflow_adapter.services.coordinate_transform import get_transformer, transform, transform_points
+
+
+class CoordinateTransformTests(unittest.TestCase):
+
+    def setUp(self):
+        get_transformer.cache_clear()
+
+    def tearDown(self):
+        get_transformer.cache_clear()
+
+    def test_transform_scalar(self):
+        x, y = transform(-93.0, 45.0, '4326', '3857')
+        self.assertAlmostEqual(-10352712.64, x, places=1)
+        self.assertAlmostEqual(5621521.49, y, places=1)
+
+    def test_transform_arrays(self):
+        x, y = transform(np.array([-93.0, 0.0]), [45.0, 0.0], 4326, 3857)
+        self.assertEqual((2,), x.shape)
+        self.assertAlmostEqual(-10352712.64, x[0], places=1)
+        self.assertAlmostEqual(0.0, y[1], places=6)
+
+    def test_transform_proj4(self):
+        x, y = transform(500000.0, 0.0, '+proj=utm +zone=15 +datum=WGS84 +units=m +no_defs', '4326')
+        self.assertAlmostEqual(-93.0, x, places=6)
+        self.assertAlmostEqual(0.0, y, places=6)
+
+    def test_transform_cached_transformer(self):
+        transform(-93.0, 45.0, '4326', '3857')
+        transform([-93.0], [45.0], 4326, 3857)
+        cache_info = get_transformer.cache_info()
+        self.assertEqual(1, cache_info.misses)
+        self.assertEqual(1, cache_info.hits)
+
+    def test_transform_points(self):
+        ret = transform_points([[-93.0, 45.0], [0.0, 0.0], [10.0, 10.0]], '4326', '3857')
+        self.assertEqual((3, 2), ret.shape)
+        np.testing.assert_allclose([0.0, 0.0], ret[1], atol=1e-6)
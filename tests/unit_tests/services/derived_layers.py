@@ -0,0 +1,43 @@
+"""
+********************************************************************************
+* Name: derived_layers
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import unittest
+import numpy as np
+
+from modflow_adapter.services.derived_layers import DerivedLayer, SIGN_SPLIT, compute_derived_values, \
+    split_derived_tag
+
+
+class DerivedLayersTests(unittest.TestCase):
+
+    def setUp(self):
+        self.values = np.array([-3.0, 0.0, 2.5, -0.5, 4.0])
+
+    def test_compute_derived_values_sign_split(self):
+        ret = dict((derived_layer.tag, values) for derived_layer, values in
+                   compute_derived_values(self.values, SIGN_SPLIT))
+        np.testing.assert_array_equal([0.0, 0.0, 2.5, 0.0, 4.0], ret['customtagpos'])
+        np.testing.assert_array_equal([3.0, 0.0, 0.0, 0.5, 0.0], ret['customtagneg'])
+
+        # The values of the attribute are not modified
+        np.testing.assert_array_equal([-3.0, 0.0, 2.5, -0.5, 4.0], self.values)
+
+    def test_compute_derived_values_custom(self):
+        above = DerivedLayer(tag='above', index=0, minimum=1.0, maximum=None, absolute=False, condition='{} > 1')
+        ret = compute_derived_values(self.values, (above,))
+        self.assertEqual(above, ret[0][0])
+        np.testing.assert_array_equal([1.0, 1.0, 2.5, 1.0, 4.0], ret[0][1])
+
+    def test_split_derived_tag(self):
+        name, derived_layer = split_derived_tag('fluxcustomtagneg-wel', SIGN_SPLIT)
+        self.assertEqual('flux-wel', name)
+        self.assertEqual(0, derived_layer.index)
+        self.assertEqual('flux < 0', derived_layer.condition.format('flux'))
+
+    def test_split_derived_tag_no_tag(self):
+        self.assertEqual(('strt-bas6', None), split_derived_tag('strt-bas6', SIGN_SPLIT))
@@ -0,0 +1,130 @@
+"""
+********************************************************************************
+* Name: geoserver_publisher
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import mock
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from modflow_adapter.services.geoserver_publisher import EngineGeoServerPublisher, GeoServerPublishError, \
+    ImporterGeoServerPublisher
+from modflow_adapter.services.tracing import Tracer
+from tests.unit_tests.utilities import RecordingGeoServer
+
+
+class GeoServerPublisherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.gs_engine = mock.MagicMock(endpoint='http://localhost:8181/geoserver/rest/')
+        self.server = RecordingGeoServer()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _zip(self, name, extensions):
+        zip_path = os.path.join(self.tmp_dir, '{}.zip'.format(name))
+        with zipfile.ZipFile(zip_path, 'w') as zipf:
+            for extension in extensions:
+                zipf.writestr(name + extension, 'data of {}{}'.format(name, extension))
+        return zip_path
+
+    def test_engine_publish_coverage(self):
+        publisher = EngineGeoServerPublisher(self.gs_engine)
+        publisher.publish_coverage('modflow:layer', 'layer.zip', 'EPSG:2901', 'modflow_raster',
+                                   projection_policy='FORCE_DECLARED')
+        self.gs_engine.create_coverage_resource.assert_called_with('modflow:layer', overwrite=True,
+                                                                   coverage_file='layer.zip', coverage_type='geotiff')
+        self.gs_engine.update_layer.assert_called_with(layer_id='modflow:layer', default_style='modflow_raster')
+        self.gs_engine.update_resource.assert_called_with(resource_id='modflow:layer', projection='EPSG:2901',
+                                                          enabled=True, projection_policy='FORCE_DECLARED')
+        self.assertEqual([], publisher.flush())
+
+    def test_engine_tracer(self):
+        tracer = Tracer()
+        self.gs_engine.create_coverage_resource.side_effect = IOError('GeoServer timeout')
+        publisher = EngineGeoServerPublisher(self.gs_engine, gs_api=mock.MagicMock(), tracer=tracer)
+        publisher.create_style('modflow', 'modflow_raster', 'raster.sld', {})
+        self.assertRaises(IOError, publisher.publish_coverage, 'modflow:layer', 'layer.zip', 'EPSG:2901',
+                          'modflow_raster')
+
+        style, coverage = tracer.get_spans()
+        self.assertEqual('geoserver.create_style', style.name)
+        self.assertEqual({'style_name': 'modflow_raster'}, style.attributes)
+        self.assertEqual('geoserver.publish_coverage', coverage.name)
+        self.assertEqual({'geoserver_store': 'modflow:layer'}, coverage.attributes)
+        self.assertEqual('OSError: GeoServer timeout', coverage.error)
+
+    def test_engine_publish_shapefile_default_style_callback(self):
+        set_default_style = mock.MagicMock()
+        publisher = EngineGeoServerPublisher(self.gs_engine, set_default_style=set_default_style)
+        publisher.publish_shapefile('modflow:contour', None, 'head_contour', shapefile_base='contour')
+        self.gs_engine.create_shapefile_resource.assert_called_with('modflow:contour', overwrite=True,
+                                                                    shapefile_base='contour')
+        set_default_style.assert_called_with('modflow:contour', 'head_contour')
+        self.gs_engine.update_layer.assert_not_called()
+        self.gs_engine.update_resource.assert_not_called()
+
+    def test_importer_flush(self):
+        publisher = ImporterGeoServerPublisher(self.gs_engine, 'modflow', session=self.server,
+                                               staging_dir=self.tmp_dir)
+        publisher.publish_coverage('modflow:model_DIS-top', self._zip('tmp_top', ['.tif', '.prj']), 'EPSG:2901',
+                                   'modflow_raster')
+        publisher.publish_coverage('modflow:model_DIS-botm', self._zip('tmp_botm', ['.tif', '.prj']), 'EPSG:2901',
+                                   'model_DIS-botm_raster_classes')
+        shapefile_base = os.path.join(self.tmp_dir, 'contour')
+        for extension in ('.shp', '.shx', '.dbf'):
+            with open(shapefile_base + extension, 'w') as f:
+                f.write(extension)
+        publisher.publish_shapefile('modflow:model_head_contour_001', None, 'head_contour',
+                                    shapefile_base=shapefile_base)
+        self.assertEqual({'modflow_raster', 'model_DIS-botm_raster_classes', 'head_contour'},
+                         publisher.staged_styles)
+
+        ret = publisher.flush()
+
+        self.assertEqual(['modflow:model_DIS-top', 'modflow:model_DIS-botm', 'modflow:model_head_contour_001'], ret)
+
+        # One import, one upload, one request per layer and one request to run the import and check it
+        self.assertEqual(['post', 'post', 'put', 'put', 'put', 'post', 'get'],
+                         [method for method, _, _, _ in self.server.requests])
+        self.assertEqual({'import': {'targetWorkspace': {'workspace': {'name': 'modflow'}}}},
+                         self.server.requests[0][2])
+        self.assertEqual(['model_DIS-top.tif', 'model_DIS-top.prj', 'model_DIS-botm.tif', 'model_DIS-botm.prj',
+                          'model_head_contour_001.shp', 'model_head_contour_001.shx', 'model_head_contour_001.dbf'],
+                         self.server.uploads[0])
+
+        tasks = list(self.server.imports[0].values())
+        self.assertEqual(['COMPLETE'] * 3, [task['state'] for task in tasks])
+        self.assertEqual(['REPLACE'] * 3, [task['updateMode'] for task in tasks])
+        self.assertEqual({'name': 'model_DIS-botm', 'srs': 'EPSG:2901',
+                          'style': {'name': 'model_DIS-botm_raster_classes'}}, tasks[1]['layer'])
+        self.assertNotIn('srs', tasks[2]['layer'])
+
+        # The staged files are removed and nothing is left to publish
+        self.assertEqual(sorted(['tmp_top.zip', 'tmp_botm.zip', 'contour.shp', 'contour.shx', 'contour.dbf']),
+                         sorted(os.listdir(self.tmp_dir)))
+        self.assertEqual([], publisher.flush())
+        self.assertEqual(7, len(self.server.requests))
+
+    def test_importer_flush_failed_layer(self):
+        self.server.fail_layers.add('model_DIS-top')
+        on_published = mock.MagicMock()
+        publisher = ImporterGeoServerPublisher(self.gs_engine, 'modflow', session=self.server,
+                                               staging_dir=self.tmp_dir, on_published=on_published)
+        publisher.publish_coverage('modflow:model_DIS-top', self._zip('tmp_top', ['.tif', '.prj']), 'EPSG:2901',
+                                   'modflow_raster')
+        publisher.publish_coverage('modflow:model_DIS-botm', self._zip('tmp_botm', ['.tif', '.prj']), 'EPSG:2901',
+                                   'modflow_raster')
+        self.assertRaises(GeoServerPublishError, publisher.flush)
+        self.assertEqual(set(), publisher.staged_styles)
+
+        # The layers that were published are reported
+        on_published.assert_called_once_with(['modflow:model_DIS-botm'])
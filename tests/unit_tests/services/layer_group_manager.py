@@ -0,0 +1,122 @@
+"""
+********************************************************************************
+* Name: layer_group_manager
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import mock
+import unittest
+
+from modflow_adapter.services.layer_group_manager import LayerGroupManager, LayerGroupUpdateError
+
+
+class FakeLayerGroups(object):
+    """
+    Layer groups of a GeoServer engine, with an optional concurrent writer that overwrites the next writes.
+    """
+
+    def __init__(self):
+        self.groups = {}
+        self.overwrites = 0
+        self.writes = 0
+
+    def get_layer_group(self, layer_group_id):
+        if layer_group_id not in self.groups:
+            return {'success': False, 'result': {}}
+        layers, styles = self.groups[layer_group_id]
+        return {'success': True, 'result': {'layers': list(layers), 'styles': list(styles)}}
+
+    def update_layer_group(self, layer_group_id, layers, styles, **kwargs):
+        self.writes += 1
+        if self.overwrites:
+            # The concurrent writer overwrites the group with the version it read before this write
+            self.overwrites -= 1
+            return
+        self.groups[layer_group_id] = (list(layers), list(styles))
+
+    create_layer_group = update_layer_group
+
+    def delete_layer_group(self, layer_group_id, **kwargs):
+        self.groups.pop(layer_group_id)
+
+
+class LayerGroupManagerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeLayerGroups()
+        self.gs_engine = mock.MagicMock(wraps=self.fake)
+        self.manager = LayerGroupManager(self.gs_engine, retry_delay=0)
+        self.group = 'modflow:model_boundary'
+
+    def test_flush_batches_changes(self):
+        self.fake.groups[self.group] = (['ex_layer', 'old_layer'], ['ex_style', 'old_style'])
+        self.manager.add_layer(self.group, 'new_boundary', 'model_boundary')
+        self.manager.add_layer(self.group, 'new_grid', 'model_grid')
+        self.manager.remove_layer(self.group, 'modflow:old_layer')
+
+        self.assertEqual([self.group], self.manager.flush())
+        self.assertEqual(1, self.fake.writes)
+        self.assertEqual((['ex_layer', 'new_boundary', 'new_grid'], ['ex_style', 'model_boundary', 'model_grid']),
+                         self.fake.groups[self.group])
+
+        # Nothing is pending after the flush
+        self.assertEqual([], self.manager.flush())
+
+    def test_flush_create_group(self):
+        self.manager.bounds = ['0', '1', '0', '1', '4326']
+        self.manager.add_layer(self.group, 'new_boundary', 'model_boundary')
+        self.manager.flush()
+        self.gs_engine.create_layer_group.assert_called_with(layer_group_id=self.group, layers=('new_boundary',),
+                                                             styles=('model_boundary',),
+                                                             bounds=['0', '1', '0', '1', '4326'])
+
+    def test_flush_no_change(self):
+        self.fake.groups[self.group] = (['ex_layer'], ['ex_style'])
+        self.manager.add_layer(self.group, 'modflow:ex_layer', 'ex_style')
+        self.manager.remove_layer(self.group, 'missing_layer')
+        self.assertEqual([], self.manager.flush())
+        self.assertEqual(0, self.fake.writes)
+
+    def test_flush_remove_last_layer(self):
+        self.fake.groups[self.group] = (['ex_layer'], ['ex_style'])
+        self.manager.remove_layer(self.group, 'ex_layer')
+        self.manager.flush()
+        self.assertNotIn(self.group, self.fake.groups)
+
+    def test_flush_retry_concurrent_update(self):
+        self.fake.groups[self.group] = (['ex_layer'], ['ex_style'])
+        self.fake.overwrites = 2
+        self.manager.add_layer(self.group, 'new_layer', 'new_style')
+        self.manager.flush()
+        self.assertEqual(3, self.fake.writes)
+        self.assertEqual((['ex_layer', 'new_layer'], ['ex_style', 'new_style']), self.fake.groups[self.group])
+
+    def test_flush_retry_exhausted(self):
+        self.fake.groups[self.group] = (['ex_layer'], ['ex_style'])
+        self.fake.overwrites = LayerGroupManager.MAX_RETRIES + 1
+        self.manager.add_layer(self.group, 'new_layer', 'new_style')
+        self.assertRaises(LayerGroupUpdateError, self.manager.flush)
+
+    def test_get_group_name_shards(self):
+        manager = LayerGroupManager(self.gs_engine, shards=16)
+        group_names = manager.get_group_names(self.group)
+        self.assertEqual(16, len(group_names))
+        self.assertEqual('modflow:model_boundary_00', group_names[0])
+
+        shard = manager.get_group_name(self.group, shard_key='123_456')
+        self.assertIn(shard, group_names)
+        self.assertEqual(shard, manager.get_group_name(self.group, shard_key='123_456'))
+
+        # Without sharding the layer group is used for all the keys
+        self.assertEqual(self.group, self.manager.get_group_name(self.group, shard_key='123_456'))
+
+    def test_add_layer_shards(self):
+        manager = LayerGroupManager(self.gs_engine, shards=4, retry_delay=0)
+        for shard_key in ('a', 'b', 'c', 'd', 'e'):
+            manager.add_layer(self.group, '{}_model_boundary'.format(shard_key), 'model_boundary',
+                              shard_key=shard_key)
+        updated = manager.flush()
+        self.assertEqual(len(updated), self.fake.writes)
+        self.assertEqual(5, sum(len(layers) for layers, _ in self.fake.groups.values()))
@@ -0,0 +1,158 @@
+"""
+********************************************************************************
+* Name: layer_statistics
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import unittest
+import numpy as np
+
+from modflow_adapter.services.layer_statistics import JENKS_BREAKS, QUANTILE_BREAKS, aggregate_list_records, \
+    get_class_breaks, get_layer_statistics, get_list_layer_array, get_list_layer_histograms, \
+    get_list_layer_statistics, get_nonzero_range
+
+
+class LayerStatisticsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.shape = (3, 4, 5)
+        self.ibound = np.ones(self.shape, dtype=np.int32)
+        self.ibound[0, 0, 0] = 0
+        dtype = np.dtype([('k', int), ('i', int), ('j', int), ('flux', np.float32), ('stage', np.float32)])
+        self.records = np.rec.fromrecords([
+            (0, 0, 0, -5.0, 1.0),   # inactive cell
+            (0, 1, 2, -2.0, 2.0),
+            (0, 1, 2, -1.0, 4.0),   # same cell, flux is summed and stage is averaged
+            (2, 3, 4, 7.5, 6.0),
+            (2, 0, 1, 0.0, 0.0),
+        ], dtype=dtype)
+
+    def tearDown(self):
+        pass
+
+    def to_array(self, name):
+        # Dense equivalent of MfList.to_array
+        arr = np.zeros(self.shape)
+        cnt = np.zeros(self.shape)
+        for rec in self.records:
+            arr[rec['k'], rec['i'], rec['j']] += rec[name]
+            cnt[rec['k'], rec['i'], rec['j']] += 1.
+        if name != 'flux':
+            arr[cnt > 0] /= cnt[cnt > 0]
+        return arr
+
+    def test_aggregate_list_records(self):
+        ret = aggregate_list_records(self.records, self.shape)
+        self.assertEqual(['flux', 'stage'], sorted(ret))
+        for name, (cells, values) in ret.items():
+            dense = np.zeros(self.shape).ravel()
+            dense[cells] = values
+            np.testing.assert_allclose(self.to_array(name).ravel(), dense)
+
+    def test_aggregate_list_records_empty(self):
+        self.assertEqual({}, aggregate_list_records(self.records[:0], self.shape))
+        self.assertEqual({}, aggregate_list_records(None, self.shape))
+
+    def test_get_list_layer_statistics(self):
+        for name, (cells, values) in aggregate_list_records(self.records, self.shape).items():
+            ret = get_list_layer_statistics(cells, values, self.ibound)
+            dense = self.to_array(name)
+            for k in range(self.shape[0]):
+                layer = dense[k].astype(np.float32)[self.ibound[k] != 0]
+                nonzero = layer[np.nonzero(layer)]
+                expected = (nonzero.min(), nonzero.max()) if len(nonzero) else (0, 0)
+                self.assertEqual(expected, ret[k])
+
+    def test_get_list_layer_array(self):
+        cells, values = aggregate_list_records(self.records, self.shape)['flux']
+        for k in range(self.shape[0]):
+            ret = get_list_layer_array(cells, values, self.shape, k)
+            self.assertEqual(np.float32, ret.dtype)
+            np.testing.assert_array_equal(self.to_array('flux')[k].astype(np.float32), ret)
+
+    def test_get_layer_statistics(self):
+        stack = np.arange(60, dtype=np.float32).reshape(self.shape) - 10
+        stack[1] = 0
+        ret = get_layer_statistics(stack, self.ibound, bins=4)
+        first = stack[0][self.ibound[0] != 0]
+        self.assertEqual(np.float32, ret['minimum'].dtype)
+        self.assertEqual(first.min(), ret['minimum'][0])
+        self.assertEqual(first.max(), ret['maximum'][0])
+        self.assertEqual(first[first != 0].min(), ret['nonzero_minimum'][0])
+        self.assertAlmostEqual(first.mean(), ret['mean'][0])
+        np.testing.assert_array_equal([19, 20, 20], ret['count'])
+        np.testing.assert_array_equal([18, 0, 20], ret['nonzero_count'])
+        np.testing.assert_array_equal(ret['nonzero_count'], ret['histogram'].sum(axis=1))
+        np.testing.assert_array_equal(np.histogram(first[first != 0], bins=4)[0], ret['histogram'][0])
+        np.testing.assert_allclose(np.histogram(first[first != 0], bins=4)[1], ret['bin_edges'][0])
+
+    def test_get_layer_statistics_nodata(self):
+        stack = np.array([[1.5, -999.99], [np.nan, 0.0]], dtype=np.float32)
+        ret = get_layer_statistics(stack, nodata=-999.99)
+        np.testing.assert_array_equal([0.0], ret['minimum'])
+        np.testing.assert_array_equal([1.5], ret['maximum'])
+        np.testing.assert_array_equal([2], ret['count'])
+
+    def test_get_layer_statistics_no_histogram(self):
+        stack = np.random.RandomState(0).rand(*self.shape)
+        ret = get_layer_statistics(stack, self.ibound, workers=2)
+        self.assertNotIn('histogram', ret)
+        self.assertNotIn('bin_edges', ret)
+        expected = get_layer_statistics(stack, self.ibound, bins=4)
+        for name, values in ret.items():
+            np.testing.assert_array_equal(expected[name], values)
+
+    def test_get_layer_statistics_workers(self):
+        stack = np.random.RandomState(0).rand(*self.shape)
+        ret = get_layer_statistics(stack, self.ibound[0], bins=4, workers=2)
+        expected = get_layer_statistics(stack, self.ibound[0], bins=4)
+        for name, values in expected.items():
+            np.testing.assert_array_equal(values, ret[name])
+
+    def test_get_layer_statistics_window_rows(self):
+        stack = np.random.RandomState(0).normal(10.0, 3.0, self.shape).astype(np.float32)
+        stack[:, 0] = 0
+        stack[1, 2, 3] = -999.99
+        expected = get_layer_statistics(stack, self.ibound, nodata=-999.99, bins=8)
+        for window_rows in (1, 3):
+            ret = get_layer_statistics(stack, self.ibound, nodata=-999.99, bins=8, window_rows=window_rows, workers=2)
+            for name, values in expected.items():
+                np.testing.assert_allclose(values, ret[name], rtol=1e-12)
+                self.assertEqual(values.dtype, ret[name].dtype)
+
+    def test_get_nonzero_range(self):
+        stack = np.zeros(self.shape, dtype=np.int32)
+        stack[2, 1, 1] = 3
+        stack[2, 2, 2] = -1
+        ret = get_layer_statistics(stack, self.ibound)
+        self.assertEqual((0, 0), get_nonzero_range(ret, 0))
+        self.assertEqual((-1, 3), get_nonzero_range(ret, 2))
+
+    def test_get_list_layer_histograms(self):
+        cells, values = aggregate_list_records(self.records, self.shape)['flux']
+        histograms, bin_edges = get_list_layer_histograms(cells, values, self.ibound, bins=4)
+        np.testing.assert_array_equal([[1, 0, 0, 0], [0, 0, 0, 0], [1, 0, 0, 0]], histograms)
+        self.assertEqual(-3.0, bin_edges[0][0])
+        self.assertEqual(7.5, bin_edges[2][0])
+
+    def test_get_class_breaks_quantile(self):
+        histogram = np.array([10, 0, 0, 10])
+        bin_edges = np.array([0.0, 1.0, 2.0, 3.0, 4.0])
+        ret = get_class_breaks(histogram, bin_edges, 3, method=QUANTILE_BREAKS)
+        self.assertEqual(0.0, ret[0])
+        self.assertEqual(4.0, ret[-1])
+        self.assertTrue(1.0 <= ret[1] <= 3.0)
+
+    def test_get_class_breaks_jenks(self):
+        histogram = np.array([5, 5, 0, 0, 0, 0, 5, 5])
+        bin_edges = np.arange(9, dtype=np.float64)
+        ret = get_class_breaks(histogram, bin_edges, 3, method=JENKS_BREAKS)
+        self.assertEqual([0.0, 2.0, 8.0], ret)
+
+    def test_get_class_breaks_empty(self):
+        self.assertEqual([], get_class_breaks(np.zeros(4), np.arange(5), 3))
+
+    def test_get_class_breaks_unknown_method(self):
+        self.assertRaises(ValueError, get_class_breaks, np.ones(4), np.arange(5), 3, method='unknown')
@@ -0,0 +1,128 @@
+"""
+********************************************************************************
+* Name: metrics
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from urllib.request import urlopen
+
+import numpy as np
+
+from modflow_adapter.services.metrics import MetricsRegistry, PublishMetrics
+from modflow_adapter.services.tracing import Tracer
+
+
+class MetricsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        counter = self.registry.counter('modflow_layers_total', 'Layers by publish result.', ['result'])
+        counter.inc(result='published')
+        counter.inc(2, result='published')
+        counter.inc(result='skipped')
+
+        self.assertEqual(3, counter.get(result='published'))
+        self.assertEqual(0, counter.get(result='failed'))
+        self.assertIs(counter, self.registry.counter('modflow_layers_total', 'Layers by publish result.', ['result']))
+        self.assertRaises(ValueError, counter.inc, -1, result='published')
+        self.assertRaises(ValueError, counter.inc, layer='1')
+        self.assertRaises(ValueError, self.registry.histogram, 'modflow_layers_total', 'Layers.', ['result'])
+
+    def test_histogram(self):
+        histogram = self.registry.histogram('modflow_geoserver_request_seconds', 'Duration.', ['operation'],
+                                            buckets=(0.1, 1.0))
+        histogram.observe(0.05, operation='create_style')
+        histogram.observe(0.5, operation='create_style')
+        histogram.observe(5.0, operation='create_style')
+        with histogram.time(operation='import'):
+            pass
+
+        self.assertEqual(3, histogram.get_count(operation='create_style'))
+        self.assertAlmostEqual(5.55, histogram.get_sum(operation='create_style'))
+        self.assertEqual(1, histogram.get_count(operation='import'))
+
+    def test_to_prometheus(self):
+        self.registry.counter('modflow_bytes_uploaded_total', 'Bytes uploaded.').inc(1024)
+        histogram = self.registry.histogram('modflow_model_load_seconds', 'Duration of the model loads.',
+                                            ['model'], buckets=(0.1, 1.0))
+        histogram.observe(0.5, model='a "b"')
+
+        text = self.registry.to_prometheus()
+
+        self.assertEqual([
+            '# HELP modflow_bytes_uploaded_total Bytes uploaded.',
+            '# TYPE modflow_bytes_uploaded_total counter',
+            'modflow_bytes_uploaded_total 1024',
+            '# HELP modflow_model_load_seconds Duration of the model loads.',
+            '# TYPE modflow_model_load_seconds histogram',
+            'modflow_model_load_seconds_bucket{model="a \\"b\\"",le="0.1"} 0',
+            'modflow_model_load_seconds_bucket{model="a \\"b\\"",le="1.0"} 1',
+            'modflow_model_load_seconds_bucket{model="a \\"b\\"",le="+Inf"} 1',
+            'modflow_model_load_seconds_sum{model="a \\"b\\""} 0.5',
+            'modflow_model_load_seconds_count{model="a \\"b\\""} 1',
+        ], text.splitlines())
+
+    def test_write_and_serve(self):
+        self.registry.counter('modflow_arrays_materialized_total', 'Arrays.').inc(4)
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, 'modflow_publish.prom')
+            self.registry.write(path)
+            with open(path) as f:
+                self.assertIn('modflow_arrays_materialized_total 4\n', f.read())
+            self.assertEqual(['modflow_publish.prom'], os.listdir(tmp_dir))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        server = self.registry.serve(port=0)
+        try:
+            with urlopen('http://127.0.0.1:{}/metrics'.format(server.server_address[1]), timeout=10) as response:
+                self.assertIn('text/plain', response.headers['Content-Type'])
+                self.assertIn('modflow_arrays_materialized_total 4', response.read().decode('utf-8'))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_merge_state(self):
+        metrics = PublishMetrics(self.registry)
+        metrics.layers.inc(2, result='published')
+        metrics.model_load_seconds.observe(3.0)
+        other = MetricsRegistry()
+        other.counter('modflow_layers_total', 'Layers by publish result.', ['result']).inc(result='published')
+
+        other.merge_state(self.registry.get_state())
+        other.merge_state(self.registry.get_state())
+
+        self.assertEqual(5, other.get('modflow_layers_total').get(result='published'))
+        self.assertEqual(2, other.get('modflow_model_load_seconds').get_count())
+        self.assertEqual(6.0, other.get('modflow_model_load_seconds').get_sum())
+
+    def test_publish_metrics(self):
+        metrics = PublishMetrics(self.registry)
+        tracer = Tracer()
+        tracer.add_listener(metrics.observe_span)
+        tracer.add_listener(metrics.observe_span)
+
+        with tracer.span('load_model'):
+            pass
+        with tracer.span('geoserver.create_style'):
+            pass
+        with self.assertRaises(IOError):
+            with tracer.span('geoserver.publish_coverage'):
+                raise IOError('GeoServer timeout')
+        metrics.count_array(np.zeros((2, 3), dtype=np.float32))
+
+        self.assertEqual(1, metrics.model_load_seconds.get_count())
+        self.assertEqual(1, metrics.geoserver_seconds.get_count(operation='create_style', status='ok'))
+        self.assertEqual(1, metrics.geoserver_seconds.get_count(operation='publish_coverage', status='error'))
+        self.assertEqual(1, metrics.layers.get(result='failed'))
+        self.assertEqual(1, metrics.arrays.get())
+        self.assertEqual(24, metrics.array_bytes.get())
@@ -9,10 +9,19 @@
 import os
 import json
 import mock
+import shutil
+import tempfile
 import unittest
 import warnings
+import numpy as np
 
+from modflow_adapter.services.metrics import MetricsRegistry
 from modflow_adapter.services.modflow_spatial_manager import ModflowSpatialManager
+from modflow_adapter.services.out_of_core import MemoryBudgetError
+from modflow_adapter.services.publish_cache import PublishCache
+from modflow_adapter.services.shared_arrays import SharedArrayRegistry
+from modflow_adapter.services.tracing import Tracer
+from tests.unit_tests.utilities import FakeGeoServer, RecordingGeoServer
 
 
 class ModflowSpatialManagerTests(unittest.TestCase):
@@ -32,11 +41,34 @@ class ModflowSpatialManagerTests(unittest.TestCase):
         self.mock_model_file_db.db_dir = self.test_files
         self.mock_model_file_db.get_id.return_value = self.store_name
         self.mock_model_file_db.list.return_value = os.listdir(self.test_files)
+        self.published_stores = [
+            '{}_model_boundary'.format(self.store_name_dashes),
+            '{}_model_grid'.format(self.store_name_dashes),
+            '{}_DIS-thickn_001'.format(self.store_name_dashes),
+            '{}_head_raster_001'.format(self.store_name_dashes),
+            '{}_head_contour_001'.format(self.store_name_dashes),
+            'other-model_DIS-thickn_001',
+        ]
+        self.geoserver_engine.list_stores.return_value = {'success': True, 'result': self.published_stores}
         warnings.simplefilter("ignore", ResourceWarning)
 
     def tearDown(self):
         pass
 
+    def _fake_layer_group(self, layers=None, styles=None):
+        """
+        Keep the layer group written by the manager to return it when it is read again.
+        """
+        group = {'success': layers is not None, 'result': {'layers': list(layers or []), 'styles': list(styles or [])}}
+
+        def write_layer_group(layer_group_id, layers, styles, **kwargs):
+            group.update({'success': True, 'result': {'layers': list(layers), 'styles': list(styles)}})
+
+        self.geoserver_engine.get_layer_group.side_effect = lambda *args, **kwargs: json.loads(json.dumps(group))
+        self.geoserver_engine.create_layer_group.side_effect = write_layer_group
+        self.geoserver_engine.update_layer_group.side_effect = write_layer_group
+        return group
+
     def test_load_model(self):
         self.msm.load_model()
         self.assertIsNotNone(self.msm.flopy_model)
@@ -94,12 +126,50 @@ class ModflowSpatialManagerTests(unittest.TestCase):
         self.assertEqual(ret, '{}:{}'.format('modflow', item_name))
 
     def test_get_extent_for_project(self):
-        mock_attrs = json.dumps({'model_extents': json.dumps([1, 1, 1, 1]), 'database_id': 1234})
-        mock_resource = mock.MagicMock(_attributes=mock_attrs)
-        self.msm.model_file_db._app.get_persistent_store_database()().query().all.return_value = [mock_resource]
-        self.msm.model_file_db.get_id.return_value = 1234
+        mock_resource = mock.MagicMock()
+        mock_resource.get_attribute.return_value = json.dumps([1, 1, 1, 1])
+        mock_session = self.msm.model_file_db._app.get_persistent_store_database()()
+        mock_session.query().filter().first.return_value = mock_resource
+        self.msm.model_file_db.get_id.return_value = '1234'
         ret = self.msm.get_extent_for_project(self.msm.model_file_db)
         self.assertEqual(ret, [1.0, 1.0, 1.0, 1.0])
+        mock_resource.get_attribute.assert_called_with('model_extents')
+        mock_session.query().all.assert_not_called()
+        mock_session.close.assert_called_once()
+
+    def test_get_extent_for_project_no_resource(self):
+        mock_session = self.msm.model_file_db._app.get_persistent_store_database()()
+        mock_session.query().filter().first.return_value = None
+        ret = self.msm.get_extent_for_project(self.msm.model_file_db)
+        self.assertEqual(ret, [-180, -90, 180, 90])
+        mock_session.close.assert_called_once()
+
+    def _mock_boundary_app(self):
+        mock_app = mock.MagicMock()
+        mock_app.get_custom_setting.side_effect = ['-10', '-5', '10', '5']
+        return mock_app, mock_app.get_persistent_store_database()()
+
+    @mock.patch('modflow_adapter.services.modflow_spatial_manager.ModflowModelResource')
+    def test_get_all_boundary_layers(self, mock_resource):
+        mock_app, mock_session = self._mock_boundary_app()
+        mock_session.query().order_by().filter.return_value = [('abc_123',), ('def_456',)]
+        layers, bounds = self.msm.get_all_boundary_layers(mock_app)
+        self.assertEqual(['modflow:modflow-abc-123_model_boundary', 'modflow:modflow-def-456_model_boundary'], layers)
+        self.assertEqual([-10.0, -5.0, 10.0, 5.0], bounds)
+        mock_resource.query_by_extent.assert_not_called()
+        mock_session.close.assert_called_once()
+
+    @mock.patch('modflow_adapter.services.modflow_spatial_manager.ModflowModelResource')
+    def test_get_all_boundary_layers_bbox_page(self, mock_resource):
+        mock_app, mock_session = self._mock_boundary_app()
+        mock_query = mock_resource.query_by_extent().filter()
+        mock_query.limit().offset.return_value = [('abc_123',)]
+        layers, _ = self.msm.get_all_boundary_layers(mock_app, bbox=[0, 0, 1, 1], page_size=20, page=2)
+        self.assertEqual(['modflow:modflow-abc-123_model_boundary'], layers)
+        mock_resource.query_by_extent.assert_called_with(mock_session, [0, 0, 1, 1], mock_resource.database_id)
+        mock_query.limit.assert_called_with(20)
+        mock_query.limit().offset.assert_called_with(40)
+        mock_session.close.assert_called_once()
 
     def test_get_extent_for_project_model_not_loaded(self):
         self.msm.map_extents = [0, 0, 19, 0]
@@ -153,6 +223,33 @@ class ModflowSpatialManagerTests(unittest.TestCase):
         result = {'BAS6': {'strt_001': {'maximum': 45.0, 'minimum': 11.4}}}
         self.assertEqual(ret['BAS6']['strt_001']['maximum'], result['BAS6']['strt_001']['maximum'])
 
+    def test_get_package_layer_attribute_info_list_package(self):
+        ret = self.msm.get_package_layer_attribute_info()
+        wel_info = ret['WEL']['fluxcustomtagneg001001']
+        self.assertGreater(wel_info['maximum'], 0)
+        self.assertLessEqual(wel_info['minimum'], wel_info['maximum'])
+        self.assertEqual({'minimum': 0, 'maximum': 0, 'cql_filter': 'k = 0 AND kper = 0 AND flux > 0'},
+                         ret['WEL']['fluxcustomtagpos001001'])
+        self.assertEqual('k = 0 AND kper = 0 AND flux < 0', wel_info['cql_filter'])
+
+    def test_get_list_layer_info_no_class_breaks(self):
+        self.assertIsNone(self.msm.class_breaks)
+        ibound = np.ones((2, 2, 2), dtype=np.int32)
+        ret = self.msm.get_list_layer_info('WEL', np.array([0, 1, 4]), np.array([-10.0, -20.0, -5.0]), ibound)
+        self.assertEqual([{'minimum': -20.0, 'maximum': -10.0}, {'minimum': -5.0, 'maximum': -5.0}], ret)
+
+        # The varying well fluxes of the model have no legend either
+        ret = self.msm.get_package_layer_attribute_info()
+        wel_info = ret['WEL']['fluxcustomtagneg001001']
+        self.assertLess(wel_info['minimum'], wel_info['maximum'])
+        self.assertNotIn('legend', wel_info)
+
+    def test_translate_layer_name_derived_layer(self):
+        ret = self.msm.translate_layer_name('fluxcustomtagneg-wel', 'meters', 'days')
+        self.assertEqual(('Well extraction rates', ''), ret)
+        ret = self.msm.translate_layer_name('fluxcustomtagpos-wel', 'meters', 'days')
+        self.assertEqual(('Well injection rates', ''), ret)
+
     def test_get_head_info(self):
         ret = self.msm.get_head_info()
         self.assertIsInstance(ret, dict)
@@ -173,9 +270,7 @@ class ModflowSpatialManagerTests(unittest.TestCase):
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
     @mock.patch('flopy.utils.reference.getprj')
     def test_create_model_boundary_layer_no_layer_group(self, mock_prj,  _):
-        self.msm.gs_engine.get_layer_group.return_value = {'success': False,
-                                                           'result': {}
-                                                           }
+        group = self._fake_layer_group()
         mock_prj.return_value = 'fake prj'
         self.msm.gs_engine._process_identifier.return_value = ['modflow', 'test']
         self.msm.gs_engine._get_geoserver_catalog_object.get_resource.return_value = mock.MagicMock(
@@ -205,14 +300,15 @@ class ModflowSpatialManagerTests(unittest.TestCase):
         self.assertFalse(os.path.isfile(temp_prj))
         self.assertFalse(os.path.isfile(temp_zip))
 
+        # The boundary and the grid are added to the new layer group with one request
+        self.msm.gs_engine.create_layer_group.assert_called_once()
+        self.msm.gs_engine.update_layer_group.assert_not_called()
+        self.assertEqual([self.msm.VL_MODEL_BOUNDARY, self.msm.VL_MODEL_GRID], group['result']['styles'])
+
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
     @mock.patch('flopy.utils.reference.getprj')
     def test_create_model_boundary_layer_ex_layer_group(self, mock_prj, _):
-        self.msm.gs_engine.get_layer_group.return_value = {'success': True,
-                                                           'result': {'layers': ['ex_layer'],
-                                                                      'styles': ['ex_style']
-                                                                      }
-                                                           }
+        self._fake_layer_group(['ex_layer'], ['ex_style'])
         mock_prj.return_value = 'fake prj'
         self.msm.get_unique_item_name = mock.MagicMock()
         self.msm.get_unique_item_name.side_effect = ['new_layer', 'new_style']
@@ -238,8 +334,10 @@ class ModflowSpatialManagerTests(unittest.TestCase):
         layer_group_call_args = self.msm.gs_engine.update_layer_group.call_args_list
         self.assertEqual("{}:{}".format(self.msm.WORKSPACE, self.msm.VL_MODEL_BOUNDARY),
                          layer_group_call_args[0][1]['layer_group_id'])
-        self.assertEqual(2, len(layer_group_call_args[0][1]['layers']))
-        self.assertEqual(2, len(layer_group_call_args[0][1]['styles']))
+        self.assertEqual(1, len(layer_group_call_args))
+        self.assertEqual(3, len(layer_group_call_args[0][1]['layers']))
+        self.assertEqual(3, len(layer_group_call_args[0][1]['styles']))
+        self.assertEqual('ex_layer', layer_group_call_args[0][1]['layers'][0])
 
         self.assertFalse(os.path.isfile(temp_shp))
         self.assertFalse(os.path.isfile(temp_prj))
@@ -247,15 +345,20 @@ class ModflowSpatialManagerTests(unittest.TestCase):
 
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
     def test_delete_model_boundary_layer(self, _):
+        layers = ['other-model_model_boundary', '{}_model_boundary'.format(self.store_name_dashes),
+                  '{}_model_grid'.format(self.store_name_dashes)]
+        group = self._fake_layer_group(layers, ['model_boundary', 'model_boundary', 'model_grid'])
         self.msm = ModflowSpatialManager(self.geoserver_engine,
                                          self.mock_model_file_db,
                                          self.modflow_version,
                                          )
         self.msm.delete_model_boundary_layer()
-        self.msm.gs_engine.delete_resource.assert_called()
-        call_args = self.msm.gs_engine.delete_resource.call_args_list
+        self.assertEqual(['other-model_model_boundary'], group['result']['layers'])
+        self.assertIsNone(self.msm.flopy_model)
         geoserver_store = "{}:{}_{}".format(self.msm.WORKSPACE, self.store_name_dashes, self.msm.VL_MODEL_BOUNDARY)
-        self.assertEqual(geoserver_store, call_args[0][0][0])
+        self.msm.gs_engine.delete_resource.assert_any_call(geoserver_store)
+        geoserver_store = "{}:{}_{}".format(self.msm.WORKSPACE, self.store_name_dashes, self.msm.VL_MODEL_GRID)
+        self.msm.gs_engine.delete_resource.assert_any_call(geoserver_store)
 
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
     @mock.patch('flopy.utils.reference.getprj')
@@ -283,6 +386,210 @@ class ModflowSpatialManagerTests(unittest.TestCase):
 
         self.assertFalse(os.path.isfile(temp_shp))
 
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    @mock.patch('flopy.utils.reference.getprj')
+    def test_create_package_shapefile_layers_multi_band(self, mock_prj, _):
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         multi_band=True,
+                                         )
+        mock_prj.return_value = 'fake prj'
+        self.msm.create_package_shapefile_layers()
+        shapefile_call_args = self.msm.gs_engine.create_coverage_resource.call_args_list
+        store_names = [call_args[0][0] for call_args in shapefile_call_args]
+        geoserver_store = "{}:{}_{}".format(self.msm.WORKSPACE, self.store_name_dashes, "DIS")
+
+        # One store for all the layers of the Util3d
+        self.assertIn("{}-thickn".format(geoserver_store), store_names)
+        self.assertNotIn("{}-thickn_001".format(geoserver_store), store_names)
+
+        style_call_args = self.msm.gs_engine.update_layer.call_args_list
+        self.assertEqual("{}_{}_band_001".format(self.msm.WORKSPACE, self.msm.RL),
+                         style_call_args[store_names.index("{}-thickn".format(geoserver_store))][1]['default_style'])
+
+        style_names = [call_args[1]['style_name'] for call_args in self.msm.gs_api.create_style.call_args_list]
+        self.assertIn("{}_{}_band_001".format(self.msm.WORKSPACE, self.msm.RL), style_names)
+        self.assertFalse(os.path.isfile("{}_{}-{}.zip".format(self.store_name_dashes, "DIS", "thickn")))
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    @mock.patch('flopy.utils.reference.getprj')
+    def test_create_package_shapefile_layers_list_package(self, mock_prj, _):
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         list_package_geometry=ModflowSpatialManager.LIST_PACKAGE_CELLS,
+                                         )
+        mock_prj.return_value = 'fake prj'
+        self.msm.create_package_shapefile_layers()
+        geoserver_store = "{}:{}_{}-{}".format(self.msm.WORKSPACE, self.store_name_dashes, "WEL", "list_package")
+        temp_zip = "{}_{}-{}.zip".format(self.store_name_dashes, "WEL", "list_package")
+
+        # One vector store for all the layers and stress periods of the package
+        self.msm.gs_engine.create_shapefile_resource.assert_called_once_with(geoserver_store,
+                                                                             overwrite=True,
+                                                                             shapefile_zip=mock.ANY)
+        shapefile_zip = self.msm.gs_engine.create_shapefile_resource.call_args[1]['shapefile_zip']
+        self.assertEqual(temp_zip, os.path.basename(shapefile_zip))
+        self.assertFalse(os.path.isfile(shapefile_zip))
+        coverage_stores = [c[0][0] for c in self.msm.gs_engine.create_coverage_resource.call_args_list]
+        self.assertFalse([store for store in coverage_stores if '_WEL-' in store])
+        self.msm.gs_engine.update_layer.assert_any_call(layer_id=geoserver_store, default_style='list_package_polygon')
+        self.assertFalse(os.path.isfile(temp_zip))
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_create_list_package_style(self, _):
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         )
+        self.msm.create_list_package_style()
+        call_args = self.msm.gs_api.create_style.call_args_list
+        self.assertEqual(['list_package_point', 'list_package_polygon'], [c[1]['style_name'] for c in call_args])
+        self.assertEqual(os.path.join(self.msm.SLD_PATH, 'list_package.sld'), call_args[0][1]['sld_template'])
+        self.assertEqual({'geometry': 'point'}, call_args[0][1]['sld_context'])
+        self.msm.gs_api.reload.assert_called_once()
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    @mock.patch('flopy.utils.reference.getprj')
+    def test_create_package_shapefile_layers_class_breaks(self, mock_prj, _):
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         class_breaks='quantile',
+                                         )
+        mock_prj.return_value = 'fake prj'
+        self.msm.create_package_shapefile_layers()
+        geoserver_store = "{}:{}_{}-{}".format(self.msm.WORKSPACE, self.store_name_dashes, "DIS", "thickn_001")
+        style_name = "{}_{}-{}_{}".format(self.store_name_dashes, "DIS", "thickn_001", self.msm.RL_CLASSES)
+
+        # The per layer styles are uploaded before they are set as default style of their layers
+        self.msm.gs_engine.update_layer.assert_any_call(layer_id=geoserver_store, default_style=style_name)
+        style_call_args = {c[1]['style_name']: c[1] for c in self.msm.gs_api.create_style.call_args_list}
+        self.assertIn(style_name, style_call_args)
+        self.assertEqual(os.path.join(self.msm.SLD_PATH, 'raster_classes.sld'),
+                         style_call_args[style_name]['sld_template'])
+        legend = style_call_args[style_name]['sld_context']['legend']
+        self.assertLessEqual(len(legend), self.msm.CLASS_BREAKS)
+        self.assertEqual(sorted(entry['quantity'] for entry in legend), [entry['quantity'] for entry in legend])
+        self.msm.gs_api.reload.assert_called_once()
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_upload_all_layer_names_to_db_class_breaks(self, _):
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         class_breaks='jenks',
+                                         )
+        geoserver_layer, _ = self.msm.upload_all_layer_names_to_db('feet', 'days')
+        layer_name = "modflow:modflow-{}_{}-{}".format(self.store_name_dashes, "DIS", "thickn_001")
+        layer = geoserver_layer['Packages']['DIS'][layer_name]
+        self.assertEqual("modflow:{}_{}-{}_{}".format(self.store_name_dashes, "DIS", "thickn_001",
+                                                      self.msm.RL_CLASSES), layer['style'])
+        self.assertAlmostEqual(float(layer['minimum']), layer['legend'][0]['quantity'], places=4)
+        self.assertAlmostEqual(float(layer['maximum']), layer['legend'][-1]['quantity'], places=4)
+        self.assertEqual(self.msm.CLASS_COLORS[0], layer['legend'][0]['color'])
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_upload_all_layer_names_to_db_statistics_once(self, _):
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         class_breaks='jenks',
+                                         )
+        with mock.patch.object(self.msm, 'get_package_layer_attribute_info',
+                               wraps=self.msm.get_package_layer_attribute_info) as mock_info:
+            geoserver_layer, _ = self.msm.upload_all_layer_names_to_db('feet', 'days')
+
+        # The statistics of all the packages are computed in one pass, not once per package
+        mock_info.assert_called_once_with()
+        self.assertIn('DIS', geoserver_layer['Packages'])
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_upload_all_layer_names_to_db_layer_group_shards(self, _):
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         layer_group_shards=4,
+                                         )
+        geoserver_layer, _ = self.msm.upload_all_layer_names_to_db('feet', 'days')
+        layer_group = self.msm.layer_groups.get_group_name('modflow:model_boundary',
+                                                           shard_key=self.mock_model_file_db.get_id())
+
+        # The layer tree gives the shard of the model boundary layer group of the model
+        self.assertIn(layer_group, self.msm.get_boundary_layer_groups())
+        self.assertEqual(4, len(self.msm.get_boundary_layer_groups()))
+        for tree_group in ('Boundary', 'Grid'):
+            for layer in geoserver_layer[tree_group].values():
+                self.assertEqual(layer_group, layer['layer_group'])
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_upload_all_layer_names_to_db_multi_band_class_breaks(self, _):
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         multi_band=True,
+                                         class_breaks='jenks',
+                                         )
+        geoserver_layer, _ = self.msm.upload_all_layer_names_to_db('feet', 'days')
+        layer_name = "modflow:modflow-{}_{}-{}".format(self.store_name_dashes, "DIS", "thickn_001")
+        layer = geoserver_layer['Packages']['DIS'][layer_name]
+
+        # The band style is rendered, the legend of the class breaks is not given
+        self.assertEqual("modflow:{}_{}_band_001".format(self.msm.WORKSPACE, self.msm.RL), layer['style'])
+        self.assertNotIn('legend', layer)
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    @mock.patch('flopy.utils.reference.getprj')
+    def test_create_package_shapefile_layers_unchanged(self, mock_prj, _):
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         )
+        mock_prj.return_value = 'fake prj'
+        self.msm.create_package_shapefile_layers()
+        publish_manifest = self.msm.publish_manifest.to_dict()
+        self.assertIn("{}:{}_{}-{}".format(self.msm.WORKSPACE, self.store_name_dashes, "DIS", "thickn_001"),
+                      publish_manifest['layers'])
+
+        # Republish with the manifest of the first publish
+        self.geoserver_engine.reset_mock()
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         publish_manifest=publish_manifest,
+                                         )
+        self.msm.create_package_shapefile_layers()
+        self.msm.gs_engine.create_coverage_resource.assert_not_called()
+        self.msm.gs_engine.update_layer.assert_not_called()
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_delete_stale_layers(self, _):
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         publish_manifest={'layers': {'modflow:old': {}}},
+                                         )
+        self.msm.publish_manifest.begin()
+        self.msm.delete_stale_layers()
+        self.msm.gs_engine.delete_resource.assert_called_with('modflow:old')
+        self.assertEqual([], self.msm.publish_manifest.get_stores())
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_create_band_raster_style(self, _):
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         multi_band=True,
+                                         )
+        self.msm.create_band_raster_style(self.msm.RL_LOWBLUE, 2)
+        call_args = self.msm.gs_api.create_style.call_args_list
+        self.assertEqual("{}_{}_band_002".format(self.msm.WORKSPACE, self.msm.RL_LOWBLUE),
+                         call_args[0][1]['style_name'])
+        self.assertEqual(os.path.join(self.msm.SLD_PATH, self.msm.RLLB + '.sld'), call_args[0][1]['sld_template'])
+        self.assertEqual({'band': 2}, call_args[0][1]['sld_context'])
+        self.msm.gs_api.reload.assert_called_once()
+
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
     def test_delete_package_shapefile_layers(self, _):
         self.msm = ModflowSpatialManager(self.geoserver_engine,
@@ -290,10 +597,62 @@ class ModflowSpatialManagerTests(unittest.TestCase):
                                          self.modflow_version,
                                          )
         self.msm.delete_package_shapefile_layers()
-        self.msm.gs_engine.delete_resource.assert_called()
+        self.assertIsNone(self.msm.flopy_model)
         call_args = self.msm.gs_engine.delete_resource.call_args_list
         geoserver_store = "{}:{}_{}-{}".format(self.msm.WORKSPACE, self.store_name_dashes, "DIS", "thickn_001")
-        self.assertEqual(geoserver_store, call_args[0][0][0])
+        self.assertEqual([geoserver_store], [c[0][0] for c in call_args])
+        self.msm.gs_engine.list_stores.assert_called_with(workspace=self.msm.WORKSPACE)
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_delete_package_shapefile_layers_manifest(self, _):
+        geoserver_store = "{}:{}_{}-{}".format('modflow', self.store_name_dashes, "DIS", "thickn")
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         publish_manifest={'layers': {geoserver_store: {}}},
+                                         )
+        self.msm.delete_package_shapefile_layers()
+        self.msm.gs_engine.list_stores.assert_not_called()
+        self.msm.gs_engine.delete_resource.assert_called_once_with(geoserver_store)
+        self.assertEqual([], self.msm.publish_manifest.get_stores())
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_delete_stores_class_styles(self, _):
+        style_name = 'modflow-thickn_001_{}'.format(ModflowSpatialManager.RL_CLASSES)
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         publish_manifest={'layers': {'modflow:thickn_001': {'style': style_name},
+                                                                      'modflow:thickn_002': {}}},
+                                         )
+        calls = mock.MagicMock()
+        calls.attach_mock(self.msm.gs_engine.delete_resource, 'delete_resource')
+        calls.attach_mock(self.msm.gs_api.delete_style, 'delete_style')
+        self.msm.delete_stores(['modflow:thickn_001', 'modflow:thickn_002'])
+
+        # The stores are deleted one at a time, then the styles they referenced
+        self.assertEqual([mock.call.delete_resource('modflow:thickn_001'),
+                          mock.call.delete_resource('modflow:thickn_002'),
+                          mock.call.delete_style(workspace=self.msm.WORKSPACE, style_name=style_name, purge=True)],
+                         calls.mock_calls)
+        self.assertEqual([], self.msm.publish_manifest.get_stores())
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_delete_stores_failure(self, _):
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         publish_manifest={'layers': {'modflow:old': {}, 'modflow:older': {}}},
+                                         )
+
+        def delete_resource(geoserver_store):
+            if geoserver_store == 'modflow:older':
+                raise IOError('GeoServer is down')
+        self.msm.gs_engine.delete_resource.side_effect = delete_resource
+
+        # The store GeoServer did not delete stays in the manifest
+        self.assertRaises(IOError, self.msm.delete_stores, ['modflow:old', 'modflow:older'])
+        self.assertEqual(['modflow:older'], self.msm.publish_manifest.get_stores())
 
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
     def test_create_raster_style(self, _):
@@ -327,6 +686,27 @@ class ModflowSpatialManagerTests(unittest.TestCase):
         self.assertEqual(True, call_args[0][1]['purge'])
         msm.gs_api.reload.assert_called_once()
 
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_delete_raster_style_multi_band(self, _):
+        msm = ModflowSpatialManager(self.geoserver_engine,
+                                    self.mock_model_file_db,
+                                    self.modflow_version,
+                                    multi_band=True,
+                                    )
+        band_style = "{}_{}_band_002".format(msm.WORKSPACE, msm.RL1)
+        msm.gs_engine.list_styles.return_value = {
+            'success': True, 'result': ['{}:{}'.format(msm.WORKSPACE, band_style), 'other_style'],
+        }
+        msm._band_styles.add("{}_{}_band_001".format(msm.WORKSPACE, msm.RL))
+        msm.delete_raster_style(purge=True, reload_config=False)
+
+        # The band styles are found without loading the model
+        self.assertIsNone(msm.flopy_model)
+        style_names = [call_args[1]['style_name'] for call_args in msm.gs_api.delete_style.call_args_list]
+        self.assertEqual(["{}_{}".format(msm.WORKSPACE, msm.RL), "{}_{}".format(msm.WORKSPACE, msm.RL1),
+                          "{}_{}_band_001".format(msm.WORKSPACE, msm.RL), band_style], style_names)
+        self.assertEqual(set(), msm._band_styles)
+
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
     def test_create_head_raster_layer_no_hds_file(self, _):
         self.test_files = os.path.join(self.test_dir, 'files', 'modflow_spatial_manager', 'test_without_results')
@@ -364,15 +744,48 @@ class ModflowSpatialManagerTests(unittest.TestCase):
         self.assertFalse(os.path.isfile(tmp_zip))
 
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
-    def test_delete_head_raster_layer_no_hds_file(self, _):
-        self.test_files = os.path.join(self.test_dir, 'files', 'modflow_spatial_manager', 'test_without_results')
-        self.mock_model_file_db.directory = self.test_files
-        self.mock_model_file_db.list.return_value = os.listdir(self.test_files)
+    @mock.patch('flopy.utils.reference.getprj')
+    def test_create_head_raster_layer_bulk_publish(self, mock_prj, _):
+        self.geoserver_engine.endpoint = 'http://localhost:8181/geoserver/rest/'
         self.msm = ModflowSpatialManager(self.geoserver_engine,
                                          self.mock_model_file_db,
                                          self.modflow_version,
+                                         bulk_publish=True,
+                                         checkpoint=mock.MagicMock(),
                                          )
-        self.assertRaises(OSError, self.msm.delete_head_raster_layer)
+        server = RecordingGeoServer()
+        self.msm.publisher.session = server
+        mock_prj.return_value = 'fake prj'
+        self.msm.create_head_raster_layer()
+
+        # All the head layers are published with one import instead of three requests per layer
+        self.msm.gs_engine.create_coverage_resource.assert_not_called()
+        self.msm.gs_engine.update_resource.assert_not_called()
+        self.assertEqual(1, len(server.imports))
+        tasks = list(server.imports[0].values())
+        layer_name = "{}_{}_{}".format(self.store_name_dashes, self.msm.RL_HEAD, '001')
+        self.assertEqual(layer_name, tasks[0]['layer']['name'])
+        self.assertEqual("{}_{}".format(self.msm.WORKSPACE, self.msm.RL), tasks[0]['layer']['style']['name'])
+        self.assertEqual(['COMPLETE'], list(set(task['state'] for task in tasks)))
+        self.assertFalse(os.path.isfile("{}.zip".format(layer_name)))
+
+        # The layers are recorded in the manifest and checkpointed once the import published them
+        geoserver_store = "{}:{}".format(self.msm.WORKSPACE, layer_name)
+        self.assertIn(geoserver_store, self.msm.publish_manifest.layers)
+        self.assertEqual({}, self.msm.publish_manifest.pending)
+        self.msm.checkpoint.assert_called_once()
+        self.assertIn(geoserver_store, self.msm.checkpoint.call_args[0][0])
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_delete_head_raster_layer_no_model_files(self, _):
+        self.mock_model_file_db.list.return_value = []
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         )
+        self.msm.delete_head_raster_layer()
+        geoserver_store = "{}:{}_{}_001".format(self.msm.WORKSPACE, self.store_name_dashes, self.msm.RL_HEAD)
+        self.msm.gs_engine.delete_resource.assert_called_once_with(geoserver_store)
 
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
     def test_delete_head_raster_layer_hds_file(self, _):
@@ -381,9 +794,9 @@ class ModflowSpatialManagerTests(unittest.TestCase):
                                          self.modflow_version,
                                          )
         self.msm.delete_head_raster_layer()
-        self.msm.gs_engine.delete_resource.assert_called()
+        self.assertIsNone(self.msm.flopy_model)
         call_args = self.msm.gs_engine.delete_resource.call_args_list
-        geoserver_store = "{}:{}_{}_layer1".format(self.msm.WORKSPACE, self.store_name_dashes, self.msm.RL_HEAD)
+        geoserver_store = "{}:{}_{}_001".format(self.msm.WORKSPACE, self.store_name_dashes, self.msm.RL_HEAD)
         self.assertEqual(geoserver_store, call_args[0][0][0])
 
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
@@ -423,15 +836,15 @@ class ModflowSpatialManagerTests(unittest.TestCase):
         self.assertFalse(os.path.isfile(temp_shp))
 
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
-    def test_delete_head_contour_layer_no_hds_file(self, _):
-        self.test_files = os.path.join(self.test_dir, 'files', 'modflow_spatial_manager', 'test_without_results')
-        self.mock_model_file_db.directory = self.test_files
-        self.mock_model_file_db.list.return_value = os.listdir(self.test_files)
+    def test_delete_head_contour_layer_no_model_files(self, _):
+        self.mock_model_file_db.list.return_value = []
         self.msm = ModflowSpatialManager(self.geoserver_engine,
                                          self.mock_model_file_db,
                                          self.modflow_version,
                                          )
-        self.assertRaises(OSError, self.msm.delete_head_contour_layer)
+        self.msm.delete_head_contour_layer()
+        geoserver_store = "{}:{}_{}_001".format(self.msm.WORKSPACE, self.store_name_dashes, self.msm.VL_HEAD_CONTOUR)
+        self.msm.gs_engine.delete_resource.assert_called_once_with(geoserver_store)
 
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
     def test_delete_head_contour_layer_hds_file(self, _):
@@ -440,9 +853,9 @@ class ModflowSpatialManagerTests(unittest.TestCase):
                                          self.modflow_version,
                                          )
         self.msm.delete_head_contour_layer()
-        self.msm.gs_engine.delete_resource.assert_called()
+        self.assertIsNone(self.msm.flopy_model)
         call_args = self.msm.gs_engine.delete_resource.call_args_list
-        geoserver_store = "{}:{}_{}_layer1".format(self.msm.WORKSPACE, self.store_name_dashes, self.msm.VL_HEAD_CONTOUR)
+        geoserver_store = "{}:{}_{}_001".format(self.msm.WORKSPACE, self.store_name_dashes, self.msm.VL_HEAD_CONTOUR)
         self.assertEqual(geoserver_store, call_args[0][0][0])
 
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
@@ -503,6 +916,25 @@ class ModflowSpatialManagerTests(unittest.TestCase):
         self.msm.delete_all_layers()
         self.msm.gs_engine.delete_resource.assert_called()
 
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_create_all_delete_all_layers(self, _):
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         )
+        self.msm.load_model()
+        self.msm.flopy_model.sr.epsg = 2901
+        self.msm.create_all()
+        published = set(self.msm.publish_manifest.layers)
+        self.assertTrue([store for store in published if self.msm.VL_HEAD_CONTOUR in store])
+
+        self.msm.delete_all_layers()
+
+        # Every store published by create_all is deleted, the head contours included
+        deleted = set(c[0][0] for c in self.msm.gs_engine.delete_resource.call_args_list)
+        self.assertEqual(set(), published - deleted)
+        self.assertEqual({}, self.msm.publish_manifest.layers)
+
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
     def test_create_all_styles(self, _):
         self.msm = ModflowSpatialManager(self.geoserver_engine,
@@ -511,6 +943,25 @@ class ModflowSpatialManagerTests(unittest.TestCase):
                                          )
         self.msm.create_all_styles()
 
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_create_all_styles_async_publish(self, _):
+        server = FakeGeoServer().start()
+        self.addCleanup(server.stop)
+        self.geoserver_engine.endpoint = server.endpoint
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         async_publish=True,
+                                         )
+        self.msm.create_all_styles()
+
+        # The styles are created concurrently by the asynchronous client, then the configuration is reloaded once
+        self.msm.gs_api.create_style.assert_not_called()
+        self.assertIn(self.msm.VL_MODEL_BOUNDARY, server.styles)
+        self.assertIn('{}_{}'.format(self.msm.VL_LIST_PACKAGE, self.msm.LIST_PACKAGE_POINTS), server.styles)
+        self.assertEqual(7, len(server.styles))
+        self.msm.gs_api.reload.assert_called_once()
+
     @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
     def test_delete_all_styles(self, _):
         self.msm = ModflowSpatialManager(self.geoserver_engine,
@@ -530,3 +981,145 @@ class ModflowSpatialManagerTests(unittest.TestCase):
         self.msm.create_all()
         self.msm.gs_engine.create_coverage_resource.assert_called()
         self.msm.gs_engine.create_shapefile_resource.assert_called()
+
+        # Each step ran as a task of the scheduler, the layers after the styles they use
+        timings = self.msm.task_scheduler.timings
+        self.assertIn('boundary_grid', timings)
+        self.assertIn('package_DIS', timings)
+        self.assertLessEqual(timings['styles'].end, timings['boundary_grid'].start)
+        self.assertLessEqual(timings['flush'].end, timings['stale_layers'].start)
+        path, _ = self.msm.task_scheduler.get_critical_path()
+        self.assertEqual('stale_layers', path[-1])
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_create_all_trace_file(self, _):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        trace_file = os.path.join(tmp_dir, 'trace.json')
+        self.msm = ModflowSpatialManager(self.geoserver_engine,
+                                         self.mock_model_file_db,
+                                         self.modflow_version,
+                                         tracer=Tracer(profile=['crop']),
+                                         trace_file=trace_file,
+                                         )
+        self.msm.load_model()
+        self.msm.flopy_model.sr.epsg = 2901
+        self.msm.create_all()
+
+        with open(trace_file) as f:
+            events = [event for event in json.load(f)['traceEvents'] if event['ph'] == 'X']
+        names = set(event['name'] for event in events)
+        for name in ('load_model', 'create_all', 'task.styles', 'task.boundary_grid', 'boundary_union', 'package',
+                     'statistics', 'encode', 'crop', 'zip', 'contour', 'geoserver.publish_coverage',
+                     'geoserver.publish_shapefile', 'geoserver.create_style'):
+            self.assertIn(name, names)
+        # The active cells are unioned once, by the boundary_mask task
+        self.assertEqual(1, len([event for event in events if event['name'] == 'boundary_union']))
+        create_all = [event for event in events if event['name'] == 'create_all'][0]
+        self.assertEqual('stale_layers', create_all['args']['critical_path'][-1])
+        self.assertGreater(create_all['args']['layers'], 0)
+        encode = [event for event in events if event['name'] == 'encode'][0]
+        self.assertIn('cells', encode['args'])
+        self.assertTrue([event for event in events if event['name'] == 'crop' and 'profile_top' in event['args']])
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    def test_create_all_metrics(self, _):
+        metrics = MetricsRegistry()
+        self.msm = ModflowSpatialManager(self.geoserver_engine, self.mock_model_file_db, self.modflow_version,
+                                         metrics=metrics)
+        self.msm.load_model()
+        self.msm.flopy_model.sr.epsg = 2901
+        self.msm.create_all()
+
+        layers = metrics.get('modflow_layers_total')
+        self.assertGreater(layers.get(result='published'), 0)
+        self.assertEqual(self.msm.publish_stats['bytes'], metrics.get('modflow_bytes_uploaded_total').get())
+        self.assertGreater(metrics.get('modflow_bytes_written_total').get(), 0)
+        self.assertGreater(metrics.get('modflow_arrays_materialized_total').get(), 0)
+        self.assertEqual(1, metrics.get('modflow_model_load_seconds').get_count())
+        self.assertGreater(metrics.get('modflow_geoserver_request_seconds').get_count(
+            operation='publish_coverage', status='ok'), 0)
+        self.assertEqual(1, metrics.get('modflow_publish_seconds').get_count(status='ok'))
+
+        # Republish with the manifest of the first publish, the layers did not change
+        self.msm = ModflowSpatialManager(self.geoserver_engine, self.mock_model_file_db, self.modflow_version,
+                                         publish_manifest=self.msm.publish_manifest.to_dict(), metrics=metrics)
+        self.msm.create_package_shapefile_layers()
+        self.assertGreater(layers.get(result='skipped'), 0)
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    @mock.patch('flopy.utils.reference.getprj')
+    def test_create_all_out_of_core(self, mock_prj, _):
+        mock_prj.return_value = 'fake prj'
+        managers = []
+        for out_of_core in (False, True):
+            msm = ModflowSpatialManager(self.geoserver_engine, self.mock_model_file_db, self.modflow_version,
+                                        multi_band=True, class_breaks='quantile', out_of_core=out_of_core,
+                                        memory_budget=64 * 1024 ** 3)
+            msm.load_model()
+            msm.flopy_model.sr.epsg = 2901
+            msm.create_all()
+            managers.append(msm)
+
+        # Same layers, data and styles as the publish with the arrays in memory
+        self.assertEqual(managers[0].publish_manifest.to_dict(), managers[1].publish_manifest.to_dict())
+        self.assertEqual(managers[0]._class_styles, managers[1]._class_styles)
+        self.assertIsInstance(managers[1].get_head_data(), np.memmap)
+        self.assertGreater(managers[1].memory_budget.peak, 0)
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    @mock.patch('flopy.utils.reference.getprj')
+    def test_create_all_shared_arrays(self, mock_prj, _):
+        mock_prj.return_value = 'fake prj'
+        self.msm = ModflowSpatialManager(self.geoserver_engine, self.mock_model_file_db, self.modflow_version,
+                                         class_breaks='quantile')
+        self.msm.load_model()
+        self.msm.flopy_model.sr.epsg = 2901
+        spatial_reference_key = self.msm.get_spatial_reference_key()
+        self.msm._spatial_reference_key = None
+
+        with mock.patch.object(SharedArrayRegistry, 'close', autospec=True,
+                               side_effect=SharedArrayRegistry.close) as mock_close:
+            self.msm.create_all()
+
+        # The heads are given to the statistics process by handle, the ibound of the tasks is the shared one
+        timings = self.msm.task_scheduler.timings
+        self.assertLessEqual(timings['shared_heads'].end, timings['head_statistics'].start)
+        self.assertLessEqual(timings['shared_arrays'].end, timings['package_DIS'].start)
+        self.assertEqual(spatial_reference_key, self.msm.get_spatial_reference_key())
+        self.assertTrue(self.msm._class_styles)
+        mock_close.assert_called_once_with(self.msm.shared_arrays)
+        self.assertEqual({}, self.msm.shared_arrays.handles)
+        self.assertIsNone(self.msm._ibound)
+
+    def test_memory_budget(self):
+        self.msm = ModflowSpatialManager(self.geoserver_engine, self.mock_model_file_db, self.modflow_version,
+                                         out_of_core=True, memory_budget=1024)
+        self.assertRaises(MemoryBudgetError, self.msm.load_model)
+
+    @mock.patch('tethysext.atcore.services.base_spatial_manager.GeoServerAPI')
+    @mock.patch('flopy.utils.reference.getprj')
+    def test_create_all_publish_cache(self, mock_prj, _):
+        mock_prj.return_value = 'fake prj'
+        publish_cache = PublishCache()
+        msm = ModflowSpatialManager(self.geoserver_engine, self.mock_model_file_db, self.modflow_version,
+                                    publish_cache=publish_cache)
+        msm.load_model()
+        msm.flopy_model.sr.epsg = 2901
+        msm.create_all()
+        self.assertTrue(publish_cache.has_style(ModflowSpatialManager.SHARED_STYLES))
+        self.assertEqual({'2901': 'fake prj'}, publish_cache.projections)
+        mock_prj.assert_called_once_with(2901)
+        self.assertGreater(msm.publish_stats['layers'], 0)
+        self.assertGreater(msm.publish_stats['bytes'], 0)
+
+        # The next model of the batch uses the shared styles
+        msm.gs_api.create_style.reset_mock()
+        msm = ModflowSpatialManager(self.geoserver_engine, self.mock_model_file_db, self.modflow_version,
+                                    publish_cache=publish_cache)
+        msm.load_model()
+        msm.flopy_model.sr.epsg = 2901
+        msm.create_all()
+        style_names = [c[1]['style_name'] for c in msm.gs_api.create_style.call_args_list]
+        self.assertNotIn(ModflowSpatialManager.VL_MODEL_BOUNDARY, style_names)
+        mock_prj.assert_called_once_with(2901)
@@ -0,0 +1,97 @@
+"""
+********************************************************************************
+* Name: out_of_core
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import mock
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from modflow_adapter.services.out_of_core import HEAD_HEADERS, MemoryBudget, MemoryBudgetError, get_rss, \
+    read_head_file, stack_layers
+
+
+class OutOfCoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.heads = np.arange(2 * 3 * 4 * 5, dtype=np.float32).reshape(2, 3, 4, 5)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_heads(self, layers=(1, 2, 3), header=HEAD_HEADERS[0], realtype=np.float32):
+        # Binary head file with one record per saved layer for 2 time steps
+        filename = os.path.join(self.temp_dir, 'model.hds')
+        with open(filename, 'wb') as f:
+            for kper in range(2):
+                for ilay in layers:
+                    f.write(np.array([(1, kper + 1, 1.0, kper + 1.0, '{:>16}'.format('HEAD'), 5, 4, ilay)],
+                                     dtype=header).tobytes())
+                    f.write(self.heads[kper, ilay - 1].astype(realtype).tobytes())
+        return filename
+
+    def test_get_rss(self):
+        self.assertGreater(get_rss(), 0)
+
+    @mock.patch('modflow_adapter.services.out_of_core.get_rss')
+    def test_memory_budget_check(self, mock_get_rss):
+        mock_get_rss.return_value = 900
+        budget = MemoryBudget(1000)
+        budget.check('statistics')
+        self.assertEqual(100, budget.get_available())
+
+        mock_get_rss.return_value = 1200
+        with self.assertRaises(MemoryBudgetError) as context:
+            budget.check('statistics')
+        self.assertIn('statistics', str(context.exception))
+        self.assertEqual(1200, budget.peak)
+
+        MemoryBudget().check()
+
+    @mock.patch('modflow_adapter.services.out_of_core.get_rss')
+    def test_memory_budget_window_rows(self, mock_get_rss):
+        mock_get_rss.return_value = 1000
+        self.assertEqual(50, MemoryBudget(window_bytes=5000).get_window_rows(200, 100))
+        self.assertEqual(200, MemoryBudget(window_bytes=10 ** 9).get_window_rows(200, 100))
+        # A quarter of the 4000 bytes left in the budget
+        self.assertEqual(10, MemoryBudget(5000, window_bytes=10 ** 9).get_window_rows(200, 100))
+        self.assertEqual(1, MemoryBudget(1000).get_window_rows(200, 100))
+
+    def test_read_head_file(self):
+        ret = read_head_file(self.write_heads())
+        self.assertIsInstance(ret, np.memmap)
+        self.assertEqual((3, 4, 5), ret.shape)
+        self.assertFalse(ret.flags.writeable)
+        np.testing.assert_array_equal(self.heads[1], ret)
+
+    def test_read_head_file_double(self):
+        ret = read_head_file(self.write_heads(header=HEAD_HEADERS[1], realtype=np.float64))
+        self.assertEqual(np.float64, ret.dtype)
+        np.testing.assert_array_equal(self.heads[1], ret)
+
+    def test_read_head_file_missing_layers(self):
+        ret = read_head_file(self.write_heads(layers=(1, 3)))
+        self.assertEqual((3, 4, 5), ret.shape)
+        np.testing.assert_array_equal(self.heads[1, 0], ret[0])
+        self.assertTrue(np.all(np.isnan(ret[1])))
+        np.testing.assert_array_equal(self.heads[1, 2], ret[2])
+
+    def test_read_head_file_invalid(self):
+        filename = os.path.join(self.temp_dir, 'model.hds')
+        with open(filename, 'wb') as f:
+            f.write(np.arange(100, dtype=np.int32).tobytes())
+        self.assertRaises(ValueError, read_head_file, filename)
+
+    def test_stack_layers(self):
+        filename = os.path.join(self.temp_dir, 'botm.dat')
+        ret = stack_layers(filename, iter(self.heads[0]), (3, 4, 5), np.float32)
+        self.assertIsInstance(ret, np.memmap)
+        np.testing.assert_array_equal(self.heads[0], ret)
+        self.assertEqual(self.heads[0].nbytes, os.path.getsize(filename))
@@ -0,0 +1,106 @@
+"""
+********************************************************************************
+* Name: publish_manifest
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import unittest
+import numpy as np
+
+from modflow_adapter.services.publish_manifest import PublishManifest
+
+
+class PublishManifestTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = 'modflow:123-456_DIS-thickn_001'
+        self.arr = np.arange(12, dtype=np.float32).reshape(3, 4)
+        self.digest = PublishManifest.hash_array(self.arr)
+        self.manifest = PublishManifest()
+
+    def tearDown(self):
+        pass
+
+    def test_hash_array(self):
+        self.assertEqual(self.digest, PublishManifest.hash_array(self.arr.copy()))
+        self.assertNotEqual(self.digest, PublishManifest.hash_array(self.arr + 1))
+        self.assertNotEqual(self.digest, PublishManifest.hash_array(self.arr.astype(np.float64)))
+        self.assertNotEqual(self.digest, PublishManifest.hash_array(self.arr.reshape(4, 3)))
+
+    def test_hash_array_stable(self):
+        # Same digest on every node, the manifests of the publishes on other nodes stay valid
+        self.assertEqual('6fd2d322d7e6d2bd', PublishManifest.hash_array(np.arange(6, dtype=np.int32).reshape(2, 3)))
+
+    def test_hash_array_not_contiguous(self):
+        self.assertEqual(PublishManifest.hash_array(self.arr[:, 1]),
+                         PublishManifest.hash_array(np.array([1, 5, 9], dtype=np.float32)))
+
+    def test_hash_array_strided_stack(self):
+        records = np.zeros(3, dtype=[('header', np.int32, (2,)), ('data', np.float32, (2, 2))])
+        records['data'] = np.arange(12, dtype=np.float32).reshape(3, 2, 2)
+        self.assertFalse(records['data'].flags.c_contiguous)
+        self.assertEqual(PublishManifest.hash_array(records['data'].copy()),
+                         PublishManifest.hash_array(records['data']))
+
+    def test_hash_array_records(self):
+        dtype = np.dtype([('k', int), ('i', int), ('j', int), ('flux', np.float32)])
+        records = np.rec.fromrecords([(0, 1, 2, -5.0), (1, 2, 3, 4.0)], dtype=dtype)
+        changed = records.copy()
+        changed['flux'][1] = 3.0
+        self.assertEqual(PublishManifest.hash_array(records), PublishManifest.hash_array(records.copy()))
+        self.assertNotEqual(PublishManifest.hash_array(records), PublishManifest.hash_array(changed))
+
+    def test_get_action_new_store(self):
+        ret = self.manifest.get_action(self.store, self.digest, 'modflow_raster', 'epsg')
+        self.assertEqual(PublishManifest.UPLOAD, ret)
+
+    def test_get_action(self):
+        self.manifest.record(self.store, self.digest, 'modflow_raster', 'epsg')
+        self.assertEqual(PublishManifest.SKIP,
+                         self.manifest.get_action(self.store, self.digest, 'modflow_raster', 'epsg'))
+        self.assertEqual(PublishManifest.RESTYLE,
+                         self.manifest.get_action(self.store, self.digest, 'modflow_raster_one_value', 'epsg'))
+        self.assertEqual(PublishManifest.UPLOAD,
+                         self.manifest.get_action(self.store, 'other', 'modflow_raster', 'epsg'))
+        self.assertEqual(PublishManifest.UPLOAD,
+                         self.manifest.get_action(self.store, self.digest, 'modflow_raster', 'other'))
+
+    def test_get_stale_stores(self):
+        self.manifest.record(self.store, self.digest, 'modflow_raster', 'epsg')
+        self.manifest.record('modflow:old', self.digest, 'modflow_raster', 'epsg')
+        self.manifest.begin()
+        self.manifest.record(self.store, self.digest, 'modflow_raster', 'epsg')
+        self.assertEqual(['modflow:old'], self.manifest.get_stale_stores())
+        self.manifest.remove('modflow:old')
+        self.assertEqual([self.store], self.manifest.get_stores())
+
+    def test_to_dict_from_dict(self):
+        self.manifest.record(self.store, self.digest, 'modflow_raster', 'epsg')
+        ret = PublishManifest.from_dict(self.manifest.to_dict())
+        self.assertEqual(self.manifest.layers, ret.layers)
+        self.assertIs(self.manifest, PublishManifest.from_dict(self.manifest))
+        self.assertEqual({}, PublishManifest.from_dict(None).layers)
+
+    def test_clear(self):
+        self.manifest.record(self.store, self.digest, 'modflow_raster', 'epsg')
+        self.manifest.clear()
+        self.assertEqual([], self.manifest.get_stores())
+
+    def test_stage_confirm(self):
+        self.manifest.record('modflow:old', self.digest, 'modflow_raster', 'epsg')
+        self.manifest.begin()
+        self.manifest.stage(self.store, self.digest, 'modflow_raster', 'epsg')
+        self.manifest.stage('modflow:failed', self.digest, 'modflow_raster', 'epsg')
+
+        # The staged stores are not published yet, but they are not stale
+        self.assertEqual(['modflow:old'], self.manifest.get_stores())
+        self.assertEqual(['modflow:old'], self.manifest.get_stale_stores())
+
+        ret = self.manifest.confirm([self.store, 'modflow:unknown'])
+
+        self.assertEqual({self.store: {'hash': self.digest, 'style': 'modflow_raster', 'spatial_reference': 'epsg'}},
+                         ret)
+        self.assertEqual(sorted(['modflow:old', self.store]), self.manifest.get_stores())
+        self.assertEqual(['modflow:failed'], list(self.manifest.pending))
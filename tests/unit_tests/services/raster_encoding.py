@@ -0,0 +1,114 @@
+"""
+********************************************************************************
+* Name: raster_encoding
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import mock
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import rasterio
+
+from modflow_adapter.services.raster_encoding import FLOAT_NODATA, encode_array, encode_window, get_encoding, \
+    write_geotiff, write_geotiff_windows
+
+
+class RasterEncodingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_encode_array_categorical(self):
+        ibound = np.array([[1, 0], [-1, 1]], dtype=np.int64)
+        ret = encode_array(ibound)
+        self.assertEqual(np.int8, ret.array.dtype)
+        self.assertEqual(-128, ret.nodata)
+        np.testing.assert_array_equal(ibound, ret.array)
+
+    def test_encode_array_integer_values_as_float(self):
+        iseg = np.array([[0.0, 200.0], [150.0, 1.0]])
+        ret = encode_array(iseg)
+        self.assertEqual(np.int16, ret.array.dtype)
+        np.testing.assert_array_equal(iseg, ret.array)
+
+    def test_encode_array_continuous(self):
+        arr = np.array([[0.5, 1.25], [np.nan, 2.0]])
+        ret = encode_array(arr)
+        self.assertEqual(np.float32, ret.array.dtype)
+        self.assertEqual(FLOAT_NODATA, ret.nodata)
+        np.testing.assert_array_equal([[0.5, 1.25], [FLOAT_NODATA, 2.0]], ret.array)
+
+    def test_encode_array_nodata(self):
+        heads = np.array([[10.5, -999.99], [11.25, 12.0]], dtype=np.float32)
+        ret = encode_array(heads, nodata=-999.99)
+        self.assertEqual(np.float32, ret.array.dtype)
+        self.assertEqual(np.float32(-999.99), np.float32(ret.nodata))
+        self.assertEqual(np.float32(-999.99), ret.array[0, 1])
+
+    def test_encode_array_precision(self):
+        arr = np.array([[100.123, 250.456], [np.nan, 175.0]])
+        ret = encode_array(arr, precision=0.01)
+        self.assertEqual(np.int16, ret.array.dtype)
+        self.assertEqual(ret.nodata, ret.array[1, 0])
+        decoded = ret.array[~np.isnan(arr)] * ret.scale + ret.offset
+        np.testing.assert_allclose(arr[~np.isnan(arr)], decoded, atol=0.005)
+
+    def test_encode_array_precision_out_of_range(self):
+        arr = np.array([[0.5, 1000.25]])
+        ret = encode_array(arr, precision=0.001)
+        self.assertEqual(np.float32, ret.array.dtype)
+
+    def test_encode_array_no_values(self):
+        ret = encode_array(np.full((2, 2), np.nan))
+        self.assertEqual(np.int8, ret.array.dtype)
+        self.assertTrue(np.all(ret.array == ret.nodata))
+
+    def test_write_geotiff(self):
+        sr = mock.MagicMock(delr=np.array([10.0, 10.0]), delc=np.array([10.0, 10.0]), length_multiplier=1.0,
+                            xul=1000.0, yul=2000.0, rotation=0.0, proj4_str='+init=epsg:26915')
+        filename = os.path.join(self.temp_dir, 'test.tif')
+        write_geotiff(filename, encode_array(np.array([[1, 2], [3, 0]])), sr)
+        with rasterio.open(filename) as src:
+            self.assertEqual('int8', src.dtypes[0])
+            self.assertEqual(-128, src.nodata)
+            self.assertEqual((1000.0, 2000.0), (src.transform.c, src.transform.f))
+            np.testing.assert_array_equal([[1, 2], [3, 0]], src.read(1))
+
+    def test_write_geotiff_non_uniform_grid(self):
+        filename = os.path.join(self.temp_dir, 'test.tif')
+        arr = encode_array(np.array([[1, 2], [3, 0]]))
+        # The first column width is the row height, but the columns are not uniform
+        for delr, delc in (([10.0, 20.0], [10.0, 10.0]), ([10.0, 10.0], [10.0, 20.0]), ([20.0, 20.0], [10.0, 10.0])):
+            sr = mock.MagicMock(delr=np.array(delr), delc=np.array(delc), length_multiplier=1.0, xul=1000.0,
+                                yul=2000.0, rotation=0.0, proj4_str='+init=epsg:26915')
+            self.assertRaises(ValueError, write_geotiff, filename, arr, sr)
+
+    def test_get_encoding_window_rows(self):
+        arr = np.array([[100.123, 250.456], [np.nan, 175.0], [-999.99, 180.5]])
+        expected = encode_array(arr, nodata=-999.99, precision=0.01)
+        encoding = get_encoding(arr, nodata=-999.99, precision=0.01, window_rows=1)
+        self.assertEqual(np.int16, encoding.dtype)
+        self.assertEqual((expected.nodata, expected.scale, expected.offset), encoding[1:])
+        windows = [encode_window(arr[row:row + 1], encoding, nodata=-999.99) for row in range(3)]
+        np.testing.assert_array_equal(expected.array, np.concatenate(windows))
+
+    def test_write_geotiff_windows(self):
+        sr = mock.MagicMock(delr=np.array([10.0] * 3), delc=np.array([10.0] * 3), length_multiplier=1.0,
+                            xul=1000.0, yul=2000.0, rotation=0.0, proj4_str='+init=epsg:26915')
+        arr = np.array([[[1.5, 2.0, 3.0], [4.0, np.nan, 6.0], [7.0, 8.0, 9.0]],
+                        [[0.5, 0.0, 0.0], [1.0, 1.0, 1.0], [2.0, 2.0, 2.0]]], dtype=np.float32)
+        filename = os.path.join(self.temp_dir, 'test.tif')
+        encoding = write_geotiff_windows(filename, arr, sr, window_rows=2)
+        self.assertEqual(np.float32, encoding.dtype)
+        with rasterio.open(filename) as src:
+            self.assertEqual(2, src.count)
+            self.assertEqual(FLOAT_NODATA, src.nodata)
+            np.testing.assert_array_equal(encode_array(arr).array, src.read())
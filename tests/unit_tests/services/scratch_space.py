@@ -0,0 +1,123 @@
+"""
+********************************************************************************
+* Name: scratch_space
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import mock
+import shutil
+import tempfile
+import threading
+import unittest
+
+from modflow_adapter.services.scratch_space import TMPFS_MIN_FREE, ScratchBudgetError, ScratchSpace
+
+
+class ScratchSpaceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.scratch = ScratchSpace(root=self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_directory(self):
+        with self.scratch.directory('head_raster') as first, self.scratch.directory('head_raster') as second:
+            self.assertNotEqual(first, second)
+            self.assertEqual(self.root, os.path.dirname(first))
+            self.assertTrue(os.path.basename(first).startswith('modflow_head_raster_'))
+            with open(os.path.join(first, 'head.tif'), 'wb') as f:
+                f.write(b'0' * 10)
+        self.assertFalse(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+        self.assertEqual([], os.listdir(self.root))
+
+    def test_directory_on_release(self):
+        on_release = mock.MagicMock()
+        scratch = ScratchSpace(root=self.root, on_release=on_release)
+        with scratch.directory('zip') as tmp_dir:
+            with open(os.path.join(tmp_dir, 'layer.zip'), 'wb') as f:
+                f.write(b'0' * 10)
+        on_release.assert_called_once_with(10)
+
+    def test_directory_error(self):
+        try:
+            with self.scratch.directory('boundary') as tmp_dir:
+                open(os.path.join(tmp_dir, 'boundary.shp'), 'w').close()
+                raise IOError('GeoServer timeout')
+        except IOError:
+            pass
+        self.assertFalse(os.path.exists(tmp_dir))
+        self.assertEqual(0, self.scratch.get_usage())
+
+    def test_directory_reserve(self):
+        self.scratch.budget = 100
+        with self.scratch.directory(nbytes=50) as tmp_dir:
+            self.assertEqual(50, self.scratch.get_usage())
+            with open(os.path.join(tmp_dir, 'grid.zip'), 'wb') as f:
+                f.write(b'0' * 60)
+            # The files written beyond the reservation count
+            self.assertEqual(60, self.scratch.get_usage())
+            with self.scratch.directory(nbytes=40):
+                self.assertEqual(100, self.scratch.get_usage())
+                with self.assertRaises(ScratchBudgetError):
+                    with self.scratch.directory(nbytes=1):
+                        pass
+            self.assertRaises(ScratchBudgetError, self.scratch.directory(nbytes=41).__enter__)
+
+        # The reservations of the finished operations are released
+        self.assertEqual(0, self.scratch.get_usage())
+        with self.scratch.directory(nbytes=100):
+            pass
+        self.assertEqual([], os.listdir(self.root))
+
+    def test_directory_reserve_concurrent(self):
+        self.scratch.budget = 100
+        barrier = threading.Barrier(4)
+        results = []
+
+        def operation():
+            barrier.wait()
+            try:
+                with self.scratch.directory('raster', nbytes=40):
+                    barrier.wait()
+                results.append(True)
+            except ScratchBudgetError:
+                barrier.wait()
+                results.append(False)
+
+        threads = [threading.Thread(target=operation) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Only two of the operations fit the budget at the same time
+        self.assertEqual([False, False, True, True], sorted(results))
+
+    def test_cleanup(self):
+        directory = self.scratch.directory('list_package')
+        tmp_dir = directory.__enter__()
+        self.scratch.cleanup()
+        self.assertFalse(os.path.exists(tmp_dir))
+        directory.__exit__(None, None, None)
+
+    @mock.patch('modflow_adapter.services.scratch_space.shutil.disk_usage')
+    @mock.patch('modflow_adapter.services.scratch_space.os.access', return_value=True)
+    @mock.patch('modflow_adapter.services.scratch_space.os.path.isdir', return_value=True)
+    def test_get_default_root(self, _, __, mock_usage):
+        mock_usage.return_value = mock.MagicMock(free=1000)
+        self.assertEqual('/dev/shm', ScratchSpace.get_default_root(budget=1000))
+
+        # Without budget, a small tmpfs is not used
+        self.assertEqual(tempfile.gettempdir(), ScratchSpace.get_default_root())
+        mock_usage.return_value = mock.MagicMock(free=TMPFS_MIN_FREE)
+        self.assertEqual('/dev/shm', ScratchSpace.get_default_root())
+        mock_usage.return_value = mock.MagicMock(free=1000)
+
+        # Not enough memory for the budget
+        self.assertEqual(tempfile.gettempdir(), ScratchSpace.get_default_root(budget=1001))
+        self.assertEqual(tempfile.gettempdir(), ScratchSpace.get_default_root(tmpfs=False))
@@ -0,0 +1,109 @@
+"""
+********************************************************************************
+* Name: shared_arrays
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from modflow_adapter.services.layer_statistics import get_layer_statistics
+from modflow_adapter.services.shared_arrays import FILES, SHARED_MEMORY, SharedArray, SharedArrayRegistry, attach, \
+    call_with_arrays, get_memmap_handle, shared_memory
+
+
+class SharedArraysTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.heads = np.arange(3 * 4 * 5, dtype=np.float32).reshape(3, 4, 5)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def get_backends(self):
+        return [FILES] + ([SHARED_MEMORY] if shared_memory is not None else [])
+
+    def test_put_get(self):
+        for backend in self.get_backends():
+            with SharedArrayRegistry(backend=backend, directory=self.temp_dir) as registry:
+                handle = registry.put('heads', self.heads)
+                self.assertIsInstance(handle, SharedArray)
+                self.assertEqual(handle, pickle.loads(pickle.dumps(handle)))
+                self.assertEqual(self.heads.nbytes, registry.nbytes)
+
+                ret = registry.get('heads')
+                np.testing.assert_array_equal(self.heads, ret)
+                self.assertFalse(ret.flags.writeable)
+
+                # Placed once
+                self.assertEqual(handle, registry.put('heads', np.zeros(2)))
+                self.assertEqual(self.heads.nbytes, registry.nbytes)
+                del ret
+
+    def test_create(self):
+        for backend in self.get_backends():
+            with SharedArrayRegistry(backend=backend, directory=self.temp_dir) as registry:
+                arr = registry.create('ibound', (3, 4, 5), np.int32)
+                for k in range(3):
+                    arr[k] = k
+                del arr
+                ret = attach(registry.handles['ibound'])
+                np.testing.assert_array_equal([0, 1, 2], ret[:, 0, 0])
+                self.assertRaises(ValueError, registry.create, 'ibound', (1,), np.int32)
+                del ret
+
+    def test_put_memmap(self):
+        filename = os.path.join(self.temp_dir, 'heads.dat')
+        stack = np.memmap(filename, dtype=np.float32, mode='w+', shape=(2, 3, 4, 5))
+        stack[1] = self.heads
+        stack.flush()
+        view = np.memmap(filename, dtype=np.float32, mode='r', shape=(2, 3, 4, 5))[1, :, 1:]
+
+        with SharedArrayRegistry() as registry:
+            handle = registry.put('heads', view)
+            # Shared from the file without being copied
+            self.assertEqual(filename, handle.filename)
+            self.assertEqual(0, registry.nbytes)
+            np.testing.assert_array_equal(self.heads[:, 1:], attach(handle))
+
+    def test_get_memmap_handle(self):
+        self.assertIsNone(get_memmap_handle('heads', self.heads))
+        filename = os.path.join(self.temp_dir, 'heads.dat')
+        np.memmap(filename, dtype=np.float32, mode='w+', shape=(3, 4, 5)).flush()
+        self.assertIsNone(get_memmap_handle('heads', np.memmap(filename, dtype=np.float32, mode='c')))
+        arr = np.memmap(filename, dtype=np.float32, mode='r', shape=(3, 4, 5))
+        self.assertIsNone(get_memmap_handle('heads', arr[::-1]))
+        handle = get_memmap_handle('heads', arr[2])
+        self.assertEqual(2 * 4 * 5 * 4, handle.offset)
+        self.assertEqual((4, 5), handle.shape)
+
+    def test_close(self):
+        with SharedArrayRegistry(backend=FILES, directory=self.temp_dir) as registry:
+            registry.put('heads', self.heads)
+            filename = registry.handles['heads'].filename
+            self.assertTrue(os.path.isfile(filename))
+        self.assertFalse(os.path.exists(filename))
+        self.assertEqual({}, registry.handles)
+        self.assertEqual([], os.listdir(self.temp_dir))
+
+    def test_invalid_backend(self):
+        self.assertRaises(ValueError, SharedArrayRegistry, backend='gpu')
+
+    def test_call_with_arrays(self):
+        expected = get_layer_statistics(self.heads, nodata=7.0, bins=4)
+        for backend in self.get_backends():
+            with SharedArrayRegistry(backend=backend, directory=self.temp_dir) as registry:
+                handle = registry.put('heads', self.heads)
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    future = executor.submit(call_with_arrays, get_layer_statistics, handle, nodata=7.0, bins=4)
+                    ret = future.result()
+            np.testing.assert_array_equal(expected['count'], ret['count'])
+            np.testing.assert_array_equal(expected['histogram'], ret['histogram'])
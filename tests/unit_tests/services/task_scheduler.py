@@ -0,0 +1,109 @@
+"""
+********************************************************************************
+* Name: task_scheduler
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import threading
+import time
+import unittest
+
+from modflow_adapter.services.task_scheduler import PROCESS_POOL, TaskResult, TaskScheduler, TaskTiming
+
+
+class TaskSchedulerTests(unittest.TestCase):
+
+    def test_get_order(self):
+        scheduler = TaskScheduler()
+        scheduler.add_task('layers', print, dependencies=['styles', 'model'])
+        scheduler.add_task('styles', print)
+        scheduler.add_task('model', print)
+        scheduler.add_task('flush', print, dependencies=['layers'])
+        self.assertEqual(['styles', 'model', 'layers', 'flush'], scheduler.get_order())
+
+    def test_add_task_errors(self):
+        scheduler = TaskScheduler()
+        scheduler.add_task('model', print)
+        self.assertRaises(ValueError, scheduler.add_task, 'model', print)
+        self.assertRaises(ValueError, scheduler.add_task, 'styles', print, pool='gpu')
+
+    def test_get_order_errors(self):
+        scheduler = TaskScheduler()
+        scheduler.add_task('layers', print, dependencies=['model'])
+        self.assertRaises(ValueError, scheduler.get_order)
+
+        scheduler = TaskScheduler()
+        scheduler.add_task('a', print, dependencies=['b'])
+        scheduler.add_task('b', print, dependencies=['a'])
+        self.assertRaises(ValueError, scheduler.run)
+
+    def test_run_results(self):
+        scheduler = TaskScheduler()
+        scheduler.add_task('heads', lambda: [1, 2, 3])
+        scheduler.add_task('total', sum, TaskResult('heads'))
+        scheduler.add_task('scaled', lambda values, factor: [v * factor for v in values], TaskResult('heads'),
+                           factor=TaskResult('total'))
+
+        ret = scheduler.run()
+
+        self.assertEqual({'heads': [1, 2, 3], 'total': 6, 'scaled': [6, 12, 18]}, ret)
+        self.assertEqual(('heads',), scheduler.tasks['total'].dependencies)
+        self.assertEqual(('heads', 'total'), scheduler.tasks['scaled'].dependencies)
+
+    def test_run_overlaps_independent_tasks(self):
+        barrier = threading.Barrier(2, timeout=5)
+        scheduler = TaskScheduler(thread_workers=2)
+        scheduler.add_task('styles', barrier.wait)
+        scheduler.add_task('heads', barrier.wait)
+        # Deadlocks (and breaks the barrier) if the tasks run one after the other
+        scheduler.run()
+        self.assertEqual({'styles', 'heads'}, set(scheduler.timings))
+
+    def test_run_process_pool(self):
+        scheduler = TaskScheduler(process_workers=1)
+        scheduler.add_task('base', lambda: 2)
+        scheduler.add_task('power', pow, TaskResult('base'), 10, pool=PROCESS_POOL)
+        self.assertEqual(1024, scheduler.run()['power'])
+
+    def test_run_error(self):
+        calls = []
+
+        def fail():
+            raise RuntimeError('upload failed')
+
+        scheduler = TaskScheduler()
+        scheduler.add_task('styles', fail)
+        scheduler.add_task('layers', calls.append, 'layers', dependencies=['styles'])
+
+        self.assertRaises(RuntimeError, scheduler.run)
+        self.assertEqual([], calls)
+        self.assertNotIn('styles', scheduler.timings)
+
+    def test_get_critical_path(self):
+        scheduler = TaskScheduler()
+        scheduler.add_task('model', time.sleep, 0)
+        scheduler.add_task('styles', time.sleep, 0)
+        scheduler.add_task('boundary', time.sleep, 0, dependencies=['model'])
+        scheduler.add_task('packages', time.sleep, 0, dependencies=['boundary', 'styles'])
+        scheduler.run()
+        scheduler.timings = {
+            'model': TaskTiming(0.0, 1.0),
+            'styles': TaskTiming(0.0, 0.5),
+            'boundary': TaskTiming(1.0, 3.0),
+            'packages': TaskTiming(3.0, 3.5),
+        }
+
+        path, total = scheduler.get_critical_path()
+
+        self.assertEqual(['model', 'boundary', 'packages'], path)
+        self.assertAlmostEqual(3.5, total)
+        report = scheduler.get_report()
+        self.assertIn('Wall time: 3.500s', report)
+        self.assertIn('Critical path (3.500s): model -> boundary -> packages', report)
+
+    def test_get_critical_path_no_run(self):
+        scheduler = TaskScheduler()
+        scheduler.add_task('model', print)
+        self.assertEqual(([], 0.0), scheduler.get_critical_path())
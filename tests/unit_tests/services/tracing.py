@@ -0,0 +1,134 @@
+"""
+********************************************************************************
+* Name: tracing
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+
+from modflow_adapter.services.tracing import NULL_SPAN, Tracer, traced
+
+
+class FakePublisher(object):
+
+    def __init__(self, tracer=None):
+        self.tracer = tracer
+
+    @traced('geoserver.publish_coverage', 'geoserver_store')
+    def publish_coverage(self, geoserver_store, coverage_file):
+        return coverage_file
+
+
+class TracingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_span(self):
+        tracer = Tracer()
+        with tracer.span('package', package_extension='DIS'):
+            with tracer.span('encode', package='DIS', cells=100) as span:
+                span.set(bytes=400)
+
+        package, encode = tracer.get_spans()
+        self.assertEqual('package', package.name)
+        self.assertEqual(package.id, encode.parent)
+        self.assertIsNone(package.parent)
+        self.assertEqual({'package': 'DIS', 'cells': 100, 'bytes': 400}, encode.attributes)
+        self.assertLessEqual(package.start, encode.start)
+        self.assertGreaterEqual(package.duration, encode.duration)
+
+    def test_span_error(self):
+        tracer = Tracer()
+        try:
+            with tracer.span('geoserver.import'):
+                raise IOError('GeoServer timeout')
+        except IOError:
+            pass
+        self.assertEqual('OSError: GeoServer timeout', tracer.get_spans()[0].error)
+        self.assertEqual(1, tracer.get_summary()['geoserver.import']['errors'])
+
+    def test_span_threads(self):
+        tracer = Tracer()
+
+        def task():
+            with tracer.span('contour', layer=1):
+                pass
+
+        with tracer.span('create_all'):
+            thread = threading.Thread(target=task)
+            thread.start()
+            thread.join()
+
+        # The spans of another thread are not nested in the spans of the calling thread
+        contour = tracer.get_spans('contour')[0]
+        self.assertIsNone(contour.parent)
+        self.assertNotEqual(tracer.get_spans('create_all')[0].thread, contour.thread)
+
+    def test_disabled(self):
+        tracer = Tracer(enabled=False)
+        with tracer.span('encode') as span:
+            span.set(bytes=10)
+        tracer.add_span('task.styles', 0.0, 1.0)
+        self.assertIs(NULL_SPAN, span)
+        self.assertEqual([], tracer.get_spans())
+
+    def test_traced(self):
+        tracer = Tracer()
+        publisher = FakePublisher(tracer)
+        self.assertEqual('layer.zip', publisher.publish_coverage('modflow:layer', coverage_file='layer.zip'))
+        span = tracer.get_spans('geoserver.*')[0]
+        self.assertEqual('geoserver.publish_coverage', span.name)
+        self.assertEqual({'geoserver_store': 'modflow:layer'}, span.attributes)
+
+        # Objects without tracer are not traced
+        self.assertEqual('layer.zip', FakePublisher().publish_coverage('modflow:layer', 'layer.zip'))
+
+    def test_profile(self):
+        tracer = Tracer(profile=['encode', 'geoserver.*'], profile_dir=self.tmp_dir, trace_memory=True)
+        try:
+            with tracer.span('encode'):
+                data = [list(range(100)) for _ in range(100)]
+            with tracer.span('zip'):
+                pass
+        finally:
+            tracer.close()
+        self.assertEqual(100, len(data))
+
+        encode, zip_span = tracer.get_spans()
+        self.assertTrue(os.path.isfile(encode.attributes['profile']))
+        self.assertTrue(encode.attributes['profile_top'])
+        self.assertGreater(encode.attributes['memory_allocated'], 0)
+        self.assertNotIn('profile', zip_span.attributes)
+        self.assertIn('memory_peak', zip_span.attributes)
+        self.assertTrue(tracer.is_profiled('geoserver.import'))
+        self.assertFalse(tracer.is_profiled('crop'))
+
+    def test_write(self):
+        tracer = Tracer()
+        with tracer.span('create_all', model='123'):
+            pass
+        tracer.add_span('task.styles', 0.0, 0.5, lane='tasks')
+        trace_file = os.path.join(self.tmp_dir, 'trace.json')
+
+        tracer.write(trace_file)
+
+        with open(trace_file) as f:
+            trace = json.load(f)
+        events = {event['name']: event for event in trace['traceEvents']}
+        self.assertEqual('X', events['create_all']['ph'])
+        self.assertEqual('123', events['create_all']['args']['model'])
+        self.assertEqual(500000.0, events['task.styles']['dur'])
+        self.assertEqual({'name': 'tasks'}, events['thread_name']['args'])
+        self.assertEqual(events['thread_name']['tid'], events['task.styles']['tid'])
+        self.assertEqual(1, trace['otherData']['summary']['create_all']['count'])
@@ -6,3 +6,216 @@
 * Copyright: (c) Aquaveo 2018
 ********************************************************************************
 """
+import json
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeResponse(object):
+    """
+    Response of the recorded GeoServer with the interface of requests.Response used by the publishers.
+    """
+
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise IOError('HTTP {}'.format(self.status_code))
+
+
+class RecordingGeoServer(object):
+    """
+    Stand-in for the REST API of a GeoServer with the Importer extension, used as the requests.Session of the
+    publishers. Each request is recorded as (method, path, json, uploaded file names) and the imports are simulated:
+    an uploaded zip file creates one task per layer (file base name), running an import completes its tasks except
+    the layers in fail_layers.
+    """
+
+    def __init__(self, endpoint='http://localhost:8181/geoserver/rest', fail_layers=()):
+        self.endpoint = endpoint.rstrip('/')
+        self.fail_layers = set(fail_layers)
+        self.requests = []
+        self.imports = OrderedDict()
+        self.uploads = {}
+
+    def get(self, url, **kwargs):
+        return self._handle('get', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._handle('post', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self._handle('put', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self._handle('delete', url, **kwargs)
+
+    def _handle(self, method, url, json=None, files=None, **kwargs):
+        path = url[len(self.endpoint):].strip('/')
+        parts = path.split('/')
+        file_names = []
+        if files:
+            for name, (file_name, f, _) in files.items():
+                with zipfile.ZipFile(f) as zipf:
+                    file_names = zipf.namelist()
+        self.requests.append((method, path, json, file_names))
+
+        if parts[0] != 'imports':
+            return FakeResponse(404)
+
+        if method == 'post' and len(parts) == 1:
+            import_id = len(self.imports)
+            self.imports[import_id] = OrderedDict()
+            return FakeResponse(201, {'import': {'id': import_id, 'state': 'PENDING'}})
+
+        tasks = self.imports.get(int(parts[1]))
+        if tasks is None:
+            return FakeResponse(404)
+
+        if method == 'post' and len(parts) == 2:
+            for task in tasks.values():
+                failed = task['layer']['name'] in self.fail_layers
+                task['state'] = 'ERROR' if failed else 'COMPLETE'
+            return FakeResponse(204)
+
+        if method == 'post' and parts[2:] == ['tasks']:
+            self.uploads[int(parts[1])] = file_names
+            for layer_name in OrderedDict.fromkeys(file_name.rsplit('.', 1)[0] for file_name in file_names):
+                task_id = len(tasks)
+                tasks[task_id] = {'id': task_id, 'state': 'READY', 'updateMode': 'CREATE',
+                                  'layer': {'name': layer_name}}
+            return FakeResponse(201, {'tasks': list(tasks.values())})
+
+        if method == 'get' and parts[2:] == ['tasks']:
+            return FakeResponse(200, {'tasks': list(tasks.values())})
+
+        if method == 'put' and len(parts) == 4:
+            task = tasks[int(parts[3])]
+            task['updateMode'] = json['task'].get('updateMode', task['updateMode'])
+            task['layer'].update(json['task'].get('layer', {}))
+            return FakeResponse(204)
+
+        return FakeResponse(405)
+
+
+class FakeGeoServer(object):
+    """
+    Local HTTP server standing in for the REST API of GeoServer (stores, resources, layers and styles), used to test
+    the asynchronous publisher. Each request is recorded as (method, path, query), the next requests can be failed
+    with the statuses of fail_statuses, and each request takes delay seconds to measure the concurrent requests.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.fail_statuses = []
+        self.requests = []
+        self.stores = {}
+        self.resources = {}
+        self.layers = {}
+        self.styles = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self):
+        return 'http://127.0.0.1:{}/geoserver/rest/'.format(self._server.server_address[1])
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._handle('get')
+
+            def do_POST(self):
+                self._handle('post')
+
+            def do_PUT(self):
+                self._handle('put')
+
+            def do_DELETE(self):
+                self._handle('delete')
+
+            def _handle(self, method):
+                url = urlparse(self.path)
+                path = url.path[len('/geoserver/rest/'):]
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with server._lock:
+                    server.requests.append((method, path, query))
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    fail_status = server.fail_statuses.pop(0) if server.fail_statuses else None
+                time.sleep(server.delay)
+                with server._lock:
+                    status = fail_status or server._dispatch(method, path.split('/'), query, body)
+                    server.in_flight -= 1
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        return Handler
+
+    def _dispatch(self, method, parts, query, body):
+        if parts[0] == 'layers' and method == 'put':
+            if parts[1] not in self.layers:
+                return 404
+            self.layers[parts[1]] = json.loads(body.decode('utf-8'))['layer']['defaultStyle']['name']
+            return 200
+
+        workspace = parts[1]
+        if parts[2] == 'styles':
+            if method == 'post':
+                if query['name'] in self.styles:
+                    return 403
+                self.styles[query['name']] = body.decode('utf-8')
+                return 201
+            if method == 'put':
+                self.styles[parts[3]] = body.decode('utf-8')
+                return 200
+            if method == 'delete':
+                return 200 if self.styles.pop(parts[3], None) is not None else 404
+
+        store_type, store = parts[2], parts[3]
+        if method == 'put' and len(parts) == 5:
+            self.stores[(store_type, store)] = body
+            self.layers['{}:{}'.format(workspace, store)] = None
+            return 201
+        if method == 'put' and len(parts) == 6:
+            if (store_type, store) not in self.stores:
+                return 404
+            self.resources[store] = json.loads(body.decode('utf-8'))
+            return 200
+        if method == 'delete':
+            if self.stores.pop((store_type, store), None) is None:
+                return 404
+            self.layers.pop('{}:{}'.format(workspace, store), None)
+            self.resources.pop(store, None)
+            return 200
+        return 405
@@ -0,0 +1,147 @@
+"""
+********************************************************************************
+* Name: batch_publish
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import json
+import mock
+import shutil
+import tempfile
+import unittest
+
+from modflow_adapter.services.metrics import MetricsRegistry, PublishMetrics
+from modflow_adapter.services.publish_cache import PublishCache
+from modflow_adapter.services.publish_manifest import PublishManifest
+from modflow_adapter.workflows.batch_publish import BatchPublisher, BatchPublishReport, get_manifest_file, \
+    load_publish_manifest, main
+
+
+class FakeManager(object):
+
+    def __init__(self, model_db_path, publish_cache, metrics, publish_manifest=None):
+        self.model_db_path = model_db_path
+        self.publish_cache = publish_cache
+        self.metrics = PublishMetrics(metrics)
+        self.publish_manifest = PublishManifest.from_dict(publish_manifest)
+        self.publish_stats = {'layers': 0, 'bytes': 0}
+
+    def create_all(self):
+        # The boundary is published before the failure
+        self.publish_manifest.record('modflow:boundary', 'abc', 'model_boundary', 'EPSG:2901')
+        if 'broken' in os.path.basename(self.model_db_path):
+            raise IOError('GeoServer timeout')
+        self.publish_cache.add_styles(['all_styles'])
+        self.publish_stats.update(layers=3, bytes=1024)
+        self.metrics.layers.inc(3, result=PublishMetrics.PUBLISHED)
+
+
+def fake_manager_factory(model_db_path, publish_cache=None, metrics=None):
+    return FakeManager(model_db_path, publish_cache, metrics, publish_manifest=load_publish_manifest(model_db_path))
+
+
+class BatchPublishTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_run(self):
+        progress = mock.MagicMock()
+        metrics = MetricsRegistry()
+        publisher = BatchPublisher(fake_manager_factory, processes=2, metrics=metrics)
+
+        model_db_paths = [os.path.join(self.tmp_dir, name) for name in ('model_1', 'broken_model', 'model_2')]
+        report = publisher.run(model_db_paths, progress=progress)
+
+        self.assertEqual(3, report.models)
+        self.assertEqual(6, report.layers)
+        self.assertEqual(2048, report.bytes)
+        self.assertEqual([model_db_paths[1]], [result['model'] for result in report.failures])
+        self.assertEqual('OSError: GeoServer timeout', report.failures[0]['error'])
+        self.assertGreater(report.models_per_hour, 0)
+        self.assertGreater(report.layers_per_second, 0)
+        self.assertEqual(3, progress.call_count)
+        progress.assert_called_with(mock.ANY, 3, 3)
+
+        # The metrics of the models published in the processes of the batch are merged
+        self.assertEqual(6, metrics.get('modflow_layers_total').get(result='published'))
+        self.assertEqual(2, metrics.get('modflow_models_total').get(result='published'))
+        self.assertEqual(1, metrics.get('modflow_models_total').get(result='failed'))
+        self.assertNotIn('metrics', report.results[0])
+
+        # The manifests of the models are saved, the failed model included
+        for model_db_path in model_db_paths:
+            self.assertEqual(['modflow:boundary'], list(load_publish_manifest(model_db_path)['layers']))
+
+    def test_publish_model(self):
+        publish_cache = PublishCache()
+        model_db_path = os.path.join(self.tmp_dir, 'model_1')
+        result = BatchPublisher.publish_model(fake_manager_factory, model_db_path, publish_cache=publish_cache)
+        self.assertEqual({'model': model_db_path, 'layers': 3, 'bytes': 1024, 'seconds': mock.ANY, 'error': None,
+                          'metrics': mock.ANY}, result)
+        self.assertEqual(['published'], result['metrics']['modflow_layers_total']['values'][0][0])
+        self.assertTrue(publish_cache.has_style('all_styles'))
+
+    def test_publish_manifest(self):
+        model_db_path = os.path.join(self.tmp_dir, 'model_1')
+        self.assertIsNone(load_publish_manifest(model_db_path))
+        BatchPublisher.publish_model(fake_manager_factory, model_db_path, publish_cache=PublishCache())
+
+        # The manifest is next to the model file database, the next batch starts from it
+        self.assertEqual(os.path.join(self.tmp_dir, 'model_1.publish_manifest.json'), get_manifest_file(model_db_path))
+        self.assertEqual(['model_1.publish_manifest.json'], os.listdir(self.tmp_dir))
+        manager = fake_manager_factory(model_db_path)
+        action = manager.publish_manifest.get_action('modflow:boundary', 'abc', 'model_boundary', 'EPSG:2901')
+        self.assertEqual(PublishManifest.SKIP, action)
+
+    def test_report(self):
+        results = [
+            {'model': 'model_1', 'layers': 10, 'bytes': 5000000, 'seconds': 30.0, 'error': None},
+            {'model': 'model_2', 'layers': 0, 'bytes': 0, 'seconds': 1.0, 'error': 'OSError: GeoServer timeout'},
+        ]
+        report = BatchPublishReport(results, 60.0, 2)
+        self.assertEqual(60.0, report.models_per_hour)
+        self.assertAlmostEqual(10 / 60.0, report.layers_per_second)
+        text = str(report)
+        self.assertIn('models/hour:       60.0', text)
+        self.assertIn('failed: model_2 (OSError: GeoServer timeout)', text)
+        self.assertEqual(1, report.to_dict()['failures'])
+
+    @mock.patch('modflow_adapter.workflows.batch_publish.BatchPublisher')
+    def test_main(self, mock_publisher):
+        report = BatchPublishReport([{'model': 'model_2', 'layers': 1, 'bytes': 10, 'seconds': 1.0, 'error': None}],
+                                    1.0, 4)
+        mock_publisher.return_value.run.return_value = report
+        model_list = os.path.join(self.tmp_dir, 'models.txt')
+        with open(model_list, 'w') as f:
+            f.write('model_2\n\n')
+        json_report = os.path.join(self.tmp_dir, 'report.json')
+        metrics_file = os.path.join(self.tmp_dir, 'modflow_publish.prom')
+
+        def run(model_db_paths, progress):
+            progress(report.results[0], 1, 1)
+            return report
+
+        mock_publisher.return_value.run.side_effect = run
+
+        exit_code = main(['model_1', '-f', model_list, '-p', '4', '--geoserver', 'http://localhost:8181/geoserver',
+                          '--multi-band', '--json', json_report, '--metrics-file', metrics_file, '--out-of-core',
+                          '--memory-budget', '16000000000'])
+
+        self.assertEqual(0, exit_code)
+        manager_factory = mock_publisher.call_args[0][0]
+        self.assertEqual(4, mock_publisher.call_args[1]['processes'])
+        self.assertIsInstance(mock_publisher.call_args[1]['metrics'], MetricsRegistry)
+        self.assertTrue(os.path.isfile(metrics_file))
+        self.assertTrue(manager_factory.keywords['multi_band'])
+        self.assertTrue(manager_factory.keywords['out_of_core'])
+        self.assertEqual(16000000000, manager_factory.keywords['memory_budget'])
+        self.assertEqual(['model_1', 'model_2'], mock_publisher.return_value.run.call_args[0][0])
+        with open(json_report) as f:
+            self.assertEqual(1, json.load(f)['layers'])
@@ -0,0 +1,147 @@
+"""
+********************************************************************************
+* Name: publish_jobs
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import datetime
+import mock
+import shutil
+import tempfile
+import unittest
+
+from modflow_adapter.workflows.publish_jobs import PublishJob, PublishJobQueue
+
+
+class PublishJobQueueTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.url = 'sqlite:///{}'.format(os.path.join(self.tmp_dir, 'jobs.sqlite'))
+        self.queue = PublishJobQueue(self.url)
+
+    def tearDown(self):
+        self.queue.engine.dispose()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_enqueue(self):
+        job_id = self.queue.enqueue('resource-1', multi_band=True)
+        job = self.queue.get(job_id)
+        self.assertEqual('resource-1', job['resource_id'])
+        self.assertEqual(PublishJob.QUEUED, job['status'])
+        self.assertEqual({'multi_band': True}, job['options'])
+
+        # A resource has one queued job at most
+        self.assertEqual(job_id, self.queue.enqueue('resource-1'))
+        self.assertNotEqual(job_id, self.queue.enqueue('resource-2'))
+        self.assertEqual(2, self.queue.count(PublishJob.QUEUED))
+
+    def test_submit(self):
+        session = mock.MagicMock()
+        resource = mock.MagicMock(id='resource-1', UPLOAD_STATUS_KEY='upload', UPLOAD_GS_STATUS_KEY='upload_geoserver',
+                                  STATUS_PENDING='Pending')
+
+        job_id = self.queue.submit(session, resource)
+
+        resource.set_status.assert_any_call('upload', 'Pending')
+        resource.set_status.assert_any_call('upload_geoserver', 'Pending')
+        resource.set_attribute.assert_any_call('upload_geoserver', {'status': 'Pending', 'job_id': job_id,
+                                                                    'stage': None, 'progress': 0.0, 'stages': {}})
+        session.commit.assert_called_once()
+        self.assertEqual(PublishJob.QUEUED, self.queue.get(job_id)['status'])
+
+    def test_claim(self):
+        first = self.queue.enqueue('resource-1')
+        second = self.queue.enqueue('resource-2')
+
+        job = self.queue.claim('worker-1')
+        self.assertEqual(first, job['id'])
+        self.assertEqual(PublishJob.RUNNING, job['status'])
+        self.assertEqual('worker-1', job['worker'])
+        self.assertEqual(1, job['attempts'])
+        self.assertIsNotNone(job['date_started'])
+
+        # Another queue on the same database (i.e. another worker process) gets the next job
+        other = PublishJobQueue(self.url)
+        self.assertEqual(second, other.claim('worker-2')['id'])
+        self.assertIsNone(other.claim('worker-2'))
+        other.engine.dispose()
+
+    def test_complete_fail(self):
+        first = self.queue.enqueue('resource-1')
+        second = self.queue.enqueue('resource-2')
+        self.queue.claim()
+        self.queue.claim()
+
+        self.queue.update(first, stage='styles', progress=0.5)
+        self.assertEqual('styles', self.queue.get(first)['stage'])
+        self.queue.complete(first)
+        self.queue.fail(second, 'ConnectionError: timeout')
+
+        job = self.queue.get(first)
+        self.assertEqual(PublishJob.COMPLETED, job['status'])
+        self.assertEqual(1.0, job['progress'])
+        self.assertIsNotNone(job['date_finished'])
+        job = self.queue.get(second)
+        self.assertEqual(PublishJob.FAILED, job['status'])
+        self.assertEqual('ConnectionError: timeout', job['message'])
+        self.assertIsNone(self.queue.get(12345))
+
+    def test_retry_checkpoint(self):
+        job_id = self.queue.enqueue('resource-1')
+        self.queue.claim()
+        self.queue.save_checkpoint(job_id, {'modflow:layer_1': {'hash': 'a'}})
+        self.queue.save_checkpoint(job_id, {'modflow:layer_2': {'hash': 'b'}})
+
+        self.queue.fail(job_id, 'timeout', retry=True)
+        job = self.queue.claim()
+        self.assertEqual(job_id, job['id'])
+        self.assertEqual(2, job['attempts'])
+        self.assertEqual({'modflow:layer_1': {'hash': 'a'}, 'modflow:layer_2': {'hash': 'b'}}, job['checkpoint'])
+
+        self.queue.fail(job_id, 'timeout')
+        self.assertIsNone(self.queue.claim())
+        self.queue.retry(job_id)
+        self.assertEqual(job_id, self.queue.claim()['id'])
+
+    def test_claim_stale(self):
+        job_id = self.queue.enqueue('resource-1')
+        self.queue.claim('worker-1')
+        self.assertIsNone(self.queue.claim('worker-2', stale_after=60))
+
+        # The worker stopped updating the job
+        self.queue.update(job_id, date_updated=datetime.datetime.utcnow() - datetime.timedelta(seconds=120))
+        job = self.queue.claim('worker-2', stale_after=60)
+        self.assertEqual(job_id, job['id'])
+        self.assertEqual('worker-2', job['worker'])
+        self.assertEqual(2, job['attempts'])
+
+    def test_claim_running_resource(self):
+        first = self.queue.enqueue('resource-1')
+        self.assertEqual(first, self.queue.claim('worker-1')['id'])
+
+        # Resubmitted while its job is running, the resource waits for it
+        second = self.queue.enqueue('resource-1')
+        self.assertNotEqual(first, second)
+        other = self.queue.enqueue('resource-2')
+        self.assertEqual(other, self.queue.claim('worker-2')['id'])
+        self.assertIsNone(self.queue.claim('worker-2'))
+        self.assertIsNone(self.queue.claim('worker-2', stale_after=60))
+
+        self.queue.complete(first)
+        self.assertEqual(second, self.queue.claim('worker-2')['id'])
+
+    def test_claim_running_resource_stale(self):
+        first = self.queue.enqueue('resource-1')
+        self.queue.claim('worker-1')
+        second = self.queue.enqueue('resource-1')
+        self.queue.update(first, date_updated=datetime.datetime.utcnow() - datetime.timedelta(seconds=120))
+
+        # The stale job is claimed again before the job queued after it
+        self.assertEqual(first, self.queue.claim('worker-2', stale_after=60)['id'])
+        self.assertIsNone(self.queue.claim('worker-3', stale_after=60))
+        self.queue.complete(first)
+        self.assertEqual(second, self.queue.claim('worker-3', stale_after=60)['id'])
@@ -0,0 +1,126 @@
+"""
+********************************************************************************
+* Name: publish_worker
+* Author: ckrewson and mlebaron
+* Created On: October 19, 2026
+* Copyright: (c) Aquaveo 2026
+********************************************************************************
+"""
+import os
+import mock
+import shutil
+import tempfile
+import unittest
+
+from modflow_adapter.workflows.publish_jobs import PublishJob, PublishJobQueue
+from modflow_adapter.workflows.publish_worker import PublishCheckpointWriter, PublishWorker
+
+
+class PublishWorkerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.queue = PublishJobQueue('sqlite:///{}'.format(os.path.join(self.tmp_dir, 'jobs.sqlite')))
+        self.resource = mock.MagicMock(id='resource-1', STATUS_PENDING='Pending', STATUS_WORKING='Working',
+                                       STATUS_SUCCESS='Success', STATUS_FAILED='Failed')
+        self.resource.get_publish_manifest.return_value = {'layers': {'modflow:layer_0': {'hash': '0'}}}
+        self.session = mock.MagicMock()
+        self.session.query.return_value.filter.return_value.one.return_value = self.resource
+        self.manager = mock.MagicMock()
+        self.manager.publish_manifest.layers = {}
+        self.manager_factory = mock.MagicMock(return_value=self.manager)
+        self.worker = PublishWorker(self.queue, mock.MagicMock(return_value=self.session), self.manager_factory,
+                                    name='worker-1', status_interval=3600)
+
+    def tearDown(self):
+        self.queue.engine.dispose()
+        shutil.rmtree(self.tmp_dir)
+
+    def _create_all(self, progress):
+        for n, task_name in enumerate(['styles', 'boundary_mask', 'boundary_grid', 'flush']):
+            progress(task_name, n + 1, 4)
+
+    def test_run(self):
+        self.manager.create_all.side_effect = self._create_all
+        job_id = self.queue.enqueue('resource-1', multi_band=True)
+
+        self.assertEqual(1, self.worker.run(stop_when_empty=True))
+
+        self.manager_factory.assert_called_with(self.resource, multi_band=True)
+        self.manager.load_model.assert_called_once()
+        self.resource.set_publish_manifest.assert_called_with(self.manager.publish_manifest)
+        job = self.queue.get(job_id)
+        self.assertEqual(PublishJob.COMPLETED, job['status'])
+        self.assertEqual('flush', job['stage'])
+
+        # The statuses of the tasks are written in batches: once when the job starts and once when it ends
+        self.resource.set_status.assert_any_call('upload', 'Success')
+        self.resource.set_status.assert_called_with('upload_geoserver', 'Success')
+        self.assertEqual(2, self.session.commit.call_count)
+        gs_status = self.resource.set_attribute.call_args_list[-1][0]
+        self.assertEqual('upload_geoserver', gs_status[0])
+        self.assertEqual(1.0, gs_status[1]['progress'])
+        self.assertEqual({'styles': 'Success', 'boundary_mask': 'Success', 'boundary_grid': 'Success',
+                          'flush': 'Success'}, gs_status[1]['stages'])
+        self.session.close.assert_called_once()
+
+    def test_run_error(self):
+        self.worker.max_attempts = 1
+        self.manager.create_all.side_effect = ValueError('bad array')
+        job_id = self.queue.enqueue('resource-1')
+
+        self.assertIsNotNone(self.worker.run_once())
+
+        job = self.queue.get(job_id)
+        self.assertEqual(PublishJob.FAILED, job['status'])
+        self.assertEqual('ValueError: bad array', job['message'])
+        self.session.rollback.assert_called_once()
+        self.resource.set_status.assert_any_call('upload', 'Success')
+        self.resource.set_status.assert_called_with('upload_geoserver', 'Failed')
+        self.assertIsNone(self.worker.run_once())
+
+    def test_run_resume(self):
+        layer = {'hash': 'abc', 'style': 'modflow_raster', 'spatial_reference': 'epsg'}
+
+        def create_all_fails(progress):
+            self.manager.checkpoint({'modflow:layer_1': layer})
+            raise IOError('GeoServer timeout')
+
+        def create_all(progress):
+            # The layer published by the first attempt is in the manifest, it is skipped
+            self.assertEqual({'modflow:layer_1': layer}, self.manager.publish_manifest.layers)
+            self.manager.checkpoint({'modflow:layer_2': layer})
+
+        attempts = iter([create_all_fails, create_all])
+        self.manager.create_all.side_effect = lambda progress: next(attempts)(progress)
+        job_id = self.queue.enqueue('resource-1')
+
+        # The failed job is queued again with its checkpoint
+        self.worker.run_once()
+        job = self.queue.get(job_id)
+        self.assertEqual(PublishJob.QUEUED, job['status'])
+        self.assertEqual('OSError: GeoServer timeout', job['message'])
+        self.assertEqual({'modflow:layer_1': layer}, job['checkpoint'])
+        self.resource.set_status.assert_called_with('upload_geoserver', 'Pending')
+        # The layer published by the failed attempt is added to the manifest of the resource
+        manifest = self.resource.set_publish_manifest.call_args[0][0]
+        self.assertEqual({'modflow:layer_0': {'hash': '0'}, 'modflow:layer_1': layer}, manifest.layers)
+
+        self.worker.run_once()
+        job = self.queue.get(job_id)
+        self.assertEqual(PublishJob.COMPLETED, job['status'])
+        self.assertEqual(2, job['attempts'])
+        self.assertEqual(['modflow:layer_1', 'modflow:layer_2'], sorted(job['checkpoint']))
+
+    def test_checkpoint_writer(self):
+        job_id = self.queue.enqueue('resource-1')
+        writer = PublishCheckpointWriter(self.queue, job_id, interval=3600)
+        writer({'modflow:layer_1': {'hash': 'a'}})
+        writer({'modflow:layer_2': {'hash': 'b'}})
+        self.assertEqual({}, self.queue.get(job_id)['checkpoint'])
+
+        writer.flush()
+
+        self.assertEqual({'modflow:layer_1': {'hash': 'a'}, 'modflow:layer_2': {'hash': 'b'}},
+                         self.queue.get(job_id)['checkpoint'])
+        self.assertEqual({}, writer.pending)